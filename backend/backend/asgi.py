@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+from pharmacy import offline_queue, pricing, reference_data  # noqa: E402  (needs the app registry)
+
+reference_data.warm_in_background()
+pricing.warm_in_background()
+offline_queue.start_sync_worker()
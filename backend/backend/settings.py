@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,9 +23,27 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+# PostgREST connection pool, one pool per worker thread (see pharmacy/supabase_client.py)
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv('SUPABASE_POOL_MAX_CONNECTIONS', '20'))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv('SUPABASE_POOL_MAX_KEEPALIVE', '10'))
+SUPABASE_POOL_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_POOL_KEEPALIVE_EXPIRY', '30'))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '15'))  # seconds per PostgREST call
+SUPABASE_CONNECT_RETRIES = int(os.getenv('SUPABASE_CONNECT_RETRIES', '1'))
+SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', 'true').lower() == 'true'
+# Rows PostgREST returns per request at most (the project's "Max rows" API setting)
+SUPABASE_MAX_ROWS = int(os.getenv('SUPABASE_MAX_ROWS', '1000'))
+# Longest in_() filter value list sent in one request, so URLs stay under proxy limits
+SUPABASE_IN_FILTER_MAX_CHARS = int(os.getenv('SUPABASE_IN_FILTER_MAX_CHARS', '2000'))
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 'remote' talks to SUPABASE_URL; 'local' uses the SQLite stand-in in pharmacy/local_supabase
+SUPABASE_BACKEND = os.getenv('SUPABASE_BACKEND', 'remote')
+LOCAL_SUPABASE_DB = os.getenv('LOCAL_SUPABASE_DB', ':memory:')
+SUPABASE_SCHEMA_DIR = BASE_DIR / 'supabase'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -76,13 +95,76 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'pharmacy.middleware.QueryCountMiddleware',
 ]
 
+# PostgREST round trips allowed per request before QueryCountMiddleware warns,
+# keyed by URL name (see pharmacy/urls.py), e.g. {'expirations-list': 5}
+DEFAULT_QUERY_BUDGET = int(os.getenv('DEFAULT_QUERY_BUDGET', '20'))
+QUERY_BUDGETS = {
+    'expirations-list': 10,
+    'purchase-orders-list': 4,
+    'stock-transfers-list': 2,
+    'stock-items-list': 4,
+    'products-list': 1,
+    'pos-list': 1,
+}
+
+# Seconds a worker keeps its copy of the reference tables (see pharmacy/reference_data.py);
+# the WSGI/ASGI entry points preload them in the background when warm-up is on.
+REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', '300'))
+REFERENCE_CACHE_WARMUP = os.getenv('REFERENCE_CACHE_WARMUP', 'true').lower() == 'true'
+# Seconds a worker keeps the product price list used by POST /pos/quote/
+PRICE_CACHE_TTL = float(os.getenv('PRICE_CACHE_TTL', '300'))
+
+# Page size for list endpoints called with ?cursor= but no ?limit=, and the largest ?limit= honoured
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+
+# Record POS sales, stock changes, identities and document numbers with the database functions in
+# supabase/migrations; turn off where those functions cannot be used to fall back to one request per
+# step.  The tables and computed columns the migrations add are needed either way.
+POS_CHECKOUT_RPC = os.getenv('POS_CHECKOUT_RPC', 'true').lower() == 'true'
+# Seconds a POS Idempotency-Key is remembered; a retry within this window replays the first sale
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+# Seconds a worker remembers the customer/physician id behind a name or PRC/PTR number; short, as a
+# delete only clears the cache of the worker that handled it (see pharmacy/identities.py)
+IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', '60'))
+# Largest number of sales accepted by POST /pos/bulk/
+POS_BULK_MAX_SALES = int(os.getenv('POS_BULK_MAX_SALES', '1000'))
+# Rows per insert/upsert request for bulk writes (POST /pos/bulk/, FIFO batch and ledger rows)
+BULK_WRITE_CHUNK = int(os.getenv('BULK_WRITE_CHUNK', '1000'))
+# Seconds snapshot_stock waits after reading the newest ledger id before folding up to it; longer than
+# any transaction that writes Stock_Transaction runs, so no lower id can still be uncommitted by then
+LEDGER_SETTLE_SECONDS = float(os.getenv('LEDGER_SETTLE_SECONDS', '60'))
+
+# Queue POS sales on the branch server while Supabase is unreachable (see pharmacy/offline_queue.py)
+# and replay them every OFFLINE_SYNC_INTERVAL seconds, OFFLINE_SYNC_BATCH sales per request;
+# off by default, set OFFLINE_QUEUE=true on the branch server only
+OFFLINE_QUEUE = os.getenv('OFFLINE_QUEUE', 'false').lower() == 'true'
+OFFLINE_QUEUE_DB = os.getenv('OFFLINE_QUEUE_DB', str(BASE_DIR / 'offline_queue.sqlite3'))
+OFFLINE_SYNC_INTERVAL = float(os.getenv('OFFLINE_SYNC_INTERVAL', '30'))
+OFFLINE_SYNC_BATCH = int(os.getenv('OFFLINE_SYNC_BATCH', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'pharmacy.queries': {'handlers': ['console'], 'level': os.getenv('QUERY_LOG_LEVEL', 'INFO')},
+    },
+}
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',  # Next.js URL
     'http://localhost:3001',  # Next.js URL
 ]
 
+CORS_EXPOSE_HEADERS = ['X-Query-Count', 'X-Query-Time-Ms', 'X-Query-Budget-Exceeded', 'Idempotent-Replayed']
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
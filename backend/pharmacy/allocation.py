@@ -0,0 +1,224 @@
+"""FIFO allocation of stock to expiry batches (``Expiration`` rows).
+
+Stock leaves a location from the batch closest to expiry first.  An
+``Allocator`` does that for a whole cart, transfer or upload in memory: it
+loads the batches of every stock item involved in one query, ``take`` and
+``receive`` move quantities between them, and ``save()`` applies every
+batch change as a signed delta in one ``adjust_batches`` call and writes
+every ledger row in one ``Stock_Transaction`` insert::
+
+    allocator = allocation.Allocator.load(stock_item_ids)
+    for line in cart:
+        allocator.take(line["stock_item_id"], line["quantity"], {"transaction_type": "POS", ...})
+    allocator.save()
+
+Each ``take`` moves a cursor past the batches it empties, so allocating a
+line costs only the batches it actually touches.  Deltas rather than the
+quantities worked out in memory are written, so a concurrent change to the
+same batch is kept; a batch that no longer holds what is taken from it
+refuses the whole save with ``StockError``.
+"""
+
+from django.conf import settings
+from postgrest import APIError
+
+from .fetch import fetch_in
+from .stock import MAX_RETRIES, StockError
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+BATCH_COLUMNS = "expiration_id, stock_item_id, expiry_date, quantity"
+
+
+def _fifo_order(batch):
+    return batch["expiry_date"], batch.get("expiration_id") or 0
+
+
+def load_batches(stock_item_ids):
+    """The ``Expiration`` rows with stock left for ``stock_item_ids``, in one query."""
+    return fetch_in(
+        lambda: supabase.table("Expiration").select(BATCH_COLUMNS).gt("quantity", 0),
+        "stock_item_id", sorted(set(stock_item_ids)), key="expiration_id",
+    )
+
+
+class Allocator:
+    def __init__(self, batches=()):
+        self._batches = {}
+        for batch in batches:
+            self._batches.setdefault(batch["stock_item_id"], []).append(dict(batch))
+        for rows in self._batches.values():
+            rows.sort(key=_fifo_order)
+        # stock_item_id -> index of the first batch that may still have stock
+        self._cursor = {}
+        # expiration_id -> delta not saved yet, and delta saved (what restore() takes back)
+        self._deltas = {}
+        self._saved = {}
+        self._new = {}
+        self.ledger = []
+
+    @classmethod
+    def load(cls, stock_item_ids):
+        return cls(load_batches(stock_item_ids))
+
+    def take(self, stock_item_id, quantity, entry=None):
+        """Deduct ``quantity`` from ``stock_item_id``'s batches, soonest expiry first.
+
+        Returns ``[(expiry_date, quantity)]`` for each batch used, ending with
+        ``(None, quantity)`` for any part not covered by a batch.  With
+        ``entry`` (the ledger columns shared by the rows), one
+        ``Stock_Transaction`` row per part is queued, with a negative
+        ``quantity_change``.
+        """
+        rows = self._batches.get(stock_item_id, ())
+        position = self._cursor.get(stock_item_id, 0)
+        parts = []
+        remaining = quantity
+        while remaining > 0 and position < len(rows):
+            batch = rows[position]
+            if batch["quantity"] <= 0:
+                position += 1
+                continue
+            taken = min(batch["quantity"], remaining)
+            self._change(batch, -taken)
+            parts.append((batch["expiry_date"], taken))
+            remaining -= taken
+        self._cursor[stock_item_id] = position
+        if remaining > 0:
+            parts.append((None, remaining))
+
+        if entry is not None:
+            for expiry_date, taken in parts:
+                self.ledger.append({**entry, "stock_item_id": stock_item_id, "quantity_change": -taken,
+                                    "expiry_date": expiry_date})
+        return parts
+
+    def receive(self, stock_item_id, expiry_date, quantity, entry=None):
+        """Add ``quantity`` to ``stock_item_id``'s batch expiring on ``expiry_date``, creating it if needed.
+
+        ``expiry_date`` None only records the ledger row.  With ``entry``, one
+        ``Stock_Transaction`` row is queued with a positive ``quantity_change``.
+        """
+        if expiry_date is not None:
+            rows = self._batches.setdefault(stock_item_id, [])
+            batch = next((row for row in rows if row["expiry_date"] == expiry_date), None)
+            if batch is None:
+                batch = {"stock_item_id": stock_item_id, "expiry_date": expiry_date, "quantity": 0}
+                self._new[(stock_item_id, expiry_date)] = batch
+                rows.append(batch)
+                rows.sort(key=_fifo_order)
+                # The new batch may expire before the ones ``take`` has already passed
+                position = next(index for index, row in enumerate(rows) if row is batch)
+                self._cursor[stock_item_id] = min(self._cursor.get(stock_item_id, 0), position)
+            self._change(batch, quantity)
+
+        if entry is not None:
+            self.ledger.append({**entry, "stock_item_id": stock_item_id, "quantity_change": quantity,
+                                "expiry_date": expiry_date})
+
+    def _change(self, batch, delta):
+        batch["quantity"] += delta
+        if batch.get("expiration_id") is not None:
+            self._deltas[batch["expiration_id"]] = self._deltas.get(batch["expiration_id"], 0) + delta
+
+    def save(self):
+        """Write the batch deltas, the new batches and the queued ledger rows, a fixed number of requests in all.
+
+        Raises ``StockError``, having written nothing, if a batch holds less
+        than is taken from it.
+        """
+        adjust_batches(self._deltas)
+        for expiration_id, delta in self._deltas.items():
+            self._saved[expiration_id] = self._saved.get(expiration_id, 0) + delta
+        self._deltas.clear()
+
+        new = [batch for batch in self._new.values() if batch["quantity"]]
+        created = bulk_write("Expiration", [dict(batch) for batch in new])
+        for batch, row in zip(new, created):
+            # Later takes and receives move it like any loaded batch
+            batch["expiration_id"] = row["expiration_id"]
+            self._saved[row["expiration_id"]] = batch["quantity"]
+        self._new = {key: batch for key, batch in self._new.items() if not batch["quantity"]}
+
+        bulk_write("Stock_Transaction", self.ledger, returning="minimal")
+        self.ledger = []
+
+    def restore(self):
+        """Take back every batch change ``save()`` wrote, as inverse deltas; drops anything still queued.
+
+        For undoing a checkout that failed part way.  Changes other requests
+        made to the same batches meanwhile are kept.
+        """
+        adjust_batches({expiration_id: -delta for expiration_id, delta in self._saved.items()})
+        self._saved.clear()
+        self._deltas.clear()
+        self._new.clear()
+        self.ledger = []
+
+
+def adjust_batches(changes):
+    """Apply ``{expiration_id: delta}`` to ``Expiration.quantity``; returns ``{expiration_id: quantity}``.
+
+    One call to the ``adjust_batches`` database function, which refuses the
+    whole batch (``StockError``) if any batch would go below zero.  With
+    ``POS_CHECKOUT_RPC`` off each batch is updated on its own, guarded by the
+    quantity it was read with, and the ones done are taken back if a later
+    one is refused.
+    """
+    deltas = {int(expiration_id): int(delta) for expiration_id, delta in changes.items() if delta}
+    if not deltas:
+        return {}
+
+    if not settings.POS_CHECKOUT_RPC:
+        done = {}
+        try:
+            for expiration_id in sorted(deltas):
+                done[expiration_id] = _adjust_batch(expiration_id, deltas[expiration_id])
+        except StockError:
+            for expiration_id in done:
+                _adjust_batch(expiration_id, -deltas[expiration_id])
+            raise
+        return done
+    try:
+        rows = supabase.rpc("adjust_batches", {
+            "adjustments": [{"expiration_id": expiration_id, "delta": delta} for expiration_id, delta in deltas.items()]
+        }).execute().data
+    except APIError as e:
+        if e.code == "P0001":
+            raise StockError(e.message) from None
+        raise
+    return {row["expiration_id"]: row["quantity"] for row in rows}
+
+
+def _adjust_batch(expiration_id, delta):
+    for _ in range(MAX_RETRIES):
+        current = supabase.table("Expiration").select("quantity").eq("expiration_id", expiration_id).execute().data
+        if not current:
+            raise StockError(f"Batch {expiration_id} not found.")
+        available = current[0]["quantity"]
+        if available + delta < 0:
+            raise StockError(f"Insufficient stock in batch {expiration_id}. Available: {available}, "
+                             f"Requested: {-delta}")
+        updated = supabase.table("Expiration").update({"quantity": available + delta}) \
+            .eq("expiration_id", expiration_id).eq("quantity", available).execute().data
+        if updated:
+            return updated[0]["quantity"]
+    raise StockError(f"Batch {expiration_id} is being changed by another request, try again")
+
+
+def bulk_write(table, rows, **options):
+    """Insert (or with ``on_conflict``, upsert) ``rows`` in requests of at most ``BULK_WRITE_CHUNK`` rows.
+
+    Returns the rows written, as the API returned them.
+    """
+    written = []
+    size = settings.BULK_WRITE_CHUNK
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        if "on_conflict" in options:
+            query = supabase.table(table).upsert(chunk, **options)
+        else:
+            query = supabase.table(table).insert(chunk, **options)
+        written.extend(query.execute().data or [])
+    return written
@@ -0,0 +1,9 @@
+"""Endpoint benchmarks against seeded local databases.
+
+Run with ``python manage.py benchmark_endpoints``; see that command for options.
+"""
+
+from .runner import benchmark_endpoint, list_endpoints, run_benchmarks
+from .seed import seed_database
+
+__all__ = ["benchmark_endpoint", "list_endpoints", "run_benchmarks", "seed_database"]
@@ -0,0 +1,146 @@
+"""Time the list endpoints against a seeded local database.
+
+Each endpoint is requested through Django's test client, so middleware, URL
+routing and DRF rendering are included in the numbers.  Per endpoint we keep
+the p50/p95 wall time, the PostgREST round trips of one request and the peak
+Python memory allocated while serving it (measured on a separate, untimed
+request because ``tracemalloc`` slows everything down).
+"""
+
+import contextvars
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from django.test import Client
+from django.urls import reverse
+
+from ..query_stats import track_queries
+from ..supabase_client import register_query_hook
+
+_deadline = contextvars.ContextVar("benchmark_deadline", default=None)
+
+
+class EndpointTimeout(BaseException):
+    """Raised from a query hook once a request runs past its time limit.
+
+    Derives from ``BaseException`` so the views' ``except Exception`` blocks
+    do not swallow it.
+    """
+
+
+def _check_deadline(event):
+    deadline = _deadline.get()
+    if deadline is not None and time.perf_counter() > deadline:
+        raise EndpointTimeout()
+
+
+register_query_hook(_check_deadline)
+
+
+@contextmanager
+def _time_limit(seconds):
+    token = _deadline.set(time.perf_counter() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def _quiet(enabled):
+    # The views print per-row debugging output and every request is logged;
+    # keep both out of the timings.
+    if not enabled:
+        yield
+        return
+    logging.disable(logging.WARNING)
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def list_endpoints():
+    """``(name, path)`` for every ``<resource>-list`` URL in ``pharmacy/urls.py``."""
+    from ..urls import resources
+
+    seen = set()
+    endpoints = []
+    for name, _view in resources:
+        if name in seen:
+            continue
+        seen.add(name)
+        endpoints.append((name, reverse(f"{name}-list")))
+    return endpoints
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _request(client, path, timeout):
+    with _time_limit(timeout), track_queries() as stats:
+        started = time.perf_counter()
+        try:
+            response = client.get(path)
+        except EndpointTimeout:
+            return None, time.perf_counter() - started, stats.count
+        return response.status_code, time.perf_counter() - started, stats.count
+
+
+def benchmark_endpoint(client, path, iterations=5, timeout=60, quiet=True):
+    """Request ``path`` ``iterations`` times and summarise the runs."""
+    samples = []
+    status = None
+    round_trips = None
+    with _quiet(quiet):
+        for _ in range(iterations):
+            status, elapsed, round_trips = _request(client, path, timeout)
+            if status is None:
+                return {
+                    "status": None,
+                    "timed_out": True,
+                    "timeout_s": timeout,
+                    "round_trips_before_timeout": round_trips,
+                    "iterations": len(samples),
+                }
+            samples.append(elapsed)
+
+        tracemalloc.start()
+        try:
+            _request(client, path, timeout)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "status": status,
+        "timed_out": False,
+        "iterations": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "min_ms": round(min(samples) * 1000, 2),
+        "round_trips": round_trips,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(endpoints, iterations=5, timeout=60, quiet=True, progress=None):
+    """Benchmark ``(name, path)`` pairs; returns ``{name: result}``."""
+    client = Client(SERVER_NAME="localhost")
+    results = {}
+    for name, path in endpoints:
+        result = {"path": path, **benchmark_endpoint(client, path, iterations, timeout, quiet)}
+        results[name] = result
+        if progress:
+            progress(name, result)
+    return results
@@ -0,0 +1,242 @@
+"""Deterministic synthetic data for the local stand-in database.
+
+``seed_database(db, rows)`` fills the reference tables with a small, fixed
+catalogue and then writes ``rows`` rows each into the high-volume tables
+(``POS``, ``POS_Item``, ``Stock_Transaction`` and ``Expiration``), spread over
+the year ending ``END_DATE``.  The same ``rows``/``seed`` always produces the
+same database, so benchmark runs are comparable.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+END_DATE = datetime(2025, 6, 30, 18, 0, tzinfo=timezone.utc)
+DAYS = 365
+BATCH_SIZE = 50_000
+
+LOCATIONS = ["Asuncion", "Talaingod", "Warehouse"]
+PRODUCTS = 200
+PEOPLE = 60
+PRESCRIPTIONS = 120
+PURCHASE_ORDERS = 20
+STOCK_TRANSFERS = 20
+
+# (description, discount) -- DSWD orders are the 100% discount type
+CUSTOMER_TYPES = [("regular", 0), ("senior citizen", 20), ("pwd", 20), ("dswd", 100)]
+ORDER_TYPES = ["regular", "regular", "regular", "senior citizen", "pwd", "dswd"]
+DOSAGE_FORMS = ["tablet", "capsule", "syrup", "suspension", "ointment"]
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(db, table, rows):
+    for batch in _batches(rows):
+        db.insert_many(table, batch)
+
+
+def _sale_time(rng):
+    return END_DATE - timedelta(days=rng.randrange(DAYS), minutes=rng.randrange(600))
+
+
+def _seed_reference_data(db, rng):
+    _insert(db, "Location", [{"location": name} for name in LOCATIONS])
+    _insert(db, "Branch", [
+        {"branch_name": name, "address": f"{name}, Davao del Norte", "location_id": i}
+        for i, name in enumerate(LOCATIONS[:2], start=1)
+    ])
+    _insert(db, "Unit", [{"unit": u} for u in ["pcs", "box", "bottle", "strip"]])
+    _insert(db, "Brand", [{"brand_name": f"Brand {i}"} for i in range(1, 21)])
+    _insert(db, "Product_Category", [{"category_name": f"Category {i}"} for i in range(1, 11)])
+    _insert(db, "Status", [{"status": s} for s in ["Active", "Inactive"]])
+    _insert(db, "User_Role", [{"role_name": r} for r in ["Admin", "Pharmacist", "Cashier"]])
+    _insert(db, "Customer_Type", [{"description": d, "discount": pct} for d, pct in CUSTOMER_TYPES])
+    _insert(db, "Purchase_Order_Status", [{"purchase_order_status": s}
+                                          for s in ["Pending", "Ordered", "Delayed", "Completed"]])
+    _insert(db, "Purchase_Order_Item_Status", [{"po_item_status": s}
+                                               for s in ["Pending", "Partial", "Received"]])
+    _insert(db, "Stock_Transfer_Status", [{"stock_transfer_status": s}
+                                          for s in ["Draft", "Pending", "In Transit", "Completed"]])
+    _insert(db, "Stock_Transfer_Item_Status", [{"sti_status": s} for s in ["Pending", "Transferred"]])
+
+    _insert(db, "Products", [{
+        "product_name": f"Product {i:04d}",
+        "category_id": rng.randint(1, 10),
+        "brand_id": rng.randint(1, 20),
+        "unit_id": rng.randint(1, 4),
+        "current_price": round(rng.uniform(5, 500), 2),
+        "net_content": f"{rng.choice([10, 30, 60, 100])}",
+    } for i in range(1, PRODUCTS + 1)])
+    _insert(db, "Drugs", [{
+        "product_id": i,
+        "dosage_strength": f"{rng.choice([125, 250, 500])}mg",
+        "dosage_form": rng.choice(DOSAGE_FORMS),
+    } for i in range(1, PRODUCTS + 1) if i % 3])
+    _insert(db, "Inventory", [{"product_id": i} for i in range(1, PRODUCTS + 1)])
+    _insert(db, "Price_History", [{"product_id": i, "price": 10, "effective_date": END_DATE - timedelta(days=DAYS)}
+                                  for i in range(1, PRODUCTS + 1)])
+    # stock_item_id = (product_id - 1) * len(LOCATIONS) + location_id
+    _insert(db, "Stock_Item", [
+        {"product_id": p, "location_id": loc, "quantity": rng.randint(0, 500)}
+        for p in range(1, PRODUCTS + 1) for loc in range(1, len(LOCATIONS) + 1)
+    ])
+
+    _insert(db, "Person", [{"first_name": f"First{i}", "last_name": f"Last{i}"} for i in range(1, PEOPLE + 1)])
+    _insert(db, "Users", [{
+        "username": f"user{i}", "password": "!", "person_id": i, "role_id": i, "location_id": min(i, 2),
+    } for i in range(1, 4)])
+    _insert(db, "Customers", [{
+        "person_id": i, "id_card_number": f"ID-{i:05d}", "customer_type_id": rng.randint(1, len(CUSTOMER_TYPES)),
+    } for i in range(4, PEOPLE - 10 + 1)])
+    _insert(db, "Physician", [{"person_id": i, "prc_num": f"PRC{i}", "ptr_num": f"PTR{i}"}
+                              for i in range(PEOPLE - 9, PEOPLE + 1)])
+    customers = PEOPLE - 10 - 3
+    _insert(db, "Prescription", [{
+        "customer_id": rng.randint(1, customers),
+        "physician_id": rng.randint(1, 10),
+        "prescription_details": "Rx",
+        "date_issued": _sale_time(rng),
+    } for _ in range(PRESCRIPTIONS)])
+    _insert(db, "Order", [{"customer_id": rng.randint(1, customers), "order_date": _sale_time(rng)}
+                          for _ in range(100)])
+
+    _insert(db, "Supplier", [{"supplier_name": f"Supplier {i}", "status_id": 1, "person_id": i} for i in range(1, 6)])
+    _insert(db, "Supplier_Item", [{
+        "supplier_id": rng.randint(1, 5), "product_id": p, "supplier_price": round(rng.uniform(3, 400), 2),
+    } for p in range(1, PRODUCTS + 1)])
+    _insert(db, "Purchase_Order", [{
+        "po_id": f"PO-2025-{i:03d}",
+        "order_date": _sale_time(rng),
+        "expected_delivery_date": END_DATE + timedelta(days=3 * DAYS),
+        "purchase_order_status_id": rng.randint(1, 4),
+    } for i in range(1, PURCHASE_ORDERS + 1)])
+    _insert(db, "Purchase_Order_Item", [{
+        "poi_id": f"POI-2025-{i:03d}",
+        "purchase_order_id": (i - 1) // 5 + 1,
+        "supplier_item_id": rng.randint(1, PRODUCTS),
+        "unit_id": 1,
+        "purchase_order_item_status_id": rng.randint(1, 3),
+        "ordered_qty": 100,
+        "received_qty": rng.randint(0, 100),
+        "expiry_date": END_DATE + timedelta(days=365),
+    } for i in range(1, PURCHASE_ORDERS * 5 + 1)])
+    _insert(db, "Stock_Transfer", [{
+        "transfer_id": f"ST-2025-{i:03d}",
+        "transfer_date": _sale_time(rng),
+        "stock_transfer_status_id": rng.randint(1, 4),
+        "src_location": 3,
+        "des_location": rng.randint(1, 2),
+    } for i in range(1, STOCK_TRANSFERS + 1)])
+    _insert(db, "Stock_Transfer_Item", [{
+        "sti_id": f"STI-{i:03d}",
+        "stock_transfer_id": (i - 1) // 5 + 1,
+        "product_id": rng.randint(1, PRODUCTS),
+        "unit_id": 1,
+        "stock_transfer_item_status_id": rng.randint(1, 2),
+        "ordered_quantity": 50,
+        "transferred_qty": 50,
+    } for i in range(1, STOCK_TRANSFERS * 5 + 1)])
+
+
+def _stock_item_id(product_id, location_id):
+    return (product_id - 1) * len(LOCATIONS) + location_id
+
+
+def _seed_sales(db, rng, rows):
+    pos_rows = []
+    for pos_id in range(1, rows + 1):
+        sale_date = _sale_time(rng)
+        pos_rows.append({
+            "sale_date": sale_date,
+            "invoice": f"POS-{sale_date.year}-{pos_id:03d}",
+            "user_id": rng.randint(2, 3),
+            "order_type": rng.choice(ORDER_TYPES),
+            "prescription_id": rng.randint(1, PRESCRIPTIONS) if pos_id % 4 == 0 else None,
+        })
+    _insert(db, "POS", pos_rows)
+    sale_dates = [row["sale_date"] for row in pos_rows]
+    dswd = [pos_id for pos_id, row in enumerate(pos_rows, start=1) if row["order_type"] == "dswd"]
+    del pos_rows
+
+    _insert(db, "Dswd_Order", ({
+        "customer_id": rng.randint(1, PEOPLE - 13),
+        "pos_id": pos_id,
+        "gl_num": f"GL-{pos_id}",
+        "gl_date": sale_dates[pos_id - 1],
+        "client_name": f"Client {pos_id}",
+    } for pos_id in dswd))
+    _insert(db, "Receipt", ({"pos_id": pos_id, "receipt_date": sale_dates[pos_id - 1]}
+                            for pos_id in range(1, rows + 1, 10)))
+
+    # Every sale has at least one item; the remaining rows go to random sales.
+    items = []
+    for i in range(rows):
+        pos_id = i + 1 if i < rows // 2 else rng.randint(1, rows)
+        items.append((pos_id, rng.randint(1, PRODUCTS), rng.randint(1, 5)))
+    _insert(db, "POS_Item", ({
+        "pos_id": pos_id, "product_id": product_id, "price": 10 + product_id % 90, "quantity_sold": qty,
+    } for pos_id, product_id, qty in items))
+
+    # The ledger: one row per sold item, plus transfers, receipts and disposals.
+    def transactions(items):
+        for i in range(rows):
+            kind = i % 10
+            pos_id, product_id, qty = items[i % len(items)]
+            location = 1 + pos_id % 2
+            if kind < 7:
+                yield {
+                    "stock_item_id": _stock_item_id(product_id, location),
+                    "transaction_type": "POS",
+                    "reference_id": pos_id,
+                    "src_location": location,
+                    "quantity_change": -qty,
+                    "transaction_date": sale_dates[pos_id - 1],
+                }
+            elif kind < 9:
+                yield {
+                    "stock_item_id": _stock_item_id(product_id, location),
+                    "transaction_type": "Transfer" if kind == 7 else "POI",
+                    "reference_id": rng.randint(1, STOCK_TRANSFERS * 5),
+                    "src_location": 3,
+                    "des_location": location,
+                    "quantity_change": 50,
+                    "transaction_date": sale_dates[pos_id - 1],
+                    "expiry_date": END_DATE + timedelta(days=rng.randrange(30, 720)),
+                }
+            else:
+                yield {
+                    "stock_item_id": _stock_item_id(product_id, location),
+                    "transaction_type": "Expired Item Disposal",
+                    "src_location": location,
+                    "quantity_change": -qty,
+                    "transaction_date": sale_dates[pos_id - 1],
+                    "disposed_date": sale_dates[pos_id - 1],
+                }
+
+    _insert(db, "Stock_Transaction", transactions(items))
+    del items
+
+    stock_items = PRODUCTS * len(LOCATIONS)
+    _insert(db, "Expiration", ({
+        "stock_item_id": rng.randint(1, stock_items),
+        "expiry_date": END_DATE + timedelta(days=rng.randrange(-60, 720)),
+        "quantity": rng.randint(0, 100),
+    } for _ in range(rows)))
+    _insert(db, "Disposed_Items", [{
+        "stock_item_id": rng.randint(1, stock_items), "quantity": rng.randint(1, 10), "disposed_date": _sale_time(rng),
+    } for _ in range(50)])
+
+
+def seed_database(db, rows, seed=0):
+    """Fill an empty ``LocalDatabase`` with reference data and ``rows`` sales rows."""
+    rng = random.Random(seed)
+    _seed_reference_data(db, rng)
+    _seed_sales(db, rng, rows)
@@ -0,0 +1,36 @@
+"""Small in-process caches shared by the request-path modules."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLStore:
+    """Thread-safe in-memory map whose entries expire; the oldest entries go first when full."""
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
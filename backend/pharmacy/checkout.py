@@ -0,0 +1,601 @@
+"""Point-of-sale checkout.
+
+``build_payload(data)`` turns the body the POS screen posts into a normalized
+payload, and ``checkout(payload)`` records the sale: customer, prescription,
+POS row, items, stock deduction (FIFO over expiry batches), ledger rows and
+the DSWD order.  With ``POS_CHECKOUT_RPC`` on (the default) that is a single
+call to the ``pos_checkout`` database function
+(``supabase/migrations/*_pos_checkout.sql``), which locks the stock rows and
+commits or rolls back the whole sale at once; otherwise the same steps run
+here as separate requests, for databases that do not have the function yet.
+
+``checkout_bulk(sales)`` records a batch (``POST /pos/bulk/``).  With the
+functions it is one ``pos_checkout_bulk`` call, which runs ``pos_checkout``
+once per sale inside the database.  Only without them does it take the
+set-based path that reads and writes each table once per batch.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from postgrest import APIError
+
+from . import allocation, document_numbers, idempotency, identities, reference_data, stock
+from .fetch import fetch_in, in_chunks
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+
+class CheckoutError(ValueError):
+    """The sale cannot be recorded as posted (bad input or not enough stock); views answer it with a 400."""
+
+
+def _split_name(name):
+    name_parts = name.strip().split()
+    if not name_parts:
+        return "", ""
+    first_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else name_parts[0]
+    last_name = name_parts[-1] if len(name_parts) > 1 else ""
+    return first_name, last_name
+
+
+def _iso_date(value):
+    return datetime.fromisoformat(value).date().isoformat() if value else None
+
+
+def customer_type_for(data):
+    """``(order_type, Customer_Type row or None, customer name)`` for a POS request body.
+
+    Regular sales have no customer type.  Raises ``CheckoutError`` when the
+    body names a customer type that does not exist.
+    """
+    discount_info = data.get("discountInfo") or {}
+    customer_info = data.get("customerInfo") or {}
+    try:
+        order_type = data["customerType"]
+    except KeyError:
+        raise CheckoutError("Missing field: customerType") from None
+    if order_type == "regular":
+        return order_type, None, None
+
+    discount_type = discount_info.get("type")
+    if discount_type == "senior":
+        discount_type = "senior citizen"
+
+    # Discount customers are named on the discount card, everyone else by patient name
+    if order_type == "discount" and discount_type in ["pwd", "senior citizen"]:
+        name_source = discount_info.get("name") or ""
+        order_type = discount_type
+    else:
+        name_source = customer_info.get("patient_name") or ""
+
+    customer_type = reference_data.find("Customer_Type", "description", order_type)
+    if not customer_type:
+        raise CheckoutError("Invalid customer type")
+    return order_type, customer_type, name_source
+
+
+def build_payload(data):
+    """The ``pos_checkout`` payload for a POS request body; raises ``CheckoutError`` on bad input."""
+    try:
+        discount_info = data.get("discountInfo") or {}
+        customer_info = data.get("customerInfo") or {}
+        order_type, customer_type, name_source = customer_type_for(data)
+
+        customer = None
+        if customer_type:
+            first_name, last_name = _split_name(name_source)
+            customer = {
+                "first_name": first_name,
+                "last_name": last_name,
+                "customer_type_id": customer_type["customer_type_id"],
+                "id_card_number": discount_info.get("idNumber"),
+            }
+
+        prescription = None
+        prescription_info = data.get("prescriptionInfo") or {}
+        if prescription_info.get("doctorName"):
+            first_name, last_name = _split_name(prescription_info["doctorName"])
+            prescription = {
+                "first_name": first_name,
+                "last_name": last_name,
+                "prc_num": prescription_info.get("PRCNumber"),
+                "ptr_num": prescription_info.get("PTRNumber"),
+                "details": prescription_info.get("notes", ""),
+                "date_issued": _iso_date(prescription_info.get("prescriptionDate")),
+            }
+
+        dswd = None
+        if order_type.upper() == "DSWD":
+            dswd = {
+                "gl_num": customer_info.get("guaranteeLetterNo"),
+                "gl_date": _iso_date(customer_info.get("guaranteeLetterDate")),
+                "claim_date": _iso_date(customer_info.get("receivedDate")),
+                "client_name": customer_info.get("client_name"),
+            }
+
+        items = [
+            {"product_id": int(item["product_id"]), "price": item["price"], "quantity": int(item["quantity"])}
+            for item in data["items"]
+        ]
+        if not items:
+            raise CheckoutError("A sale needs at least one item")
+        for item in items:
+            if item["quantity"] < 1:
+                raise CheckoutError(f"Invalid quantity for product {item['product_id']}")
+
+        return {
+            "sale_date": datetime.fromisoformat(data["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "user_id": data["user_id"],
+            "order_type": order_type,
+            "location_id": int(data["branch"]),
+            "customer": customer,
+            "prescription": prescription,
+            "dswd": dswd,
+            "items": items,
+        }
+    except CheckoutError:
+        raise
+    except KeyError as e:
+        raise CheckoutError(f"Missing field: {e.args[0]}") from None
+    except (TypeError, ValueError) as e:
+        raise CheckoutError(str(e)) from None
+
+
+def checkout(payload, idempotency_key=None):
+    """Record the sale described by ``payload``; returns ``{"pos_id", "invoice"}``.
+
+    With an ``idempotency_key`` a repeated call returns the first call's
+    result, marked ``"replayed": True``, instead of selling again.
+    """
+    fingerprint = None
+    if idempotency_key:
+        fingerprint = idempotency.request_hash(payload)
+        replayed = idempotency.recall(idempotency_key, fingerprint)
+        if replayed is not None:
+            return {**replayed, "replayed": True}
+
+    if settings.POS_CHECKOUT_RPC:
+        params = _with_idempotency(payload, idempotency_key, fingerprint)
+        try:
+            result = supabase.rpc("pos_checkout", {"payload": params}).execute().data
+        except APIError as e:
+            # RAISE EXCEPTION in the function (stock checks) arrives as P0001
+            if e.code == "P0001":
+                raise CheckoutError(e.message) from None
+            if e.code == "PT409":
+                raise idempotency.IdempotencyConflict(e.message) from None
+            raise
+    elif idempotency_key:
+        stored = idempotency.claim(idempotency_key, fingerprint)
+        if stored is not None:
+            result = {**stored, "replayed": True}
+        else:
+            try:
+                result = _checkout_resolving(payload)
+            except Exception:
+                idempotency.release(idempotency_key)
+                raise
+            idempotency.complete(idempotency_key, result)
+    else:
+        return _checkout_resolving(payload)
+
+    if idempotency_key:
+        idempotency.remember(idempotency_key, fingerprint,
+                             {k: v for k, v in result.items() if k != "replayed"})
+    return result
+
+
+def checkout_many(sales):
+    """Record many sales at once; ``sales`` is a list of ``{"data": <POS body>, "idempotency_key": ...}``.
+
+    Returns one result per sale, in order: ``{"index", "status", "pos_id",
+    "invoice", "error"}`` with status ``created``, ``replayed`` or
+    ``rejected``.  A rejected sale (bad input, not enough stock, a reused
+    key, a user or product that does not exist) does not stop the others.  With ``POS_CHECKOUT_RPC`` on this is a
+    single ``pos_checkout_bulk`` call.
+    """
+    results = [None] * len(sales)
+    payloads = []
+    for index, sale in enumerate(sales):
+        try:
+            payloads.append((index, build_payload(sale["data"]), sale.get("idempotency_key")))
+        except CheckoutError as e:
+            results[index] = _rejected(index, str(e))
+
+    if settings.POS_CHECKOUT_RPC:
+        if payloads:
+            params = [
+                _with_idempotency(payload, key, idempotency.request_hash(payload) if key else None)
+                for _, payload, key in payloads
+            ]
+            recorded = supabase.rpc("pos_checkout_bulk", {"sales": params}).execute().data
+            for (index, _, _), result in zip(payloads, recorded):
+                results[index] = {"index": index, "status": result["status"], "pos_id": result.get("pos_id"),
+                                  "invoice": result.get("invoice"), "error": result.get("error")}
+        return results
+
+    for index, payload, key in payloads:
+        try:
+            result = checkout(payload, idempotency_key=key)
+        except (CheckoutError, idempotency.IdempotencyConflict) as e:
+            results[index] = _rejected(index, str(e))
+            continue
+        results[index] = {
+            "index": index,
+            "status": "replayed" if result.get("replayed") else "created",
+            "pos_id": result["pos_id"],
+            "invoice": result["invoice"],
+            "error": None,
+        }
+    return results
+
+
+def _rejected(index, error):
+    return {"index": index, "status": "rejected", "pos_id": None, "invoice": None, "error": error}
+
+
+def _with_idempotency(payload, idempotency_key, fingerprint):
+    """``payload`` as ``pos_checkout`` takes it, with the idempotency key if there is one."""
+    if not idempotency_key:
+        return payload
+    return {**payload, "idempotency": {
+        "key": idempotency_key, "request_hash": fingerprint, "ttl": settings.IDEMPOTENCY_KEY_TTL,
+    }}
+
+
+def _resolve_prescription(prescription, customer_id):
+    """prescription_id of a new Prescription for a payload's ``prescription``, finding or adding the physician."""
+    if not prescription:
+        return None
+    physician_id, = identities.resolve_physicians([prescription])
+    prescription_insert = supabase.table("Prescription").insert(
+        _prescription_row(prescription, customer_id, physician_id)
+    ).execute()
+    return prescription_insert.data[0]["prescription_id"]
+
+
+def _prescription_row(prescription, customer_id, physician_id):
+    return {
+        "customer_id": customer_id, "physician_id": physician_id,
+        "prescription_details": prescription["details"],
+        "date_issued": prescription["date_issued"]
+    }
+
+
+def _requested(items):
+    """Total quantity per product_id over the cart lines."""
+    requested = {}
+    for item in items:
+        requested[item["product_id"]] = requested.get(item["product_id"], 0) + item["quantity"]
+    return requested
+
+
+def _load_stock(location_id, requested):
+    """``{product_id: Stock_Item row}`` for the cart, read in one query; raises ``CheckoutError`` if short."""
+    rows = fetch_in(
+        lambda: supabase.table("Stock_Item").select("stock_item_id, product_id, location_id, quantity")
+        .eq("location_id", location_id),
+        "product_id", list(requested), key="stock_item_id",
+    )
+    stock_items = {row["product_id"]: row for row in rows}
+    for product_id, quantity in requested.items():
+        stock_item = stock_items.get(product_id)
+        error = _stock_error(product_id, stock_item["quantity"] if stock_item else None, quantity)
+        if error:
+            raise CheckoutError(error)
+    return stock_items
+
+
+def _stock_error(product_id, available, requested):
+    """Why ``requested`` units cannot be sold when ``available`` are in stock (None: no Stock_Item), or None."""
+    if available is None:
+        return f"Product {product_id} not found in stock for this location."
+    if requested > available:
+        return f"Insufficient stock for product {product_id}. Available: {available}, Requested: {requested}"
+    return None
+
+
+def _names_people(payload):
+    return bool(payload.get("customer") or payload.get("prescription"))
+
+
+def _checkout_resolving(payload):
+    """``_checkout_client_side``, retried once with fresh customer and physician ids (see ``identities``)."""
+    return identities.retry_stale(lambda: _checkout_client_side(payload), _names_people(payload))
+
+
+def _checkout_client_side(payload):
+    """``pos_checkout`` step by step over the REST API.
+
+    Not atomic: if a write fails after the stock was deducted, what was
+    written is taken back (``_undo_sales``) before the error propagates.
+    """
+    location_id = payload["location_id"]
+    sale_date = payload["sale_date"]
+
+    # Pre-check stock levels before writing anything
+    stock_items = _load_stock(location_id, _requested(payload["items"]))
+
+    customer_id, = identities.resolve_customers([payload.get("customer")])
+    prescription_id = _resolve_prescription(payload.get("prescription"), customer_id)
+
+    # All the cart's stock rows in one atomic call, before the sale is written
+    changes = [(stock_items[item["product_id"]]["stock_item_id"], -item["quantity"]) for item in payload["items"]]
+    try:
+        stock.adjust(changes)
+    except stock.StockError as e:
+        raise CheckoutError(str(e)) from None
+
+    pos_ids = []
+    allocator = None
+    try:
+        invoice = document_numbers.next_number("POS")
+        pos_insert = supabase.table("POS").insert({
+            "sale_date": sale_date, "invoice": invoice, "user_id": payload["user_id"],
+            "order_type": payload["order_type"], "prescription_id": prescription_id
+        }).execute()
+        pos_id = pos_insert.data[0]["pos_id"]
+        pos_ids.append(pos_id)
+
+        # FIFO over the cart's batches, one ledger row per batch touched
+        allocator = allocation.Allocator.load(row["stock_item_id"] for row in stock_items.values())
+        entry = {"transaction_date": sale_date, "transaction_type": "POS", "src_location": location_id,
+                 "reference_id": pos_id}
+        for item in payload["items"]:
+            allocator.take(stock_items[item["product_id"]]["stock_item_id"], item["quantity"], entry)
+        allocator.save()
+
+        allocation.bulk_write("POS_Item", [
+            {"pos_id": pos_id, "product_id": item["product_id"], "price": item["price"],
+             "quantity_sold": item["quantity"]}
+            for item in payload["items"]
+        ], returning="minimal")
+
+        dswd = payload.get("dswd")
+        if dswd:
+            supabase.table("Dswd_Order").insert({
+                "customer_id": customer_id, "pos_id": pos_id, **dswd
+            }).execute()
+    except Exception as e:
+        _undo_sales(changes, pos_ids, allocator)
+        if isinstance(e, stock.StockError):
+            # A batch was sold from since it was read
+            raise CheckoutError(str(e)) from None
+        raise
+
+    return {"pos_id": pos_id, "invoice": invoice}
+
+
+def _undo_sales(changes, pos_ids, allocator=None):
+    """Take back a client-side checkout that failed after its stock was deducted.
+
+    ``changes`` are the deltas given to ``stock.adjust``, ``pos_ids`` the POS
+    rows written so far and ``allocator`` the one that took their batches.
+    The stock goes back first, so a retry of the sale finds it there.
+    """
+    stock.adjust([(stock_item_id, -delta) for stock_item_id, delta in changes])
+    if allocator is not None:
+        allocator.restore()
+    for chunk in in_chunks(pos_ids):
+        supabase.table("Stock_Transaction").delete().eq("transaction_type", "POS").in_("reference_id", chunk).execute()
+        for table in ("Dswd_Order", "POS_Item", "POS"):
+            supabase.table(table).delete().in_("pos_id", chunk).execute()
+
+
+# -- bulk ingest -------------------------------------------------------------------
+
+def checkout_bulk(sales):
+    """Record many sales with a fixed number of requests (``POST /pos/bulk/``).
+
+    Takes and returns the same shapes as ``checkout_many``.  With
+    ``POS_CHECKOUT_RPC`` on (the default) it is ``checkout_many``: one
+    ``pos_checkout_bulk`` round trip, in which the database runs
+    ``pos_checkout`` for each sale in its own subtransaction.  The set-based
+    path below is the fallback for databases without the functions.  There,
+    every cart is checked against one read of the stock rows involved, in
+    order and with a running balance, so a sale is rejected if earlier sales
+    in the batch already took its stock.  The accepted sales are then written table by
+    table with bulk requests, customers and physicians included (see
+    ``identities``).  Those writes are not one transaction: if one fails,
+    what the batch wrote is taken back and its keys released before the
+    error propagates.
+    """
+    if settings.POS_CHECKOUT_RPC:
+        return checkout_many(sales)
+
+    results = [None] * len(sales)
+    queued = []
+    first_by_key = {}
+    duplicates = []
+    for index, sale in enumerate(sales):
+        try:
+            payload = build_payload(sale["data"])
+        except CheckoutError as e:
+            results[index] = _rejected(index, str(e))
+            continue
+        key = sale.get("idempotency_key")
+        fingerprint = idempotency.request_hash(payload) if key else None
+        if key in first_by_key:
+            # Same key twice in one batch: the second is a retry of the first
+            duplicates.append((index, key, fingerprint))
+            continue
+        if key:
+            first_by_key[key] = (index, fingerprint)
+        queued.append({"index": index, "payload": payload, "key": key, "fingerprint": fingerprint})
+
+    # Sales already recorded under their key are replayed, not sold again
+    claimed, stored = idempotency.claim_many({sale["key"]: sale["fingerprint"] for sale in queued if sale["key"]})
+    to_sell = []
+    for sale in queued:
+        key = sale["key"]
+        if not key or key in claimed:
+            to_sell.append(sale)
+            continue
+        row = stored.get(key)
+        if row is None:
+            results[sale["index"]] = _rejected(sale["index"], "Idempotency key is being reused, try again")
+        elif row["request_hash"] != sale["fingerprint"]:
+            results[sale["index"]] = _rejected(sale["index"], "Idempotency key was already used for a different sale")
+        elif row["response"] is None:
+            results[sale["index"]] = _rejected(sale["index"], "A sale with this idempotency key is still being processed")
+        else:
+            results[sale["index"]] = _recorded(sale["index"], row["response"], replayed=True)
+
+    stock_items = _load_stock_many(to_sell)
+    sold = []
+    refused_keys = []
+    for sale in to_sell:
+        error = _take_stock(sale["payload"], stock_items)
+        if error:
+            results[sale["index"]] = _rejected(sale["index"], error)
+            if sale["key"]:
+                refused_keys.append(sale["key"])
+        else:
+            sold.append(sale)
+    idempotency.release_many(refused_keys)
+
+    if sold:
+        try:
+            identities.retry_stale(lambda: _record_sales(sold, stock_items),
+                                   any(_names_people(sale["payload"]) for sale in sold))
+        except stock.StockError as e:
+            # Another terminal sold the same stock after our read; nothing of the batch was written
+            idempotency.release_many([sale["key"] for sale in sold if sale["key"]])
+            raise CheckoutError(f"Stock changed while the upload was processed, send it again: {e}") from None
+        except Exception:
+            # _record_sales has taken back what it wrote; let the terminals retry the same keys
+            idempotency.release_many([sale["key"] for sale in sold if sale["key"]])
+            raise
+        idempotency.complete_many({
+            sale["key"]: (sale["fingerprint"], {"pos_id": sale["pos_id"], "invoice": sale["invoice"]})
+            for sale in sold if sale["key"]
+        })
+        for sale in sold:
+            results[sale["index"]] = _recorded(sale["index"], sale)
+
+    for index, key, fingerprint in duplicates:
+        first_index, first_fingerprint = first_by_key[key]
+        first = results[first_index]
+        if fingerprint != first_fingerprint:
+            results[index] = _rejected(index, "Idempotency key was already used for a different sale")
+        elif first["status"] == "rejected":
+            results[index] = _rejected(index, first["error"])
+        else:
+            results[index] = _recorded(index, first, replayed=True)
+    return results
+
+
+def _recorded(index, sale, replayed=False):
+    return {"index": index, "status": "replayed" if replayed else "created", "pos_id": sale["pos_id"],
+            "invoice": sale["invoice"], "error": None}
+
+
+def _load_stock_many(sales):
+    """``{(product_id, location_id): Stock_Item row}`` for every cart line, one query per location."""
+    products_by_location = {}
+    for sale in sales:
+        products = products_by_location.setdefault(sale["payload"]["location_id"], set())
+        products.update(item["product_id"] for item in sale["payload"]["items"])
+
+    stock_items = {}
+    for location_id, products in products_by_location.items():
+        rows = fetch_in(
+            lambda: supabase.table("Stock_Item").select("stock_item_id, product_id, location_id, quantity")
+            .eq("location_id", location_id),
+            "product_id", sorted(products), key="stock_item_id",
+        )
+        stock_items.update({(row["product_id"], row["location_id"]): row for row in rows})
+    return stock_items
+
+
+def _take_stock(payload, stock_items):
+    """Deduct the cart from the in-memory ``stock_items``, or return why it cannot be sold."""
+    location_id = payload["location_id"]
+    requested = _requested(payload["items"])
+    for product_id, quantity in requested.items():
+        stock_item = stock_items.get((product_id, location_id))
+        error = _stock_error(product_id, stock_item["quantity"] if stock_item else None, quantity)
+        if error:
+            return error
+    for product_id, quantity in requested.items():
+        stock_items[(product_id, location_id)]["quantity"] -= quantity
+    return None
+
+
+def _record_sales(sold, stock_items):
+    """Write the accepted sales; sets each sale's ``pos_id`` and ``invoice``.
+
+    The stock is taken first, in one atomic call.  Any later failure takes
+    back what was written (``_undo_sales``) before it propagates, so
+    ``stock.StockError`` (the stock or a batch changed since it was read)
+    means nothing is left written.
+    """
+    touched = {(item["product_id"], sale["payload"]["location_id"])
+               for sale in sold for item in sale["payload"]["items"]}
+    changes = [(stock_items[(item["product_id"], sale["payload"]["location_id"])]["stock_item_id"], -item["quantity"])
+               for sale in sold for item in sale["payload"]["items"]]
+    stock.adjust(changes)
+
+    invoices = []
+    allocator = None
+    try:
+        year = datetime.now().year
+        numbers = document_numbers.reserve(f"POS-{year}", len(sold))
+
+        # Customers and physicians for the whole upload in one call each, then the prescriptions in one insert
+        customer_ids = identities.resolve_customers([sale["payload"].get("customer") for sale in sold])
+        prescribed = [(sale, customer_id) for sale, customer_id in zip(sold, customer_ids)
+                      if sale["payload"].get("prescription")]
+        physician_ids = identities.resolve_physicians([sale["payload"]["prescription"] for sale, _ in prescribed])
+        prescriptions = allocation.bulk_write("Prescription", [
+            _prescription_row(sale["payload"]["prescription"], customer_id, physician_id)
+            for (sale, customer_id), physician_id in zip(prescribed, physician_ids)
+        ])
+        # Inserted rows come back in the order they were sent
+        prescription_ids = {id(sale): row["prescription_id"] for (sale, _), row in zip(prescribed, prescriptions)}
+
+        pos_rows = []
+        for sale, number, customer_id in zip(sold, numbers, customer_ids):
+            payload = sale["payload"]
+            sale["customer_id"] = customer_id
+            sale["invoice"] = document_numbers.format_number("POS", year, number)
+            pos_rows.append({
+                "sale_date": payload["sale_date"],
+                "invoice": sale["invoice"],
+                "user_id": payload["user_id"],
+                "order_type": payload["order_type"],
+                "prescription_id": prescription_ids.get(id(sale)),
+            })
+        # Looked up by invoice if the insert fails part way
+        invoices.extend(row["invoice"] for row in pos_rows)
+        pos_ids = {row["invoice"]: row["pos_id"] for row in allocation.bulk_write("POS", pos_rows)}
+        for sale in sold:
+            sale["pos_id"] = pos_ids[sale["invoice"]]
+
+        allocation.bulk_write("POS_Item", [
+            {"pos_id": sale["pos_id"], "product_id": item["product_id"], "price": item["price"],
+             "quantity_sold": item["quantity"]}
+            for sale in sold for item in sale["payload"]["items"]
+        ], returning="minimal")
+
+        # FIFO over every touched stock item's batches, loaded at once
+        allocator = allocation.Allocator.load(stock_items[pair]["stock_item_id"] for pair in touched)
+        for sale in sold:
+            payload = sale["payload"]
+            entry = {"transaction_date": payload["sale_date"], "transaction_type": "POS",
+                     "src_location": payload["location_id"], "reference_id": sale["pos_id"]}
+            for item in payload["items"]:
+                allocator.take(stock_items[(item["product_id"], payload["location_id"])]["stock_item_id"],
+                               item["quantity"], entry)
+        allocator.save()
+
+        allocation.bulk_write("Dswd_Order", [
+            {"customer_id": sale["customer_id"], "pos_id": sale["pos_id"], **sale["payload"]["dswd"]}
+            for sale in sold if sale["payload"].get("dswd")
+        ], returning="minimal")
+    except Exception:
+        written = fetch_in(lambda: supabase.table("POS").select("pos_id"), "invoice", invoices, key="pos_id")
+        _undo_sales(changes, [row["pos_id"] for row in written], allocator)
+        raise
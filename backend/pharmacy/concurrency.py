@@ -0,0 +1,72 @@
+"""Run async PostgREST fan-out from synchronous DRF views.
+
+DRF's ``APIView`` only dispatches to synchronous handlers, so the async views
+keep a thin ``get`` that hands their coroutine to ``run_async``.  Coroutines run
+on one long-lived event loop per worker process (started on first use, so
+forked workers each get their own), which keeps the async PostgREST pool and its
+keep-alive connections warm across requests under both WSGI and ASGI servers.
+
+The caller's context variables travel with the coroutine, so query counting
+(``pharmacy.query_stats``) and ``query_timeout`` work exactly as in sync code.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_worker_loop():
+    """Return this process's background event loop, starting it if needed."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_run_loop, args=(_loop,), name="pharmacy-async", daemon=True).start()
+        return _loop
+
+
+def run_async(coro):
+    """Run ``coro`` on the worker loop and block until it finishes; returns its result."""
+    loop = get_worker_loop()
+    context = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def start():
+        # Creating the task inside ``context`` makes it run with the caller's context vars.
+        task = context.run(loop.create_task, coro)
+
+        def done(task):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        task.add_done_callback(done)
+
+    loop.call_soon_threadsafe(start)
+    return future.result()
+
+
+async def gather_bounded(coros, limit):
+    """``asyncio.gather`` that runs at most ``limit`` of ``coros`` at a time; results keep their order."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))
@@ -0,0 +1,67 @@
+"""Document numbers (``PO-2026-001``, ``ST-2026-001``, ``POI-001-01``) from database counters.
+
+Each number comes from the ``next_document_number`` database function
+(``supabase/migrations/*_document_numbers.sql``), which increments a counter
+row atomically, so concurrent requests never get the same number and nothing
+has to read the latest document first.  Counters for yearly numbers include
+the year, so numbering starts again at 1 each January::
+
+    po_id = document_numbers.next_number("PO")                  # "PO-2026-014"
+    for number in document_numbers.reserve("POI-014", 3): ...   # 1, 2, 3
+
+POS invoices are numbered the same way inside ``pos_checkout``.  With
+``POS_CHECKOUT_RPC`` off (a database without the function) the next numbers
+follow the latest document of the counter instead; two concurrent requests
+can then draw the same number, and the unique PO/POI/ST id refuses the second.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+# Counter prefix: (table, numbered column, primary key) of the documents it numbers
+DOCUMENTS = {
+    "POS": ("POS", "invoice", "pos_id"),
+    "PO": ("Purchase_Order", "po_id", "purchase_order_id"),
+    "POI": ("Purchase_Order_Item", "poi_id", "purchase_order_item_id"),
+    "ST": ("Stock_Transfer", "transfer_id", "stock_transfer_id"),
+}
+
+
+def reserve(counter, count=1):
+    """The next ``count`` numbers of ``counter``, reserved in one call, as a ``range``."""
+    if count < 1:
+        return range(0)
+    if not settings.POS_CHECKOUT_RPC:
+        last = _last_issued(counter) + count
+    else:
+        last = supabase.rpc("next_document_number", {"counter": counter, "how_many": count}).execute().data
+    return range(last - count + 1, last + 1)
+
+
+def format_number(prefix, year, number, width=3):
+    return f"{prefix}-{year}-{number:0{width}d}"
+
+
+def next_number(prefix, year=None):
+    """The next ``<prefix>-<year>-NNN`` number (current year by default)."""
+    year = year or datetime.now().year
+    return format_number(prefix, year, reserve(f"{prefix}-{year}")[0])
+
+
+# -- without the database function (POS_CHECKOUT_RPC off) -----------------------
+
+def _last_issued(counter):
+    """The number of the newest ``<counter>-N`` document, 0 if there is none."""
+    table, column, primary_key = DOCUMENTS[counter.split("-")[0]]
+    # Newest by primary key rather than by the text id, which sorts "1000" before "999"
+    latest = supabase.table(table).select(column).like(column, f"{counter}-%") \
+        .order(primary_key, desc=True).limit(1).execute().data
+    if not latest:
+        return 0
+    suffix = latest[0][column].rsplit("-", 1)[-1]
+    return int(suffix) if suffix.isdigit() else 0
@@ -0,0 +1,118 @@
+"""Read result sets larger than PostgREST's row cap.
+
+PostgREST returns at most ``SUPABASE_MAX_ROWS`` rows per request (1000 on
+Supabase) and silently drops the rest, so ``.execute().data`` on an unbounded
+query is only complete while the table is small.  These helpers walk the
+result with ``range()`` pages instead.  Builders are single-use, so they take a
+function returning a fresh query; ``order`` must be a unique column to keep
+pages from overlapping::
+
+    for row in iter_all(lambda: supabase.table("Stock_Transaction").select("*"), "stock_transaction_id"):
+        ...
+
+    rows = await afetch_all(
+        lambda: async_supabase.table("Expiration").select("*").gte("expiry_date", start),
+        "expiration_id", parallel=4,
+    )
+
+Rows are yielded page by page, so a caller that folds them into an aggregate
+never holds more than a page (``parallel`` pages for the async version).
+
+``fetch_in``/``afetch_in`` run an ``in_`` filter over an ID list of any size:
+the IDs are deduplicated and split into chunks that keep the request URL
+short, each chunk is paged by ``key`` (a unique column) like ``fetch_all``,
+the chunks run concurrently (async) and the rows come back merged::
+
+    items = await afetch_in(lambda: async_supabase.table("POS_Item").select("*"),
+                            "pos_id", pos_ids, key="pos_item_id")
+"""
+
+import asyncio
+
+from django.conf import settings
+
+from .concurrency import gather_bounded
+
+
+def _page_size(page_size):
+    # A page larger than the server's cap would come back short and end the walk early.
+    return min(page_size or settings.SUPABASE_MAX_ROWS, settings.SUPABASE_MAX_ROWS)
+
+
+def iter_all(build, order, page_size=None, desc=False):
+    """Yield every row of ``build()``'s query, one ``range()`` request per page."""
+    page_size = _page_size(page_size)
+    start = 0
+    while True:
+        rows = build().order(order, desc=desc).range(start, start + page_size - 1).execute().data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def fetch_all(build, order, page_size=None, desc=False):
+    return list(iter_all(build, order, page_size, desc))
+
+
+async def aiter_all(build, order, page_size=None, desc=False, parallel=1):
+    """Async ``iter_all``; with ``parallel > 1`` that many pages are requested at once."""
+    page_size = _page_size(page_size)
+    start = 0
+    while True:
+        responses = await asyncio.gather(*(
+            build().order(order, desc=desc).range(offset, offset + page_size - 1).execute()
+            for offset in range(start, start + parallel * page_size, page_size)
+        ))
+        for response in responses:
+            for row in response.data:
+                yield row
+            if len(response.data) < page_size:
+                return
+        start += parallel * page_size
+
+
+async def afetch_all(build, order, page_size=None, desc=False, parallel=1):
+    return [row async for row in aiter_all(build, order, page_size, desc, parallel)]
+
+
+def in_chunks(values, max_chars=None):
+    """Split the distinct, non-null ``values`` into lists whose ``in_`` filter stays under ``max_chars``."""
+    max_chars = max_chars or settings.SUPABASE_IN_FILTER_MAX_CHARS
+    chunk, size = [], 0
+    for value in dict.fromkeys(v for v in values if v is not None):
+        length = len(str(value)) + 3  # separator, possible quotes
+        if chunk and size + length > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(value)
+        size += length
+    if chunk:
+        yield chunk
+
+
+def _merge(results, key):
+    merged = {}
+    for rows in results:
+        for row in rows:
+            merged.setdefault(row[key], row)
+    return list(merged.values())
+
+
+def fetch_in(build, column, values, key):
+    """Rows of ``build()`` whose ``column`` is in ``values``, one request per URL-sized chunk and page.
+
+    ``key`` is a unique column of the rows: each chunk is paged by it past the
+    row cap, and rows matched by more than one chunk are returned once.
+    """
+    results = [fetch_all(lambda: build().in_(column, chunk), key) for chunk in in_chunks(values)]
+    return _merge(results, key)
+
+
+async def afetch_in(build, column, values, key, parallel=4):
+    """Async ``fetch_in``; up to ``parallel`` chunks are in flight at once."""
+    async def fetch_chunk(chunk):
+        return await afetch_all(lambda: build().in_(column, chunk), key)
+
+    results = await gather_bounded([fetch_chunk(chunk) for chunk in in_chunks(values)], parallel)
+    return _merge(results, key)
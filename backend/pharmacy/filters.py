@@ -0,0 +1,18 @@
+"""Query-string filter values shared by the list endpoints.
+
+Date range filters (``/pos/?date_from=&date_to=``, ``/stock-items/?as_of=``)
+take either a day or a moment::
+
+    parse_date_bound("2026-10-17")           # date(2026, 10, 17)
+    parse_date_bound("2026-10-17T18:30:00")  # datetime(2026, 10, 17, 18, 30)
+
+A bad value raises ``ValueError``, which the views answer with a 400.
+"""
+
+from datetime import date, datetime
+
+
+def parse_date_bound(value):
+    """A ``date_from``/``date_to``/``as_of`` value: a date, or a datetime when it has a time part."""
+    value = value.strip()
+    return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
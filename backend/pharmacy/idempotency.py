@@ -0,0 +1,160 @@
+"""Idempotency keys for POS sales.
+
+A terminal sends ``Idempotency-Key: <uuid>`` with a sale and sends the same
+key again when it retries.  The key is claimed in the ``Idempotency_Key``
+table in the same transaction as the sale (see ``pos_checkout`` in
+``supabase/migrations/*_pos_idempotency.sql``), so only the first request
+sells and every retry gets the first result back.  Results are also kept in
+this process for ``IDEMPOTENCY_KEY_TTL`` seconds, so a retry that reaches
+the same worker is answered without a round trip::
+
+    key = idempotency.get_key(request)
+    result = checkout.checkout(payload, idempotency_key=key)
+    if result.get("replayed"): ...
+
+Reusing a key for a different sale raises ``IdempotencyConflict`` (HTTP 409).
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from postgrest import APIError
+
+from .cache import TTLStore
+from .fetch import fetch_in, in_chunks
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class InvalidKey(ValueError):
+    """Malformed ``Idempotency-Key`` header; views answer it with a 400."""
+
+
+class IdempotencyConflict(Exception):
+    """The key belongs to a different (or still unfinished) request; views answer it with a 409."""
+
+
+def get_key(request):
+    """The request's idempotency key, or None when the client did not send one."""
+    key = request.headers.get(HEADER)
+    return check_key(key, HEADER) if key is not None else None
+
+
+def check_key(key, name="idempotency_key"):
+    """``key`` stripped; raises ``InvalidKey`` unless it is a non-empty string of at most ``MAX_KEY_LENGTH``."""
+    key = key.strip() if isinstance(key, str) else ""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidKey(f"{name} must be 1 to {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def request_hash(payload):
+    """Fingerprint of a request body, to tell a retry from a different request reusing the key."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+_results = TTLStore()
+
+
+def recall(key, fingerprint):
+    """The result already recorded for ``key`` in this process, or None."""
+    stored = _results.get(key)
+    if stored is None:
+        return None
+    if stored["request_hash"] != fingerprint:
+        raise IdempotencyConflict("Idempotency key was already used for a different sale")
+    return dict(stored["response"])
+
+
+def remember(key, fingerprint, response):
+    _results.set(key, {"request_hash": fingerprint, "response": dict(response)}, settings.IDEMPOTENCY_KEY_TTL)
+
+
+# -- without the database function (POS_CHECKOUT_RPC off) ----------------------
+
+def claim(key, fingerprint):
+    """Claim ``key`` in ``Idempotency_Key``; returns the stored result if it was already used."""
+    now = datetime.now(timezone.utc)
+    supabase.table("Idempotency_Key").delete().lte("expires_at", now.isoformat()).execute()
+    try:
+        supabase.table("Idempotency_Key").insert({
+            "key": key,
+            "request_hash": fingerprint,
+            "expires_at": (now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)).isoformat(),
+        }).execute()
+        return None
+    except APIError as e:
+        if e.code != "23505":
+            raise
+
+    stored = supabase.table("Idempotency_Key").select("request_hash, response").eq("key", key).execute().data
+    if not stored:
+        # Expired and deleted between our insert and select; let the client retry
+        raise IdempotencyConflict("Idempotency key is being reused, try again")
+    if stored[0]["request_hash"] != fingerprint:
+        raise IdempotencyConflict("Idempotency key was already used for a different sale")
+    if stored[0]["response"] is None:
+        raise IdempotencyConflict("A sale with this idempotency key is still being processed")
+    return stored[0]["response"]
+
+
+def complete(key, response):
+    supabase.table("Idempotency_Key").update({"response": response}).eq("key", key).execute()
+
+
+def release(key):
+    """Give up a claimed key after the request failed, so a retry can run it again."""
+    supabase.table("Idempotency_Key").delete().eq("key", key).execute()
+
+
+def _expires_at(now):
+    return (now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)).isoformat()
+
+
+def claim_many(fingerprints):
+    """``claim`` for ``{key: fingerprint}`` in a fixed number of requests.
+
+    Returns ``(claimed, stored)``: the keys claimed now, and ``{key: row}``
+    (``request_hash``, ``response``) for the keys that were already taken.
+    """
+    if not fingerprints:
+        return set(), {}
+    now = datetime.now(timezone.utc)
+    supabase.table("Idempotency_Key").delete().lte("expires_at", now.isoformat()).execute()
+    # ON CONFLICT DO NOTHING returns only the rows it inserted, i.e. the keys we now own
+    inserted = supabase.table("Idempotency_Key").upsert(
+        [{"key": key, "request_hash": fingerprint, "expires_at": _expires_at(now)}
+         for key, fingerprint in fingerprints.items()],
+        on_conflict="key", ignore_duplicates=True,
+    ).execute().data
+    claimed = {row["key"] for row in inserted}
+    taken = [key for key in fingerprints if key not in claimed]
+    rows = fetch_in(lambda: supabase.table("Idempotency_Key").select("key, request_hash, response"),
+                    "key", taken, key="key")
+    return claimed, {row["key"]: row for row in rows}
+
+
+def complete_many(results):
+    """Store ``{key: (fingerprint, response)}`` for keys claimed with ``claim_many``, in one request."""
+    if not results:
+        return
+    now = datetime.now(timezone.utc)
+    supabase.table("Idempotency_Key").upsert([
+        {"key": key, "request_hash": fingerprint, "response": response, "expires_at": _expires_at(now)}
+        for key, (fingerprint, response) in results.items()
+    ], on_conflict="key").execute()
+    for key, (fingerprint, response) in results.items():
+        remember(key, fingerprint, response)
+
+
+def release_many(keys):
+    """``release`` for many keys."""
+    for chunk in in_chunks(keys):
+        supabase.table("Idempotency_Key").delete().in_("key", chunk).execute()
@@ -0,0 +1,142 @@
+"""Customers and physicians named on a sale, resolved to ids through a cache.
+
+Discount, DSWD and prescription sales name a customer (found by name) and
+possibly a physician (found by PRC/PTR number).  ``resolve_customers`` and
+``resolve_physicians`` turn a list of those into ids, creating the rows that
+do not exist yet.  Ids already seen by this process are answered from memory
+for ``IDENTITY_CACHE_TTL`` seconds; the rest are resolved together in one
+call to the ``resolve_customers`` / ``resolve_physicians`` database function
+(``supabase/migrations/*_identity_resolution.sql``), or with the step-by-step
+lookups when ``POS_CHECKOUT_RPC`` is off::
+
+    customer_id, = identities.resolve_customers([payload["customer"]])
+
+Names are compared case-insensitively and with runs of spaces collapsed.
+The Person, Customers and Physician views call ``invalidate()`` after every
+update and delete, but that only clears the worker that handled the request.
+Another worker can hand out the deleted row's id until it expires, so writes
+that use resolved ids go through ``retry_stale``: when one fails on a foreign
+key, the cache is cleared and the write runs once more with fresh ids.
+"""
+
+from django.conf import settings
+from postgrest import APIError
+
+from .cache import TTLStore
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+_ids = TTLStore(max_entries=50_000)
+
+# PostgreSQL's foreign_key_violation
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def _normalize(value):
+    return " ".join(str(value or "").split()).casefold()
+
+
+def customer_key(customer):
+    return ("customer", _normalize(customer["first_name"]), _normalize(customer["last_name"]))
+
+
+def physician_key(physician):
+    return ("physician", _normalize(physician.get("prc_num")), _normalize(physician.get("ptr_num")))
+
+
+def invalidate():
+    _ids.clear()
+
+
+def retry_stale(write, resolves=True):
+    """``write()``, run once more with an empty cache if it fails on a foreign key.
+
+    ``write`` resolves its customers and physicians itself and takes back what
+    it wrote before raising.  With ``resolves`` false (nothing it writes names
+    a customer or physician) there is no retry.
+    """
+    try:
+        return write()
+    except APIError as e:
+        if e.code != FOREIGN_KEY_VIOLATION or not resolves:
+            raise
+    # A cached id of a row another worker has since deleted
+    invalidate()
+    return write()
+
+
+def resolve_customers(customers):
+    """customer_id for each entry of ``customers`` (None stays None), in order."""
+    return _resolve(customers, customer_key, "resolve_customers", "customers", _find_or_create_customer)
+
+
+def resolve_physicians(physicians):
+    """physician_id for each entry of ``physicians`` (None stays None), in order."""
+    return _resolve(physicians, physician_key, "resolve_physicians", "physicians", _find_or_create_physician)
+
+
+def _resolve(entries, key_of, function, param, find_or_create):
+    ids = [None] * len(entries)
+    missing = {}
+    for index, entry in enumerate(entries):
+        if not entry:
+            continue
+        key = key_of(entry)
+        cached = _ids.get(key)
+        if cached is not None:
+            ids[index] = cached
+        else:
+            missing.setdefault(key, (entry, []))[1].append(index)
+
+    if missing:
+        unresolved = [entry for entry, _ in missing.values()]
+        if settings.POS_CHECKOUT_RPC:
+            resolved = supabase.rpc(function, {param: unresolved}).execute().data
+        else:
+            resolved = [find_or_create(entry) for entry in unresolved]
+        for (key, (_, indexes)), resolved_id in zip(missing.items(), resolved):
+            _ids.set(key, resolved_id, settings.IDENTITY_CACHE_TTL)
+            for index in indexes:
+                ids[index] = resolved_id
+    return ids
+
+
+# -- without the database functions (POS_CHECKOUT_RPC off) ---------------------
+
+def _find_or_create_person(first_name, last_name):
+    person_query = supabase.table("Person").select("person_id") \
+        .eq("first_name", first_name).eq("last_name", last_name).limit(1).execute()
+    if person_query.data:
+        return person_query.data[0]["person_id"]
+    person_insert = supabase.table("Person").insert({
+        "first_name": first_name, "last_name": last_name
+    }).execute()
+    return person_insert.data[0]["person_id"]
+
+
+def _find_or_create_customer(customer):
+    person_id = _find_or_create_person(customer["first_name"], customer["last_name"])
+    existing_customer_query = supabase.table("Customers").select("customer_id") \
+        .eq("person_id", person_id).limit(1).execute()
+    if existing_customer_query.data:
+        return existing_customer_query.data[0]["customer_id"]
+    customer_insert = supabase.table("Customers").insert({
+        "person_id": person_id,
+        "id_card_number": customer["id_card_number"],
+        "customer_type_id": customer["customer_type_id"]
+    }).execute()
+    return customer_insert.data[0]["customer_id"]
+
+
+def _find_or_create_physician(physician):
+    physician_query = supabase.table("Physician").select("physician_id") \
+        .eq("prc_num", physician["prc_num"]).eq("ptr_num", physician["ptr_num"]).limit(1).execute()
+    if physician_query.data:
+        return physician_query.data[0]["physician_id"]
+    physician_person_id = _find_or_create_person(physician["first_name"], physician["last_name"])
+    physician_insert = supabase.table("Physician").insert({
+        "person_id": physician_person_id, "prc_num": physician["prc_num"],
+        "ptr_num": physician["ptr_num"]
+    }).execute()
+    return physician_insert.data[0]["physician_id"]
@@ -0,0 +1,192 @@
+"""Stock quantities folded from the ledger (``Stock_Transaction``).
+
+Every change to a stock item's quantity is a ``Stock_Transaction`` row with
+a signed ``quantity_change``, so the ledger alone says how much of anything
+a location holds.  ``Stock_Item.quantity`` is the running total kept next to
+it by ``stock.adjust`` for O(1) reads; this module is what it is checked and
+rebuilt against.  ``Stock_Snapshot`` holds each stock item's ledger total at
+the end of a day (``manage.py snapshot_stock``, run nightly), so a fold reads
+the snapshot and only the entries after it::
+
+    ledger.quantities()                                   # {stock_item_id: quantity} now
+    ledger.quantities([12, 13], as_of=date(2026, 3, 31))  # at the end of a past day
+    ledger.snapshot(date(2026, 10, 17))
+
+A snapshot of ``day`` covers the entries dated before the end of that day
+(in ``TIME_ZONE``) whose id is at most its ``last_transaction_id``; entries
+written later, backdated offline sales included, are found by id.  Ids are
+handed out when a row is inserted, not when it commits, so that watermark is
+the newest id read ``LEDGER_SETTLE_SECONDS`` earlier (``watermark()``): by
+then every lower id has committed or rolled back.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from time import sleep
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import allocation, stock
+from .fetch import in_chunks, iter_all
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+
+def day_start(day):
+    """The first moment of ``day`` in ``TIME_ZONE``."""
+    return datetime.combine(day, time.min, tzinfo=timezone.get_default_timezone())
+
+
+def day_of(value):
+    """The ``TIME_ZONE`` day of a ``transaction_date`` (ISO string or datetime)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return timezone.localtime(value).date()
+
+
+def _rows(build, stock_item_ids, order):
+    """Every row of ``build()``, restricted to ``stock_item_ids`` unless it is None, page by page."""
+    if stock_item_ids is None:
+        yield from iter_all(build, order)
+        return
+    for chunk in in_chunks(stock_item_ids):
+        yield from iter_all(lambda: build().in_("stock_item_id", chunk), order)
+
+
+def _base_snapshot(before):
+    """``(day, last_transaction_id)`` of the latest snapshot ending by ``before``, or None."""
+    rows = supabase.table("Stock_Snapshot").select("day, last_transaction_id") \
+        .lt("day", day_of(before).isoformat()).order("day", desc=True).limit(1).execute().data
+    if not rows:
+        return None
+    # One run writes the whole day with the same last_transaction_id
+    return date.fromisoformat(str(rows[0]["day"])), rows[0]["last_transaction_id"]
+
+
+def _fold(stock_item_ids, until, inclusive=True, up_to_id=None):
+    """``{stock_item_id: quantity}`` of the entries dated up to ``until`` (and with id <= ``up_to_id``)."""
+    compare = "lte" if inclusive else "lt"
+    base = _base_snapshot(until if inclusive else until - timedelta(microseconds=1))
+    quantities = {}
+
+    def entries(build):
+        for row in _rows(build, stock_item_ids, "stock_transaction_id"):
+            if row["stock_item_id"] is not None:
+                quantities[row["stock_item_id"]] = quantities.get(row["stock_item_id"], 0) + row["quantity_change"]
+
+    def ledger():
+        query = supabase.table("Stock_Transaction").select("stock_transaction_id, stock_item_id, quantity_change")
+        query = getattr(query, compare)("transaction_date", until.isoformat())
+        return query.lte("stock_transaction_id", up_to_id) if up_to_id is not None else query
+
+    if base is None:
+        entries(ledger)
+        return quantities
+
+    day, last_transaction_id = base
+    end = day_start(day + timedelta(days=1)).isoformat()
+    for row in _rows(lambda: supabase.table("Stock_Snapshot").select("stock_item_id, quantity").eq("day", day.isoformat()),
+                     stock_item_ids, "stock_item_id"):
+        quantities[row["stock_item_id"]] = row["quantity"]
+    # Entries dated after the snapshot's day, and entries written after it but dated inside it
+    entries(lambda: ledger().gte("transaction_date", end))
+    entries(lambda: ledger().lt("transaction_date", end).gt("stock_transaction_id", last_transaction_id))
+    return quantities
+
+
+def quantities(stock_item_ids=None, as_of=None):
+    """``{stock_item_id: quantity}`` from the ledger at ``as_of`` (default now), for all or some stock items.
+
+    ``as_of`` is a datetime (naive ones are in ``TIME_ZONE``) or a date,
+    meaning the end of that day.  Stock items with no entry and no snapshot
+    yet are left out (their quantity is 0).
+    """
+    stock_item_ids = None if stock_item_ids is None else sorted(set(stock_item_ids))
+    if as_of is None:
+        return _fold(stock_item_ids, timezone.now())
+    if not isinstance(as_of, datetime):
+        return _fold(stock_item_ids, day_start(as_of + timedelta(days=1)), inclusive=False)
+    if timezone.is_naive(as_of):
+        as_of = timezone.make_aware(as_of)
+    return _fold(stock_item_ids, as_of)
+
+
+def watermark():
+    """The newest ``Stock_Transaction`` id, returned ``LEDGER_SETTLE_SECONDS`` after reading it.
+
+    A transaction still open when it is read may hold a lower id and commit
+    later; waiting out the longest such transaction makes every id up to the
+    watermark final, so a snapshot counting them can trust it.
+    """
+    latest = supabase.table("Stock_Transaction").select("stock_transaction_id") \
+        .order("stock_transaction_id", desc=True).limit(1).execute().data
+    sleep(settings.LEDGER_SETTLE_SECONDS)
+    return latest[0]["stock_transaction_id"] if latest else 0
+
+
+def snapshot(day=None, last_transaction_id=None):
+    """Write every stock item's ledger total at the end of ``day`` (default yesterday); returns the row count.
+
+    The entries counted are those with id up to ``last_transaction_id``
+    (default a fresh ``watermark()``); pass one watermark to every day of a
+    backfill so the run waits once.
+    """
+    day = day or timezone.localdate() - timedelta(days=1)
+    if last_transaction_id is None:
+        last_transaction_id = watermark()
+    totals = dict.fromkeys((row["stock_item_id"] for row in iter_all(
+        lambda: supabase.table("Stock_Item").select("stock_item_id"), "stock_item_id")), 0)
+    totals.update(_fold(None, day_start(day + timedelta(days=1)), inclusive=False, up_to_id=last_transaction_id))
+    allocation.bulk_write("Stock_Snapshot", [
+        {"stock_item_id": stock_item_id, "day": day.isoformat(), "quantity": quantity,
+         "last_transaction_id": last_transaction_id}
+        for stock_item_id, quantity in sorted(totals.items())
+    ], on_conflict="stock_item_id,day", returning="minimal")
+    return len(totals)
+
+
+def amend(old, new=None):
+    """Carry a changed (``new``) or deleted ledger entry ``old`` into the snapshots that already counted it.
+
+    The snapshots move by the entry's change in one ``amend_snapshots``
+    call, so amendments made at once do not overwrite each other.  With
+    ``POS_CHECKOUT_RPC`` off each snapshot row gets a guarded update.
+    """
+    changes = [
+        {"stock_item_id": entry["stock_item_id"], "day": day_of(entry["transaction_date"]).isoformat(),
+         "stock_transaction_id": entry["stock_transaction_id"], "delta": sign * entry["quantity_change"]}
+        for entry, sign in [(old, -1)] + ([(new, 1)] if new else [])
+        if entry.get("stock_item_id") is not None and entry.get("quantity_change")
+    ]
+    if not changes:
+        return
+    if settings.POS_CHECKOUT_RPC:
+        supabase.rpc("amend_snapshots", {"changes": changes}).execute()
+        return
+    for change in changes:
+        rows = supabase.table("Stock_Snapshot").select("stock_item_id, day, quantity") \
+            .eq("stock_item_id", change["stock_item_id"]).gte("day", change["day"]) \
+            .gte("last_transaction_id", change["stock_transaction_id"]).execute().data
+        for row in rows:
+            _shift_snapshot(row, change["delta"])
+
+
+# -- without the database function (POS_CHECKOUT_RPC off) -----------------------
+
+def _shift_snapshot(row, delta):
+    for _ in range(stock.MAX_RETRIES):
+        updated = supabase.table("Stock_Snapshot").update({"quantity": row["quantity"] + delta}) \
+            .eq("stock_item_id", row["stock_item_id"]).eq("day", row["day"]).eq("quantity", row["quantity"]) \
+            .execute().data
+        if updated:
+            return
+        current = supabase.table("Stock_Snapshot").select("stock_item_id, day, quantity") \
+            .eq("stock_item_id", row["stock_item_id"]).eq("day", row["day"]).execute().data
+        if not current:
+            return
+        row = current[0]
+    raise stock.StockError(f"Snapshot of stock item {row['stock_item_id']} on {row['day']} is being changed "
+                           "by another request, try again")
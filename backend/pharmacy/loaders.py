@@ -0,0 +1,137 @@
+"""Request-scoped batching loaders for foreign-key lookups.
+
+Per-row code keeps its natural shape::
+
+    loaders = Loaders()
+
+    async def enrich(row):
+        product = await loaders.get("Products", "product_id").load(row["product_id"])
+        ...
+
+    await asyncio.gather(*(enrich(row) for row in rows))
+
+Every ``load()`` issued while the gathered coroutines run is queued; once they
+have all yielded, each loader resolves its queued keys with a single
+``in_`` query.  Results are kept in an identity map for the life of the
+``Loaders`` object, so a key is fetched at most once per request.  Create one
+``Loaders`` per request (never share it between requests).
+"""
+
+import asyncio
+
+from .fetch import afetch_in
+from .supabase_client import get_async_supabase_client
+
+async_supabase = get_async_supabase_client()
+
+
+class DataLoader:
+    """Coalesce ``load(key)`` calls made in the same event-loop tick into one ``batch_load(keys)``.
+
+    ``batch_load`` receives a list of distinct keys and must return a dict
+    mapping each found key to its value; missing keys resolve to ``missing``.
+    """
+
+    def __init__(self, batch_load, missing=None):
+        self.batch_load = batch_load
+        self.missing = missing
+        self._cache = {}
+        self._queue = []
+        self._scheduled = False
+
+    def load(self, key):
+        """Return an awaitable for ``key``'s value."""
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            if key is None:
+                future.set_result(self.missing)
+            else:
+                self._queue.append(key)
+                if not self._scheduled:
+                    self._scheduled = True
+                    loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key, value):
+        """Seed the identity map with an already-known value."""
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    def _dispatch(self):
+        keys, self._queue, self._scheduled = self._queue, [], False
+        asyncio.ensure_future(self._resolve(keys))
+
+    async def _resolve(self, keys):
+        futures = [self._cache[key] for key in keys]
+        try:
+            found = await self.batch_load(keys)
+        except Exception as e:
+            for key, future in zip(keys, futures):
+                # Forget failed keys so a retry fetches them again.
+                self._cache.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in zip(keys, futures):
+            if not future.done():
+                future.set_result(found.get(key, self.missing))
+
+
+class TableLoader(DataLoader):
+    """Load rows of ``table`` by ``key`` with one ``in_`` query per batch.
+
+    With ``many=True`` each key resolves to the list of matching rows (for
+    one-to-many lookups such as POS_Item by pos_id); otherwise to one row or None.
+    A ``many`` loader needs ``order``, a unique column of the table (e.g.
+    ``pos_item_id``) to page the matching rows by.
+    """
+
+    def __init__(self, table, key, columns="*", many=False, order=None, client=None):
+        if many and not order:
+            raise ValueError(f"A many=True loader of {table} needs a unique order column")
+        super().__init__(self._fetch, missing=[] if many else None)
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.many = many
+        self.order = order if many else key
+        self.client = client or async_supabase
+
+    async def _fetch(self, keys):
+        columns = self.columns
+        if not columns.lstrip().startswith("*"):
+            selected = [c.strip() for c in columns.split(",")]
+            columns = ", ".join([*dict.fromkeys(c for c in (self.key, self.order) if c not in selected), columns])
+        # Large batches are split into URL-sized chunks, each paged past the row cap by a unique column.
+        rows = await afetch_in(lambda: self.client.table(self.table).select(columns), self.key, keys, key=self.order)
+        found = {}
+        for row in rows:
+            if self.many:
+                found.setdefault(row[self.key], []).append(row)
+            else:
+                found[row[self.key]] = row
+        return found
+
+
+class Loaders:
+    """The ``TableLoader``s of one request, created on first use."""
+
+    def __init__(self, client=None):
+        self.client = client
+        self._loaders = {}
+
+    def get(self, table, key, columns="*", many=False, order=None):
+        cache_key = (table, key, columns, many, order)
+        loader = self._loaders.get(cache_key)
+        if loader is None:
+            loader = TableLoader(table, key, columns, many, order, client=self.client)
+            self._loaders[cache_key] = loader
+        return loader
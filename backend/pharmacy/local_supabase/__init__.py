@@ -0,0 +1,73 @@
+"""In-process stand-in for the hosted Supabase/PostgREST API.
+
+Set ``SUPABASE_BACKEND=local`` to have ``get_supabase_client()`` return a
+``LocalSupabaseClient`` backed by SQLite (``LOCAL_SUPABASE_DB``, in memory by
+default) loaded from ``backend/supabase/schema.sql`` and its migrations.  It
+supports the subset of the postgrest-py builder API the views use: filters,
+ordering, ranges, counts, embedded resources, single/maybe_single, insert,
+upsert, update, delete and rpc.  Every call is reported to the query hooks, so
+round-trip counts match the remote client, and reads are capped at
+``SUPABASE_MAX_ROWS`` rows just as PostgREST caps them.
+"""
+
+import threading
+
+from django.conf import settings
+
+from . import rpc
+from .client import AsyncLocalSupabaseClient, LocalDatabase, LocalSupabaseClient
+
+__all__ = [
+    "AsyncLocalSupabaseClient",
+    "LocalDatabase",
+    "LocalSupabaseClient",
+    "create_local_client",
+    "get_async_local_client",
+    "get_local_client",
+    "reset_local_client",
+]
+
+_lock = threading.Lock()
+_client = None
+
+
+def _database(path=None):
+    db = LocalDatabase(path or settings.LOCAL_SUPABASE_DB, settings.SUPABASE_SCHEMA_DIR,
+                       max_rows=settings.SUPABASE_MAX_ROWS)
+    rpc.register_all(db)
+    return db
+
+
+def create_local_client(path=None):
+    db = _database(path)
+    return LocalSupabaseClient(db)
+
+
+def get_local_client():
+    """Return the process-wide local client; all threads share one database."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = create_local_client()
+        return _client
+
+
+def get_async_local_client():
+    """Async view of the process-wide local client (``await query.execute()``)."""
+    return AsyncLocalSupabaseClient(get_local_client())
+
+
+def reset_local_client(path=None):
+    """Point the process-wide local client at a fresh database and return it.
+
+    Clients already handed out (including the per-thread ones) see the new
+    database too, since they are all the same object.
+    """
+    global _client
+    with _lock:
+        db = _database(path)
+        if _client is None:
+            _client = LocalSupabaseClient(db)
+        else:
+            _client.db = db
+        return _client
@@ -0,0 +1,733 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from itertools import groupby
+
+from postgrest import APIError
+from postgrest.base_request_builder import APIResponse, SingleAPIResponse
+
+from ..supabase_client import QueryEvent, notify_query_hooks
+from .schema import Schema, load_schema
+from .select import Embed, Field, Star, parse_select
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit.
+_IN_CHUNK = 5000
+
+
+def _error(message, code="PGRST000", details=None, hint=None):
+    return APIError({"message": message, "code": code, "details": details, "hint": hint})
+
+
+def _integrity_error(exc):
+    text = str(exc)
+    if "UNIQUE" in text:
+        return _error(text, "23505")
+    if "FOREIGN KEY" in text:
+        return _error(text, "23503")
+    if "NOT NULL" in text:
+        return _error(text, "23502")
+    if "CHECK" in text:
+        return _error(text, "23514")
+    return _error(text, "23000")
+
+
+def _normalize_timestamp(value, with_tz):
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        if with_tz:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.astimezone(timezone.utc).isoformat()
+        return value.replace(tzinfo=None).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _normalize_date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and len(value) > 10 and value[4:5] == "-":
+        return value[:10]
+    return value
+
+
+def to_db(value, column_type=""):
+    """Convert a JSON-ish Python value into what the SQLite column stores."""
+    if value is None:
+        return None
+    if column_type in ("json", "jsonb"):
+        return json.dumps(value)
+    if column_type in ("timestamptz", "timestamp with time zone"):
+        return _normalize_timestamp(value, True)
+    if column_type in ("timestamp", "timestamp without time zone"):
+        return _normalize_timestamp(value, False)
+    if column_type == "date":
+        return _normalize_date(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _from_db(value, column_type):
+    if value is None:
+        return None
+    if column_type in ("json", "jsonb"):
+        return json.loads(value) if isinstance(value, str) else value
+    if column_type == "boolean":
+        return bool(value)
+    return value
+
+
+def _like_to_glob(pattern):
+    return pattern.replace("%", "*").replace("_", "?")
+
+
+class LocalDatabase:
+    """A SQLite database holding the pharmacy schema, shared by every thread.
+
+    All access is serialised through one re-entrant lock; ``transaction()``
+    groups several statements into one atomic unit, as a Postgres function would.
+    """
+
+    def __init__(self, path=":memory:", schema_dir=None, max_rows=None):
+        self.path = str(path)
+        # Like PostgREST's db-max-rows: reads return at most this many rows (None: no cap).
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self._depth = 0
+        self.conn.execute("pragma foreign_keys = on")
+        if self.path != ":memory:":
+            self.conn.execute("pragma journal_mode = wal")
+            self.conn.execute("pragma synchronous = normal")
+        if schema_dir is not None:
+            load_schema(self.conn, schema_dir)
+        self.schema = Schema(self.conn)
+        self.rpcs = {}
+        # (table, name) -> function(db, row): PostgREST computed columns
+        self.computed = {}
+        # table -> function(db), run before every read of the table: brings
+        # trigger-maintained tables up to date (see ``rpc.TRIGGERS``)
+        self.before_read = {}
+
+    # -- low level -----------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute("begin immediate")
+            else:
+                self.conn.execute(f"savepoint sp{self._depth}")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("rollback")
+                else:
+                    self.conn.execute(f"rollback to sp{self._depth}")
+                    self.conn.execute(f"release sp{self._depth}")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("commit")
+                else:
+                    self.conn.execute(f"release sp{self._depth}")
+
+    def fetch(self, table, sql, params=()):
+        """Run ``sql`` and decode its rows as dicts of ``table`` columns."""
+        types = self.schema.column_types(table)
+        with self.lock:
+            refresh = self.before_read.get(table)
+            if refresh is not None:
+                refresh(self)
+            try:
+                cursor = self.conn.execute(sql, params)
+            except sqlite3.IntegrityError as e:
+                raise _integrity_error(e) from e
+            names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        decoders = [(i, name, types.get(name, "")) for i, name in enumerate(names)]
+        return [{name: _from_db(row[i], t) for i, name, t in decoders} for row in rows]
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            try:
+                return self.conn.execute(sql, params)
+            except sqlite3.IntegrityError as e:
+                raise _integrity_error(e) from e
+
+    def insert_many(self, table, rows):
+        """Bulk insert without RETURNING; used to seed benchmark datasets.
+
+        Rows need not share their keys: each run of rows with the same
+        columns is one statement, so rows keep their order and a column a
+        row leaves out gets its default.
+        """
+        if not rows:
+            return
+        types = self.schema.column_types(table)
+        with self.transaction():
+            for columns, run in groupby(rows, key=lambda row: tuple(row.keys())):
+                quoted = ", ".join(f'"{c}"' for c in columns)
+                sql = f'insert into "{table}" ({quoted}) values ({", ".join("?" * len(columns))})'
+                values = [tuple(to_db(row[c], types.get(c, "")) for c in columns) for row in run]
+                try:
+                    self.conn.executemany(sql, values)
+                except sqlite3.IntegrityError as e:
+                    raise _integrity_error(e) from e
+
+    def register_rpc(self, name, function):
+        self.rpcs[name] = function
+
+    def register_computed(self, table, name, function):
+        self.computed[(table, name)] = function
+
+    def register_before_read(self, table, function):
+        self.before_read[table] = function
+
+    # -- schema helpers ------------------------------------------------------
+
+    def check_table(self, table):
+        if not self.schema.has_table(table):
+            raise _error(f"Could not find the table 'public.{table}' in the schema cache", "PGRST205")
+
+    def check_column(self, table, column):
+        if column not in self.schema.column_types(table):
+            raise _error(f"column {table}.{column} does not exist", "42703")
+
+    def relationship(self, parent, target, hint=None):
+        """Resolve how ``target`` embeds under ``parent``.
+
+        Returns ``(parent_column, child_column, to_many)``.
+        """
+        candidates = []
+        for fk in self.schema.foreign_keys:
+            if fk.table == parent and fk.ref_table == target:
+                candidates.append((fk.column, fk.ref_column, False, fk.column))
+            if fk.table == target and fk.ref_table == parent:
+                to_many = not self.schema.is_unique(target, fk.column)
+                candidates.append((fk.ref_column, fk.column, to_many, fk.column))
+        if hint:
+            candidates = [c for c in candidates if c[3] == hint]
+        if not candidates:
+            raise _error(
+                f"Could not find a relationship between '{parent}' and '{target}' in the schema cache",
+                "PGRST200",
+            )
+        if len(candidates) > 1:
+            raise _error(
+                f"Could not embed because more than one relationship was found for '{parent}' and '{target}'",
+                "PGRST201",
+                hint=f"Try changing '{target}' to one of the FK columns, e.g. '{target}!{candidates[0][3]}'",
+            )
+        parent_column, child_column, to_many, _ = candidates[0]
+        return parent_column, child_column, to_many
+
+
+class _Filters:
+    """Filter methods shared by select, update and delete queries."""
+
+    def _init_filters(self):
+        self.filters = []
+        self._negate = False
+
+    def _add(self, column, op, value):
+        self.filters.append((column, op, value, self._negate))
+        self._negate = False
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def in_(self, column, values):
+        return self._add(column, "in", list(values))
+
+    def match(self, query):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def filter(self, column, operator, criteria):
+        if operator == "in" and isinstance(criteria, str):
+            criteria = [v for v in criteria.strip("()").split(",") if v != ""]
+        return self._add(column, operator, criteria)
+
+    def _where(self, table):
+        types = self.db.schema.column_types(table)
+        clauses = []
+        params = []
+        for column, op, value, negate in self.filters:
+            if "." in column:
+                raise _error(f"Filtering on embedded columns ({column}) is not supported locally", "PGRST100")
+            self.db.check_column(table, column)
+            col = f'"{table}"."{column}"'
+            ctype = types.get(column, "")
+            if op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+                sql_op = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}[op]
+                clause = f"{col} {sql_op} ?"
+                params.append(to_db(value, ctype))
+            elif op == "like":
+                clause = f"{col} glob ?"
+                params.append(_like_to_glob(value.replace("*", "%")))
+            elif op == "ilike":
+                clause = f"lower({col}) like lower(?)"
+                params.append(value.replace("*", "%"))
+            elif op == "is":
+                lowered = str(value).lower()
+                if value is None or lowered == "null":
+                    clause = f"{col} is null"
+                elif lowered in ("true", "false"):
+                    clause = f"{col} = {1 if lowered == 'true' else 0}"
+                else:
+                    raise _error(f"Unsupported is_ value {value!r}", "PGRST100")
+            elif op == "in":
+                values = [to_db(v, ctype) for v in value]
+                if not values:
+                    clause = "0"
+                else:
+                    clause = f"{col} in ({', '.join('?' * len(values))})"
+                    params.extend(values)
+            else:
+                raise _error(f"Operator '{op}' is not supported locally", "PGRST100")
+            clauses.append(f"not ({clause})" if negate else clause)
+        return (" where " + " and ".join(clauses)) if clauses else "", params
+
+
+def _returning(value):
+    return str(getattr(value, "value", value) or "representation")
+
+
+class LocalQuery(_Filters):
+    """Chainable query mirroring postgrest-py's request builders."""
+
+    def __init__(self, db, table, method, columns="*", payload=None, count=None, head=False,
+                 returning="representation", on_conflict="", ignore_duplicates=False, default_to_null=True):
+        self.db = db
+        self.table = table
+        self.method = method
+        self.nodes = parse_select(columns)
+        self.payload = payload
+        self.count = str(getattr(count, "value", count)) if count else None
+        self.head = head
+        self.returning = _returning(returning)
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.default_to_null = default_to_null
+        self.orders = []
+        self.embedded_orders = {}
+        self._limit = None
+        self._offset = None
+        self._single = None
+        self._init_filters()
+
+    # -- modifiers -----------------------------------------------------------
+
+    def select(self, *columns):
+        self.nodes = parse_select(columns or "*")
+        return self
+
+    def order(self, column, *, desc=False, nullsfirst=False, foreign_table=None):
+        if foreign_table:
+            self.embedded_orders.setdefault(foreign_table, []).append((column, desc, nullsfirst))
+        else:
+            self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        if not foreign_table:
+            self._limit = int(size)
+        return self
+
+    def offset(self, size):
+        self._offset = int(size)
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        if not foreign_table:
+            self._offset = int(start)
+            self._limit = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        self._single = "single"
+        return self
+
+    def maybe_single(self):
+        self._single = "maybe"
+        return self
+
+    # -- execution -----------------------------------------------------------
+
+    def execute(self):
+        started = time.perf_counter()
+        status = 200
+        error = None
+        try:
+            return self._execute()
+        except APIError as e:
+            status = 400
+            error = e
+            raise
+        finally:
+            http_method = {"select": "HEAD" if self.head else "GET", "insert": "POST", "upsert": "POST",
+                           "update": "PATCH", "delete": "DELETE"}[self.method]
+            notify_query_hooks(QueryEvent(
+                http_method, f"/rest/v1/{self.table}", status, time.perf_counter() - started, error
+            ))
+
+    def _execute(self):
+        self.db.check_table(self.table)
+        if self.method == "select":
+            rows, count = self._select()
+        elif self.method in ("insert", "upsert"):
+            rows, count = self._insert()
+        elif self.method == "update":
+            rows, count = self._update()
+        else:
+            rows, count = self._delete()
+
+        if self.returning == "minimal" and self.method != "select":
+            rows = []
+        if self._single:
+            if len(rows) == 1:
+                return SingleAPIResponse.model_construct(data=rows[0], count=count)
+            if not rows and self._single == "maybe":
+                return None
+            raise _error(
+                "JSON object requested, multiple (or no) rows returned", "PGRST116",
+                details=f"The result contains {len(rows)} rows",
+            )
+        return APIResponse.model_construct(data=rows, count=count)
+
+    def _order_sql(self, table, orders):
+        parts = []
+        for column, desc, nullsfirst in orders:
+            self.db.check_column(table, column)
+            col = f'"{table}"."{column}"'
+            # Postgres puts NULLs last for ASC and first for DESC unless told otherwise.
+            nulls_first = nullsfirst or desc
+            parts.append(f"({col} is null) {'desc' if nulls_first else 'asc'}")
+            parts.append(f"{col} {'desc' if desc else 'asc'}")
+        return (" order by " + ", ".join(parts)) if parts else ""
+
+    def _select(self):
+        table = self.table
+        where, params = self._where(table)
+        inner_where = []
+        for node in self.nodes:
+            if isinstance(node, Embed) and node.inner:
+                self.db.check_table(node.table)
+                parent_col, child_col, _ = self.db.relationship(table, node.table, node.hint)
+                inner_where.append(
+                    f'exists (select 1 from "{node.table}" where "{node.table}"."{child_col}" = "{table}"."{parent_col}")'
+                )
+        if inner_where:
+            where = (where + " and " if where else " where ") + " and ".join(inner_where)
+
+        count = None
+        if self.count:
+            with self.db.lock:
+                count = self.db.conn.execute(f'select count(*) from "{table}"{where}', params).fetchone()[0]
+        if self.head:
+            return [], count
+
+        sql = f'select * from "{table}"{where}{self._order_sql(table, self.orders)}'
+        limit = self._limit
+        if self.db.max_rows and (limit is None or limit > self.db.max_rows):
+            limit = self.db.max_rows
+        if limit is not None or self._offset is not None:
+            sql += f" limit {limit if limit is not None else -1} offset {self._offset or 0}"
+        rows = self.db.fetch(table, sql, params)
+        return self._shape(table, rows, self.nodes), count
+
+    def _fetch_related(self, table, column, keys):
+        keys = list(keys)
+        rows = []
+        order = self.embedded_orders.get(table, [])
+        for i in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[i:i + _IN_CHUNK]
+            sql = (f'select * from "{table}" where "{column}" in ({", ".join("?" * len(chunk))})'
+                   f'{self._order_sql(table, order)}')
+            rows.extend(self.db.fetch(table, sql, chunk))
+        return rows
+
+    def _shape(self, table, rows, nodes):
+        """Project ``rows`` onto the select nodes, resolving embedded resources."""
+        columns = self.db.schema.column_names(table)
+        for node in nodes:
+            if isinstance(node, Field) and (table, node.name) not in self.db.computed:
+                self.db.check_column(table, node.name)
+
+        embedded = {}
+        for index, node in enumerate(nodes):
+            if not isinstance(node, Embed):
+                continue
+            self.db.check_table(node.table)
+            parent_col, child_col, to_many = self.db.relationship(table, node.table, node.hint)
+            keys = {row[parent_col] for row in rows if row.get(parent_col) is not None}
+            children = self._fetch_related(node.table, child_col, keys) if keys else []
+            child_keys = [child[child_col] for child in children]
+            shaped = self._shape(node.table, children, node.nodes)
+            grouped = {}
+            for key, child in zip(child_keys, shaped):
+                if to_many:
+                    grouped.setdefault(key, []).append(child)
+                else:
+                    grouped.setdefault(key, child)
+            embedded[index] = (parent_col, to_many, grouped)
+
+        result = []
+        for row in rows:
+            out = {}
+            for index, node in enumerate(nodes):
+                if isinstance(node, Star):
+                    for column in columns:
+                        out[column] = row[column]
+                elif isinstance(node, Field):
+                    computed = self.db.computed.get((table, node.name))
+                    out[node.alias or node.name] = computed(self.db, row) if computed else row[node.name]
+                else:
+                    parent_col, to_many, grouped = embedded[index]
+                    value = grouped.get(row.get(parent_col))
+                    out[node.alias or node.table] = value if value is not None else ([] if to_many else None)
+            result.append(out)
+        return result
+
+    def _payload_rows(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        types = self.db.schema.column_types(self.table)
+        for row in rows:
+            for column in row:
+                if column not in types:
+                    raise _error(f"Could not find the '{column}' column of '{self.table}' in the schema cache",
+                                 "PGRST204")
+        return rows, types
+
+    def _insert(self):
+        rows, types = self._payload_rows()
+        if not rows:
+            return [], 0
+        columns = list(dict.fromkeys(c for row in rows for c in row))
+        conflict = ""
+        if self.method == "upsert":
+            target = self.on_conflict or self.db.schema.primary_key(self.table)
+            target_cols = [c.strip() for c in target.split(",")]
+            updates = [c for c in columns if c not in target_cols]
+            if self.ignore_duplicates or not updates:
+                conflict = f" on conflict ({', '.join(target_cols)}) do nothing"
+            else:
+                assignments = ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+                conflict = f" on conflict ({', '.join(target_cols)}) do update set {assignments}"
+
+        out = []
+        with self.db.transaction():
+            for row in rows:
+                # Bulk inserts send the union of keys; missing ones become NULL
+                # unless default_to_null is off, in which case column defaults apply.
+                row_columns = columns if self.default_to_null and len(rows) > 1 else list(row)
+                values = [to_db(row.get(c), types[c]) for c in row_columns]
+                if row_columns:
+                    quoted = ", ".join(f'"{c}"' for c in row_columns)
+                    sql = (f'insert into "{self.table}" ({quoted}) '
+                           f'values ({", ".join("?" * len(values))}){conflict} returning *')
+                else:
+                    sql = f'insert into "{self.table}" default values returning *'
+                out.extend(self._write(sql, values))
+        return out, len(out)
+
+    def _write(self, sql, params):
+        types = self.db.schema.column_types(self.table)
+        with self.db.lock:
+            try:
+                cursor = self.db.conn.execute(sql, params)
+            except sqlite3.IntegrityError as e:
+                raise _integrity_error(e) from e
+            names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        return [{n: _from_db(v, types.get(n, "")) for n, v in zip(names, row)} for row in rows]
+
+    def _update(self):
+        rows, types = self._payload_rows()
+        values = rows[0]
+        if not values:
+            return [], 0
+        where, params = self._where(self.table)
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        sql = f'update "{self.table}" set {assignments}{where} returning *'
+        with self.db.transaction():
+            out = self._write(sql, [to_db(v, types[c]) for c, v in values.items()] + params)
+        return out, len(out)
+
+    def _delete(self):
+        where, params = self._where(self.table)
+        with self.db.transaction():
+            out = self._write(f'delete from "{self.table}"{where} returning *', params)
+        return out, len(out)
+
+
+class LocalRequestBuilder:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+
+    def select(self, *columns, count=None, head=None):
+        return LocalQuery(self.db, self.table, "select", columns or "*", count=count, head=bool(head))
+
+    def insert(self, json, *, count=None, returning="representation", upsert=False, default_to_null=True):
+        return LocalQuery(self.db, self.table, "upsert" if upsert else "insert", payload=json, count=count,
+                          returning=returning, default_to_null=default_to_null)
+
+    def upsert(self, json, *, count=None, returning="representation", ignore_duplicates=False,
+               on_conflict="", default_to_null=True):
+        return LocalQuery(self.db, self.table, "upsert", payload=json, count=count, returning=returning,
+                          on_conflict=on_conflict, ignore_duplicates=ignore_duplicates,
+                          default_to_null=default_to_null)
+
+    def update(self, json, *, count=None, returning="representation"):
+        return LocalQuery(self.db, self.table, "update", payload=json, count=count, returning=returning)
+
+    def delete(self, *, count=None, returning="representation"):
+        return LocalQuery(self.db, self.table, "delete", count=count, returning=returning)
+
+
+class LocalRPC:
+    """``client.rpc(name, params)`` backed by a Python function run in one transaction."""
+
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params or {}
+        self._single = False
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self):
+        started = time.perf_counter()
+        status = 200
+        error = None
+        try:
+            function = self.db.rpcs.get(self.name)
+            if function is None:
+                raise _error(f"Could not find the function public.{self.name} in the schema cache", "PGRST202")
+            with self.db.transaction():
+                data = function(self.db, **self.params)
+            if self._single:
+                return SingleAPIResponse.model_construct(data=data, count=None)
+            return APIResponse.model_construct(data=data, count=None)
+        except APIError as e:
+            status = 400
+            error = e
+            raise
+        finally:
+            notify_query_hooks(QueryEvent(
+                "POST", f"/rest/v1/rpc/{self.name}", status, time.perf_counter() - started, error
+            ))
+
+
+class LocalSupabaseClient:
+    """Drop-in replacement for the object ``get_supabase_client()`` returns."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def table(self, table_name):
+        return LocalRequestBuilder(self.db, table_name)
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def rpc(self, fn, params=None):
+        return LocalRPC(self.db, fn, params)
+
+
+class _AsyncLocal:
+    """Wraps a local builder/query so that ``execute()`` is awaitable, as with AsyncPostgrestClient."""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if isinstance(attr, _WRAPPED):
+            return _AsyncLocal(attr)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return _AsyncLocal(result) if isinstance(result, _WRAPPED) else result
+
+        return call
+
+    async def execute(self):
+        # asyncio.to_thread copies the context, so query hooks still see the caller's counters.
+        return await asyncio.to_thread(self._target.execute)
+
+
+_WRAPPED = (LocalRequestBuilder, LocalQuery, LocalRPC)
+
+
+class AsyncLocalSupabaseClient:
+    """Async facade over the same ``LocalDatabase`` a ``LocalSupabaseClient`` uses."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, table_name):
+        return _AsyncLocal(self.client.table(table_name))
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def rpc(self, fn, params=None):
+        return _AsyncLocal(self.client.rpc(fn, params))
@@ -0,0 +1,338 @@
+"""Python versions of the database functions in ``supabase/migrations``.
+
+``LocalRPC`` runs each one inside ``LocalDatabase.transaction()``, so an
+exception rolls back everything the function wrote, as in Postgres.  Errors
+the SQL raises with ``RAISE EXCEPTION`` are raised here as ``APIError`` with
+code ``P0001`` and the same message.
+
+Tables the migrations keep up to date with triggers are maintained lazily:
+SQLite triggers (``TRIGGERS``) note which rows changed, and the table is
+refreshed from them before it is next read, so bulk seeding stays linear.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from postgrest import APIError
+
+from .client import _error, to_db
+
+
+def _one(db, table, sql, params=()):
+    rows = db.fetch(table, sql, params)
+    return rows[0] if rows else None
+
+
+def _insert(db, table, values):
+    """Insert one row and return it."""
+    types = db.schema.column_types(table)
+    columns = ", ".join(f'"{c}"' for c in values)
+    sql = f'insert into "{table}" ({columns}) values ({", ".join("?" * len(values))}) returning *'
+    params = [to_db(v, types.get(c, "")) for c, v in values.items()]
+    with db.transaction():
+        return db.fetch(table, sql, params)[0]
+
+
+def next_document_number(db, counter, how_many=1):
+    row = _one(db, "Document_Counter",
+               'insert into "Document_Counter" (counter, last_value) values (?, ?) '
+               'on conflict (counter) do update set last_value = last_value + excluded.last_value '
+               'returning last_value', (counter, how_many))
+    return row["last_value"]
+
+
+def resolve_person(db, p_first_name, p_last_name):
+    person = _one(db, "Person", 'select person_id from "Person" where lower(first_name) = lower(?) '
+                                'and lower(last_name) = lower(?) order by person_id limit 1',
+                  (p_first_name, p_last_name))
+    if person is None:
+        person = _insert(db, "Person", {"first_name": p_first_name, "last_name": p_last_name})
+    return person["person_id"]
+
+
+def resolve_customers(db, customers):
+    ids = []
+    for customer in customers:
+        person_id = resolve_person(db, customer["first_name"], customer["last_name"])
+        row = _one(db, "Customers", 'select customer_id from "Customers" where person_id = ? '
+                                    'order by customer_id limit 1', (person_id,))
+        if row is None:
+            row = _insert(db, "Customers", {"person_id": person_id, "id_card_number": customer.get("id_card_number"),
+                                            "customer_type_id": customer.get("customer_type_id")})
+        ids.append(row["customer_id"])
+    return ids
+
+
+def resolve_physicians(db, physicians):
+    ids = []
+    for physician in physicians:
+        row = _one(db, "Physician", 'select physician_id from "Physician" where prc_num is ? and ptr_num is ? '
+                                    'order by physician_id limit 1',
+                   (physician.get("prc_num"), physician.get("ptr_num")))
+        if row is None:
+            person_id = resolve_person(db, physician["first_name"], physician["last_name"])
+            row = _insert(db, "Physician", {"person_id": person_id, "prc_num": physician.get("prc_num"),
+                                            "ptr_num": physician.get("ptr_num")})
+        ids.append(row["physician_id"])
+    return ids
+
+
+def adjust_stock(db, adjustments):
+    deltas = {}
+    for adjustment in adjustments:
+        stock_item_id = int(adjustment["stock_item_id"])
+        deltas[stock_item_id] = deltas.get(stock_item_id, 0) + int(adjustment["delta"])
+    result = []
+    for stock_item_id in sorted(deltas):
+        delta = deltas[stock_item_id]
+        row = _one(db, "Stock_Item", 'update "Stock_Item" set quantity = quantity + ? where stock_item_id = ? '
+                                     'returning quantity', (delta, stock_item_id))
+        if row is None:
+            raise _error(f"Stock item {stock_item_id} not found.", "P0001")
+        if row["quantity"] < 0:
+            raise _error(f"Insufficient stock for stock item {stock_item_id}. Available: {row['quantity'] - delta}, "
+                         f"Requested: {-delta}", "P0001")
+        result.append({"stock_item_id": stock_item_id, "quantity": row["quantity"]})
+    return result
+
+
+def adjust_batches(db, adjustments):
+    deltas = {}
+    for adjustment in adjustments:
+        expiration_id = int(adjustment["expiration_id"])
+        deltas[expiration_id] = deltas.get(expiration_id, 0) + int(adjustment["delta"])
+    result = []
+    for expiration_id in sorted(deltas):
+        delta = deltas[expiration_id]
+        row = _one(db, "Expiration", 'update "Expiration" set quantity = quantity + ? where expiration_id = ? '
+                                     'returning quantity', (delta, expiration_id))
+        if row is None:
+            raise _error(f"Batch {expiration_id} not found.", "P0001")
+        if row["quantity"] < 0:
+            raise _error(f"Insufficient stock in batch {expiration_id}. Available: {row['quantity'] - delta}, "
+                         f"Requested: {-delta}", "P0001")
+        result.append({"expiration_id": expiration_id, "quantity": row["quantity"]})
+    return result
+
+
+def amend_snapshots(db, changes):
+    totals = {}
+    for change in changes:
+        rows = db.execute('select stock_item_id, day from "Stock_Snapshot" where stock_item_id = ? and day >= ? '
+                          'and last_transaction_id >= ?',
+                          (change["stock_item_id"], change["day"], change["stock_transaction_id"])).fetchall()
+        for stock_item_id, day in rows:
+            totals[(stock_item_id, day)] = totals.get((stock_item_id, day), 0) + int(change["delta"])
+    for (stock_item_id, day), delta in totals.items():
+        db.execute('update "Stock_Snapshot" set quantity = quantity + ? where stock_item_id = ? and day = ?',
+                   (delta, stock_item_id, day))
+    return len(totals)
+
+
+def pos_record_sale(db, payload):
+    location_id = payload["location_id"]
+    sale_date = payload["sale_date"]
+    customer = payload.get("customer")
+    prescription = payload.get("prescription")
+    dswd = payload.get("dswd")
+
+    requested = {}
+    for item in payload["items"]:
+        requested[item["product_id"]] = requested.get(item["product_id"], 0) + item["quantity"]
+    for product_id in sorted(requested):
+        stock_item = _one(db, "Stock_Item", 'select quantity from "Stock_Item" where product_id = ? and location_id = ?',
+                          (product_id, location_id))
+        if stock_item is None:
+            raise _error(f"Product {product_id} not found in stock for this location.", "P0001")
+        if requested[product_id] > stock_item["quantity"]:
+            raise _error(f"Insufficient stock for product {product_id}. Available: {stock_item['quantity']}, "
+                         f"Requested: {requested[product_id]}", "P0001")
+
+    customer_id = resolve_customers(db, [customer])[0] if isinstance(customer, dict) else None
+
+    prescription_id = None
+    if isinstance(prescription, dict):
+        prescription_id = _insert(db, "Prescription", {
+            "customer_id": customer_id,
+            "physician_id": resolve_physicians(db, [prescription])[0],
+            "prescription_details": prescription.get("details"),
+            "date_issued": prescription.get("date_issued"),
+        })["prescription_id"]
+
+    year = datetime.now().year
+    invoice = f"POS-{year}-{next_document_number(db, f'POS-{year}'):03d}"
+    pos_id = _insert(db, "POS", {"sale_date": sale_date, "invoice": invoice, "user_id": payload.get("user_id"),
+                                 "order_type": payload.get("order_type"),
+                                 "prescription_id": prescription_id})["pos_id"]
+
+    for item in payload["items"]:
+        quantity = item["quantity"]
+        stock_item = _one(db, "Stock_Item", 'update "Stock_Item" set quantity = quantity - ? '
+                                            'where product_id = ? and location_id = ? returning stock_item_id',
+                          (quantity, item["product_id"], location_id))
+        stock_item_id = stock_item["stock_item_id"]
+
+        remaining = quantity
+        batches = db.fetch("Expiration", 'select expiration_id, expiry_date, quantity from "Expiration" '
+                                         'where stock_item_id = ? and quantity > 0 order by expiry_date, expiration_id',
+                           (stock_item_id,))
+        for batch in batches:
+            if remaining <= 0:
+                break
+            take = min(batch["quantity"], remaining)
+            db.execute('update "Expiration" set quantity = quantity - ? where expiration_id = ?',
+                       (take, batch["expiration_id"]))
+            _insert(db, "Stock_Transaction", {
+                "transaction_date": sale_date, "transaction_type": "POS", "src_location": location_id,
+                "stock_item_id": stock_item_id, "reference_id": pos_id, "quantity_change": -take,
+                "expiry_date": batch["expiry_date"],
+            })
+            remaining -= take
+
+        if remaining > 0:
+            _insert(db, "Stock_Transaction", {
+                "transaction_date": sale_date, "transaction_type": "POS", "src_location": location_id,
+                "stock_item_id": stock_item_id, "reference_id": pos_id, "quantity_change": -remaining,
+            })
+
+        _insert(db, "POS_Item", {"pos_id": pos_id, "product_id": item["product_id"], "price": item["price"],
+                                 "quantity_sold": quantity})
+
+    if isinstance(dswd, dict):
+        _insert(db, "Dswd_Order", {"customer_id": customer_id, "pos_id": pos_id, "gl_num": dswd.get("gl_num"),
+                                   "gl_date": dswd.get("gl_date"), "claim_date": dswd.get("claim_date"),
+                                   "client_name": dswd.get("client_name")})
+
+    return {"pos_id": pos_id, "invoice": invoice}
+
+
+def pos_checkout(db, payload):
+    idempotency = payload.get("idempotency") or {}
+    key = idempotency.get("key")
+    if key is None:
+        return pos_record_sale(db, payload)
+
+    now = datetime.now(timezone.utc)
+    db.execute('delete from "Idempotency_Key" where expires_at <= ?', (now.isoformat(),))
+    claimed = db.execute(
+        'insert into "Idempotency_Key" (key, request_hash, expires_at) values (?, ?, ?) on conflict (key) do nothing',
+        (key, idempotency.get("request_hash"),
+         (now + timedelta(seconds=idempotency.get("ttl") or 86400)).isoformat()),
+    ).rowcount
+    if not claimed:
+        stored = _one(db, "Idempotency_Key", 'select request_hash, response from "Idempotency_Key" where key = ?',
+                      (key,))
+        if stored["request_hash"] != idempotency.get("request_hash"):
+            raise _error("Idempotency key was already used for a different sale", "PT409")
+        if stored["response"] is None:
+            raise _error("A sale with this idempotency key is still being processed", "PT409")
+        return {**stored["response"], "replayed": True}
+
+    result = pos_record_sale(db, payload)
+    db.execute('update "Idempotency_Key" set response = ? where key = ?', (to_db(result, "jsonb"), key))
+    return result
+
+
+def pos_checkout_bulk(db, sales):
+    results = []
+    for sale in sales:
+        try:
+            with db.transaction():
+                result = pos_checkout(db, sale)
+        except APIError as e:
+            if e.code not in ("P0001", "PT409", "23503"):
+                raise
+            results.append({"status": "rejected", "error": e.message})
+            continue
+        results.append({"status": "replayed" if result.get("replayed") else "created",
+                        "pos_id": result["pos_id"], "invoice": result["invoice"]})
+    return results
+
+
+def pos_total_amount(db, pos):
+    row = _one(db, "POS_Item", 'select coalesce(sum(price * quantity_sold), 0) as total from "POS_Item" '
+                               'where pos_id = ?', (pos["pos_id"],))
+    return row["total"]
+
+
+def pos_item_total_price(db, item):
+    return item["price"] * item["quantity_sold"]
+
+
+def refresh_stock_availability(db):
+    """Rebuild the ``Stock_Availability`` rows of the stock items written since the last read."""
+    with db.transaction():
+        db.execute(
+            'insert into "Stock_Availability" (stock_item_id, product_id, location_id, quantity, expiry_details, '
+            'updated_at) '
+            'select s.stock_item_id, s.product_id, s.location_id, s.quantity, '
+            "coalesce((select json_group_array(json_object('expiry_date', b.expiry_date, 'quantity', b.quantity)) "
+            '          from (select expiry_date, quantity from "Expiration" e '
+            '                where e.stock_item_id = s.stock_item_id and e.quantity > 0 '
+            "                order by e.expiry_date, e.expiration_id) b), '[]'), ? "
+            'from "Stock_Item" s where s.stock_item_id in (select stock_item_id from _stock_availability_changed) '
+            'on conflict (stock_item_id) do update set product_id = excluded.product_id, '
+            'location_id = excluded.location_id, quantity = excluded.quantity, '
+            'expiry_details = excluded.expiry_details, updated_at = excluded.updated_at',
+            (datetime.now(timezone.utc).isoformat(),),
+        )
+        db.execute("delete from _stock_availability_changed")
+
+
+def _changed_trigger(name, event, table, row):
+    return (f'create trigger if not exists {name} after {event} on "{table}" '
+            f'begin insert into _stock_availability_changed values ({row}.stock_item_id); end')
+
+
+# SQLite DDL run on every LocalDatabase: the triggers of ``*_stock_availability.sql``,
+# recording the stock items each write touched.
+TRIGGERS = [
+    # No key: a trigger's "or ignore" gives way to the conflict clause of the write that fired it
+    "create table if not exists _stock_availability_changed (stock_item_id integer)",
+    _changed_trigger("stock_item_availability_insert", "insert", "Stock_Item", "new"),
+    _changed_trigger("stock_item_availability_update", "update", "Stock_Item", "new"),
+    _changed_trigger("expiration_availability_insert", "insert", "Expiration", "new"),
+    _changed_trigger("expiration_availability_update", "update", "Expiration", "new"),
+    _changed_trigger("expiration_availability_move", "update of stock_item_id", "Expiration", "old"),
+    _changed_trigger("expiration_availability_delete", "delete", "Expiration", "old"),
+    # Stock items that were there before the triggers (an existing LOCAL_SUPABASE_DB file)
+    'insert into _stock_availability_changed select stock_item_id from "Stock_Item" '
+    'where stock_item_id not in (select stock_item_id from "Stock_Availability")',
+]
+
+# table -> function(db); refreshes the trigger-maintained tables before they are read.
+BEFORE_READ = {
+    "Stock_Availability": refresh_stock_availability,
+}
+
+
+# (table, column) -> function(db, row); the computed columns PostgREST exposes.
+COMPUTED = {
+    ("POS", "total_amount"): pos_total_amount,
+    ("POS_Item", "total_price"): pos_item_total_price,
+}
+
+
+# name -> function(db, **params); registered on every LocalDatabase.
+FUNCTIONS = {
+    "adjust_batches": adjust_batches,
+    "adjust_stock": adjust_stock,
+    "amend_snapshots": amend_snapshots,
+    "next_document_number": next_document_number,
+    "pos_checkout": pos_checkout,
+    "pos_checkout_bulk": pos_checkout_bulk,
+    "pos_record_sale": pos_record_sale,
+    "resolve_customers": resolve_customers,
+    "resolve_person": resolve_person,
+    "resolve_physicians": resolve_physicians,
+}
+
+
+def register_all(db):
+    for name, function in FUNCTIONS.items():
+        db.register_rpc(name, function)
+    for (table, name), function in COMPUTED.items():
+        db.register_computed(table, name, function)
+    for statement in TRIGGERS:
+        db.execute(statement)
+    for table, function in BEFORE_READ.items():
+        db.register_before_read(table, function)
@@ -0,0 +1,140 @@
+"""Load the Postgres schema in ``supabase/`` into SQLite and introspect it.
+
+Only plain tables and indexes are translated; functions, triggers, grants and
+other Postgres-only statements are skipped (server-side functions are emulated
+in Python, see ``rpc.py``).
+"""
+
+import re
+from collections import namedtuple
+from pathlib import Path
+
+ForeignKey = namedtuple("ForeignKey", ["table", "column", "ref_table", "ref_column"])
+Column = namedtuple("Column", ["name", "type", "pk"])
+
+
+def split_statements(sql):
+    """Split a SQL script on ``;`` outside of comments, quotes and $$ bodies."""
+    statements = []
+    current = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end + 1
+            continue
+        if ch == "'":
+            end = i + 1
+            while end < n:
+                if sql[end] == "'" and sql[end + 1:end + 2] == "'":
+                    end += 2
+                    continue
+                if sql[end] == "'":
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if ch == "$":
+            match = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, i + len(tag))
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if ch == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+_IDENTITY_PK = re.compile(
+    r"\bbigint\s+generated\s+(?:by\s+default|always)\s+as\s+identity\s+primary\s+key", re.I
+)
+_NOW = re.compile(r"\bdefault\s+now\(\)", re.I)
+_USING = re.compile(r"\busing\s+\w+\s*\(", re.I)
+
+
+def translate(statement):
+    """Return the SQLite form of a Postgres DDL statement, or None to skip it."""
+    head = " ".join(statement.split()[:3]).lower()
+    if head.startswith("create table"):
+        statement = re.sub(r"^create\s+table\s+(?!if\s+not\s+exists)", "create table if not exists ",
+                           statement, flags=re.I)
+        statement = _IDENTITY_PK.sub("integer primary key autoincrement", statement)
+        statement = _NOW.sub("default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))", statement)
+        return statement
+    if head.startswith("create index") or head.startswith("create unique index"):
+        statement = re.sub(r"\bindex\s+(?!if\s+not\s+exists)", "index if not exists ", statement,
+                           count=1, flags=re.I)
+        return _USING.sub("(", statement)
+    return None
+
+
+def schema_files(schema_dir):
+    schema_dir = Path(schema_dir)
+    files = [schema_dir / "schema.sql"]
+    migrations = schema_dir / "migrations"
+    if migrations.is_dir():
+        files.extend(sorted(migrations.glob("*.sql")))
+    return [f for f in files if f.exists()]
+
+
+def load_schema(conn, schema_dir):
+    for path in schema_files(schema_dir):
+        for statement in split_statements(path.read_text()):
+            translated = translate(statement)
+            if translated:
+                conn.execute(translated)
+
+
+class Schema:
+    """Columns, foreign keys and unique keys of every table in the database."""
+
+    def __init__(self, conn):
+        self.columns = {}
+        self.foreign_keys = []
+        self.unique_keys = {}
+        tables = [row[0] for row in conn.execute(
+            "select name from sqlite_master where type = 'table' and name not like 'sqlite_%'"
+        )]
+        for table in tables:
+            info = conn.execute(f'pragma table_info("{table}")').fetchall()
+            self.columns[table] = [Column(row[1], (row[2] or "").lower(), row[5]) for row in info]
+            for row in conn.execute(f'pragma foreign_key_list("{table}")'):
+                self.foreign_keys.append(ForeignKey(table, row[3], row[2], row[4]))
+            uniques = [frozenset(c.name for c in self.columns[table] if c.pk)]
+            for index in conn.execute(f'pragma index_list("{table}")'):
+                if index[2]:
+                    cols = conn.execute(f'pragma index_info("{index[1]}")').fetchall()
+                    uniques.append(frozenset(c[2] for c in cols))
+            self.unique_keys[table] = uniques
+
+    def has_table(self, table):
+        return table in self.columns
+
+    def column_names(self, table):
+        return [c.name for c in self.columns[table]]
+
+    def column_types(self, table):
+        return {c.name: c.type for c in self.columns[table]}
+
+    def primary_key(self, table):
+        pk = [c.name for c in self.columns[table] if c.pk]
+        return pk[0] if len(pk) == 1 else None
+
+    def is_unique(self, table, column):
+        return frozenset([column]) in self.unique_keys.get(table, [])
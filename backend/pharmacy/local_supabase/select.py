@@ -0,0 +1,78 @@
+"""Parser for PostgREST ``select=`` strings such as
+``"*, alias:Location!src_location(location), Products!inner(*, Drugs(*))"``.
+"""
+
+from collections import namedtuple
+
+Field = namedtuple("Field", ["name", "alias"])
+Star = namedtuple("Star", [])
+Embed = namedtuple("Embed", ["table", "alias", "hint", "inner", "nodes"])
+
+
+def _strip(text):
+    out = []
+    quoted = False
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+            continue
+        if ch.isspace() and not quoted:
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def _split_top_level(text):
+    parts = []
+    depth = 0
+    current = []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    if depth != 0:
+        raise ValueError(f"Unbalanced parentheses in select: {text!r}")
+    return [p for p in parts if p]
+
+
+def _parse_node(item):
+    if item == "*":
+        return Star()
+
+    alias = None
+    paren = item.find("(")
+    head = item if paren == -1 else item[:paren]
+    if ":" in head and "::" not in head:
+        alias, head = head.split(":", 1)
+
+    if paren == -1:
+        name = head.split("::", 1)[0]  # casts are ignored
+        return Field(name, alias)
+
+    if not item.endswith(")"):
+        raise ValueError(f"Malformed embedded resource: {item!r}")
+    table, *modifiers = head.split("!")
+    hint = None
+    inner = False
+    for modifier in modifiers:
+        if modifier == "inner":
+            inner = True
+        elif modifier != "left":
+            hint = modifier
+    return Embed(table, alias, hint, inner, parse_select(item[paren + 1:-1]))
+
+
+def parse_select(columns):
+    """Parse a select string (or a sequence of them) into Field/Star/Embed nodes."""
+    if not isinstance(columns, str):
+        columns = ",".join(columns)
+    text = _strip(columns) or "*"
+    return [_parse_node(item) for item in _split_top_level(text)]
@@ -0,0 +1,123 @@
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from pharmacy import reference_data
+from pharmacy.benchmark import list_endpoints, run_benchmarks, seed_database
+from pharmacy.local_supabase import reset_local_client
+from pharmacy.supabase_client import close_thread_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the local Supabase stand-in at several sizes and time every list endpoint "
+        "(p50/p95 latency, PostgREST round trips, peak memory). Results are written as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="1000,100000,1000000",
+                            help="Comma-separated row counts for POS, POS_Item, Stock_Transaction and Expiration.")
+        parser.add_argument("--endpoints", default="",
+                            help="Comma-separated resource names from pharmacy/urls.py (default: all).")
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--timeout", type=float, default=60,
+                            help="Give up on a request after this many seconds.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--db", default=":memory:",
+                            help="SQLite file for the seeded data, recreated for every scale.")
+        parser.add_argument("--output", default="benchmark-results.json")
+        parser.add_argument("--compare", help="Earlier results file to print p50 changes against.")
+        parser.add_argument("--show-view-output", action="store_true",
+                            help="Do not silence the views' print() output.")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options["scales"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--scales must be comma-separated integers")
+
+        with override_settings(SUPABASE_BACKEND="local"):
+            close_thread_client()
+            endpoints = list_endpoints()
+            if options["endpoints"]:
+                wanted = {e.strip() for e in options["endpoints"].split(",")}
+                unknown = wanted - {name for name, _ in endpoints}
+                if unknown:
+                    raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+                endpoints = [(name, path) for name, path in endpoints if name in wanted]
+
+            report = {
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "iterations": options["iterations"],
+                "timeout_s": options["timeout"],
+                "seed": options["seed"],
+                "scales": {},
+            }
+            for rows in scales:
+                report["scales"][str(rows)] = self.run_scale(rows, endpoints, options)
+            close_thread_client()
+
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    def run_scale(self, rows, endpoints, options):
+        if options["db"] != ":memory:" and os.path.exists(options["db"]):
+            os.remove(options["db"])
+        client = reset_local_client(options["db"])
+
+        self.stdout.write(f"Seeding {rows:,} rows...")
+        started = time.perf_counter()
+        seed_database(client.db, rows, seed=options["seed"])
+        seed_seconds = round(time.perf_counter() - started, 2)
+        reference_data.invalidate()
+        self.stdout.write(f"  seeded in {seed_seconds}s")
+
+        def progress(name, result):
+            if result["timed_out"]:
+                line = f"  {name:<28} timed out after {result['timeout_s']}s " \
+                       f"({result['round_trips_before_timeout']} round trips)"
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(
+                    f"  {name:<28} {result['status']}  p50 {result['p50_ms']:>10.2f} ms  "
+                    f"p95 {result['p95_ms']:>10.2f} ms  {result['round_trips']:>7} queries  "
+                    f"{result['peak_memory_kb']:>10.1f} KiB"
+                )
+
+        results = run_benchmarks(
+            endpoints,
+            iterations=options["iterations"],
+            timeout=options["timeout"],
+            quiet=not options["show_view_output"],
+            progress=progress,
+        )
+        return {"rows": rows, "seed_seconds": seed_seconds, "endpoints": results}
+
+    def compare(self, path, report):
+        with open(path) as f:
+            baseline = json.load(f)
+        self.stdout.write(f"\nChange in p50 against {path}:")
+        for scale, current in report["scales"].items():
+            previous = baseline.get("scales", {}).get(scale)
+            if not previous:
+                continue
+            self.stdout.write(f"  {int(scale):,} rows")
+            for name, result in current["endpoints"].items():
+                before = previous["endpoints"].get(name)
+                if not before or before.get("timed_out") or result.get("timed_out"):
+                    continue
+                ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+                self.stdout.write(
+                    f"    {name:<28} {before['p50_ms']:>10.2f} -> {result['p50_ms']:>10.2f} ms  "
+                    f"(x{ratio:.2f})  queries {before['round_trips']} -> {result['round_trips']}"
+                )
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from pharmacy import reconciliation
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Stock_Item.quantity, the stock left in Expiration batches and the ledger total "
+        "for every stock item (see pharmacy/reconciliation.py) and report the ones that disagree. "
+        "With --fix, bring them into line with the ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--location", type=int, action="append", dest="locations", metavar="ID",
+                            help="Only this location_id (repeatable; default: all).")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Partitions checked at once.")
+        parser.add_argument("--fix", action="store_true",
+                            help="Correct the counters and surplus batches that still disagree on a second look.")
+        parser.add_argument("--output", help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        found = reconciliation.check(options["locations"], options["workers"])
+        self.stdout.write(f"Checked in {time.monotonic() - started:.1f}s, {len(found)} stock items disagree")
+        for row in found:
+            self.stdout.write(self.style.WARNING(
+                f"Location {row['location_id']} stock item {row['stock_item_id']} (product {row['product_id']}): "
+                f"counter {row['quantity']}, batches {row['batches']}, ledger {row['ledger']}"
+            ))
+
+        report = {"discrepancies": found}
+        if options["fix"] and found:
+            confirmed = reconciliation.recheck(found)
+            result = reconciliation.fix(confirmed)
+            report["fixed"] = result
+            self.stdout.write(f"Fixed {result['counters']} counters and {result['batches']} batch sets "
+                              f"({len(found) - len(confirmed)} changed during the check and were left alone)")
+            if result["ledger_only"]:
+                self.stdout.write(self.style.WARNING(
+                    f"Counter and batches agree but the ledger differs, check its entries: {result['ledger_only']}"
+                ))
+            if result["skipped"]:
+                self.stdout.write(self.style.WARNING(
+                    f"Need a manual look (negative ledger or batches short of it): {result['skipped']}"
+                ))
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pharmacy import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the daily Stock_Snapshot rows the ledger folds start from (see pharmacy/ledger.py). "
+        "Run it once a night; --since backfills a range of days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", type=date.fromisoformat, default=None,
+                            help="Day to snapshot, YYYY-MM-DD (default: yesterday).")
+        parser.add_argument("--since", type=date.fromisoformat, default=None,
+                            help="Snapshot every day from this one through --day, oldest first.")
+
+    def handle(self, *args, **options):
+        last = options["day"] or timezone.localdate() - timedelta(days=1)
+        day = options["since"] or last
+        if day > last:
+            raise CommandError("--since is after --day")
+
+        # Oldest first, so each day folds only the entries since the one before
+        last_transaction_id = ledger.watermark()
+        while day <= last:
+            count = ledger.snapshot(day, last_transaction_id)
+            self.stdout.write(f"{day}: {count} stock items")
+            day += timedelta(days=1)
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from pharmacy import offline_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay POS sales queued while Supabase was unreachable (see pharmacy/offline_queue.py) "
+        "and report the ones the database refused."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Sales per request (default: OFFLINE_SYNC_BATCH).")
+        parser.add_argument("--report", action="store_true",
+                            help="Only print the queue counts and the conflicts, do not sync.")
+        parser.add_argument("--requeue", type=int, nargs="*", default=[], metavar="ID",
+                            help="Move these conflicts back to pending before syncing.")
+
+    def handle(self, *args, **options):
+        queue = offline_queue.get_queue()
+
+        if not options["report"]:
+            for entry_id in options["requeue"]:
+                queue.requeue(entry_id)
+            summary = offline_queue.sync(queue, options["batch_size"])
+            self.stdout.write(f"Synced {summary['synced']}, conflicts {summary['conflicts']}, "
+                              f"still pending {summary['pending']}")
+
+        report = queue.report()
+        self.stdout.write(f"Queue: {json.dumps(report['counts'])}")
+        for conflict in report["conflicts"]:
+            self.stdout.write(self.style.WARNING(
+                f"Conflict #{conflict['id']} (queued {conflict['queued_at']}, key {conflict['idempotency_key']}): "
+                f"{conflict['error']}"
+            ))
@@ -0,0 +1,52 @@
+import json
+import logging
+
+from django.conf import settings
+
+from .query_stats import track_queries
+
+logger = logging.getLogger("pharmacy.queries")
+
+
+class QueryCountMiddleware:
+    """Report PostgREST round trips and time spent in them for every request.
+
+    Adds ``X-Query-Count`` and ``X-Query-Time-Ms`` response headers and logs one
+    JSON line per request.  Budgets from ``settings.QUERY_BUDGETS`` (keyed by URL
+    name, e.g. ``"expirations-list"``) or ``settings.DEFAULT_QUERY_BUDGET`` are
+    checked after the view runs; an overrun is logged as a warning and flagged
+    with ``X-Query-Budget-Exceeded``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as stats:
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match else None
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(url_name, getattr(settings, "DEFAULT_QUERY_BUDGET", None))
+
+        response["X-Query-Count"] = str(stats.count)
+        response["X-Query-Time-Ms"] = str(stats.elapsed_ms)
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "url_name": url_name,
+            "status": response.status_code,
+            "query_count": stats.count,
+            "query_time_ms": stats.elapsed_ms,
+            "query_errors": stats.errors,
+        }
+
+        if budget is not None and stats.count > budget:
+            response["X-Query-Budget-Exceeded"] = f"{stats.count}/{budget}"
+            record["query_budget"] = budget
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        return response
@@ -0,0 +1,228 @@
+"""Write-ahead queue for POS sales made while Supabase is unreachable.
+
+When a branch loses its link, ``POS.post`` stores the sale here (a SQLite
+file on the branch server, ``OFFLINE_QUEUE_DB``) and answers 202 instead of
+failing, so the counter keeps selling.  ``sync()`` replays queued sales in
+batches of ``OFFLINE_SYNC_BATCH`` through ``checkout.checkout_many`` (one
+round trip per batch), oldest first; it runs every ``OFFLINE_SYNC_INTERVAL``
+seconds in a background thread and from ``manage.py sync_offline_sales``.
+The queue is off unless ``OFFLINE_QUEUE`` is set, which is meant for the
+branch server only.  Every worker process there runs its own sync thread;
+each batch is claimed with one ``UPDATE ... RETURNING``, so two workers never
+replay the same sales at once.
+
+Every queued sale carries an idempotency key, so a sale that did reach the
+database before the link dropped is replayed, not sold twice.  A sale the
+database refuses (usually stock that was sold out meanwhile) is kept with
+status ``conflict`` and its error for someone to resolve; ``report()`` lists
+them.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from django.conf import settings
+
+from . import checkout
+
+PENDING = "pending"
+SYNCING = "syncing"
+SYNCED = "synced"
+CONFLICT = "conflict"
+
+# Seconds after which a batch claimed by a worker that died is claimed again; replaying it
+# is safe, as its idempotency keys answer sales that did get through
+CLAIM_EXPIRY = 300
+
+_SCHEMA = """
+create table if not exists queued_sale (
+    id integer primary key autoincrement,
+    idempotency_key text not null unique,
+    data text not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    last_error text,
+    pos_id integer,
+    queued_at text not null,
+    claimed_at text,
+    synced_at text
+);
+create index if not exists queued_sale_status_idx on queued_sale (status, id);
+"""
+
+
+def is_offline_error(exc):
+    """True for errors that mean Supabase could not be reached (as opposed to refusing the request)."""
+    return isinstance(exc, httpx.TransportError)
+
+
+def new_key():
+    return str(uuid.uuid4())
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class OfflineQueue:
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            # Every enqueue is on disk before the 202 goes out
+            self.conn.execute("pragma journal_mode = wal")
+            self.conn.execute("pragma synchronous = full")
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("pragma table_info(queued_sale)")}
+        if "claimed_at" not in columns:
+            # A queue file from before batches were claimed
+            self.conn.execute("alter table queued_sale add column claimed_at text")
+
+    def enqueue(self, data, idempotency_key):
+        """Queue a POS request body; queuing the same key twice keeps the first."""
+        with self.lock:
+            self.conn.execute(
+                "insert into queued_sale (idempotency_key, data, queued_at) values (?, ?, ?) "
+                "on conflict (idempotency_key) do nothing",
+                (idempotency_key, json.dumps(data, default=str), _now()),
+            )
+            return self.conn.execute("select id from queued_sale where idempotency_key = ?",
+                                     (idempotency_key,)).fetchone()[0]
+
+    def claim(self, limit):
+        """Mark up to ``limit`` of the oldest pending sales as syncing and return them, in one statement.
+
+        Sales another worker claimed more than ``CLAIM_EXPIRY`` seconds ago
+        are taken over.
+        """
+        now = datetime.now(timezone.utc)
+        expired = (now - timedelta(seconds=CLAIM_EXPIRY)).isoformat()
+        with self.lock:
+            rows = self.conn.execute(
+                "update queued_sale set status = ?, claimed_at = ? where id in ("
+                "select id from queued_sale where status = ? or (status = ? and claimed_at < ?) order by id limit ?"
+                ") returning id, idempotency_key, data",
+                (SYNCING, now.isoformat(), PENDING, SYNCING, expired, limit),
+            ).fetchall()
+        return sorted(({"id": row[0], "idempotency_key": row[1], "data": json.loads(row[2])} for row in rows),
+                      key=lambda entry: entry["id"])
+
+    def mark_synced(self, entry_id, pos_id):
+        with self.lock:
+            self.conn.execute("update queued_sale set status = ?, pos_id = ?, synced_at = ?, attempts = attempts + 1 "
+                              "where id = ?", (SYNCED, pos_id, _now(), entry_id))
+
+    def mark_conflict(self, entry_id, error):
+        with self.lock:
+            self.conn.execute("update queued_sale set status = ?, last_error = ?, attempts = attempts + 1 "
+                              "where id = ?", (CONFLICT, error, entry_id))
+
+    def mark_failed(self, entry_ids, error):
+        """Put the entries back to pending for the next sync, recording why this one failed."""
+        with self.lock:
+            self.conn.executemany("update queued_sale set status = ?, last_error = ?, attempts = attempts + 1 "
+                                  "where id = ?", [(PENDING, error, entry_id) for entry_id in entry_ids])
+
+    def count(self, *statuses):
+        with self.lock:
+            return self.conn.execute(f"select count(*) from queued_sale where status in ({', '.join('?' * len(statuses))})",
+                                     statuses).fetchone()[0]
+
+    def requeue(self, entry_id):
+        """Put a conflict back in line, e.g. after the stock has been corrected."""
+        with self.lock:
+            self.conn.execute("update queued_sale set status = ? where id = ? and status = ?",
+                              (PENDING, entry_id, CONFLICT))
+
+    def report(self):
+        """Counts per status and the unresolved conflicts."""
+        with self.lock:
+            counts = dict(self.conn.execute("select status, count(*) from queued_sale group by status").fetchall())
+            conflicts = self.conn.execute(
+                "select id, idempotency_key, last_error, queued_at, data from queued_sale "
+                "where status = ? order by id", (CONFLICT,)
+            ).fetchall()
+        return {
+            "counts": {status: counts.get(status, 0) for status in (PENDING, SYNCING, SYNCED, CONFLICT)},
+            "conflicts": [
+                {"id": row[0], "idempotency_key": row[1], "error": row[2], "queued_at": row[3],
+                 "data": json.loads(row[4])}
+                for row in conflicts
+            ],
+        }
+
+
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_queue = None
+
+
+def get_queue():
+    """The process-wide queue on ``OFFLINE_QUEUE_DB``."""
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = OfflineQueue(settings.OFFLINE_QUEUE_DB)
+        return _queue
+
+
+def sync(queue=None, batch_size=None):
+    """Replay pending sales until none are left or Supabase is unreachable again.
+
+    Returns how many sales were synced, how many hit a conflict and how many
+    are still pending (or being synced by another worker).
+    """
+    queue = queue or get_queue()
+    batch_size = batch_size or settings.OFFLINE_SYNC_BATCH
+    summary = {"synced": 0, "conflicts": 0, "pending": 0}
+    # Runs in other processes claim other batches; within one there is no point in two
+    with _sync_lock:
+        _sync_batches(queue, batch_size, summary)
+    summary["pending"] = queue.count(PENDING, SYNCING)
+    return summary
+
+
+def _sync_batches(queue, batch_size, summary):
+    while True:
+        batch = queue.claim(batch_size)
+        if not batch:
+            break
+        try:
+            results = checkout.checkout_many(
+                [{"data": entry["data"], "idempotency_key": entry["idempotency_key"]} for entry in batch]
+            )
+        except Exception as e:
+            queue.mark_failed([entry["id"] for entry in batch], str(e))
+            if not is_offline_error(e):
+                print(f"❌ Offline sync failed: {e}")
+            return
+        for entry, result in zip(batch, results):
+            if result["status"] in ("created", "replayed"):
+                queue.mark_synced(entry["id"], result["pos_id"])
+                summary["synced"] += 1
+            else:
+                queue.mark_conflict(entry["id"], result["error"])
+                summary["conflicts"] += 1
+
+
+def _sync_forever():
+    while True:
+        time.sleep(settings.OFFLINE_SYNC_INTERVAL)
+        try:
+            summary = sync()
+            if summary["synced"] or summary["conflicts"]:
+                print(f"🔄 Offline sync: {summary}")
+        except Exception as e:
+            print(f"❌ Offline sync failed: {e}")
+
+
+def start_sync_worker():
+    """Start the background sync thread when the offline queue is enabled."""
+    if settings.OFFLINE_QUEUE:
+        threading.Thread(target=_sync_forever, name="offline-pos-sync", daemon=True).start()
@@ -0,0 +1,85 @@
+"""Keyset (cursor) pagination for the list endpoints.
+
+List endpoints return the whole table unless the client asks for a page with
+``?limit=`` and/or ``?cursor=``; then the body becomes::
+
+    {"results": [...], "next_cursor": "eyJrIjogMTAwfQ"}
+
+and the next page is ``?cursor=<next_cursor>`` (``next_cursor`` is null on the
+last page).  Pages are cut on an indexed, unique column, ``WHERE key > last``
+instead of ``OFFSET``, so every page costs the same however deep it is::
+
+    page = get_page(request)
+    if page:
+        query = page.apply(query, "pos_id")
+    rows = query.execute().data
+    if page:
+        return Response(page.respond(rows, "pos_id"))
+"""
+
+import base64
+import json
+
+from django.conf import settings
+
+
+class InvalidPage(ValueError):
+    """Bad ``limit`` or ``cursor`` query parameter; views answer it with a 400."""
+
+
+def encode_cursor(value):
+    raw = json.dumps({"k": value}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return json.loads(raw)["k"]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidPage("Invalid cursor") from None
+
+
+class Page:
+    def __init__(self, limit, after=None):
+        self.limit = limit
+        self.after = after
+
+    def apply(self, query, column, desc=False):
+        """Restrict ``query`` to this page; fetches one extra row to tell whether another page follows."""
+        if self.after is not None:
+            query = query.lt(column, self.after) if desc else query.gt(column, self.after)
+        return query.order(column, desc=desc).limit(self.limit + 1)
+
+    def split(self, rows, column):
+        """``(rows of this page, next cursor or None)`` for rows fetched with ``apply``."""
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        return rows, encode_cursor(rows[-1][column])
+
+    def respond(self, rows, column):
+        rows, next_cursor = self.split(rows, column)
+        return {"results": rows, "next_cursor": next_cursor}
+
+
+def get_page(request, max_limit=None):
+    """The ``Page`` requested by ``limit``/``cursor``, or None when the client wants the full list."""
+    limit = request.query_params.get("limit")
+    cursor = request.query_params.get("cursor")
+    if limit is None and cursor is None:
+        return None
+
+    max_limit = max_limit or settings.MAX_PAGE_SIZE
+    if limit is None:
+        limit = min(settings.DEFAULT_PAGE_SIZE, max_limit)
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidPage("limit must be an integer") from None
+        if limit < 1:
+            raise InvalidPage("limit must be at least 1")
+        limit = min(limit, max_limit)
+
+    return Page(limit, decode_cursor(cursor) if cursor else None)
@@ -0,0 +1,130 @@
+"""Cart pricing for ``POST /pos/quote/``.
+
+Prices come from ``Products.current_price`` and discounts from the
+customer type's ``Customer_Type.discount`` (a percentage; 100 means the sale
+is fully covered, as for DSWD).  Both are held in memory: the price list is
+read whole (one paged query) on first use and kept for
+``PRICE_CACHE_TTL`` seconds, and customer types come from ``reference_data``,
+so a quote does no I/O once warm::
+
+    quote = pricing.quote(request.data)   # same body as POST /pos/
+    quote["total"]
+
+The Products views call ``invalidate()`` after every write.  A product that
+is not in the cached list triggers a reload (at most every
+``MISS_RELOAD_INTERVAL`` seconds), so products added on another worker are
+priced without waiting for the copy to expire.
+"""
+
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .checkout import CheckoutError, customer_type_for
+from .fetch import fetch_all
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+CENT = Decimal("0.01")
+# A miss reloads the list at most this often, so unknown ids cannot make every request reload it
+MISS_RELOAD_INTERVAL = 5.0
+
+_lock = threading.Lock()
+_prices = None
+_expires_at = 0.0
+_loaded_at = 0.0
+# Bumped by ``invalidate`` so a load that started before a write does not store what it read.
+_generation = 0
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _load(force=False):
+    global _prices, _expires_at, _loaded_at
+    now = time.monotonic()
+    if _prices is not None and _expires_at > now and not (force and now - _loaded_at >= MISS_RELOAD_INTERVAL):
+        return _prices
+    generation = _generation
+    rows = fetch_all(lambda: supabase.table("Products").select("product_id, current_price"), "product_id")
+    prices = {row["product_id"]: _money(row["current_price"] or 0) for row in rows}
+    with _lock:
+        if generation == _generation:
+            _prices, _loaded_at = prices, time.monotonic()
+            _expires_at = _loaded_at + settings.PRICE_CACHE_TTL
+    return prices
+
+
+def invalidate():
+    global _prices, _generation
+    with _lock:
+        _generation += 1
+        _prices = None
+
+
+def warm():
+    try:
+        _load()
+    except Exception as e:
+        print(f"⚠️ Could not preload product prices: {e}")
+
+
+def warm_in_background():
+    if settings.REFERENCE_CACHE_WARMUP:
+        threading.Thread(target=warm, name="price-list-warmup", daemon=True).start()
+
+
+def price_of(product_id):
+    """The current price of ``product_id``; raises ``CheckoutError`` for an unknown product."""
+    price = _load().get(product_id)
+    if price is None:
+        price = _load(force=True).get(product_id)
+    if price is None:
+        raise CheckoutError(f"Product {product_id} not found")
+    return price
+
+
+def quote(data):
+    """Line and total amounts for a POS request body; raises ``CheckoutError`` on bad input."""
+    order_type, customer_type, _ = customer_type_for(data)
+    rate = min(Decimal(str(customer_type["discount"])) / 100, Decimal(1)) if customer_type else Decimal(0)
+
+    try:
+        items = [(int(item["product_id"]), int(item["quantity"])) for item in data["items"]]
+    except KeyError as e:
+        raise CheckoutError(f"Missing field: {e.args[0]}") from None
+    except (TypeError, ValueError) as e:
+        raise CheckoutError(str(e)) from None
+    if not items:
+        raise CheckoutError("A sale needs at least one item")
+
+    lines = []
+    for product_id, quantity in items:
+        if quantity < 1:
+            raise CheckoutError(f"Invalid quantity for product {product_id}")
+        unit_price = price_of(product_id)
+        amount = unit_price * quantity
+        discount = (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        lines.append({
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "amount": amount,
+            "discount": discount,
+            "net_amount": amount - discount,
+        })
+
+    subtotal = sum((line["amount"] for line in lines), Decimal(0))
+    discount = sum((line["discount"] for line in lines), Decimal(0))
+    return {
+        "order_type": order_type,
+        "discount_rate": rate,
+        "items": lines,
+        "subtotal": subtotal,
+        "discount": discount,
+        "total": subtotal - discount,
+    }
@@ -0,0 +1,72 @@
+"""Per-request PostgREST round-trip accounting.
+
+Every ``.execute()`` on a Supabase query builder is exactly one HTTP request
+through the pooled transport in ``supabase_client``, so a query hook there
+counts builder executions.  Counters are pushed onto a context-local stack:
+``QueryCountMiddleware`` opens one per request and ``assert_max_queries``
+opens one for a block of test code; every active counter sees every query.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from .supabase_client import register_query_hook
+
+_active = contextvars.ContextVar("pharmacy_query_stats", default=())
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+        self.errors = 0
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        with self._lock:
+            self.count += 1
+            self.elapsed += event.elapsed
+            if event.error is not None or (event.status or 0) >= 400:
+                self.errors += 1
+            self.queries.append(f"{event.method} {event.path}")
+
+    @property
+    def elapsed_ms(self):
+        return round(self.elapsed * 1000, 2)
+
+
+def _record(event):
+    for stats in _active.get():
+        stats.record(event)
+
+
+register_query_hook(_record)
+
+
+@contextmanager
+def track_queries():
+    """Count every PostgREST round trip made inside the block."""
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail with ``AssertionError`` if the block makes more than ``limit`` round trips.
+
+    Example::
+
+        with assert_max_queries(3):
+            self.client.get("/pharmacy/expirations/")
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        queries = "\n".join(f"  {i}. {q}" for i, q in enumerate(stats.queries, start=1))
+        raise AssertionError(f"{stats.count} PostgREST queries executed, budget is {limit}:\n{queries}")
@@ -0,0 +1,109 @@
+"""Compare Stock_Item, Expiration and the ledger per stock item (``manage.py reconcile_stock``).
+
+Three records say how much of a stock item a location holds: the running
+total ``Stock_Item.quantity``, its batches (``Expiration`` rows with stock
+left) and the ledger (``Stock_Transaction``, folded by ``ledger``).  ``check``
+reads them in bulk, each location's stock items in partitions of
+``PARTITION_SIZE``, with the partitions spread over a thread pool (every
+thread has its own client, see ``supabase_client``)::
+
+    found = reconciliation.check(workers=8)
+    reconciliation.fix(reconciliation.recheck(found))
+
+The ledger is the source of truth.  ``fix`` moves each wrong counter by the
+difference through ``stock.adjust``, so sales made meanwhile are kept, and
+trims surplus batches soonest expiry first.  Stock items it cannot settle
+are only reported, counter and batches untouched: batches short of the ledger
+(nothing says which expiry date is missing), negative ledger totals, and a
+counter that agrees with its batches while the ledger alone differs, which
+points at a lost or doubled ledger entry rather than a wrong counter.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import allocation, ledger, reference_data, stock
+from .fetch import fetch_all, fetch_in
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+PARTITION_SIZE = 500
+
+
+def _stock_items(location_id):
+    return fetch_all(lambda: supabase.table("Stock_Item").select("stock_item_id, product_id, location_id, quantity")
+                     .eq("location_id", location_id), "stock_item_id")
+
+
+def _compare(stock_items):
+    """The discrepancies among ``stock_items`` (Stock_Item rows), three reads in all."""
+    ids = [row["stock_item_id"] for row in stock_items]
+    batches = {}
+    for batch in fetch_in(lambda: supabase.table("Expiration").select("expiration_id, stock_item_id, quantity")
+                          .gt("quantity", 0), "stock_item_id", ids, key="expiration_id"):
+        batches[batch["stock_item_id"]] = batches.get(batch["stock_item_id"], 0) + batch["quantity"]
+    totals = ledger.quantities(ids)
+
+    found = []
+    for row in stock_items:
+        in_batches = batches.get(row["stock_item_id"], 0)
+        in_ledger = totals.get(row["stock_item_id"], 0)
+        if row["quantity"] != in_ledger or in_batches != in_ledger:
+            found.append({**row, "batches": in_batches, "ledger": in_ledger})
+    return found
+
+
+def check(location_ids=None, workers=4):
+    """Every stock item whose counter, batches and ledger disagree, by location and id."""
+    if location_ids is None:
+        location_ids = sorted(row["location_id"] for row in reference_data.rows("Location"))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partitions = [
+            rows[start:start + PARTITION_SIZE]
+            for rows in pool.map(_stock_items, location_ids)
+            for start in range(0, len(rows), PARTITION_SIZE)
+        ]
+        found = [row for rows in pool.map(_compare, partitions) for row in rows]
+    return sorted(found, key=lambda row: (row["location_id"], row["stock_item_id"]))
+
+
+def recheck(found):
+    """The entries of ``found`` that still disagree the same way, so a sale made mid-check is not "fixed"."""
+    if not found:
+        return []
+    current = fetch_in(lambda: supabase.table("Stock_Item").select("stock_item_id, product_id, location_id, quantity"),
+                       "stock_item_id", [row["stock_item_id"] for row in found], key="stock_item_id")
+    again = {row["stock_item_id"]: row for row in _compare(current)}
+    return [row for row in found if again.get(row["stock_item_id"]) == row]
+
+
+def fix(found):
+    """Bring counters and surplus batches in ``found`` into line with the ledger.
+
+    Returns ``{"counters": n, "batches": n, "ledger_only": [...], "skipped": [...]}``
+    (stock item ids).  ``ledger_only`` are rows whose counter and batches
+    agree and only the ledger differs; ``skipped`` are negative ledger totals
+    and batches short of the ledger.  Neither is touched.
+    """
+    ledger_only = [row for row in found if row["quantity"] == row["batches"]]
+    skipped = [row for row in found if row["quantity"] != row["batches"]
+               and (row["ledger"] < 0 or row["batches"] < row["ledger"])]
+    left_alone = {row["stock_item_id"] for row in ledger_only + skipped}
+    fixable = [row for row in found if row["stock_item_id"] not in left_alone]
+
+    counters = [(row["stock_item_id"], row["ledger"] - row["quantity"])
+                for row in fixable if row["quantity"] != row["ledger"]]
+    for start in range(0, len(counters), settings.BULK_WRITE_CHUNK):
+        stock.adjust(counters[start:start + settings.BULK_WRITE_CHUNK])
+
+    surplus = [row for row in fixable if row["batches"] > row["ledger"]]
+    if surplus:
+        allocator = allocation.Allocator.load(row["stock_item_id"] for row in surplus)
+        for row in surplus:
+            allocator.take(row["stock_item_id"], row["batches"] - row["ledger"])
+        allocator.save()
+    return {"counters": len(counters), "batches": len(surplus),
+            "ledger_only": sorted(row["stock_item_id"] for row in ledger_only),
+            "skipped": sorted(row["stock_item_id"] for row in skipped)}
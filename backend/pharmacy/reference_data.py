@@ -0,0 +1,191 @@
+"""Process-wide cache of the small reference tables.
+
+Locations, units, brands, categories, customer types, roles and the status
+tables change a few times a year but are read by almost every request.  Each
+table is fetched whole (one round trip) on first use and kept for
+``REFERENCE_CACHE_TTL`` seconds::
+
+    from .. import reference_data
+
+    location = reference_data.get("Location", location_id)
+    senior = reference_data.find("Customer_Type", "description", "senior citizen")
+    brand = await reference_data.aget("Brand", brand_id)   # from async views
+
+The CRUD views of these tables call ``invalidate(table)`` after every
+successful write, so this worker sees its own changes immediately; other
+worker processes pick them up when their copy expires.  Rows are handed out as
+copies, so callers may modify them freely.
+"""
+
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+from .supabase_client import get_async_supabase_client, get_supabase_client
+
+supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
+
+# Cached table -> primary key column.
+REFERENCE_TABLES = {
+    "Location": "location_id",
+    "Branch": "branch_id",
+    "Unit": "unit_id",
+    "Brand": "brand_id",
+    "Product_Category": "category_id",
+    "Customer_Type": "customer_type_id",
+    "User_Role": "role_id",
+    "Status": "status_id",
+    "Purchase_Order_Status": "purchase_order_status_id",
+    "Purchase_Order_Item_Status": "purchase_order_item_status_id",
+    "Stock_Transfer_Status": "stock_transfer_status_id",
+    "Stock_Transfer_Item_Status": "stock_transfer_item_status_id",
+}
+
+
+class _Entry:
+    __slots__ = ("rows", "by_id", "expires_at")
+
+    def __init__(self, rows, key, ttl):
+        self.rows = rows
+        self.by_id = {row[key]: row for row in rows}
+        self.expires_at = time.monotonic() + ttl
+
+
+_entries = {}
+# Bumped by ``invalidate`` so a fetch that started before a write does not
+# store what it read.
+_generations = {}
+_lock = threading.Lock()
+# (event loop, table) -> the fetch already under way on that loop.
+_inflight = {}
+
+
+def _key(table):
+    try:
+        return REFERENCE_TABLES[table]
+    except KeyError:
+        raise KeyError(f"{table} is not a cached reference table") from None
+
+
+def _cached(table):
+    _key(table)
+    entry = _entries.get(table)
+    if entry is not None and entry.expires_at > time.monotonic():
+        return entry
+    return None
+
+
+def _store(table, rows, generation):
+    entry = _Entry(rows, _key(table), settings.REFERENCE_CACHE_TTL)
+    with _lock:
+        if _generations.get(table, 0) == generation:
+            _entries[table] = entry
+    return entry
+
+
+def _load(table):
+    entry = _cached(table)
+    if entry is None:
+        generation = _generations.get(table, 0)
+        rows = supabase.table(table).select("*").order(_key(table)).execute().data
+        entry = _store(table, rows, generation)
+    return entry
+
+
+async def _afetch(table):
+    generation = _generations.get(table, 0)
+    rows = (await async_supabase.table(table).select("*").order(_key(table)).execute()).data
+    return _store(table, rows, generation)
+
+
+async def _aload(table):
+    entry = _cached(table)
+    if entry is not None:
+        return entry
+    # Coroutines gathered over many rows all miss at once; let them share one fetch.
+    key = (asyncio.get_running_loop(), table)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_afetch(table))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def _find(entry, column, value):
+    wanted = value.casefold() if isinstance(value, str) else value
+    for row in entry.rows:
+        current = row.get(column)
+        if isinstance(current, str) and isinstance(wanted, str):
+            current = current.casefold()
+        if current == wanted:
+            return dict(row)
+    return None
+
+
+def rows(table):
+    """Every row of ``table``, ordered by primary key."""
+    return [dict(row) for row in _load(table).rows]
+
+
+def get(table, pk):
+    """The row of ``table`` whose primary key is ``pk``, or None."""
+    row = _load(table).by_id.get(pk)
+    return dict(row) if row is not None else None
+
+
+def get_many(table, pks):
+    """``{pk: row}`` for the ``pks`` that exist in ``table``."""
+    by_id = _load(table).by_id
+    return {pk: dict(by_id[pk]) for pk in pks if pk in by_id}
+
+
+def find(table, column, value):
+    """First row whose ``column`` equals ``value`` (case-insensitively for text), or None."""
+    return _find(_load(table), column, value)
+
+
+async def arows(table):
+    return [dict(row) for row in (await _aload(table)).rows]
+
+
+async def aget(table, pk):
+    row = (await _aload(table)).by_id.get(pk)
+    return dict(row) if row is not None else None
+
+
+async def aget_many(table, pks):
+    by_id = (await _aload(table)).by_id
+    return {pk: dict(by_id[pk]) for pk in pks if pk in by_id}
+
+
+async def afind(table, column, value):
+    return _find(await _aload(table), column, value)
+
+
+def invalidate(table=None):
+    """Drop the cached copy of ``table`` (or of every table)."""
+    tables = [table] if table is not None else list(REFERENCE_TABLES)
+    with _lock:
+        for name in tables:
+            _key(name)
+            _generations[name] = _generations.get(name, 0) + 1
+            _entries.pop(name, None)
+
+
+def warm(tables=None):
+    """Load ``tables`` (default: all) now; a table that fails to load is retried on first use."""
+    for table in tables or REFERENCE_TABLES:
+        try:
+            _load(table)
+        except Exception as e:
+            print(f"⚠️ Could not preload {table}: {e}")
+
+
+def warm_in_background():
+    """Start ``warm()`` in a daemon thread so server startup does not wait on the network."""
+    if settings.REFERENCE_CACHE_WARMUP:
+        threading.Thread(target=warm, name="reference-data-warmup", daemon=True).start()
@@ -0,0 +1,88 @@
+"""Atomic changes to ``Stock_Item.quantity``.
+
+Every view that moves stock passes signed deltas to ``adjust`` instead of
+reading the quantity and writing back a new one, so two cashiers selling the
+same item cannot overwrite each other's sale::
+
+    quantities = stock.adjust({stock_item_id: -3, other_stock_item_id: +10})
+
+All deltas are applied in one call to the ``adjust_stock`` database function
+(``supabase/migrations/*_adjust_stock.sql``), which refuses the whole batch if
+any item would go below zero.  With ``POS_CHECKOUT_RPC`` off (a database
+without the function) each item is updated on its own, guarded by the
+quantity it was read with, so a concurrent change is retried rather than lost.
+
+A change that goes with a ledger row is made with ``adjusted``, which takes
+it back if writing the row fails, so the counter never moves on its own::
+
+    with stock.adjusted({stock_item_id: -3}):
+        supabase.table("Stock_Transaction").insert(entry).execute()
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from postgrest import APIError
+
+from .supabase_client import get_supabase_client
+
+supabase = get_supabase_client()
+
+# Attempts per item when the guarded update keeps losing to concurrent writers
+MAX_RETRIES = 5
+
+
+class StockError(ValueError):
+    """The change would take a stock item below zero (or it does not exist); views answer it with a 400."""
+
+
+def adjust(changes):
+    """Apply ``{stock_item_id: delta}`` (or ``[(stock_item_id, delta)]``); returns ``{stock_item_id: quantity}``."""
+    deltas = {}
+    for stock_item_id, delta in (changes.items() if isinstance(changes, dict) else changes):
+        deltas[int(stock_item_id)] = deltas.get(int(stock_item_id), 0) + int(delta)
+    if not deltas:
+        return {}
+
+    if not settings.POS_CHECKOUT_RPC:
+        return {stock_item_id: _adjust_one(stock_item_id, deltas[stock_item_id]) for stock_item_id in sorted(deltas)}
+    try:
+        rows = supabase.rpc("adjust_stock", {
+            "adjustments": [{"stock_item_id": stock_item_id, "delta": delta} for stock_item_id, delta in deltas.items()]
+        }).execute().data
+    except APIError as e:
+        # RAISE EXCEPTION in the function (the non-negative guard) arrives as P0001
+        if e.code == "P0001":
+            raise StockError(e.message) from None
+        raise
+    return {row["stock_item_id"]: row["quantity"] for row in rows}
+
+
+@contextmanager
+def adjusted(changes):
+    """``adjust(changes)`` for the block, reversed if the block raises; yields the new quantities."""
+    quantities = adjust(changes)
+    try:
+        yield quantities
+    except BaseException:
+        adjust([(stock_item_id, -delta) for stock_item_id, delta in
+                (changes.items() if isinstance(changes, dict) else changes)])
+        raise
+
+
+# -- without the database function (POS_CHECKOUT_RPC off) -----------------------
+
+def _adjust_one(stock_item_id, delta):
+    for _ in range(MAX_RETRIES):
+        current = supabase.table("Stock_Item").select("quantity").eq("stock_item_id", stock_item_id).execute().data
+        if not current:
+            raise StockError(f"Stock item {stock_item_id} not found.")
+        available = current[0]["quantity"]
+        if available + delta < 0:
+            raise StockError(f"Insufficient stock for stock item {stock_item_id}. Available: {available}, "
+                             f"Requested: {-delta}")
+        updated = supabase.table("Stock_Item").update({"quantity": available + delta}) \
+            .eq("stock_item_id", stock_item_id).eq("quantity", available).execute().data
+        if updated:
+            return updated[0]["quantity"]
+    raise StockError(f"Stock item {stock_item_id} is being changed by another request, try again")
@@ -1,11 +1,285 @@
-import os
+"""Data-access layer for the Supabase/PostgREST backend.
 
+Every view module does ``supabase = get_supabase_client()`` at import time.
+That object is a lightweight proxy: each thread (gunicorn worker thread,
+thread-pool worker, ...) lazily builds its own Supabase client on first use,
+backed by a pooled keep-alive HTTP transport with bounded timeouts.  Clients
+are never created at import time, so forked workers do not share sockets.
+
+All PostgREST round trips go through ``_InstrumentedTransport``; query hooks
+registered with ``register_query_hook`` see every one of them and are the
+single place to attach metrics, caching or batching instrumentation.
+
+Views that fan out independent lookups can use ``get_async_supabase_client()``
+instead: the same pooled, instrumented setup on an ``AsyncPostgrestClient``,
+one per event loop (see ``pharmacy.concurrency.run_async``).
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+
+import httpx
 from django.conf import settings
-from supabase import create_client
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import AsyncClient as AsyncPostgrestSession
+from postgrest.utils import SyncClient as PostgrestSession
+from supabase import Client, ClientOptions
+
+# Reported to query hooks after every round trip.
+QueryEvent = namedtuple("QueryEvent", ["method", "path", "status", "elapsed", "error"])
+
+_query_hooks = []
+_hooks_lock = threading.Lock()
+
+# Per-call timeout override, see ``query_timeout``.
+_timeout_override = contextvars.ContextVar("supabase_timeout_override", default=None)
+
+_local = threading.local()
+
+
+def register_query_hook(hook):
+    """Call ``hook(event)`` with a ``QueryEvent`` after every PostgREST round trip."""
+    with _hooks_lock:
+        if hook not in _query_hooks:
+            _query_hooks.append(hook)
+    return hook
+
+
+def unregister_query_hook(hook):
+    with _hooks_lock:
+        if hook in _query_hooks:
+            _query_hooks.remove(hook)
+
+
+def notify_query_hooks(event):
+    for hook in list(_query_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            # Instrumentation must never break a request.
+            print(f"⚠️ Query hook {hook!r} failed: {e}")
+
+
+@contextmanager
+def query_timeout(seconds):
+    """Override the read/write timeout for every query issued inside the block.
+
+    Example::
+
+        with query_timeout(2):
+            supabase.table("POS").select("*").execute()
+    """
+    token = _timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        _timeout_override.reset(token)
+
+
+def _apply_timeout_override(request):
+    seconds = _timeout_override.get()
+    if seconds is not None:
+        request.extensions["timeout"] = httpx.Timeout(
+            seconds, connect=min(seconds, settings.SUPABASE_CONNECT_TIMEOUT)
+        ).as_dict()
+
+
+class _InstrumentedTransport(httpx.HTTPTransport):
+    """Pooled HTTP transport that times every round trip and reports it to the query hooks."""
+
+    def handle_request(self, request):
+        _apply_timeout_override(request)
+        started = time.perf_counter()
+        status = None
+        error = None
+        try:
+            response = super().handle_request(request)
+            status = response.status_code
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            notify_query_hooks(QueryEvent(
+                request.method, request.url.path, status, time.perf_counter() - started, error
+            ))
+
+
+class _InstrumentedAsyncTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of ``_InstrumentedTransport``."""
+
+    async def handle_async_request(self, request):
+        _apply_timeout_override(request)
+        started = time.perf_counter()
+        status = None
+        error = None
+        try:
+            response = await super().handle_async_request(request)
+            status = response.status_code
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            notify_query_hooks(QueryEvent(
+                request.method, request.url.path, status, time.perf_counter() - started, error
+            ))
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _http_timeout():
+    return httpx.Timeout(settings.SUPABASE_TIMEOUT, connect=settings.SUPABASE_CONNECT_TIMEOUT)
+
+
+class _PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        transport = _InstrumentedTransport(
+            verify=verify,
+            http2=settings.SUPABASE_HTTP2,
+            limits=_http_limits(),
+            proxy=proxy,
+            retries=settings.SUPABASE_CONNECT_RETRIES,
+        )
+        return PostgrestSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=_http_timeout(),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+
+class _PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        transport = _InstrumentedAsyncTransport(
+            verify=verify,
+            http2=settings.SUPABASE_HTTP2,
+            limits=_http_limits(),
+            proxy=proxy,
+            retries=settings.SUPABASE_CONNECT_RETRIES,
+        )
+        return AsyncPostgrestSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=_http_timeout(),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+
+class _PooledClient(Client):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return _PooledPostgrestClient(rest_url, headers=headers, schema=schema, verify=verify, proxy=proxy)
+
+
+def create_supabase_client():
+    """Build a new pooled client.  Prefer ``get_supabase_client()`` in views.
+
+    With ``SUPABASE_BACKEND = "local"`` this returns the shared SQLite-backed
+    stand-in from ``pharmacy.local_supabase`` instead.
+    """
+    if settings.SUPABASE_BACKEND == "local":
+        from .local_supabase import get_local_client
+
+        return get_local_client()
+    options = ClientOptions(postgrest_client_timeout=_http_timeout())
+    return _PooledClient(settings.SUPABASE_URL, settings.SUPABASE_KEY, options)
+
+
+def get_thread_client():
+    """Return the client owned by the calling thread, creating it on first use."""
+    client = getattr(_local, "client", None)
+    if client is None:
+        client = create_supabase_client()
+        _local.client = client
+    return client
+
+
+def close_thread_client():
+    """Close the calling thread's HTTP pool, e.g. when a worker thread exits."""
+    client = getattr(_local, "client", None)
+    if client is not None:
+        if hasattr(client, "postgrest"):  # the local stand-in has no HTTP pool
+            client.postgrest.aclose()
+        _local.client = None
+
+
+class _ThreadLocalSupabase:
+    """Module-level stand-in that forwards every attribute to the calling thread's client."""
+
+    def __getattr__(self, name):
+        return getattr(get_thread_client(), name)
+
+    def __repr__(self):
+        return "<thread-local Supabase client>"
+
+
+supabase = _ThreadLocalSupabase()
 
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 def get_supabase_client():
-    return supabase
\ No newline at end of file
+    return supabase
+
+
+# -- async ---------------------------------------------------------------------
+#
+# httpx async pools belong to the event loop that created them, so async
+# clients are kept per loop.  Views normally reach the loop through
+# ``pharmacy.concurrency.run_async``, which owns one long-lived loop per
+# worker process.
+
+_loop_clients = weakref.WeakKeyDictionary()
+
+
+def create_async_supabase_client():
+    """Build a new pooled async PostgREST client for the running event loop."""
+    if settings.SUPABASE_BACKEND == "local":
+        from .local_supabase import get_async_local_client
+
+        return get_async_local_client()
+    headers = dict(ClientOptions().headers)
+    headers.update({"apiKey": settings.SUPABASE_KEY, "Authorization": f"Bearer {settings.SUPABASE_KEY}"})
+    return _PooledAsyncPostgrestClient(f"{settings.SUPABASE_URL}/rest/v1", headers=headers, schema="public")
+
+
+def get_loop_client():
+    """Return the async client owned by the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+    if client is None:
+        client = create_async_supabase_client()
+        _loop_clients[loop] = client
+    return client
+
+
+class _LoopLocalSupabase:
+    """Like ``_ThreadLocalSupabase`` but forwards to the running event loop's async client.
+
+    Builders come from ``table``/``from_``/``rpc`` as usual; ``execute()`` must be awaited.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_loop_client(), name)
+
+    def __repr__(self):
+        return "<event-loop-local async PostgREST client>"
+
+
+async_supabase = _LoopLocalSupabase()
+
+
+def get_async_supabase_client():
+    return async_supabase
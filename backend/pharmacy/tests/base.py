@@ -0,0 +1,63 @@
+"""Test case base for code that talks to Supabase.
+
+The tests run against the SQLite stand-in (``pharmacy.local_supabase``), so
+they need neither the hosted project nor Postgres::
+
+    python manage.py test pharmacy
+
+Every test gets a fresh in-memory database, seeded with ``seed_database``
+when ``rows`` is set, and empty in-process caches.
+"""
+
+import contextlib
+import io
+import logging
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import identities, idempotency, pricing, reference_data
+from ..benchmark import seed_database
+from ..local_supabase import reset_local_client
+from ..supabase_client import close_thread_client
+
+
+@override_settings(SUPABASE_BACKEND="local", LOCAL_SUPABASE_DB=":memory:", POS_CHECKOUT_RPC=True,
+                   OFFLINE_QUEUE=False)
+class LocalSupabaseTestCase(SimpleTestCase):
+    # seed_database scale; 0 leaves the tables empty
+    rows = 0
+
+    def setUp(self):
+        super().setUp()
+        close_thread_client()
+        self.reset(self.rows)
+
+        # The views print every request body and the middleware logs every request
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def reset(self, rows=0):
+        """Start over on a fresh database, seeded with ``rows`` rows per high-volume table."""
+        self.db = reset_local_client().db
+        if rows:
+            seed_database(self.db, rows)
+        reference_data.invalidate()
+        pricing.invalidate()
+        identities.invalidate()
+        idempotency._results.clear()
+
+    def drop_functions(self):
+        """Forget every database function, for code that must run without them (``POS_CHECKOUT_RPC`` off)."""
+        self.db.rpcs.clear()
+
+    def request(self, method, path, data=None, **headers):
+        """``self.client.<method>(path, data)`` as JSON, with the views' print() and traceback output silenced."""
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return getattr(self.client, method)(path, data, content_type="application/json", headers=headers)
+
+    def sql(self, sql, params=()):
+        """Rows of a raw SQL query against the local database, as tuples."""
+        return self.db.conn.execute(sql, params).fetchall()
+
+    def scalar(self, sql, params=()):
+        return self.sql(sql, params)[0][0]
@@ -0,0 +1,136 @@
+from django.test import override_settings
+
+from ..allocation import Allocator
+from ..stock import StockError
+from ..query_stats import track_queries
+from .base import LocalSupabaseTestCase
+
+
+class AllocatorTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute('delete from "Expiration"')
+        self.db.conn.executemany(
+            'insert into "Expiration" (stock_item_id, expiry_date, quantity) values (?, ?, ?)',
+            [(1, "2026-12-01", 5), (1, "2026-08-01", 3), (1, "2026-10-01", 0), (2, "2026-09-01", 7)],
+        )
+        self.ledger_count = self.scalar('select count(*) from "Stock_Transaction"')
+
+    def batches(self, stock_item_id=1):
+        return self.sql('select expiry_date, quantity from "Expiration" where stock_item_id = ? '
+                        'order by expiry_date', (stock_item_id,))
+
+    def new_ledger(self):
+        return self.sql('select stock_item_id, quantity_change, expiry_date from "Stock_Transaction" '
+                        'order by stock_transaction_id limit -1 offset ?', (self.ledger_count,))
+
+    def test_take_uses_soonest_expiry_first(self):
+        allocator = Allocator.load([1, 2])
+
+        self.assertEqual(allocator.take(1, 2), [("2026-08-01", 2)])
+        self.assertEqual(allocator.take(1, 4), [("2026-08-01", 1), ("2026-12-01", 3)])
+        allocator.save()
+
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-10-01", 0), ("2026-12-01", 2)])
+        self.assertEqual(self.batches(2), [("2026-09-01", 7)])
+
+    def test_take_past_the_batches_reports_the_shortfall(self):
+        allocator = Allocator.load([1])
+        self.assertEqual(allocator.take(1, 10), [("2026-08-01", 3), ("2026-12-01", 5), (None, 2)])
+        self.assertEqual(allocator.take(3, 1), [(None, 1)])
+
+    def test_ledger_rows_per_batch(self):
+        allocator = Allocator.load([1, 2])
+        entry = {"transaction_type": "POS", "transaction_date": "2026-05-02T10:00:00+00:00", "reference_id": 1}
+        allocator.take(1, 4, entry)
+        allocator.take(2, 1, entry)
+        allocator.receive(2, "2027-01-01", 10, {**entry, "transaction_type": "Transfer"})
+        allocator.save()
+
+        self.assertEqual(self.new_ledger(), [
+            (1, -3, "2026-08-01"), (1, -1, "2026-12-01"), (2, -1, "2026-09-01"), (2, 10, "2027-01-01"),
+        ])
+        self.assertEqual(self.batches(2), [("2026-09-01", 6), ("2027-01-01", 10)])
+
+    def test_received_batch_expiring_first_is_taken_next(self):
+        allocator = Allocator.load([1])
+        allocator.take(1, 3)
+        allocator.receive(1, "2026-06-01", 2)
+        self.assertEqual(allocator.take(1, 3), [("2026-06-01", 2), ("2026-12-01", 1)])
+
+    @override_settings(BULK_WRITE_CHUNK=2)
+    def test_save_is_a_fixed_number_of_requests(self):
+        allocator = Allocator.load([1, 2])
+        for _ in range(5):
+            allocator.take(1, 1, {"transaction_type": "POS"})
+        allocator.take(2, 1, {"transaction_type": "POS"})
+        with track_queries() as stats:
+            allocator.save()
+
+        # 3 changed batches in one adjust_batches call, and 6 ledger rows, 2 rows per request
+        self.assertEqual(stats.count, 1 + 3)
+
+    def test_restore_puts_back_saved_batches(self):
+        allocator = Allocator.load([1, 2])
+        allocator.take(1, 6, {"transaction_type": "POS"})
+        allocator.save()
+        allocator.take(2, 2)
+        allocator.restore()
+
+        self.assertEqual(self.batches(), [("2026-08-01", 3), ("2026-10-01", 0), ("2026-12-01", 5)])
+        self.assertEqual(self.batches(2), [("2026-09-01", 7)])
+
+    def test_save_keeps_a_change_made_since_the_load(self):
+        allocator = Allocator.load([1])
+        allocator.take(1, 4)
+        # Another sale takes 2 from the batch expiring last meanwhile
+        self.db.conn.execute('update "Expiration" set quantity = quantity - 2 where stock_item_id = 1 '
+                             "and expiry_date = '2026-12-01'")
+        allocator.save()
+
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-10-01", 0), ("2026-12-01", 2)])
+
+    def test_save_refuses_to_take_more_than_a_batch_holds_now(self):
+        allocator = Allocator.load([1, 2])
+        allocator.take(1, 4, {"transaction_type": "POS"})
+        allocator.take(2, 1, {"transaction_type": "POS"})
+        self.db.conn.execute('update "Expiration" set quantity = 0 where stock_item_id = 1 and expiry_date = \'2026-08-01\'')
+
+        with self.assertRaises(StockError):
+            allocator.save()
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-10-01", 0), ("2026-12-01", 5)])
+        self.assertEqual(self.batches(2), [("2026-09-01", 7)])
+        self.assertEqual(self.new_ledger(), [])
+
+    def test_restore_keeps_changes_made_since_the_save(self):
+        allocator = Allocator.load([1, 2])
+        allocator.take(1, 6)
+        allocator.receive(2, "2027-01-01", 4)
+        allocator.save()
+        self.db.conn.execute('update "Expiration" set quantity = quantity + 10 where stock_item_id = 1 '
+                             "and expiry_date = '2026-12-01'")
+        allocator.restore()
+
+        self.assertEqual(self.batches(), [("2026-08-01", 3), ("2026-10-01", 0), ("2026-12-01", 15)])
+        self.assertEqual(self.batches(2), [("2026-09-01", 7), ("2027-01-01", 0)])
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideAllocatorTests(AllocatorTests):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+    @override_settings(BULK_WRITE_CHUNK=2)
+    def test_save_is_a_fixed_number_of_requests(self):
+        allocator = Allocator.load([1, 2])
+        for _ in range(5):
+            allocator.take(1, 1, {"transaction_type": "POS"})
+        allocator.take(2, 1, {"transaction_type": "POS"})
+        with track_queries() as stats:
+            allocator.save()
+
+        # Without adjust_batches each of the 3 changed batches is read and updated on its own
+        self.assertEqual(stats.count, 3 * 2 + 3)
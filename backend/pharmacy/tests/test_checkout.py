@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from .. import allocation, checkout, stock
+from ..query_stats import track_queries
+from .base import LocalSupabaseTestCase
+
+# seed_database numbers stock items (product_id - 1) * 3 + location_id
+STOCK_ITEM = 1
+OTHER_STOCK_ITEM = 4
+
+
+def sale(*lines, user_id=2, branch=1, customer_type="regular"):
+    return {
+        "timestamp": "2026-05-02T10:00:00",
+        "user_id": user_id,
+        "branch": str(branch),
+        "customerType": customer_type,
+        "items": [{"product_id": product_id, "price": 10, "quantity": quantity} for product_id, quantity in lines],
+    }
+
+
+class CheckoutTestCase(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        # Product 1 at location 1: 10 in stock, in a batch of 6 expiring first and one of 4
+        for stock_item_id, quantity, batches in ((STOCK_ITEM, 10, [("2026-12-01", 4), ("2026-08-01", 6)]),
+                                                 (OTHER_STOCK_ITEM, 5, [("2026-09-01", 5)])):
+            self.db.conn.execute('update "Stock_Item" set quantity = ? where stock_item_id = ?', (quantity, stock_item_id))
+            self.db.conn.execute('delete from "Expiration" where stock_item_id = ?', (stock_item_id,))
+            self.db.conn.executemany('insert into "Expiration" (stock_item_id, expiry_date, quantity) values (?, ?, ?)',
+                                     [(stock_item_id, expiry_date, quantity) for expiry_date, quantity in batches])
+        self.pos_count = self.scalar('select count(*) from "POS"')
+
+    def quantity(self, stock_item_id=STOCK_ITEM):
+        return self.scalar('select quantity from "Stock_Item" where stock_item_id = ?', (stock_item_id,))
+
+    def batches(self, stock_item_id=STOCK_ITEM):
+        return self.sql('select expiry_date, quantity from "Expiration" where stock_item_id = ? order by expiry_date',
+                        (stock_item_id,))
+
+    def new_sales(self):
+        return self.scalar('select count(*) from "POS"') - self.pos_count
+
+    def assert_untouched(self):
+        self.assertEqual(self.quantity(), 10)
+        self.assertEqual(self.batches(), [("2026-08-01", 6), ("2026-12-01", 4)])
+        self.assertEqual(self.new_sales(), 0)
+
+
+class CheckoutTests(CheckoutTestCase):
+    def test_sale_takes_stock_fifo_and_writes_the_ledger(self):
+        response = self.request("post", "/pharmacy/pos/", sale((1, 8), (2, 1)))
+
+        self.assertEqual(response.status_code, 201, response.content)
+        pos_id = response.json()["pos_id"]
+        self.assertEqual(self.quantity(), 2)
+        self.assertEqual(self.quantity(OTHER_STOCK_ITEM), 4)
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-12-01", 2)])
+        self.assertEqual(
+            self.sql('select stock_item_id, quantity_change, expiry_date from "Stock_Transaction" '
+                     'where transaction_type = \'POS\' and reference_id = ? order by stock_item_id, expiry_date', (pos_id,)),
+            [(STOCK_ITEM, -6, "2026-08-01"), (STOCK_ITEM, -2, "2026-12-01"), (OTHER_STOCK_ITEM, -1, "2026-09-01")],
+        )
+        self.assertEqual(self.scalar('select sum(quantity_sold) from "POS_Item" where pos_id = ?', (pos_id,)), 9)
+
+    def test_insufficient_stock_is_refused_without_writing(self):
+        response = self.request("post", "/pharmacy/pos/", sale((1, 11)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Insufficient stock for product 1", response.json()["error"])
+        self.assert_untouched()
+
+    def test_failed_sale_is_rolled_back(self):
+        response = self.request("post", "/pharmacy/pos/", sale((1, 3), user_id=999))
+
+        self.assertEqual(response.status_code, 500)
+        self.assert_untouched()
+
+
+class CartStockRequestTests(CheckoutTestCase):
+    def test_cart_stock_is_read_in_one_request(self):
+        with track_queries() as stats:
+            stock_items = checkout._load_stock(1, {1: 2, 2: 1})
+
+        self.assertEqual(stats.count, 1)
+        self.assertEqual({product_id: row["stock_item_id"] for product_id, row in stock_items.items()},
+                         {1: STOCK_ITEM, 2: OTHER_STOCK_ITEM})
+
+    def test_short_cart_is_refused_from_the_same_read(self):
+        with track_queries() as stats, self.assertRaisesMessage(checkout.CheckoutError, "Insufficient stock for product 2"):
+            checkout._load_stock(1, {1: 2, 2: 6})
+
+        self.assertEqual(stats.count, 1)
+
+    def test_cart_stock_is_adjusted_in_one_request(self):
+        with track_queries() as stats:
+            stock.adjust([(STOCK_ITEM, -2), (OTHER_STOCK_ITEM, -1), (STOCK_ITEM, -1)])
+
+        self.assertEqual(stats.count, 1)
+        self.assertEqual((self.quantity(), self.quantity(OTHER_STOCK_ITEM)), (7, 4))
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideCheckoutTests(CheckoutTests):
+    """The same sales without the database functions, plus the undo of a half-written sale."""
+
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+    def test_stock_is_put_back_when_a_write_fails(self):
+        response = self.request("post", "/pharmacy/pos/", sale((1, 3), user_id=999), **{"Idempotency-Key": "k1"})
+        self.assertEqual(response.status_code, 500)
+        self.assert_untouched()
+
+        # The key was released, so the retry sells once, from the full stock
+        response = self.request("post", "/pharmacy/pos/", sale((1, 3)), **{"Idempotency-Key": "k1"})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.new_sales(), 1)
+
+    def test_batches_and_rows_are_put_back_when_a_late_write_fails(self):
+        bulk_write = allocation.bulk_write
+
+        def failing_bulk_write(table, rows, **options):
+            if table == "POS_Item":
+                raise RuntimeError("connection lost")
+            return bulk_write(table, rows, **options)
+
+        with mock.patch.object(checkout.allocation, "bulk_write", failing_bulk_write):
+            response = self.request("post", "/pharmacy/pos/", sale((1, 8)))
+
+        self.assertEqual(response.status_code, 500)
+        self.assert_untouched()
+        self.assertEqual(self.scalar('select count(*) from "Stock_Transaction" where transaction_type = \'POS\' '
+                                     'and reference_id not in (select pos_id from "POS")'), 0)
+
+    def test_sale_is_refused_when_its_batch_was_sold_from_meanwhile(self):
+        load = allocation.Allocator.load
+
+        def load_then_sell_elsewhere(stock_item_ids):
+            allocator = load(stock_item_ids)
+            self.db.conn.execute('update "Expiration" set quantity = 0 where stock_item_id = ? and expiry_date = ?',
+                                 (STOCK_ITEM, "2026-08-01"))
+            return allocator
+
+        with mock.patch.object(allocation.Allocator, "load", side_effect=load_then_sell_elsewhere):
+            response = self.request("post", "/pharmacy/pos/", sale((1, 8)))
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(self.quantity(), 10)
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-12-01", 4)])
+        self.assertEqual(self.new_sales(), 0)
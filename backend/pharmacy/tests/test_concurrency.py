@@ -0,0 +1,68 @@
+import asyncio
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from ..concurrency import gather_bounded, run_async
+from ..query_stats import track_queries
+from ..supabase_client import get_async_supabase_client
+from .base import LocalSupabaseTestCase
+
+
+class RunAsyncTests(SimpleTestCase):
+    def test_result_and_errors_reach_the_caller(self):
+        async def answer():
+            return 42
+
+        async def fail():
+            raise LookupError("missing")
+
+        self.assertEqual(run_async(answer()), 42)
+        with self.assertRaisesMessage(LookupError, "missing"):
+            run_async(fail())
+
+    def test_gather_bounded_keeps_order_and_limit(self):
+        running = []
+        peak = []
+
+        async def work(value):
+            running.append(value)
+            peak.append(len(running))
+            await asyncio.sleep(0.01 * (5 - value))
+            running.remove(value)
+            return value * 10
+
+        self.assertEqual(run_async(gather_bounded([work(value) for value in range(5)], 2)), [0, 10, 20, 30, 40])
+        self.assertEqual(max(peak), 2)
+
+
+class ConcurrentViewTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def test_queries_on_the_worker_loop_are_counted_for_the_caller(self):
+        async def two_reads():
+            client = get_async_supabase_client()
+            await asyncio.gather(client.table("Location").select("*").execute(),
+                                 client.table("Unit").select("*").execute())
+
+        with track_queries() as stats:
+            run_async(two_reads())
+
+        self.assertEqual(stats.count, 2)
+
+    def test_expirations_are_enriched_and_filtered(self):
+        this_month = date.today().replace(day=28).isoformat()
+        self.db.conn.execute('delete from "Expiration"')
+        # Stock items 1 and 4: products 1 and 2 at location 1
+        self.db.conn.executemany('insert into "Expiration" (stock_item_id, expiry_date, quantity) values (?, ?, ?)',
+                                 [(1, this_month, 5), (4, this_month, 3), (1, this_month, 0)])
+
+        response = self.request("get", "/pharmacy/expirations/?product_id=1")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        entry, = response.json()
+        self.assertEqual((entry["quantity"], entry["location_id"]), (5, 1))
+        self.assertEqual(entry["location"], self.scalar('select location from "Location" where location_id = 1'))
+        self.assertEqual(entry["Stock_Item"]["Product"]["product_id"], 1)
+        self.assertTrue(entry["Stock_Item"]["Product"]["full_product_name"].startswith(
+            self.scalar('select product_name from "Products" where product_id = 1')))
@@ -0,0 +1,27 @@
+from django.test import override_settings
+
+from .. import document_numbers
+from .base import LocalSupabaseTestCase
+
+
+class DocumentNumberTests(LocalSupabaseTestCase):
+    def test_numbers_are_reserved_in_blocks(self):
+        self.assertEqual(document_numbers.next_number("ST", 2026), "ST-2026-001")
+        self.assertEqual(list(document_numbers.reserve("POI-001", 3)), [1, 2, 3])
+        self.assertEqual(list(document_numbers.reserve("POI-001", 2)), [4, 5])
+        self.assertEqual(document_numbers.next_number("ST", 2026), "ST-2026-002")
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideDocumentNumberTests(LocalSupabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+    def test_numbers_follow_the_newest_document(self):
+        self.db.conn.executemany('insert into "Purchase_Order" (po_id) values (?)',
+                                 [("PO-2026-999",), ("PO-2026-1000",), ("PO-2025-1500",)])
+
+        self.assertEqual(document_numbers.next_number("PO", 2026), "PO-2026-1001")
+        self.assertEqual(document_numbers.next_number("PO", 2027), "PO-2027-001")
+        self.assertEqual(list(document_numbers.reserve("POI-1000", 2)), [1, 2])
@@ -0,0 +1,96 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..concurrency import run_async
+from ..fetch import afetch_in, fetch_in, in_chunks
+from ..loaders import Loaders, TableLoader
+from ..query_stats import track_queries
+from ..supabase_client import get_async_supabase_client, get_supabase_client
+from .base import LocalSupabaseTestCase
+
+POS_ID = 1
+
+
+class InChunksTests(SimpleTestCase):
+    def test_chunks_stay_under_the_limit(self):
+        # Each value costs its length plus 3
+        self.assertEqual(list(in_chunks([100, 200, 300, 4000], max_chars=12)), [[100, 200], [300], [4000]])
+
+    def test_duplicates_and_nulls_are_dropped(self):
+        self.assertEqual(list(in_chunks([1, None, 2, 1, 3, 2], max_chars=100)), [[1, 2, 3]])
+
+    def test_a_value_longer_than_the_limit_goes_alone(self):
+        self.assertEqual(list(in_chunks(["a", "b" * 20, "c"], max_chars=10)), [["a"], ["b" * 20], ["c"]])
+
+    def test_nothing_to_filter_gives_no_chunks(self):
+        self.assertEqual(list(in_chunks([None])), [])
+
+
+@override_settings(SUPABASE_MAX_ROWS=5, SUPABASE_IN_FILTER_MAX_CHARS=8)
+class FetchInTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute('delete from "POS_Item" where pos_id = ?', (POS_ID,))
+        self.db.conn.executemany('insert into "POS_Item" (pos_id, product_id, price, quantity_sold) values (?, 1, 10, ?)',
+                                 [(POS_ID, quantity) for quantity in range(1, 13)])
+        self.expected = self.sql('select stock_item_id from "Stock_Item" where location_id in (1, 3) '
+                                 'order by stock_item_id')
+
+    def ids(self, rows):
+        return sorted((row["stock_item_id"],) for row in rows)
+
+    def test_every_row_of_every_chunk_is_read_past_the_row_cap(self):
+        rows = fetch_in(lambda: get_supabase_client().table("Stock_Item").select("stock_item_id"),
+                        "location_id", [1, 3, 1], key="stock_item_id")
+
+        self.assertGreater(len(self.expected), 5)
+        self.assertEqual(self.ids(rows), self.expected)
+
+    def test_async_reads_every_row_too(self):
+        rows = run_async(afetch_in(lambda: get_async_supabase_client().table("Stock_Item").select("stock_item_id"),
+                                   "location_id", [1, 3], key="stock_item_id"))
+
+        self.assertEqual(self.ids(rows), self.expected)
+
+    def test_many_loader_returns_every_matching_row(self):
+        async def load():
+            return await Loaders().get("POS_Item", "pos_id", "quantity_sold", many=True, order="pos_item_id").load(POS_ID)
+
+        self.assertEqual(sorted(row["quantity_sold"] for row in run_async(load())), list(range(1, 13)))
+
+    def test_many_loader_needs_an_order_column(self):
+        with self.assertRaises(ValueError):
+            TableLoader("POS_Item", "pos_id", many=True)
+
+
+@override_settings(SUPABASE_IN_FILTER_MAX_CHARS=8)
+class ChunkRequestTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def products(self):
+        return lambda: get_supabase_client().table("Products").select("product_id")
+
+    def test_one_request_per_chunk(self):
+        with track_queries() as stats:
+            rows = fetch_in(self.products(), "product_id", [1, 2, 3, 4, 5, 6], key="product_id")
+
+        # Two one-digit ids per 8 characters
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(sorted(row["product_id"] for row in rows), [1, 2, 3, 4, 5, 6])
+
+    def test_async_chunks_make_the_same_requests(self):
+        with track_queries() as stats:
+            rows = run_async(afetch_in(
+                lambda: get_async_supabase_client().table("Products").select("product_id"),
+                "product_id", [6, 5, 4, 3, 2, 1, 6], key="product_id", parallel=2,
+            ))
+
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(sorted(row["product_id"] for row in rows), [1, 2, 3, 4, 5, 6])
+
+    def test_no_values_make_no_request(self):
+        with track_queries() as stats:
+            self.assertEqual(fetch_in(self.products(), "product_id", [], key="product_id"), [])
+
+        self.assertEqual(stats.count, 0)
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import override_settings
+
+from .. import checkout, idempotency
+from .test_checkout import CheckoutTestCase, sale
+
+
+class IdempotencyTests(CheckoutTestCase):
+    def post(self, body, key):
+        return self.request("post", "/pharmacy/pos/", body, **{"Idempotency-Key": key})
+
+    def forget_in_process(self):
+        # Make the next request look the key up in the database, as another worker would
+        idempotency._results.clear()
+
+    def test_retry_replays_the_first_sale(self):
+        first = self.post(sale((1, 3)), "k1")
+        self.forget_in_process()
+        second = self.post(sale((1, 3)), "k1")
+
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(second.status_code, 201, second.content)
+        self.assertEqual(second.json()["pos_id"], first.json()["pos_id"])
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.new_sales(), 1)
+
+    def test_retry_answered_from_this_process(self):
+        first = self.post(sale((1, 3)), "k1")
+        second = self.post(sale((1, 3)), "k1")
+
+        self.assertEqual(second.json()["pos_id"], first.json()["pos_id"])
+        self.assertEqual(self.new_sales(), 1)
+
+    def test_key_reused_for_another_cart_is_a_conflict(self):
+        self.post(sale((1, 3)), "k1")
+        for forget in (False, True):
+            if forget:
+                self.forget_in_process()
+            response = self.post(sale((1, 4)), "k1")
+            self.assertEqual(response.status_code, 409)
+            self.assertIn("different sale", response.json()["error"])
+        self.assertEqual(self.quantity(), 7)
+
+    def test_unfinished_key_is_a_conflict(self):
+        # Claimed by another path (a bulk upload, idempotency.claim) that has not stored its result yet
+        body = sale((1, 3))
+        self.db.conn.execute(
+            'insert into "Idempotency_Key" (key, request_hash, expires_at) values (?, ?, ?)',
+            ("k1", idempotency.request_hash(checkout.build_payload(body)),
+             (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()),
+        )
+        response = self.post(body, "k1")
+
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(response.json()["error"], "A sale with this idempotency key is still being processed")
+        self.assert_untouched()
+
+    def test_expired_key_sells_again(self):
+        self.post(sale((1, 3)), "k1")
+        self.db.conn.execute('update "Idempotency_Key" set expires_at = ?',
+                             ((datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat(),))
+        self.forget_in_process()
+        response = self.post(sale((1, 3)), "k1")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(self.quantity(), 4)
+
+    def test_malformed_key_is_refused(self):
+        response = self.post(sale((1, 3)), " ")
+        self.assertEqual(response.status_code, 400)
+        self.assert_untouched()
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideIdempotencyTests(IdempotencyTests):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
@@ -0,0 +1,63 @@
+from django.test import override_settings
+
+from .. import identities
+from .test_checkout import CheckoutTestCase, sale
+
+PATIENT = {"first_name": "Maria", "last_name": "Santos", "customer_type_id": 4, "id_card_number": None}
+DOCTOR = {"first_name": "Jose", "last_name": "Rizal", "prc_num": "PRC-77", "ptr_num": "PTR-77"}
+
+
+def dswd_sale(*lines):
+    return {**sale(*lines, customer_type="dswd"),
+            "customerInfo": {"patient_name": "Maria Santos", "guaranteeLetterNo": "GL-1"}}
+
+
+def prescribed_sale(*lines):
+    return {**sale(*lines), "prescriptionInfo": {"doctorName": "Jose Rizal", "PRCNumber": "PRC-77",
+                                                  "PTRNumber": "PTR-77", "notes": "", "prescriptionDate": None}}
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class StaleIdentityTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+    def delete_through_another_worker(self, table, column, row_id):
+        # Another worker's invalidate() does not reach this one's cache
+        self.db.conn.execute(f'delete from "{table}" where {column} = ?', (row_id,))
+
+    def test_sale_naming_a_deleted_customer_resolves_it_again(self):
+        stale_id, = identities.resolve_customers([PATIENT])
+        self.delete_through_another_worker("Customers", "customer_id", stale_id)
+
+        response = self.request("post", "/pharmacy/pos/", dswd_sale((1, 2)))
+
+        self.assertEqual(response.status_code, 201, response.content)
+        customer_id = self.scalar('select customer_id from "Dswd_Order" where pos_id = ?', (response.json()["pos_id"],))
+        self.assertNotEqual(customer_id, stale_id)
+        self.assertEqual(self.scalar('select count(*) from "Customers" where customer_id = ?', (customer_id,)), 1)
+        self.assertEqual(self.quantity(), 8)
+
+    def test_sale_naming_a_deleted_physician_resolves_it_again(self):
+        stale_id, = identities.resolve_physicians([DOCTOR])
+        self.delete_through_another_worker("Physician", "physician_id", stale_id)
+
+        response = self.request("post", "/pharmacy/pos/", prescribed_sale((1, 2)))
+
+        self.assertEqual(response.status_code, 201, response.content)
+        physician_id = self.scalar('select physician_id from "Prescription" p join "POS" s using (prescription_id) '
+                                   'where s.pos_id = ?', (response.json()["pos_id"],))
+        self.assertNotEqual(physician_id, stale_id)
+        self.assertEqual(self.quantity(), 8)
+
+    def test_bulk_upload_naming_a_deleted_customer_resolves_it_again(self):
+        stale_id, = identities.resolve_customers([PATIENT])
+        self.delete_through_another_worker("Customers", "customer_id", stale_id)
+
+        response = self.request("post", "/pharmacy/pos/bulk/", {"sales": [dswd_sale((1, 2)), sale((1, 1))]})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([result["status"] for result in response.json()["results"]], ["created", "created"])
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.new_sales(), 2)
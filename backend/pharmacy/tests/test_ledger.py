@@ -0,0 +1,156 @@
+from datetime import date, datetime, timezone
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.test import override_settings
+
+from .. import ledger
+from .base import LocalSupabaseTestCase
+
+STOCK_ITEM = 1
+OTHER_STOCK_ITEM = 4
+
+
+@override_settings(LEDGER_SETTLE_SECONDS=0)
+class LedgerTestCase(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute('delete from "Stock_Transaction"')
+        self.entry("2026-10-15T09:00:00+00:00", 10)
+        self.entry("2026-10-16T09:00:00+00:00", -3)
+        self.entry("2026-10-16T12:00:00+00:00", 5, stock_item_id=OTHER_STOCK_ITEM)
+        self.entry("2026-10-17T09:00:00+00:00", -2)
+
+    def entry(self, transaction_date, quantity_change, stock_item_id=STOCK_ITEM, stock_transaction_id=None):
+        """Insert a ledger entry; returns it as the API reads it."""
+        row_id = self.db.conn.execute(
+            'insert into "Stock_Transaction" (stock_transaction_id, stock_item_id, transaction_type, quantity_change, '
+            "transaction_date) values (?, ?, 'Adjustment', ?, ?)",
+            (stock_transaction_id, stock_item_id, quantity_change, transaction_date)).lastrowid
+        return {"stock_transaction_id": row_id, "stock_item_id": stock_item_id, "quantity_change": quantity_change,
+                "transaction_date": transaction_date}
+
+    def snapshots(self):
+        return self.sql('select stock_item_id, day, quantity from "Stock_Snapshot" '
+                        "where stock_item_id in (?, ?) order by day, stock_item_id", (STOCK_ITEM, OTHER_STOCK_ITEM))
+
+
+class LedgerTests(LedgerTestCase):
+    def test_fold_sums_every_entry(self):
+        self.assertEqual(ledger.quantities([STOCK_ITEM, OTHER_STOCK_ITEM]), {STOCK_ITEM: 5, OTHER_STOCK_ITEM: 5})
+
+    def test_as_of_a_date_means_the_end_of_that_day(self):
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=date(2026, 10, 16)), {STOCK_ITEM: 7})
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=date(2026, 10, 14)), {})
+
+    def test_as_of_a_datetime_includes_that_moment(self):
+        as_of = datetime(2026, 10, 16, 9, tzinfo=timezone.utc)
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=as_of), {STOCK_ITEM: 7})
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=as_of.replace(hour=8)), {STOCK_ITEM: 10})
+
+    def test_snapshot_writes_the_end_of_day_totals(self):
+        count = ledger.snapshot(date(2026, 10, 16))
+
+        self.assertEqual(count, self.scalar('select count(*) from "Stock_Item"'))
+        self.assertEqual(self.snapshots(), [(STOCK_ITEM, "2026-10-16", 7), (OTHER_STOCK_ITEM, "2026-10-16", 5)])
+
+    def test_fold_from_a_snapshot_matches_a_full_fold(self):
+        expected = {day: ledger.quantities([STOCK_ITEM, OTHER_STOCK_ITEM], as_of=day)
+                    for day in (date(2026, 10, 16), date(2026, 10, 17))}
+        ledger.snapshot(date(2026, 10, 15))
+        ledger.snapshot(date(2026, 10, 16))
+
+        for day, quantities in expected.items():
+            with self.subTest(day=day):
+                self.assertEqual(ledger.quantities([STOCK_ITEM, OTHER_STOCK_ITEM], as_of=day), quantities)
+
+    def test_entries_written_after_a_snapshot_are_counted(self):
+        ledger.snapshot(date(2026, 10, 16))
+        # A backdated offline sale inside the snapshot's day, and one after it
+        self.entry("2026-10-16T15:00:00+00:00", -1)
+        self.entry("2026-10-18T09:00:00+00:00", -1)
+
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=date(2026, 10, 16)), {STOCK_ITEM: 6})
+        self.assertEqual(ledger.quantities([STOCK_ITEM]), {STOCK_ITEM: 3})
+
+    def test_snapshot_counts_a_lower_id_committed_while_it_settles(self):
+        self.entry("2026-10-16T10:00:00+00:00", 1, stock_transaction_id=100)
+        self.entry("2026-10-16T11:00:00+00:00", 1, stock_transaction_id=102)
+
+        # Id 101 was handed out before the watermark was read but commits during the wait
+        def commit_late(seconds):
+            self.entry("2026-10-16T10:30:00+00:00", 1, stock_transaction_id=101)
+
+        with mock.patch.object(ledger, "sleep", side_effect=commit_late):
+            ledger.snapshot(date(2026, 10, 16))
+
+        self.assertEqual(self.scalar('select distinct last_transaction_id from "Stock_Snapshot"'), 102)
+        self.assertEqual(self.snapshots(), [(STOCK_ITEM, "2026-10-16", 10), (OTHER_STOCK_ITEM, "2026-10-16", 5)])
+        self.assertEqual(ledger.quantities([STOCK_ITEM]), {STOCK_ITEM: 8})
+
+    def test_snapshot_leaves_out_ids_after_the_watermark(self):
+        watermark = ledger.watermark()
+        self.entry("2026-10-16T15:00:00+00:00", -1)
+        ledger.snapshot(date(2026, 10, 16), watermark)
+
+        self.assertEqual(self.snapshots(), [(STOCK_ITEM, "2026-10-16", 7), (OTHER_STOCK_ITEM, "2026-10-16", 5)])
+        self.assertEqual(ledger.quantities([STOCK_ITEM], as_of=date(2026, 10, 16)), {STOCK_ITEM: 6})
+
+    def test_amend_carries_an_edit_into_snapshots(self):
+        old = self.entry("2026-10-16T15:00:00+00:00", -1)
+        ledger.snapshot(date(2026, 10, 16))
+        ledger.snapshot(date(2026, 10, 17))
+
+        self.db.conn.execute('update "Stock_Transaction" set quantity_change = -4 where stock_transaction_id = ?',
+                             (old["stock_transaction_id"],))
+        ledger.amend(old, {**old, "quantity_change": -4})
+
+        self.assertEqual(self.snapshots(), [(STOCK_ITEM, "2026-10-16", 3), (OTHER_STOCK_ITEM, "2026-10-16", 5),
+                                            (STOCK_ITEM, "2026-10-17", 1), (OTHER_STOCK_ITEM, "2026-10-17", 5)])
+        self.assertEqual(ledger.quantities([STOCK_ITEM]), {STOCK_ITEM: 1})
+
+    def test_amend_takes_a_deleted_entry_out_of_snapshots(self):
+        ledger.snapshot(date(2026, 10, 16))
+        old = self.entry("2026-10-17T09:30:00+00:00", -1)
+        ledger.snapshot(date(2026, 10, 17))
+
+        self.db.conn.execute('delete from "Stock_Transaction" where stock_transaction_id = ?', (old["stock_transaction_id"],))
+        ledger.amend(old)
+
+        # The day before never counted it
+        self.assertEqual(self.snapshots(), [(STOCK_ITEM, "2026-10-16", 7), (OTHER_STOCK_ITEM, "2026-10-16", 5),
+                                            (STOCK_ITEM, "2026-10-17", 5), (OTHER_STOCK_ITEM, "2026-10-17", 5)])
+        self.assertEqual(ledger.quantities([STOCK_ITEM]), {STOCK_ITEM: 5})
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideLedgerTests(LedgerTests):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+
+class StockAsOfTests(LedgerTestCase):
+    def as_of(self, as_of, **params):
+        response = self.request("get", "/pharmacy/stock-items/as-of/?" + urlencode({"as_of": as_of, **params}))
+        self.assertEqual(response.status_code, 200, response.content)
+        return {(row["product_id"], row["location_id"]): row["quantity"] for row in response.json()["results"]}
+
+    def test_fold_from_a_snapshot_counts_backdated_entries(self):
+        ledger.snapshot(date(2026, 10, 16))
+        # Offline sales synced after the snapshot was written, one inside its day
+        self.entry("2026-10-16T15:00:00+00:00", -1)
+        self.entry("2026-10-17T10:00:00+00:00", -1)
+
+        self.assertEqual(self.as_of("2026-10-16", branch=1), {(1, 1): 6, (2, 1): 5})
+        self.assertEqual(self.as_of("2026-10-17T09:30:00", branch=1), {(1, 1): 4, (2, 1): 5})
+        self.assertEqual(self.as_of("2026-10-17", branch=1, product_id=1), {(1, 1): 3})
+
+    def test_stock_items_with_nothing_in_hand_are_left_out(self):
+        self.assertEqual(self.as_of("2026-10-15", branch=1), {(1, 1): 10})
+
+    def test_as_of_is_required(self):
+        self.assertEqual(self.request("get", "/pharmacy/stock-items/as-of/").status_code, 400)
+        self.assertEqual(self.request("get", "/pharmacy/stock-items/as-of/?as_of=yesterday").status_code, 400)
@@ -0,0 +1,18 @@
+from .base import LocalSupabaseTestCase
+
+
+class InsertManyTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def test_rows_with_different_keys_keep_their_columns(self):
+        self.db.conn.execute('delete from "Stock_Transaction"')
+        self.db.insert_many("Stock_Transaction", [
+            {"stock_item_id": 1, "transaction_type": "POS", "quantity_change": -1},
+            {"stock_item_id": 1, "transaction_type": "Transfer", "quantity_change": 2, "des_location": 1,
+             "expiry_date": "2026-12-01"},
+            {"stock_item_id": 1, "transaction_type": "POS", "quantity_change": -1},
+        ])
+
+        self.assertEqual(self.sql('select transaction_type, quantity_change, des_location, expiry_date, '
+                                  'transaction_date is not null from "Stock_Transaction" order by stock_transaction_id'),
+                         [("POS", -1, None, None, 1), ("Transfer", 2, 1, "2026-12-01", 1), ("POS", -1, None, None, 1)])
@@ -0,0 +1,85 @@
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from .. import checkout, offline_queue
+from .test_checkout import CheckoutTestCase, sale
+
+
+@override_settings(OFFLINE_QUEUE=True)
+class OfflineQueueTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.queue = offline_queue.OfflineQueue(":memory:")
+        patcher = mock.patch.object(offline_queue, "_queue", self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sell_offline(self, body):
+        with mock.patch.object(checkout, "checkout", side_effect=httpx.ConnectError("unreachable")):
+            return self.request("post", "/pharmacy/pos/", body)
+
+    def test_sale_queued_while_offline_is_recorded_by_sync(self):
+        response = self.sell_offline(sale((1, 3)))
+
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assert_untouched()
+        self.assertEqual(self.queue.count(offline_queue.PENDING), 1)
+
+        self.assertEqual(offline_queue.sync(self.queue), {"synced": 1, "conflicts": 0, "pending": 0})
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.new_sales(), 1)
+        self.assertEqual(self.queue.report()["counts"][offline_queue.SYNCED], 1)
+
+    def test_sale_that_got_through_before_the_link_dropped_is_replayed_not_sold_twice(self):
+        first = checkout.checkout(checkout.build_payload(sale((1, 3))), idempotency_key="lost-response")
+        self.queue.enqueue(sale((1, 3)), "lost-response")
+
+        self.assertEqual(offline_queue.sync(self.queue)["synced"], 1)
+        self.assertEqual(self.queue.conn.execute("select pos_id from queued_sale").fetchone()[0], first["pos_id"])
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.new_sales(), 1)
+
+    def test_refused_sale_is_kept_as_a_conflict(self):
+        self.queue.enqueue(sale((1, 11)), "too-many")
+        self.queue.enqueue(sale((1, 2)), "fine")
+
+        self.assertEqual(offline_queue.sync(self.queue), {"synced": 1, "conflicts": 1, "pending": 0})
+        conflicts = self.queue.report()["conflicts"]
+        self.assertEqual([conflict["idempotency_key"] for conflict in conflicts], ["too-many"])
+        self.assertIn("Insufficient stock", conflicts[0]["error"])
+        self.assertEqual(self.quantity(), 8)
+
+    def test_failed_sync_puts_the_batch_back(self):
+        self.queue.enqueue(sale((1, 2)), "a")
+        with mock.patch.object(checkout, "checkout_many", side_effect=httpx.ConnectError("unreachable")):
+            self.assertEqual(offline_queue.sync(self.queue), {"synced": 0, "conflicts": 0, "pending": 1})
+
+        self.assertEqual(self.queue.count(offline_queue.PENDING), 1)
+        self.assertEqual(offline_queue.sync(self.queue)["synced"], 1)
+        self.assertEqual(self.quantity(), 8)
+
+
+class OfflineQueueClaimTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.queue = offline_queue.OfflineQueue(":memory:")
+        for key in "abcde":
+            self.queue.enqueue({"key": key}, key)
+
+    def keys(self, batch):
+        return [entry["idempotency_key"] for entry in batch]
+
+    def test_claims_do_not_overlap(self):
+        self.assertEqual(self.keys(self.queue.claim(3)), ["a", "b", "c"])
+        self.assertEqual(self.keys(self.queue.claim(3)), ["d", "e"])
+        self.assertEqual(self.queue.claim(3), [])
+        self.assertEqual(self.queue.count(offline_queue.SYNCING), 5)
+
+    def test_claim_left_by_a_dead_worker_expires(self):
+        self.queue.claim(2)
+        self.queue.conn.execute("update queued_sale set claimed_at = '2000-01-01T00:00:00+00:00' "
+                                "where idempotency_key = 'a'")
+
+        self.assertEqual(self.keys(self.queue.claim(5)), ["a", "c", "d", "e"])
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase
+
+from ..pagination import InvalidPage, decode_cursor, encode_cursor
+from .base import LocalSupabaseTestCase
+
+
+class CursorTests(SimpleTestCase):
+    def test_cursor_round_trips(self):
+        for value in (0, 1234, "PO-2026-0001"):
+            with self.subTest(value=value):
+                self.assertEqual(decode_cursor(encode_cursor(value)), value)
+
+    def test_tampered_cursor_is_refused(self):
+        for token in ("not-base64!", encode_cursor(5)[:-2], "e30"):  # "e30" is {}
+            with self.subTest(token=token), self.assertRaises(InvalidPage):
+                decode_cursor(token)
+
+
+class KeysetPaginationTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def walk(self, path, limit):
+        """Every page of ``path``, following next_cursor; returns the pages' ids."""
+        pages = []
+        url = f"{path}?limit={limit}"
+        while url:
+            response = self.request("get", url)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            pages.append([row["product_id"] for row in body["results"]])
+            url = f"{path}?limit={limit}&cursor={body['next_cursor']}" if body["next_cursor"] else None
+        return pages
+
+    def test_pages_cover_the_list_once_in_key_order(self):
+        everything = sorted(product["product_id"] for product in self.request("get", "/pharmacy/products/").json())
+        pages = self.walk("/pharmacy/products/", 7)
+
+        self.assertEqual([len(page) for page in pages[:-1]], [7] * (len(pages) - 1))
+        self.assertEqual([product_id for page in pages for product_id in page], everything)
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        response = self.request("get", "/pharmacy/products/?cursor=garbage!")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid cursor"})
+
+    def test_bad_limit_is_a_bad_request(self):
+        for limit in ("ten", "0"):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.request("get", f"/pharmacy/products/?limit={limit}").status_code, 400)
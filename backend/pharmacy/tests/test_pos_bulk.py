@@ -0,0 +1,73 @@
+from django.test import override_settings
+
+from .test_checkout import OTHER_STOCK_ITEM, CheckoutTestCase, sale
+
+
+def keyed(key, body):
+    return {**body, "idempotency_key": key}
+
+
+class BulkCheckoutTests(CheckoutTestCase):
+    def upload(self, *sales):
+        return self.request("post", "/pharmacy/pos/bulk/", {"sales": list(sales)})
+
+    def statuses(self, response):
+        return [result["status"] for result in response.json()["results"]]
+
+    def test_sales_are_checked_against_a_running_balance(self):
+        response = self.upload(sale((1, 6)), sale((1, 5)), sale((1, 4), (2, 5)))
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.statuses(response), ["created", "rejected", "created"])
+        self.assertIn("Insufficient stock for product 1", response.json()["results"][1]["error"])
+        self.assertEqual(self.quantity(), 0)
+        self.assertEqual(self.quantity(OTHER_STOCK_ITEM), 0)
+        self.assertEqual(self.batches(), [("2026-08-01", 0), ("2026-12-01", 0)])
+        self.assertEqual(self.new_sales(), 2)
+
+    def test_retried_upload_replays(self):
+        first = self.upload(keyed("a", sale((1, 2))), keyed("b", sale((1, 3))))
+        second = self.upload(keyed("a", sale((1, 2))), keyed("b", sale((1, 3))), keyed("c", sale((1, 1))))
+
+        self.assertEqual(self.statuses(second), ["replayed", "replayed", "created"])
+        self.assertEqual([r["pos_id"] for r in second.json()["results"][:2]],
+                         [r["pos_id"] for r in first.json()["results"]])
+        self.assertEqual(self.quantity(), 4)
+        self.assertEqual(self.new_sales(), 3)
+
+    def test_key_repeated_in_one_upload_sells_once(self):
+        response = self.upload(keyed("a", sale((1, 2))), keyed("a", sale((1, 2))), keyed("a", sale((1, 3))))
+
+        self.assertEqual(self.statuses(response), ["created", "replayed", "rejected"])
+        self.assertEqual(self.quantity(), 8)
+
+    def test_sale_with_a_missing_user_is_rejected_alone(self):
+        response = self.upload(keyed("a", sale((1, 3), user_id=999)), keyed("b", sale((1, 2))))
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.statuses(response), ["rejected", "created"])
+        self.assertEqual(self.quantity(), 8)
+
+        retry = self.upload(keyed("a", sale((1, 3))), keyed("b", sale((1, 2))))
+        self.assertEqual(self.statuses(retry), ["created", "replayed"])
+        self.assertEqual(self.quantity(), 5)
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideBulkCheckoutTests(BulkCheckoutTests):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+    def test_sale_with_a_missing_user_is_rejected_alone(self):
+        # The set-based writes cannot tell which sale broke them: the upload fails and is taken back whole
+        response = self.upload(keyed("a", sale((1, 3), user_id=999)), keyed("b", sale((1, 2))))
+
+        self.assertEqual(response.status_code, 500)
+        self.assert_untouched()
+        self.assertEqual(self.scalar('select count(*) from "Idempotency_Key"'), 0)
+
+        retry = self.upload(keyed("a", sale((1, 3))), keyed("b", sale((1, 2))))
+        self.assertEqual(self.statuses(retry), ["created", "created"])
+        self.assertEqual(self.quantity(), 5)
+        self.assertEqual(self.new_sales(), 2)
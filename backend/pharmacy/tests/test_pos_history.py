@@ -0,0 +1,59 @@
+from ..query_stats import track_queries
+from .test_checkout import CheckoutTestCase, sale
+
+
+class POSHistoryTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute('delete from "POS"')
+        self.sales = [
+            self.sell({**sale((1, 2), (2, 1)), "timestamp": "2026-05-01T09:00:00"}),
+            self.sell({**sale((1, 1), user_id=3), "timestamp": "2026-05-02T18:30:00"}),
+            self.sell({**sale((2, 1), customer_type="dswd"), "timestamp": "2026-05-03T08:00:00",
+                       "customerInfo": {"patient_name": "Maria Santos"}}),
+        ]
+
+    def sell(self, body):
+        response = self.request("post", "/pharmacy/pos/", body)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()["pos_id"]
+
+    def history(self, query=""):
+        with track_queries() as stats:
+            response = self.request("get", f"/pharmacy/pos/{query}")
+        self.assertEqual(stats.count, 1)
+        return response
+
+    def ids(self, query):
+        response = self.history(query)
+        if response.status_code == 404:
+            return []
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(pos["pos_id"] for pos in response.json())
+
+    def test_sale_comes_back_with_its_items_and_totals(self):
+        response = self.history(f"{self.sales[0]}/")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        pos = response.json()
+        self.assertEqual(pos["total_amount"], 30)
+        self.assertEqual(sorted((item["product_id"], item["quantity"], item["total_price"]) for item in pos["items"]),
+                         [(1, 2, 20), (2, 1, 10)])
+
+    def test_filters(self):
+        first, second, third = self.sales
+
+        self.assertEqual(self.ids(""), [first, second, third])
+        self.assertEqual(self.ids("?user_id=3"), [second])
+        self.assertEqual(self.ids("?order_type=DSWD"), [third])
+        # A plain date_to covers the whole day
+        self.assertEqual(self.ids("?date_from=2026-05-02&date_to=2026-05-02"), [second])
+        self.assertEqual(self.ids("?date_to=2026-05-02T12:00:00"), [first])
+        self.assertEqual(self.ids("?user_id=3&order_type=dswd"), [])
+
+    def test_bad_filter_is_a_bad_request(self):
+        with track_queries() as stats:
+            response = self.request("get", "/pharmacy/pos/?date_from=someday")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stats.count, 0)
@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from .. import pricing
+from ..checkout import CheckoutError
+from .base import LocalSupabaseTestCase
+from .test_checkout import sale
+
+
+def senior_sale(*lines):
+    return {**sale(*lines, customer_type="discount"), "discountInfo": {"type": "senior", "name": "Ana Cruz"}}
+
+
+class QuoteTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        for product_id, price in ((1, "10.05"), (2, "33.33"), (3, "0.125")):
+            self.db.conn.execute('update "Products" set current_price = ? where product_id = ?', (price, product_id))
+
+    def test_regular_sale_has_no_discount(self):
+        quote = pricing.quote(sale((1, 3), (2, 1)))
+
+        self.assertEqual(quote["subtotal"], Decimal("63.48"))
+        self.assertEqual(quote["discount"], Decimal("0.00"))
+        self.assertEqual(quote["total"], Decimal("63.48"))
+
+    def test_discount_is_rounded_half_up_per_line(self):
+        quote = pricing.quote(senior_sale((1, 3), (2, 1)))
+
+        self.assertEqual(quote["discount_rate"], Decimal("0.2"))
+        # 30.15 * 20% = 6.03 exactly; 33.33 * 20% = 6.666 -> 6.67
+        self.assertEqual([line["discount"] for line in quote["items"]], [Decimal("6.03"), Decimal("6.67")])
+        self.assertEqual([line["net_amount"] for line in quote["items"]], [Decimal("24.12"), Decimal("26.66")])
+        self.assertEqual(quote["discount"], Decimal("12.70"))
+        self.assertEqual(quote["total"], Decimal("50.78"))
+
+    def test_prices_are_rounded_to_the_cent(self):
+        line, = pricing.quote(senior_sale((3, 1)))["items"]
+
+        self.assertEqual(line["unit_price"], Decimal("0.13"))
+        # 0.13 * 20% = 0.026 -> 0.03
+        self.assertEqual(line["discount"], Decimal("0.03"))
+
+    def test_dswd_sale_is_fully_covered(self):
+        quote = pricing.quote(sale((2, 2), customer_type="dswd"))
+
+        self.assertEqual(quote["discount"], Decimal("66.66"))
+        self.assertEqual(quote["total"], Decimal("0.00"))
+
+    def test_unknown_product_is_refused(self):
+        with self.assertRaisesMessage(CheckoutError, "Product 999 not found"):
+            pricing.quote(sale((999, 1)))
+
+    def test_price_change_through_the_api_is_quoted_at_once(self):
+        pricing.quote(sale((1, 1)))
+        product = dict(zip(("product_name", "category_id", "brand_id", "net_content", "unit_id"), self.sql(
+            'select product_name, category_id, brand_id, net_content, unit_id from "Products" where product_id = 1')[0]))
+        response = self.request("put", "/pharmacy/products/1/", {**product, "current_price": "12.00"})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(pricing.quote(sale((1, 1)))["total"], Decimal("12.00"))
+
+    def test_endpoint_answers_a_bad_cart_with_400(self):
+        response = self.request("post", "/pharmacy/pos/quote/", {**sale(), "items": []})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "A sale needs at least one item"})
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.test import override_settings
+
+from ..benchmark import list_endpoints
+from ..query_stats import assert_max_queries
+from .base import LocalSupabaseTestCase
+
+# Endpoints that used to run one query per row; their count must not grow with the data
+FIXED_COST = ["expirations", "purchase-orders", "stock-transfers", "stock-items", "products", "pos"]
+
+
+class QueryBudgetTests(LocalSupabaseTestCase):
+    rows = 300
+
+    def get(self, path, budget):
+        with assert_max_queries(budget) as stats:
+            response = self.request("get", path)
+        self.assertEqual(response.status_code, 200, f"{path}: {response.content[:200]}")
+        return stats.count
+
+    def test_list_endpoints_stay_within_budget(self):
+        for name, path in list_endpoints():
+            with self.subTest(endpoint=name):
+                self.get(path, settings.QUERY_BUDGETS.get(f"{name}-list", settings.DEFAULT_QUERY_BUDGET))
+
+    def test_expirations_within_budget(self):
+        self.get("/pharmacy/expirations/", settings.QUERY_BUDGETS["expirations-list"])
+
+    def test_purchase_orders_within_budget(self):
+        self.get("/pharmacy/purchase-orders/", settings.QUERY_BUDGETS["purchase-orders-list"])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        paths = dict(list_endpoints())
+        small = {name: self.get(paths[name], settings.QUERY_BUDGETS[f"{name}-list"]) for name in FIXED_COST}
+
+        self.reset(900)
+        for name in FIXED_COST:
+            with self.subTest(endpoint=name):
+                self.assertEqual(self.get(paths[name], settings.QUERY_BUDGETS[f"{name}-list"]), small[name])
+
+    def test_middleware_flags_an_exceeded_budget(self):
+        with override_settings(QUERY_BUDGETS={"purchase-orders-list": 1}):
+            response = self.request("get", "/pharmacy/purchase-orders/")
+        self.assertGreater(int(response["X-Query-Count"]), 1)
+        self.assertEqual(response["X-Query-Budget-Exceeded"], f"{response['X-Query-Count']}/1")
@@ -0,0 +1,82 @@
+from .. import reconciliation
+from .base import LocalSupabaseTestCase
+
+# Location 1 stock items, by what is wrong with them
+COUNTER_OFF = 1
+SURPLUS_BATCHES = 4
+BATCHES_SHORT = 7
+LEDGER_ONLY = 10
+NEGATIVE_LEDGER = 13
+
+
+class ReconciliationTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        # Start from stock that reconciles: nothing anywhere
+        self.db.conn.execute('delete from "Expiration"')
+        self.db.conn.execute('delete from "Stock_Transaction"')
+        self.db.conn.execute('update "Stock_Item" set quantity = 0')
+
+        # stock_item_id: (counter, [(expiry_date, batch quantity)], ledger)
+        self.stock({
+            COUNTER_OFF: (7, [("2026-12-01", 5)], 5),
+            SURPLUS_BATCHES: (5, [("2026-08-01", 3), ("2026-12-01", 5)], 5),
+            BATCHES_SHORT: (9, [("2026-12-01", 2)], 5),
+            LEDGER_ONLY: (6, [("2026-12-01", 6)], 4),
+            NEGATIVE_LEDGER: (1, [], -2),
+        })
+
+    def stock(self, items):
+        for stock_item_id, (counter, batches, in_ledger) in items.items():
+            self.db.conn.execute('update "Stock_Item" set quantity = ? where stock_item_id = ?', (counter, stock_item_id))
+            self.db.conn.executemany('insert into "Expiration" (stock_item_id, expiry_date, quantity) values (?, ?, ?)',
+                                     [(stock_item_id, expiry_date, quantity) for expiry_date, quantity in batches])
+            self.db.conn.execute('insert into "Stock_Transaction" (stock_item_id, transaction_type, quantity_change) '
+                                 "values (?, 'Adjustment', ?)", (stock_item_id, in_ledger))
+
+    def counters(self):
+        return dict(self.sql('select stock_item_id, quantity from "Stock_Item" where quantity != 0'))
+
+    def batches(self, stock_item_id):
+        return self.sql('select expiry_date, quantity from "Expiration" where stock_item_id = ? order by expiry_date',
+                        (stock_item_id,))
+
+    def test_check_finds_every_discrepancy(self):
+        found = reconciliation.check(workers=2)
+
+        self.assertEqual([(row["stock_item_id"], row["quantity"], row["batches"], row["ledger"]) for row in found], [
+            (COUNTER_OFF, 7, 5, 5),
+            (SURPLUS_BATCHES, 5, 8, 5),
+            (BATCHES_SHORT, 9, 2, 5),
+            (LEDGER_ONLY, 6, 6, 4),
+            (NEGATIVE_LEDGER, 1, 0, -2),
+        ])
+
+    def test_fix_settles_counters_and_surplus_batches(self):
+        result = reconciliation.fix(reconciliation.recheck(reconciliation.check()))
+
+        self.assertEqual(result, {"counters": 1, "batches": 1, "ledger_only": [LEDGER_ONLY],
+                                  "skipped": [BATCHES_SHORT, NEGATIVE_LEDGER]})
+        self.assertEqual(self.counters()[COUNTER_OFF], 5)
+        # Soonest expiry first
+        self.assertEqual(self.batches(SURPLUS_BATCHES), [("2026-08-01", 0), ("2026-12-01", 5)])
+        self.assertEqual([row["stock_item_id"] for row in reconciliation.check()],
+                         [BATCHES_SHORT, LEDGER_ONLY, NEGATIVE_LEDGER])
+
+    def test_fix_leaves_what_it_reports_alone(self):
+        reconciliation.fix(reconciliation.check())
+
+        counters = self.counters()
+        self.assertEqual({stock_item_id: counters.get(stock_item_id, 0)
+                          for stock_item_id in (BATCHES_SHORT, LEDGER_ONLY, NEGATIVE_LEDGER)},
+                         {BATCHES_SHORT: 9, LEDGER_ONLY: 6, NEGATIVE_LEDGER: 1})
+        self.assertEqual(self.batches(BATCHES_SHORT), [("2026-12-01", 2)])
+        self.assertEqual(self.batches(LEDGER_ONLY), [("2026-12-01", 6)])
+
+    def test_recheck_drops_rows_that_changed(self):
+        found = reconciliation.check()
+        self.db.conn.execute('update "Stock_Item" set quantity = 6 where stock_item_id = ?', (COUNTER_OFF,))
+
+        self.assertNotIn(COUNTER_OFF, [row["stock_item_id"] for row in reconciliation.recheck(found)])
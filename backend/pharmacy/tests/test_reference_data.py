@@ -0,0 +1,49 @@
+from .. import reference_data
+from .base import LocalSupabaseTestCase
+
+
+class ReferenceDataTests(LocalSupabaseTestCase):
+    rows = 1
+
+    def locations(self):
+        response = self.request("get", "/pharmacy/locations/")
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row["location_id"]: row["location"] for row in response.json()}
+
+    def test_rows_are_served_from_the_cache(self):
+        before = self.locations()
+        # Written behind the cache's back, e.g. by another worker
+        self.db.conn.execute("""update "Location" set location = 'Renamed' where location_id = 1""")
+
+        self.assertEqual(self.locations(), before)
+        reference_data.invalidate("Location")
+        self.assertEqual(self.locations()[1], "Renamed")
+
+    def test_writes_through_the_api_are_seen_at_once(self):
+        self.locations()
+
+        created = self.request("post", "/pharmacy/locations/", {"location": "Annex"})
+        self.assertEqual(created.status_code, 201, created.content)
+        location_id = created.json()[0]["location_id"]
+        self.assertEqual(self.locations()[location_id], "Annex")
+
+        self.request("put", f"/pharmacy/locations/{location_id}/", {"location": "Annex 2"})
+        self.assertEqual(self.locations()[location_id], "Annex 2")
+
+        self.request("delete", f"/pharmacy/locations/{location_id}/")
+        self.assertNotIn(location_id, self.locations())
+
+    def test_rows_handed_out_are_copies(self):
+        reference_data.get("Location", 1)["location"] = "Changed by a caller"
+
+        self.assertNotEqual(reference_data.get("Location", 1)["location"], "Changed by a caller")
+
+    def test_invalidate_during_a_fetch_keeps_the_stale_read_out(self):
+        generation = reference_data._generations.get("Location", 0)
+        stale = reference_data.rows("Location")
+        reference_data.invalidate("Location")
+        self.db.conn.execute("""update "Location" set location = 'Renamed' where location_id = 1""")
+
+        # A fetch that read before the invalidate() must not store its rows
+        reference_data._store("Location", stale, generation)
+        self.assertEqual(reference_data.get("Location", 1)["location"], "Renamed")
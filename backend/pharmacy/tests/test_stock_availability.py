@@ -0,0 +1,41 @@
+from .test_checkout import STOCK_ITEM, CheckoutTestCase, sale
+
+PRODUCT = 1
+LOCATION = 1
+
+
+class StockAvailabilityTests(CheckoutTestCase):
+    def stock(self, location_id=LOCATION):
+        response = self.request("get", f"/pharmacy/products/{PRODUCT}/")
+        self.assertEqual(response.status_code, 200, response.content)
+        return next(entry for entry in response.json()["stock_per_location"] if entry["location_id"] == location_id)
+
+    def test_catalog_shows_the_batches_soonest_expiry_first(self):
+        stock = self.stock()
+
+        self.assertEqual(stock["total_quantity"], 10)
+        self.assertEqual(stock["expiry_details"], [{"expiry_date": "2026-08-01", "quantity": 6},
+                                                   {"expiry_date": "2026-12-01", "quantity": 4}])
+
+    def test_sale_refreshes_the_catalog(self):
+        self.assertEqual(self.request("post", "/pharmacy/pos/", sale((1, 7))).status_code, 201)
+
+        stock = self.stock()
+        self.assertEqual(stock["total_quantity"], 3)
+        # The emptied batch is left out
+        self.assertEqual(stock["expiry_details"], [{"expiry_date": "2026-12-01", "quantity": 3}])
+
+    def test_deleted_batch_leaves_the_catalog(self):
+        expiration_id = self.scalar('select expiration_id from "Expiration" where stock_item_id = ? '
+                                    "and expiry_date = '2026-08-01'", (STOCK_ITEM,))
+        self.request("delete", f"/pharmacy/expirations/{expiration_id}/")
+
+        self.assertEqual(self.stock()["expiry_details"], [{"expiry_date": "2026-12-01", "quantity": 4}])
+
+    def test_writes_outside_the_api_are_picked_up(self):
+        self.db.conn.execute('update "Expiration" set quantity = quantity + 1 where stock_item_id = ?', (STOCK_ITEM,))
+        self.db.conn.execute('update "Stock_Item" set quantity = 12 where stock_item_id = ?', (STOCK_ITEM,))
+
+        stock = self.stock()
+        self.assertEqual(stock["total_quantity"], 12)
+        self.assertEqual([batch["quantity"] for batch in stock["expiry_details"]], [7, 5])
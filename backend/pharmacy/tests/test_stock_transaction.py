@@ -0,0 +1,142 @@
+from datetime import date
+from unittest import mock
+
+from django.test import override_settings
+
+from .. import ledger
+from .base import LocalSupabaseTestCase
+
+# seed_database numbers stock items (product_id - 1) * 3 + location_id
+STOCK_ITEM = 1
+
+
+class StockMovementTestCase(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        self.db.conn.execute('update "Stock_Item" set quantity = 10 where stock_item_id = ?', (STOCK_ITEM,))
+        self.ledger_count = self.scalar('select count(*) from "Stock_Transaction"')
+
+    def quantity(self):
+        return self.scalar('select quantity from "Stock_Item" where stock_item_id = ?', (STOCK_ITEM,))
+
+    def fail_ledger_writes(self):
+        for event in ("insert", "update", "delete"):
+            self.db.conn.execute(f'create trigger fail_ledger_{event} before {event} on "Stock_Transaction" '
+                                 "begin select raise(abort, 'connection lost'); end")
+
+
+class StockTransactionTests(StockMovementTestCase):
+    def record(self, quantity_change):
+        return self.request("post", "/pharmacy/stock-transactions/", {
+            "stock_item_id": STOCK_ITEM, "transaction_type": "POS", "reference_id": 1,
+            "quantity_change": quantity_change, "src_location": 1,
+        })
+
+    def test_entry_moves_the_stock(self):
+        response = self.record(-3)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.scalar('select count(*) from "Stock_Transaction"'), self.ledger_count + 1)
+
+    def test_stock_is_put_back_when_the_entry_cannot_be_written(self):
+        self.fail_ledger_writes()
+        response = self.record(-3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantity(), 10)
+
+
+@override_settings(LEDGER_SETTLE_SECONDS=0)
+class StockTransactionEditTests(StockMovementTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry_id = self.db.conn.execute(
+            'insert into "Stock_Transaction" (stock_item_id, transaction_type, quantity_change, transaction_date) '
+            "values (?, 'Adjustment', -2, '2026-10-16T09:00:00+00:00')", (STOCK_ITEM,)).lastrowid
+        ledger.snapshot(date(2026, 10, 16))
+        self.counted = self.snapshot()
+
+    def snapshot(self):
+        return self.scalar('select quantity from "Stock_Snapshot" where stock_item_id = ? and day = ?',
+                           (STOCK_ITEM, "2026-10-16"))
+
+    def entry(self):
+        return self.sql('select quantity_change from "Stock_Transaction" where stock_transaction_id = ?', (self.entry_id,))
+
+    def edit(self, quantity_change):
+        return self.request("put", f"/pharmacy/stock-transactions/{self.entry_id}/", {"quantity_change": quantity_change})
+
+    def delete(self):
+        return self.request("delete", f"/pharmacy/stock-transactions/{self.entry_id}/")
+
+    def test_edit_moves_the_stock_and_the_snapshot(self):
+        response = self.edit(-5)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.quantity(), 7)
+        self.assertEqual(self.entry(), [(-5,)])
+        self.assertEqual(self.snapshot(), self.counted - 3)
+
+    def test_delete_moves_the_stock_and_the_snapshot(self):
+        response = self.delete()
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.quantity(), 12)
+        self.assertEqual(self.entry(), [])
+        self.assertEqual(self.snapshot(), self.counted + 2)
+
+    def test_edit_is_taken_back_when_the_snapshots_cannot_follow(self):
+        with mock.patch.object(ledger, "amend", side_effect=RuntimeError("connection lost")):
+            response = self.edit(-5)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantity(), 10)
+        self.assertEqual(self.entry(), [(-2,)])
+        self.assertEqual(self.snapshot(), self.counted)
+
+    def test_delete_is_taken_back_when_the_snapshots_cannot_follow(self):
+        with mock.patch.object(ledger, "amend", side_effect=RuntimeError("connection lost")):
+            response = self.delete()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantity(), 10)
+        self.assertEqual(self.entry(), [(-2,)])
+
+    def test_missing_entry_moves_nothing(self):
+        self.db.conn.execute('create trigger skip_update before update on "Stock_Transaction" '
+                             "begin select raise(ignore); end")
+        response = self.edit(-5)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantity(), 10)
+
+
+@override_settings(POS_CHECKOUT_RPC=False)
+class ClientSideStockTransactionEditTests(StockTransactionEditTests):
+    def setUp(self):
+        super().setUp()
+        self.drop_functions()
+
+
+class StockItemCorrectionTests(StockMovementTestCase):
+    def correct(self, quantity):
+        return self.request("put", "/pharmacy/stock-items/1/", {
+            "product_id": 1, "location_id": 1, "quantity": quantity, "transaction_type": "Adjustment",
+        })
+
+    def test_correction_is_recorded_as_a_delta(self):
+        response = self.correct(4)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.quantity(), 4)
+        self.assertEqual(self.scalar('select quantity_change from "Stock_Transaction" order by stock_transaction_id desc'), -6)
+
+    def test_correction_is_taken_back_when_the_entry_cannot_be_written(self):
+        self.fail_ledger_writes()
+        response = self.correct(4)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.quantity(), 10)
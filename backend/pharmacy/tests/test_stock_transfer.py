@@ -0,0 +1,135 @@
+from unittest import mock
+
+from .. import allocation, ledger
+from .base import LocalSupabaseTestCase
+
+# seed_database numbers stock items (product_id - 1) * 3 + location_id; the warehouse is location 3
+SOURCE = {1: 3, 2: 6}
+DESTINATION = {1: 1, 2: 4}
+
+
+class StockTransferTests(LocalSupabaseTestCase):
+    rows = 20
+
+    def setUp(self):
+        super().setUp()
+        # The view marks completed items with status 4
+        self.db.conn.executemany('insert into "Stock_Transfer_Item_Status" (sti_status) values (?)',
+                                 [("In Transit",), ("Completed",)])
+        self.db.conn.execute('delete from "Expiration"')
+        for stock_item_id, quantity in ((3, 10), (6, 5), (1, 0), (4, 2)):
+            self.db.conn.execute('update "Stock_Item" set quantity = ? where stock_item_id = ?', (quantity, stock_item_id))
+        self.db.conn.executemany('insert into "Expiration" (stock_item_id, expiry_date, quantity) values (?, ?, ?)',
+                                 [(3, "2026-08-01", 6), (3, "2026-12-01", 4), (6, "2026-09-01", 5), (4, "2026-07-01", 2)])
+        self.transfer_id = self.db.conn.execute(
+            'insert into "Stock_Transfer" (transfer_id, stock_transfer_status_id, src_location, des_location) '
+            "values ('ST-TEST-001', 2, 3, 1)").lastrowid
+        self.db.conn.executemany(
+            'insert into "Stock_Transfer_Item" (stock_transfer_id, product_id, ordered_quantity) values (?, ?, ?)',
+            [(self.transfer_id, 1, 8), (self.transfer_id, 2, 3)])
+
+    def complete(self):
+        return self.request("put", f"/pharmacy/stock-transfers/{self.transfer_id}/", {"stock_transfer_status_id": 4})
+
+    def quantities(self):
+        return {stock_item_id: self.scalar('select quantity from "Stock_Item" where stock_item_id = ?', (stock_item_id,))
+                for stock_item_id in (3, 6, 1, 4)}
+
+    def status(self):
+        return self.scalar('select stock_transfer_status_id from "Stock_Transfer" where stock_transfer_id = ?',
+                           (self.transfer_id,))
+
+    def test_completing_moves_stock_and_batches(self):
+        response = self.complete()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.status(), 4)
+        self.assertEqual(self.quantities(), {3: 2, 6: 2, 1: 8, 4: 5})
+        self.assertEqual(self.sql('select stock_item_id, expiry_date, quantity from "Expiration" '
+                                  'where stock_item_id in (1, 3) and quantity > 0 order by stock_item_id, expiry_date'),
+                         [(1, "2026-08-01", 6), (1, "2026-12-01", 2), (3, "2026-12-01", 2)])
+
+    def test_completing_writes_both_sides_to_the_ledger(self):
+        before = ledger.quantities([3, 6, 1, 4])
+        self.complete()
+        after = ledger.quantities([3, 6, 1, 4])
+
+        self.assertEqual({stock_item_id: after[stock_item_id] - before.get(stock_item_id, 0) for stock_item_id in after},
+                         {3: -8, 6: -3, 1: 8, 4: 3})
+        self.assertEqual(
+            self.sql('select stock_item_id, quantity_change, expiry_date from "Stock_Transaction" '
+                     'where transaction_type = \'Transfer\' and reference_id in '
+                     '(select stock_transfer_item_id from "Stock_Transfer_Item" where stock_transfer_id = ?) '
+                     'order by stock_transaction_id', (self.transfer_id,)),
+            [(3, -6, "2026-08-01"), (3, -2, "2026-12-01"), (1, 6, "2026-08-01"), (1, 2, "2026-12-01"),
+             (6, -3, "2026-09-01"), (4, 3, "2026-09-01")],
+        )
+
+    def test_completing_twice_moves_stock_once(self):
+        self.complete()
+        response = self.complete()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), {3: 2, 6: 2, 1: 8, 4: 5})
+
+    def test_source_short_of_stock_leaves_the_transfer_open(self):
+        self.db.conn.execute('update "Stock_Item" set quantity = 1 where stock_item_id = 6')
+        response = self.complete()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Insufficient stock for stock item 6", response.json()["error"])
+        self.assertEqual(self.status(), 2)
+        self.assertEqual(self.quantities(), {3: 10, 6: 1, 1: 0, 4: 2})
+
+    def test_retry_after_a_failed_status_update_moves_stock_once(self):
+        self.db.conn.execute('create trigger fail_completion before update on "Stock_Transfer" '
+                             "when new.stock_transfer_status_id = 4 begin select raise(abort, 'connection lost'); end")
+        self.assertEqual(self.complete().status_code, 500)
+        self.assertEqual(self.quantities(), {3: 10, 6: 5, 1: 0, 4: 2})
+
+        self.db.conn.execute("drop trigger fail_completion")
+        self.assertEqual(self.complete().status_code, 200)
+        self.assertEqual(self.quantities(), {3: 2, 6: 2, 1: 8, 4: 5})
+
+    def assert_open_and_untouched(self):
+        self.assertEqual(self.status(), 2)
+        self.assertEqual(self.quantities(), {3: 10, 6: 5, 1: 0, 4: 2})
+        self.assertEqual(self.sql('select stock_item_id, expiry_date, quantity from "Expiration" '
+                                  'where quantity > 0 and stock_item_id in (1, 3, 4, 6) order by stock_item_id, expiry_date'),
+                         [(3, "2026-08-01", 6), (3, "2026-12-01", 4), (4, "2026-07-01", 2), (6, "2026-09-01", 5)])
+        self.assertEqual(self.scalar('select count(*) from "Stock_Transaction" where transaction_type = \'Transfer\''),
+                         self.transfers)
+        self.assertEqual(self.sql('select distinct stock_transfer_item_status_id from "Stock_Transfer_Item" '
+                                  'where stock_transfer_id = ?', (self.transfer_id,)), [(None,)])
+
+    def test_late_failure_takes_everything_back_and_a_retry_completes(self):
+        self.transfers = self.scalar('select count(*) from "Stock_Transaction" where transaction_type = \'Transfer\'')
+        bulk_write = allocation.bulk_write
+
+        def failing_bulk_write(table, rows, **options):
+            if table == "Stock_Transaction":
+                raise RuntimeError("connection lost")
+            return bulk_write(table, rows, **options)
+
+        with mock.patch.object(allocation, "bulk_write", failing_bulk_write):
+            self.assertEqual(self.complete().status_code, 500)
+        self.assert_open_and_untouched()
+
+        self.assertEqual(self.complete().status_code, 200)
+        self.assertEqual(self.quantities(), {3: 2, 6: 2, 1: 8, 4: 5})
+
+    def test_batch_sold_from_meanwhile_reopens_the_transfer(self):
+        self.transfers = self.scalar('select count(*) from "Stock_Transaction" where transaction_type = \'Transfer\'')
+        load = allocation.Allocator.load
+
+        def load_then_sell_elsewhere(stock_item_ids):
+            allocator = load(stock_item_ids)
+            self.db.conn.execute('update "Expiration" set quantity = 1 where stock_item_id = 6')
+            return allocator
+
+        with mock.patch.object(allocation.Allocator, "load", side_effect=load_then_sell_elsewhere):
+            response = self.complete()
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.db.conn.execute('update "Expiration" set quantity = 5 where stock_item_id = 6')
+        self.assert_open_and_untouched()
@@ -1,13 +1,13 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView  # type: ignore
 
-from .views import (POI, POS, STI, Branch, Brand, Customers, CustomerType,
+from .views import (POI, POS, STI, POSBulk, POSQuote, Branch, Brand, Customers, CustomerType,
                     DisposedItems, Drugs, DswdOrder, Expiration, Inventory,
                     Location, Order, PersonList, Prescription, PriceHistory,
                     ProductCategory, Products, Purchase_Order_Item_Status,
                     Purchase_Order_Status, PurchaseOrder, Receipt,
                     StatementOfAccounts, Status, Stock_Transfer_Item_Status,
-                    Stock_Transfer_Status, StockItem, StockTransaction,
+                    Stock_Transfer_Status, StockAsOf, StockItem, StockTransaction,
                     StockTransfer, Supplier, SupplierItem, Unit, UserList,
                     UserLoginView, UserRole)
 
@@ -72,6 +72,9 @@ urlpatterns = [
     # Explicitly define PUT route for supplier-items
     path("supplier-items/edit/<int:supplier_item_id>/", SupplierItem.as_view(), name="edit-supplier-item"),
     path("stock-transfer-<str:direction>/<int:location_id>/", StockTransfer.as_view()),
+    path("pos/bulk/", POSBulk.as_view(), name="pos-bulk"),
+    path("pos/quote/", POSQuote.as_view(), name="pos-quote"),
+    path("stock-items/as-of/", StockAsOf.as_view(), name="stock-items-as-of"),
 ] + [
     path("login/", UserLoginView.as_view(), name="login"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
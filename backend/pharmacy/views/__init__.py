@@ -9,7 +9,7 @@ from .inventory import Inventory
 from .location import Location
 from .order import Order
 from .person_views import PersonList
-from .pos import POS
+from .pos import POS, POSBulk, POSQuote
 from .prescription import Prescription
 from .price_history import PriceHistory
 from .product_brand import Brand
@@ -21,7 +21,7 @@ from .purchase_order_item_status import Purchase_Order_Item_Status
 from .purchase_order_status import Purchase_Order_Status
 from .receipt import Receipt
 from .status import Status
-from .stock_item import StockItem
+from .stock_item import StockAsOf, StockItem
 from .stock_transaction import StockTransaction
 from .stock_transfer import StockTransfer
 from .stock_transfer_item import STI
@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class Branch(APIView):
     def get(self, request, branch_id=None):
         try:
-            query = supabase.table('Branch').select('*')
             if branch_id is not None:
-                query = query.eq('branch_id', branch_id)
-            
-            response = query.execute()
+                row = reference_data.get('Branch', branch_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Branch')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Branch found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class Branch(APIView):
         try:
            
             response = supabase.table("Branch").insert(data).execute()
+            reference_data.invalidate("Branch")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class Branch(APIView):
         data = request.data 
         try:
             response = supabase.table("Branch").update(data).eq('branch_id', branch_id).execute()
+            reference_data.invalidate("Branch")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class Branch(APIView):
     def delete(self, request, branch_id):
         try:
             response = supabase.table("Branch").delete().eq('branch_id', branch_id).execute()
+            reference_data.invalidate("Branch")
 
             if response.data:
                 return Response({"message": "Branch deleted successfully"}, status=204)
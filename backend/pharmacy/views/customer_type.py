@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class CustomerType(APIView):
     def get(self, request, customerType_id=None):
         try:
-            query = supabase.table('Customer_Type').select('*')
             if customerType_id is not None:
-                query = query.eq('customerType_id', customerType_id)
-            
-            response = query.execute()
+                row = reference_data.get('Customer_Type', customerType_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Customer_Type')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Customer Type found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class CustomerType(APIView):
         try:
            
             response = supabase.table("Customer_Type").insert(data).execute()
+            reference_data.invalidate("Customer_Type")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class CustomerType(APIView):
         data = request.data 
         try:
             response = supabase.table("Customer_Type").update(data).eq('customerType_id', customerType_id).execute()
+            reference_data.invalidate("Customer_Type")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class CustomerType(APIView):
     def delete(self, request, customerType_id):
         try:
             response = supabase.table("Customer_Type").delete().eq('customerType_id', customerType_id).execute()
+            reference_data.invalidate("Customer_Type")
 
             if response.data:
                 return Response({"message": "Customer Type deleted successfully"}, status=204)
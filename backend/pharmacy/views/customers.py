@@ -3,6 +3,8 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import identities
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,17 +14,26 @@ supabase = get_supabase_client()
 class Customers(APIView):
     def get(self, request, customer_id=None):
         try:
+            page = get_page(request) if customer_id is None else None
+
             query = supabase.table('Customers').select('*')
             if customer_id is not None:
                 query = query.eq('customer_id', customer_id)
+            elif page:
+                query = page.apply(query, 'customer_id')
             
             response = query.execute()
 
             if not response.data:
                 return Response({"error": "No Customers found"}, status=404)
 
+            if page:
+                return Response(page.respond(response.data, 'customer_id'), status=200)
+
             return Response(response.data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
         
@@ -39,6 +50,7 @@ class Customers(APIView):
         data = request.data 
         try:
             response = supabase.table("Customers").update(data).eq('customer_id', customer_id).execute()
+            identities.invalidate()
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +62,7 @@ class Customers(APIView):
     def delete(self, request, customer_id):
         try:
             response = supabase.table("Customers").delete().eq('customer_id', customer_id).execute()
+            identities.invalidate()
 
             if response.data:
                 return Response({"message": "Customer deleted successfully"}, status=204)
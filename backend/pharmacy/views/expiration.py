@@ -1,20 +1,28 @@
 # views.py
 
-import time
+import asyncio
 import traceback
 from datetime import datetime
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..supabase_client import get_supabase_client
+from .. import allocation, reference_data, stock
+from ..concurrency import run_async
+from ..fetch import afetch_all
+from ..loaders import Loaders
+from ..supabase_client import get_async_supabase_client, get_supabase_client
 
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
 
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class Expiration(APIView):
     def get(self, request):
+        return run_async(self.aget(request))
+
+    async def aget(self, request):
         try:
             now = datetime.now()
             start_of_month = now.replace(day=1).strftime('%Y-%m-%d')
@@ -33,14 +41,16 @@ class Expiration(APIView):
             
             while retry_count < max_retries:
                 try:
-                    expiration_query = supabase.table('Expiration').select('*')
-
                     if expiration_id:
-                        expiration_query = expiration_query.eq('expiration_id', int(expiration_id))
+                        expiration_rows = (await async_supabase.table('Expiration').select('*')
+                                           .eq('expiration_id', int(expiration_id)).execute()).data
                     else:
-                        expiration_query = expiration_query.gte('expiry_date', start_of_month).lt('expiry_date', end_of_month)
-
-                    expiration_response = expiration_query.execute()
+                        # A month of batches can exceed SUPABASE_MAX_ROWS; page through all of them
+                        expiration_rows = await afetch_all(
+                            lambda: async_supabase.table('Expiration').select('*')
+                            .gte('expiry_date', start_of_month).lt('expiry_date', end_of_month),
+                            'expiration_id', parallel=4,
+                        )
                     
                     # If we get here, the query was successful
                     break
@@ -50,112 +60,18 @@ class Expiration(APIView):
                         return Response({"error": f"Database connection error after {max_retries} attempts: {str(conn_error)}"}, status=503)
                     
                     # Wait before retrying (exponential backoff)
-                    time.sleep(1 * retry_count)
+                    await asyncio.sleep(1 * retry_count)
 
-            if not expiration_response.data:
+            if not expiration_rows:
                 return Response({"error": "No Expiration records found."}, status=404)
 
-            enriched_data = []
-
-            for exp in expiration_response.data:
-
-                if exp['quantity'] == 0:
-                    continue
-                
-                stock_item_id = exp['stock_item_id']
-
-                # Add retry logic for each related query
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        # Stock Item
-                        stock_resp = supabase.table('Stock_Item').select('*') \
-                            .eq('stock_item_id', stock_item_id).single().execute()
-                        
-                        if not stock_resp.data:
-                            break  # Skip this item
-                            
-                        stock_item = stock_resp.data
-
-                        # Filters
-                        if product_id and stock_item['product_id'] != int(product_id):
-                            break  # Skip this item
-                        if location_id and stock_item['location_id'] != int(location_id):
-                            break  # Skip this item
-
-                        # Product
-                        product_resp = supabase.table('Products').select('*') \
-                            .eq('product_id', stock_item['product_id']).single().execute()
-                        product = product_resp.data or {}
-
-                        # Get additional product details
-                        brand_resp = supabase.table('Brand').select('brand_name') \
-                            .eq('brand_id', product.get('brand_id')).single().execute()
-                        brand_name = brand_resp.data.get('brand_name', '').strip() if brand_resp.data else ''
-
-                        unit_resp = supabase.table('Unit').select('unit') \
-                            .eq('unit_id', product.get('unit_id')).single().execute()
-                        unit_name = unit_resp.data.get('unit', '').strip() if unit_resp.data else ''
-
-                        # Check if it's a drug
-                        drug_resp = supabase.table('Drugs').select('dosage_strength, dosage_form') \
-                            .eq('product_id', product.get('product_id')).single().execute()
-                        drug_info = drug_resp.data or {}
-
-                        # Location (flattened)
-                        location_resp = supabase.table('Location').select('*') \
-                            .eq('location_id', stock_item['location_id']).single().execute()
-                        location = location_resp.data or {}
-                        
-                        # If we get here, all queries were successful
-                        break
-                    except Exception as conn_error:
-                        retry_count += 1
-                        if retry_count >= max_retries:
-                            # Log the error but continue with other items
-                            print(f"Error processing item {exp['expiration_id']}: {str(conn_error)}")
-                            continue
-                        
-                        # Wait before retrying
-                        time.sleep(0.5 * retry_count)
-                
-                # Skip if we couldn't get the related data after retries
-                if retry_count >= max_retries or not stock_resp.data:
-                    continue
-
-                # Build full name using the same format as products.py
-                if drug_info:
-                    dosage_strength = drug_info.get('dosage_strength', '').strip()
-                    dosage_form = drug_info.get('dosage_form', '').strip()
-                    full_product_name = f"{product.get('product_name', 'Unknown Product')} {dosage_strength} {dosage_form} ({brand_name})"
-                else:
-                    full_product_name = f"{product.get('product_name', 'Unknown Product')} {product.get('net_content', '')} per {unit_name} ({brand_name})"
-
-                # Remove product_name from product fields
-                product.pop("product_name", None)
-
-                # Calculate days until expiry
-                expiry_date_obj = datetime.strptime(exp['expiry_date'], "%Y-%m-%d")
-                days_until_expiry = (expiry_date_obj - now).days
-
-                # Final structure
-                enriched_data.append({
-                    "expiration_id": exp['expiration_id'],
-                    "expiry_date": exp['expiry_date'],
-                    "days_until_expiry": days_until_expiry,
-                    "quantity": exp['quantity'],
-                    "location_id": location.get("location_id"),
-                    "location": location.get("location"),
-                    "Stock_Item": {
-                        "stock_item_id": stock_item['stock_item_id'],
-                        "quantity": stock_item['quantity'],
-                        "Product": {
-                            "product_id": product.get('product_id'),
-                            "full_product_name": full_product_name,
-                            **{k: v for k, v in product.items() if k != "product_name"}
-                        }
-                    }
-                })
+            # Enrich every row concurrently; the loaders batch each lookup into one query per table
+            loaders = Loaders()
+            results = await asyncio.gather(*(
+                self._enrich(loaders, exp, now, product_id, location_id, max_retries)
+                for exp in expiration_rows if exp['quantity'] != 0
+            ))
+            enriched_data = [entry for entry in results if entry is not None]
 
             return Response(enriched_data, status=200)
 
@@ -163,6 +79,92 @@ class Expiration(APIView):
             traceback.print_exc()
             return Response({"error": str(e)}, status=500)
 
+    async def _enrich(self, loaders, exp, now, product_id, location_id, max_retries):
+        """Build one response entry, or return None if the row is filtered out or its lookups fail."""
+        stock_item_id = exp['stock_item_id']
+
+        # Add retry logic for each related query
+        retry_count = 0
+        while retry_count < max_retries:
+            try:
+                # Stock Item
+                stock_item = await loaders.get('Stock_Item', 'stock_item_id').load(stock_item_id)
+                
+                if not stock_item:
+                    return None  # Skip this item
+
+                # Filters
+                if product_id and stock_item['product_id'] != int(product_id):
+                    return None  # Skip this item
+                if location_id and stock_item['location_id'] != int(location_id):
+                    return None  # Skip this item
+
+                # Product and location (flattened) only need the stock item
+                product, location = await asyncio.gather(
+                    loaders.get('Products', 'product_id').load(stock_item['product_id']),
+                    reference_data.aget('Location', stock_item['location_id']),
+                )
+                # Copy: rows from the loaders are shared by every expiration of the same product
+                product = dict(product or {})
+                location = location or {}
+
+                # Brand, unit and drug details only need the product.  Not every
+                # product is a drug, so a missing Drugs row is not an error.
+                brand, unit, drug = await asyncio.gather(
+                    reference_data.aget('Brand', product.get('brand_id')),
+                    reference_data.aget('Unit', product.get('unit_id')),
+                    loaders.get('Drugs', 'product_id', 'dosage_strength, dosage_form').load(product.get('product_id')),
+                )
+                brand_name = (brand.get('brand_name') or '').strip() if brand else ''
+                unit_name = (unit.get('unit') or '').strip() if unit else ''
+                drug_info = {k: drug[k] for k in ('dosage_strength', 'dosage_form')} if drug else {}
+                
+                # If we get here, all queries were successful
+                break
+            except Exception as conn_error:
+                retry_count += 1
+                if retry_count >= max_retries:
+                    # Log the error but continue with other items
+                    print(f"Error processing item {exp['expiration_id']}: {str(conn_error)}")
+                    return None
+                
+                # Wait before retrying
+                await asyncio.sleep(0.5 * retry_count)
+
+        # Build full name using the same format as products.py
+        if drug_info:
+            dosage_strength = drug_info.get('dosage_strength', '').strip()
+            dosage_form = drug_info.get('dosage_form', '').strip()
+            full_product_name = f"{product.get('product_name', 'Unknown Product')} {dosage_strength} {dosage_form} ({brand_name})"
+        else:
+            full_product_name = f"{product.get('product_name', 'Unknown Product')} {product.get('net_content', '')} per {unit_name} ({brand_name})"
+
+        # Remove product_name from product fields
+        product.pop("product_name", None)
+
+        # Calculate days until expiry
+        expiry_date_obj = datetime.strptime(exp['expiry_date'], "%Y-%m-%d")
+        days_until_expiry = (expiry_date_obj - now).days
+
+        # Final structure
+        return {
+            "expiration_id": exp['expiration_id'],
+            "expiry_date": exp['expiry_date'],
+            "days_until_expiry": days_until_expiry,
+            "quantity": exp['quantity'],
+            "location_id": location.get("location_id"),
+            "location": location.get("location"),
+            "Stock_Item": {
+                "stock_item_id": stock_item['stock_item_id'],
+                "quantity": stock_item['quantity'],
+                "Product": {
+                    "product_id": product.get('product_id'),
+                    "full_product_name": full_product_name,
+                    **{k: v for k, v in product.items() if k != "product_name"}
+                }
+            }
+        }
+
     def post(self, request):
         data = request.data 
         try:
@@ -185,19 +187,15 @@ class Expiration(APIView):
         try:
             quantity_to_dispose = int(quantity_to_dispose)
 
-            # 1. Get current stock quantity and src_location
-            stock_response = supabase.table("Stock_Item").select("quantity, location_id").eq("stock_item_id", stock_item_id).single().execute()
+            # 1. Get src_location
+            stock_response = supabase.table("Stock_Item").select("location_id").eq("stock_item_id", stock_item_id).single().execute()
             if not stock_response.data:
                 return Response({"error": "Stock item not found"}, status=404)
 
-            current_quantity = int(stock_response.data["quantity"])
             src_location = stock_response.data["location_id"]
 
-            if quantity_to_dispose > current_quantity:
-                return Response({"error": "Disposal quantity exceeds available stock"}, status=400)
-
-            # 2. Get current expiration quantity
-            expiration_response = supabase.table("Expiration").select("quantity").eq("expiration_id", expiration_id).single().execute()
+            # 2. Get the batch being disposed of
+            expiration_response = supabase.table("Expiration").select(allocation.BATCH_COLUMNS).eq("expiration_id", expiration_id).single().execute()
             if not expiration_response.data:
                 return Response({"error": "Expiration record not found"}, status=404)
 
@@ -205,25 +203,28 @@ class Expiration(APIView):
             if quantity_to_dispose > expiration_quantity:
                 return Response({"error": "Disposal quantity exceeds expiration quantity"}, status=400)
 
-            # 3. Insert stock transaction with src_location
-            transaction_data = {
-                "stock_item_id": stock_item_id,
+            # 3. Take the quantity off the stock item atomically (refused if it exceeds the available stock)
+            try:
+                stock.adjust({stock_item_id: -quantity_to_dispose})
+            except stock.StockError:
+                return Response({"error": "Disposal quantity exceeds available stock"}, status=400)
+
+            # 4. Take the quantity out of that batch and record the stock transaction with src_location
+            allocator = allocation.Allocator([expiration_response.data])
+            allocator.take(expiration_response.data["stock_item_id"], quantity_to_dispose, {
                 "transaction_type": "Expired Item Disposal",
-                "quantity_change": -quantity_to_dispose,
                 "disposed_date": disposal_date,
-                "src_location": src_location
-            }
-            supabase.table("Stock_Transaction").insert(transaction_data).execute()
-
-            # 4. Update stock item quantity
-            updated_stock_quantity = current_quantity - quantity_to_dispose
-            supabase.table("Stock_Item").update({"quantity": updated_stock_quantity}).eq("stock_item_id", stock_item_id).execute()
-
-            # 5. Update expiration quantity or delete if zero
-            updated_expiration_quantity = expiration_quantity - quantity_to_dispose
-
-            # Update expiration quantity
-            supabase.table("Expiration").update({"quantity": updated_expiration_quantity}).eq("expiration_id", expiration_id).execute()
+                "src_location": src_location,
+            })
+            try:
+                allocator.save()
+            except stock.StockError:
+                # Someone took from the batch since it was read
+                stock.adjust({stock_item_id: quantity_to_dispose})
+                return Response({"error": "Disposal quantity exceeds expiration quantity"}, status=400)
+            except Exception:
+                stock.adjust({stock_item_id: quantity_to_dispose})
+                raise
 
             return Response({"message": "Disposal recorded and quantities updated"}, status=200)
 
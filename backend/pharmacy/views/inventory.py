@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,17 +13,26 @@ supabase = get_supabase_client()
 class Inventory(APIView):
     def get(self, request, inventory_id=None):
         try:
+            page = get_page(request) if inventory_id is None else None
+
             query = supabase.table('Inventory').select('*')
             if inventory_id is not None:
                 query = query.eq('inventory_id', inventory_id)
+            elif page:
+                query = page.apply(query, 'inventory_id')
             
             response = query.execute()
 
             if not response.data:
                 return Response({"error": "No Inventory found"}, status=404)
 
+            if page:
+                return Response(page.respond(response.data, 'inventory_id'), status=200)
+
             return Response(response.data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
         
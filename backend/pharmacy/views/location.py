@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class Location(APIView):
     def get(self, request, location_id=None):
         try:
-            query = supabase.table('Location').select('*')
             if location_id is not None:
-                query = query.eq('location_id', location_id)
-            
-            response = query.execute()
+                row = reference_data.get('Location', location_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Location')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Location found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class Location(APIView):
         try:
            
             response = supabase.table("Location").insert(data).execute()
+            reference_data.invalidate("Location")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class Location(APIView):
         data = request.data
         try:
             response = supabase.table("Location").update(data).eq('location_id', location_id).execute()
+            reference_data.invalidate("Location")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class Location(APIView):
     def delete(self, request, location_id):
         try:
             response = supabase.table("Location").delete().eq('location_id', location_id).execute()
+            reference_data.invalidate("Location")
 
             if response.data:
                 return Response({"message": "Location deleted successfully"}, status=204)
@@ -3,6 +3,8 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import identities
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,17 +14,26 @@ supabase = get_supabase_client()
 class PersonList(APIView):
     def get(self, request, person_id=None):
         try:
+            page = get_page(request) if person_id is None else None
+
             query = supabase.table('Person').select('*')
             if person_id is not None:
                 query = query.eq('person_id', person_id)
+            elif page:
+                query = page.apply(query, 'person_id')
             
             response = query.execute()
 
             if not response.data:
                 return Response({"error": "No Person found"}, status=404)
 
+            if page:
+                return Response(page.respond(response.data, 'person_id'), status=200)
+
             return Response(response.data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
         
@@ -41,6 +52,7 @@ class PersonList(APIView):
         try:
             # Update the person in the database based on person_id
             response = supabase.table("Person").update(person_data).eq('person_id', person_id).execute()
+            identities.invalidate()
 
             if response.data:
                 return Response(response.data, status=200)
@@ -53,6 +65,7 @@ class PersonList(APIView):
         try:
             # Delete the person from the database based on person_id
             response = supabase.table("Person").delete().eq('person_id', person_id).execute()
+            identities.invalidate()
 
             if response.data:
                 return Response({"message": "Person deleted successfully"}, status=204)
@@ -3,11 +3,17 @@
 import traceback
 from calendar import month_name
 from collections import defaultdict
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
+from django.conf import settings
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import checkout, idempotency, offline_queue, pricing
+from ..checkout import CheckoutError
+from ..filters import parse_date_bound
+from ..idempotency import IdempotencyConflict, InvalidKey
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -15,15 +21,55 @@ supabase = get_supabase_client()
 def safe_date(value):
     return value.isoformat() if isinstance(value, (date, datetime)) else value
 
+def format_pos(pos):
+    formatted_items = []
+    for item in pos.get("POS_Item") or []:
+        product = item.get("Products") or {}
+        drugs = product.get("Drugs") or {}
+
+        dosage = f"{drugs.get('dosage_form', '')} {drugs.get('dosage_strength', '')}".strip()
+        full_name = f"{product.get('product_name', 'Unknown Product')} {dosage}".strip()
+
+        formatted_items.append({
+            "pos_item_id": item["pos_item_id"],
+            "product_id": product.get("product_id", "N/A"),
+            "full_product_name": full_name,
+            "quantity": item["quantity_sold"],
+            "price": item["price"],
+            "total_price": item["total_price"]
+        })
+
+    return {
+        "pos_id": pos["pos_id"],
+        "sale_date": pos.get("sale_date"),
+        "user_id": pos.get("user_id"),
+        "invoice": pos.get("invoice"),
+        "order_type": pos.get("order_type"),
+        "total_amount": pos["total_amount"],
+        "items": formatted_items
+    }
+
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class POS(APIView):
     def get(self, request, pos_id=None):
+        """Sales with their items and totals, in one query.
+
+        Filters: ``order_type``, ``user_id`` and a ``sale_date`` range with
+        ``date_from`` / ``date_to`` (inclusive; plain dates cover the whole
+        day).  ``limit`` / ``cursor`` page through the results by ``pos_id``.
+        """
         try:
-            order_type = request.query_params.get("order_type")  # e.g., 'DSWD', 'senior citizen'
+            params = request.query_params
+            order_type = params.get("order_type")  # e.g., 'DSWD', 'senior citizen'
+            page = get_page(request) if pos_id is None else None
 
-            # Base POS query
-            query = supabase.table('POS').select('*')
+            # Items, products and totals all come back embedded in the POS rows
+            query = supabase.table('POS').select(
+                "pos_id, sale_date, user_id, invoice, order_type, total_amount, "
+                "POS_Item(pos_item_id, quantity_sold, price, total_price, "
+                "Products(product_id, product_name, Drugs(dosage_form, dosage_strength)))"
+            )
 
             if pos_id is not None:
                 query = query.eq('pos_id', pos_id)
@@ -31,66 +77,39 @@ class POS(APIView):
             if order_type is not None:
                 query = query.ilike('order_type', order_type.lower())
 
+            if params.get("user_id"):
+                query = query.eq('user_id', int(params["user_id"]))
+
+            if params.get("date_from"):
+                query = query.gte('sale_date', parse_date_bound(params["date_from"]).isoformat())
+
+            if params.get("date_to"):
+                date_to = parse_date_bound(params["date_to"])
+                if isinstance(date_to, datetime):
+                    query = query.lte('sale_date', date_to.isoformat())
+                else:
+                    query = query.lt('sale_date', (date_to + timedelta(days=1)).isoformat())
+
+            if page:
+                query = page.apply(query, 'pos_id')
+
             pos_response = query.execute()
 
             if not pos_response.data:
                 return Response({"error": "No POS records found"}, status=404)
 
-            formatted_pos_data = []
-
-            for pos in pos_response.data:
-                try:
-                    # Fetch POS items with nested product/drug details
-                    items_response = (
-                        supabase.table('POS_Item')
-                        .select("*, Products(*, Drugs(*))")
-                        .eq("pos_id", pos["pos_id"])
-                        .execute()
-                    )
-
-                    items = items_response.data if items_response.data else []
-                    total_amount = 0
-                    formatted_items = []
-
-                    for item in items:
-                        product = item.get("Products") or {}
-                        drugs = product.get("Drugs") or {}
-
-                        dosage = f"{drugs.get('dosage_form', '')} {drugs.get('dosage_strength', '')}".strip()
-                        full_name = f"{product.get('product_name', 'Unknown Product')} {dosage}".strip()
-
-                        item_total = item["quantity_sold"] * item["price"]
-                        total_amount += item_total
-
-                        formatted_items.append({
-                            "pos_item_id": item["pos_item_id"],
-                            "product_id": product.get("product_id", "N/A"),
-                            "full_product_name": full_name,
-                            "quantity": item["quantity_sold"],
-                            "price": item["price"],
-                            "total_price": item_total
-                        })
-
-                    formatted_pos_data.append({
-                        "pos_id": pos["pos_id"],
-                        "sale_date": pos.get("sale_date"),
-                        "user_id": pos.get("user_id"),
-                        "invoice": pos.get("invoice"),
-                        "order_type": pos.get("order_type"),
-                        "total_amount": total_amount,
-                        "items": formatted_items
-                    })
-
-                except Exception as item_error:
-                    print(f"[ERROR] Failed to process POS ID {pos['pos_id']}:")
-                    print(traceback.format_exc())
-                    continue  # Skip this broken POS record
-
-            if not formatted_pos_data:
-                return Response({"error": "No valid POS records found"}, status=404)
+            pos_rows, next_cursor = page.split(pos_response.data, 'pos_id') if page else (pos_response.data, None)
+            formatted_pos_data = [format_pos(pos) for pos in pos_rows]
+
+            if page:
+                return Response({"results": formatted_pos_data, "next_cursor": next_cursor}, status=200)
 
             return Response(formatted_pos_data[0] if pos_id else formatted_pos_data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
+        except ValueError as e:
+            return Response({"error": f"Invalid filter: {e}"}, status=400)
         except Exception as e:
             print("=== ERROR in POS GET ===")
             print(traceback.format_exc())
@@ -102,277 +121,90 @@ class POS(APIView):
             data = request.data
             print(f"🟢 Received POS request data: {data}")
 
-            current_year = datetime.now().year
-
-            # Fetch latest pos_id for invoice generation
-            latest_pos_query = supabase.table("POS").select("pos_id") \
-                .order("pos_id", desc=True).limit(1).execute()
-
-            pos_id = (latest_pos_query.data[0]["pos_id"] + 1) if latest_pos_query.data else 1
-            invoice_number = f"POS-{current_year}-{pos_id:03d}"
-            transaction_date = datetime.fromisoformat(data["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-
-            customer_id = None
-            
-            if data["discountInfo"]["type"] == "senior":
-                data["discountInfo"]["type"] = "senior citizen"
-
-            if data["customerType"] != "regular":
-                # Determine source of name based on discount type
-                if data["customerType"] == "discount" and data["discountInfo"]["type"] in ["pwd", "senior citizen"]:
-                    name_source = data["discountInfo"]["name"]
-                    data["customerType"] = data["discountInfo"]["type"]
-                else:
-                    name_source = data["customerInfo"]["patient_name"]
-
-                name_parts = name_source.strip().split()
-
-                first_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else name_parts[0]
-                last_name = name_parts[-1] if len(name_parts) > 1 else ""
-
-                # Check if person exists
-                person_query = supabase.table("Person").select("person_id") \
-                    .eq("first_name", first_name).eq("last_name", last_name).limit(1).execute()
-
-                person_id = person_query.data[0]["person_id"] if person_query.data else None
-                if not person_id:
-                    person_insert = supabase.table("Person").insert({
-                        "first_name": first_name, "last_name": last_name
-                    }).execute()
-                    person_id = person_insert.data[0]["person_id"] if person_insert.data else None
-
-                # Check customer type
-                customer_type_query = supabase.table("Customer_Type").select("customer_type_id").ilike("description", data["customerType"]).limit(1).execute()
-
-                print(f"🧪 Checking customer type: {data['customerType']}")
-                print(f"🧪 Customer type lookup result: {customer_type_query.data}")
-
-                if not customer_type_query.data:
-                    return Response({"error": "Invalid customer type"}, status=400)
+            idempotency_key = idempotency.get_key(request)
+            if settings.OFFLINE_QUEUE and not idempotency_key:
+                # A sale queued after a timeout may have been recorded after all; the key makes its replay safe
+                idempotency_key = offline_queue.new_key()
+
+            try:
+                payload = checkout.build_payload(data)
+                result = checkout.checkout(payload, idempotency_key=idempotency_key)
+            except Exception as e:
+                if not (settings.OFFLINE_QUEUE and offline_queue.is_offline_error(e)):
+                    raise
+                queued_id = offline_queue.get_queue().enqueue(data, idempotency_key)
+                print(f"📥 Supabase unreachable ({e}), POS sale queued: ID={queued_id}, Key={idempotency_key}")
+                return Response({
+                    "message": "POS transaction queued; it will be recorded when the connection is back",
+                    "queued_id": queued_id,
+                    "idempotency_key": idempotency_key,
+                }, status=202)
+
+            response = Response({"message": "POS transaction created successfully", "pos_id": result["pos_id"]}, status=201)
+            if result.get("replayed"):
+                print(f"🔁 POS request replayed: ID={result['pos_id']}, Key={idempotency_key}")
+                response["Idempotent-Replayed"] = "true"
+            else:
+                print(f"🟢 POS Transaction Created: ID={result['pos_id']}, Invoice={result['invoice']}")
+            return response
+
+        except (CheckoutError, InvalidKey) as e:
+            return Response({"error": str(e)}, status=400)
+        except IdempotencyConflict as e:
+            return Response({"error": str(e)}, status=409)
+        except Exception as e:
+            print("❌ Exception:", str(e))
+            traceback.print_exc()
+            return Response({"error": str(e)}, status=500)
 
-                customer_type_id = customer_type_query.data[0]["customer_type_id"]
 
-                # Check if this person is already a customer
-                existing_customer_query = supabase.table("Customers").select("customer_id") \
-                    .eq("person_id", person_id).limit(1).execute()
+class POSBulk(APIView):
+    def post(self, request):
+        """Record many POS transactions in one request (offline terminals, end-of-day imports)."""
+        try:
+            data = request.data
+            sales = data.get("sales") if isinstance(data, dict) else data
+            if not isinstance(sales, list) or not sales:
+                return Response({"error": "sales must be a non-empty list"}, status=400)
+            if len(sales) > settings.POS_BULK_MAX_SALES:
+                return Response({"error": f"At most {settings.POS_BULK_MAX_SALES} sales per request"}, status=400)
+
+            entries = []
+            for index, sale in enumerate(sales):
+                if not isinstance(sale, dict):
+                    return Response({"error": f"Sale {index} is not an object"}, status=400)
+                key = sale.get("idempotency_key")
+                entries.append({
+                    "data": sale,
+                    "idempotency_key": idempotency.check_key(key, f"sales[{index}].idempotency_key") if key is not None else None,
+                })
+            print(f"🟢 Received {len(entries)} POS sales in bulk")
+
+            results = checkout.checkout_bulk(entries)
+            counts = {status: sum(1 for r in results if r["status"] == status)
+                      for status in ("created", "replayed", "rejected")}
+            print(f"🟢 Bulk POS result: {counts}")
+
+            return Response({"results": results, **counts}, status=200)
+
+        except InvalidKey as e:
+            return Response({"error": str(e)}, status=400)
+        except CheckoutError as e:
+            return Response({"error": str(e)}, status=409)
+        except Exception as e:
+            print("❌ Exception:", str(e))
+            traceback.print_exc()
+            return Response({"error": str(e)}, status=500)
 
-                if existing_customer_query.data:
-                    customer_id = existing_customer_query.data[0]["customer_id"]
-                else:
-                    # Insert customer
-                    customer_insert = supabase.table("Customers").insert({
-                        "person_id": person_id,
-                        "id_card_number": data["discountInfo"].get("idNumber"),
-                        "customer_type_id": customer_type_id
-                    }).execute()
-                    customer_id = customer_insert.data[0]["customer_id"] if customer_insert.data else None
-
-            # Insert into POS table
-            pos_insert = supabase.table("POS").insert({
-                "sale_date": transaction_date, "invoice": invoice_number, "user_id": data["user_id"], "order_type": data["customerType"]
-            }).execute()
-
-            pos_transaction_id = pos_insert.data[0]["pos_id"] if pos_insert.data else None
-            print(f"🟢 POS Transaction Created: ID={pos_transaction_id}, Invoice={invoice_number}")
-
-            # Insert Prescription if provided
-            if "prescriptionInfo" in data and data["prescriptionInfo"].get("doctorName"):
-                prescription = data["prescriptionInfo"]
-
-                # Split doctor name
-                doctor_name_parts = prescription["doctorName"].split()
-                doctor_first_name = " ".join(doctor_name_parts[:-1]) if len(doctor_name_parts) > 1 else doctor_name_parts[0]
-                doctor_last_name = doctor_name_parts[-1] if len(doctor_name_parts) > 1 else ""
-
-                # Check if physician exists
-                physician_query = supabase.table("Physician").select("physician_id", "person_id") \
-                    .eq("prc_num", prescription["PRCNumber"]).eq("ptr_num", prescription["PTRNumber"]).limit(1).execute()
-
-                physician_id = physician_query.data[0]["physician_id"] if physician_query.data else None
-
-                if not physician_id:
-                    # Check if person exists for physician
-                    person_query = supabase.table("Person").select("person_id") \
-                        .eq("first_name", doctor_first_name).eq("last_name", doctor_last_name).limit(1).execute()
-
-                    physician_person_id = person_query.data[0]["person_id"] if person_query.data else None
-                    if not physician_person_id:
-                        person_insert = supabase.table("Person").insert({
-                            "first_name": doctor_first_name, "last_name": doctor_last_name
-                        }).execute()
-                        physician_person_id = person_insert.data[0]["person_id"] if person_insert.data else None
-
-                    # Insert physician
-                    physician_insert = supabase.table("Physician").insert({
-                        "person_id": physician_person_id, "prc_num": prescription["PRCNumber"],
-                        "ptr_num": prescription["PTRNumber"]
-                    }).execute()
-                    physician_id = physician_insert.data[0]["physician_id"] if physician_insert.data else None
-
-                # Insert prescription
-                prescription_insert = supabase.table("Prescription").insert({
-                    "customer_id": customer_id, "physician_id": physician_id,
-                    "prescription_details": prescription.get("notes", ""),
-                    "date_issued": prescription["prescriptionDate"]
-                }).execute()
-
-                prescription_id = prescription_insert.data[0]["prescription_id"] if prescription_insert.data else None
-                print(f"🟢 Prescription added with ID={prescription_id} for POS ID: {pos_transaction_id}")
-
-                # ✅ Update POS with prescription_id
-                if prescription_id:
-                    supabase.table("POS").update({
-                        "prescription_id": prescription_id
-                    }).eq("pos_id", pos_transaction_id).execute()
-                    print(f"🟢 POS updated with prescription_id={prescription_id}")
-
-            # Pre-check stock levels before processing the sale
-            for item in data["items"]:
-                stock_item_query = supabase.table("Stock_Item").select("quantity") \
-                    .eq("product_id", item["product_id"]).eq("location_id", int(data["branch"])).limit(1).execute()
-                
-                if not stock_item_query.data:
-                    return Response({"error": f"Product {item['product_id']} not found in stock for this location."}, status=400)
-
-                available_quantity = stock_item_query.data[0]["quantity"]
-                if item["quantity"] > available_quantity:
-                    return Response({
-                        "error": f"Insufficient stock for product {item['product_id']}. Available: {available_quantity}, Requested: {item['quantity']}"
-                    }, status=400)
-
-            # Insert into POS_Item and update Stock_Item
-            for item in data["items"]:
-                # Fetch stock item (location-specific)
-                stock_item_query = supabase.table("Stock_Item").select("stock_item_id") \
-                    .eq("product_id", item["product_id"]).eq("location_id", int(data["branch"])).limit(1).execute()
-
-                if not stock_item_query.data:
-                    print(f"⚠️ Stock item not found for product {item['product_id']} at location {data['branch']}")
-                    continue  # Skip item
-
-                stock_item_id = stock_item_query.data[0]["stock_item_id"]
-
-                # Deduct stock item quantity
-                current_quantity_query = supabase.table("Stock_Item").select("quantity") \
-                    .eq("stock_item_id", stock_item_id).limit(1).execute()
-
-                if not current_quantity_query.data:
-                    print(f"⚠️ Failed to fetch current quantity for stock item {stock_item_id}")
-                    continue  # Skip item
-
-                current_quantity = current_quantity_query.data[0]["quantity"]
-                new_quantity = current_quantity - item["quantity"]
-
-                # Update Stock_Item quantity
-                stock_item_update = supabase.table("Stock_Item").update({
-                    "quantity": new_quantity
-                }).eq("stock_item_id", stock_item_id).execute()
-
-                if not stock_item_update.data:
-                    print(f"⚠️ Failed to update stock item {stock_item_id} for product {item['product_id']}")
-                    continue  # Skip item
-
-                print(f"🟢 Stock item {stock_item_id} updated for product {item['product_id']} with new quantity {new_quantity}")
-
-                # Insert stock transaction log (general deduction, outside FIFO logic)
-                supabase.table("Stock_Transaction").insert({
-                    "transaction_date": transaction_date,
-                    "transaction_type": "POS",
-                    "src_location": data["branch"],
-                    "des_location": None,
-                    "stock_item_id": stock_item_id,
-                    "reference_id": pos_transaction_id,
-                    "quantity_change": -item["quantity"]
-                    
-                }).execute()
-
-                # Handle FIFO expiration tracking
-                expiry_query = (
-                    supabase.table("Expiration")
-                    .select("expiration_id, expiry_date, quantity")
-                    .eq("stock_item_id", stock_item_id)
-                    .gt("quantity", 0)  # Ignore fully used stock
-                    .order("expiry_date", desc=False)  # FIFO order
-                    .execute()
-                )
-
-                remaining_qty = item["quantity"]
-
-                for batch in expiry_query.data:
-                    batch_id = batch["expiration_id"]
-                    available_qty = batch["quantity"]
-
-                    if remaining_qty <= 0:
-                        break  # Stop if order is fulfilled
-
-                    if available_qty >= remaining_qty:
-                        # Deduct from this batch only
-                        new_qty = available_qty - remaining_qty
-                        remaining_qty = 0
-                    else:
-                        # Use full batch and move to next
-                        new_qty = 0
-                        remaining_qty -= available_qty
-
-                    # Update batch quantity
-                    supabase.table("Expiration").update({"quantity": new_qty}).eq("expiration_id", batch_id).execute()
-
-                    # Log stock transaction for this batch (FIFO tracking)
-                    supabase.table("Stock_Transaction").insert({
-                        "transaction_date": transaction_date,
-                        "transaction_type": "POS",
-                        "src_location": data["branch"],
-                        "des_location": None,
-                        "stock_item_id": stock_item_id,
-                        "reference_id": pos_transaction_id,
-                        "quantity_change": -min(item["quantity"], available_qty)
-                       
-                    }).execute()
-
-
-                # Insert into POS_Item (even if stock is insufficient, for tracking)
-                supabase.table("POS_Item").insert({
-                    "pos_id": pos_transaction_id, "product_id": item["product_id"],
-                    "price": item["price"], "quantity_sold": item["quantity"]
-                }).execute()
-
-
-            print(f"🟢 Successfully inserted {len(data['items'])} items into POS_Item.")
-
-            
-            # Insert into DSWD_Order if applicable
-            if data["customerType"].upper() == "DSWD":
-                # Parse the string to proper ISO format or datetime object (depending on Supabase expectation)
-                gl_date = datetime.fromisoformat(data["customerInfo"].get("guaranteeLetterDate")).date()
-                claim_date = datetime.fromisoformat(data["customerInfo"].get("receivedDate")).date()
-                try:
-                    print("🛠 Payload to Supabase:", {
-                        "customer_id": customer_id,
-                        "gl_num": data["customerInfo"].get("guaranteeLetterNo"),
-                        "gl_date": safe_date(gl_date),
-                        "claim_date": safe_date(claim_date),
-                        "pos_id": pos_transaction_id,
-                        "client_name": data["customerInfo"].get("client_name")
-                    })
-                    response = supabase.table("Dswd_Order").insert({
-                        "customer_id": customer_id,
-                        "gl_num": data["customerInfo"].get("guaranteeLetterNo"),
-                        "gl_date": safe_date(gl_date),
-                        "claim_date": safe_date(claim_date),
-                        "pos_id": pos_transaction_id,
-                        "client_name": data["customerInfo"].get("client_name")
-                    }).execute()
-                    
-                    print("🧾 Supabase Response:", response)
-                    print(f"🟢 DSWD Order added for patient ID: {customer_id}")
-                except Exception as e:
-                    print("❌ Supabase Insert Error:", e)
-
-            return Response({"message": "POS transaction created successfully", "pos_id": pos_transaction_id}, status=201)
 
+class POSQuote(APIView):
+    def post(self, request):
+        """Price a cart from the current price list and the customer type's discount, without selling it."""
+        try:
+            return Response(pricing.quote(request.data), status=200)
+        except CheckoutError as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
-            import traceback
             print("❌ Exception:", str(e))
             traceback.print_exc()
             return Response({"error": str(e)}, status=500)
-
@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class Brand(APIView):
     def get(self, request, brand_id=None):
         try:
-            query = supabase.table('Brand').select('*')
             if brand_id is not None:
-                query = query.eq('brand_id', brand_id)
-            
-            response = query.execute()
+                row = reference_data.get('Brand', brand_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Brand')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No brand found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -30,6 +31,7 @@ class Brand(APIView):
         data = request.data
         try:
             response = supabase.table("Brand").insert(data).execute()
+            reference_data.invalidate("Brand")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -38,6 +40,7 @@ class Brand(APIView):
         data = request.data
         try:
             response = supabase.table("Brand").update(data).eq('brand_id', brand_id).execute()
+            reference_data.invalidate("Brand")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -49,6 +52,7 @@ class Brand(APIView):
     def delete(self, request, brand_id):
         try:
             response = supabase.table("Brand").delete().eq('brand_id', brand_id).execute()
+            reference_data.invalidate("Brand")
 
             if response.data:
                 return Response({"message": "Category deleted successfully"}, status=204)
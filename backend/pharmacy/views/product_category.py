@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class ProductCategory(APIView):
     def get(self, request, category_id=None):
         try:
-            query = supabase.table('Product_Category').select('*')
             if category_id is not None:
-                query = query.eq('category_id', category_id)
-            
-            response = query.execute()
+                row = reference_data.get('Product_Category', category_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Product_Category')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Product Category found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class ProductCategory(APIView):
         try:
            
             response = supabase.table("Product_Category").insert(data).execute()
+            reference_data.invalidate("Product_Category")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class ProductCategory(APIView):
         data = request.data 
         try:
             response = supabase.table("Product_Category").update(data).eq('category_id', category_id).execute()
+            reference_data.invalidate("Product_Category")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class ProductCategory(APIView):
     def delete(self, request, category_id):
         try:
             response = supabase.table("Product_Category").delete().eq('category_id', category_id).execute()
+            reference_data.invalidate("Product_Category")
 
             if response.data:
                 return Response({"message": "Category deleted successfully"}, status=204)
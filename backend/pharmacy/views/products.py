@@ -3,24 +3,47 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import pricing
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
 
+
+def format_stock(product):
+    """``stock_per_location`` of a product from its embedded Stock_Availability rows."""
+    return [
+        {
+            "location_id": item["location_id"],
+            "location": item["Location"]["location"],
+            "total_quantity": item["quantity"],
+            "expiry_details": item["expiry_details"],  # FIFO order maintained
+        }
+        for item in sorted(product.get("Stock_Availability", []), key=lambda item: item["stock_item_id"])
+    ]
+
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class Products(APIView):
     def get(self, request, product_id=None):
-        # Base query including stock items
+        # Base query including stock and batches per location, kept by the Stock_Availability triggers
         query = supabase.table("Products").select(
             "product_id, product_name, current_price, net_content, "
             "Brand(brand_id, brand_name), Product_Category(category_id, category_name), "
             "Unit(unit_id, unit), Drugs(dosage_strength, dosage_form), "
-            "Stock_Item(stock_item_id, location_id, quantity, Location(location))"
+            "Stock_Availability(stock_item_id, location_id, quantity, expiry_details, Location(location))"
         )
 
+        page = None
         if product_id:
             query = query.eq("product_id", product_id)
+        else:
+            try:
+                page = get_page(request)
+            except InvalidPage as e:
+                return Response({"error": str(e)}, status=400)
+            if page:
+                query = page.apply(query, "product_id")
 
         # Execute query
         response = query.execute()
@@ -32,33 +55,7 @@ class Products(APIView):
 
             product = products[0]  # Get the first (and only) result
             drug_info = product.get("Drugs", {})
-            stock_items = product.get("Stock_Item", [])
-
-            stock_per_location = []
-            for item in stock_items:
-                stock_item_id = item["stock_item_id"]
-
-                # ✅ Fetch Expiration details sorted by nearest expiry
-                expiry_query = (
-                    supabase.table("Expiration")
-                    .select("expiry_date, quantity")
-                    .eq("stock_item_id", stock_item_id)
-                    .gt("quantity", 0)  # Ignore fully used stock
-                    .order("expiry_date", desc=False)  # Sort FIFO (ascending order)
-                    .execute()
-                )
-                
-                expiry_data = expiry_query.data or []
-
-                stock_per_location.append({
-                    "location_id": item["location_id"],
-                    "location": item["Location"]["location"],
-                    "total_quantity": item["quantity"],
-                    "expiry_details": [
-                        {"expiry_date": exp["expiry_date"], "quantity": exp["quantity"]}
-                        for exp in expiry_data
-                    ]  # FIFO order maintained
-                })
+            stock_per_location = format_stock(product)
 
             # ✅ Check if it's a drug
             if isinstance(drug_info, dict) and drug_info:
@@ -87,39 +84,16 @@ class Products(APIView):
                 })
 
         # If no product_id, return a list of products
+        if page:
+            products, next_cursor = page.split(products, "product_id")
+
         formatted_products = []
         for product in products:
             brand_name = product.get("Brand", {}).get("brand_name", "").strip()
             category_name = product.get("Product_Category", {}).get("category_name", "").strip()
             unit_name = product.get("Unit", {}).get("unit", "").strip()
             drug_info = product.get("Drugs", {})
-            stock_items = product.get("Stock_Item", [])
-
-            stock_per_location = []
-            for item in stock_items:
-                stock_item_id = item["stock_item_id"]
-
-                # ✅ Fetch Expiration details sorted by nearest expiry
-                expiry_query = (
-                    supabase.table("Expiration")
-                    .select("expiry_date, quantity")
-                    .eq("stock_item_id", stock_item_id)
-                    .gt("quantity", 0)  # Ignore fully used stock
-                    .order("expiry_date", desc=False)  # Sort FIFO (ascending order)
-                    .execute()
-                )
-
-                expiry_data = expiry_query.data or []
-
-                stock_per_location.append({
-                    "location_id": item["location_id"],
-                    "location": item["Location"]["location"],
-                    "total_quantity": item["quantity"],
-                    "expiry_details": [
-                        {"expiry_date": exp["expiry_date"], "quantity": exp["quantity"]}
-                        for exp in expiry_data
-                    ]  # FIFO order maintained
-                })
+            stock_per_location = format_stock(product)
 
             if isinstance(drug_info, dict) and drug_info:
                 dosage_strength = drug_info.get("dosage_strength", "").strip()
@@ -138,6 +112,9 @@ class Products(APIView):
                 "stock_per_location": stock_per_location
             })
 
+        if page:
+            return Response({"results": formatted_products, "next_cursor": next_cursor})
+
         return Response(formatted_products)
 
     
@@ -155,6 +132,7 @@ class Products(APIView):
                 "net_content": data["net_content"],
                 "unit_id": data["unit_id"]
             }).execute()
+            pricing.invalidate()
 
             if not product_response.data:
                 return Response({"error": "Products insertion failed"}, status=400)
@@ -212,6 +190,7 @@ class Products(APIView):
                 "net_content": data["net_content"],
                 "unit_id": data["unit_id"]
             }).eq("product_id", product_id).execute()
+            pricing.invalidate()
 
             if not product_response.data:
                 return Response({"error": "Product not found or update failed"}, status=400)
@@ -263,6 +242,7 @@ class Products(APIView):
 
             # Delete from Products table
             response = supabase.table("Products").delete().eq("product_id", product_id).execute()
+            pricing.invalidate()
 
             if response.data:
                 return Response({"message": "Product deleted successfully"}, status=200)
@@ -1,24 +1,32 @@
 # views.py
 
-import re
+import asyncio
 from datetime import datetime
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..supabase_client import get_supabase_client
+from .. import document_numbers
+from ..concurrency import run_async
+from ..loaders import Loaders
+from ..pagination import InvalidPage, get_page
+from ..supabase_client import get_async_supabase_client, get_supabase_client
 
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
 
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class PurchaseOrder(APIView):
     def get(self, request, purchase_order_id=None):
         """Retrieve all purchase orders or a single purchase order by ID with lineItems"""
+        return run_async(self.aget(request, purchase_order_id))
+
+    async def aget(self, request, purchase_order_id=None):
         try:
             today = datetime.today().date()  # Get current date
 
-            query = supabase.table("Purchase_Order").select(
+            query = async_supabase.table("Purchase_Order").select(
                 "purchase_order_id, po_id, order_date, expected_delivery_date, purchase_order_status_id, notes, "
                 "Purchase_Order_Status!inner(purchase_order_status), "
                 "Purchase_Order_Item (purchase_order_item_id, poi_id, ordered_qty, purchase_order_item_status_id, "
@@ -32,132 +40,153 @@ class PurchaseOrder(APIView):
 
            
 
+            page = None
             if purchase_order_id is not None:
                 query = query.eq("purchase_order_id", purchase_order_id).single()
+            else:
+                page = get_page(request)
+                if page:
+                    query = page.apply(query, "purchase_order_id")
 
-            response = query.execute()
+            response = await query.execute()
 
             if not response.data:
                 return Response({"error": "No purchase orders found"}, status=404)
 
             purchase_orders = [response.data] if isinstance(response.data, dict) else response.data
-            formatted_orders = []
-
-            for order in purchase_orders:
-                purchase_order_items = order.get("Purchase_Order_Item", [])
-                
-                # ✅ Ensure purchase_order_items exists before accessing index 0
-                supplier_item = {}
-                supplier_data = {}
-                person_data = {}
-
-                if purchase_order_items:
-                    supplier_item = purchase_order_items[0].get("Supplier_Item", {})
-                    supplier_data = supplier_item.get("Supplier", {})
-                    person_data = supplier_data.get("Person", {})
-
-                expected_date = order["expected_delivery_date"]
-                current_status_id = order["purchase_order_status_id"]
-
-                # ✅ Check if order is delayed
-                if expected_date and datetime.strptime(expected_date, "%Y-%m-%d").date() < today:
-                    if current_status_id != 3:  # Avoid unnecessary updates
-                        supabase.table("Purchase_Order").update({"purchase_order_status_id": 3}).eq("purchase_order_id", order["purchase_order_id"]).execute()
-                        current_status_id = 3  # Update local variable
-
-                # ✅ Check if order is completed
-                if all(item["purchase_order_item_status_id"] != 1 for item in purchase_order_items):
-                    if current_status_id != 4:  # Avoid unnecessary updates
-                        supabase.table("Purchase_Order").update({"purchase_order_status_id": 4}).eq("purchase_order_id", order["purchase_order_id"]).execute()
-                        current_status_id = 4  # Update local variable
-
-                formatted_order = {
-                    "purchase_order_id": order["purchase_order_id"],
-                    "po_id": order["po_id"],
-                    "supplier": {
-                        "supplier_id": supplier_item.get("supplier_id", "N/A"),
-                        "name": supplier_data.get("supplier_name", "Unknown Supplier"),
-                        "contact": f"{person_data.get('first_name', '')} {person_data.get('last_name', '')}".strip(),
-                        "email": person_data.get("email", "N/A"),
-                        "phone": person_data.get("contact", "N/A"),
-                        "address": person_data.get("address", "N/A"),
-                    },
-                    "order_date": order["order_date"],
-                    "expected_date": expected_date,
-                    "po_total": 0,  # Calculate below
-                    "status_id": current_status_id,
-                    "status": order.get("Purchase_Order_Status", {}).get("purchase_order_status", "Unknown"),
-                    "notes": order["notes"],
-                    "lineItems": [],
-                }
-
-                po_total = 0
-                for item in purchase_order_items:
-                    supplier_item = item.get("Supplier_Item", {})  # Avoid KeyError
-                    product = supplier_item.get("Products", {})
-                    drugs = product.get("Drugs", {}) if "Drugs" in product else {}  # ✅ Fix for non-drug products
-                    product_id = product.get("product_id", "N/A")
-
-                    # ✅ Concatenate dosage info only if available
-                    brand_query = supabase.table("Products").select("Brand(brand_name)").eq("product_id", product_id).single().execute()
-                    brand_name = brand_query.data.get("Brand", {}).get("brand_name", "").strip() if brand_query.data else ""
-
-                    unit_query = supabase.table("Products").select("Unit(unit)").eq("product_id", product_id).single().execute()
-                    unit_name = unit_query.data.get("Unit", {}).get("unit", "").strip() if unit_query.data else ""
-
-                    net_content = product.get("net_content", "").strip()
-
-                    # Format based on whether it's a drug or not
-                    if isinstance(drugs, dict) and drugs:
-                        dosage_strength = drugs.get("dosage_strength", "").strip()
-                        dosage_form = drugs.get("dosage_form", "").strip()
-                        product_name = f"{product.get('product_name', 'Unknown Product')} {dosage_strength} {dosage_form} ({brand_name})"
-                    else:
-                        product_name = f"{product.get('product_name', 'Unknown Product')} {net_content} per {unit_name} ({brand_name})"
-
-                    supplier_price = supplier_item.get("supplier_price", 0)
-                    poi_total = item["ordered_qty"] * supplier_price
-                    po_total += poi_total
-
-                    # ✅ Fetch expiry date from Stock_Transaction
-                    # stock_transaction_query = (
-                    #     supabase.table("Stock_Transaction")
-                    #     .select("expiry_date")
-                    #     .eq("reference_id", item["purchase_order_item_id"])
-                    #     .order("expiry_date", desc=True)  # Get latest expiry date
-                    #     .limit(1)
-                    #     .maybe_single()
-                    # )
-                    # stock_transaction_result = stock_transaction_query.execute()
-
-                    # expiry_date = stock_transaction_result.data["expiry_date"] if stock_transaction_result.data else None
-
-                    formatted_order["lineItems"].append({
-                        "purchase_order_item_id": item["purchase_order_item_id"],
-                        "poi_id": item.get("poi_id", ""),
-                        "product_id": product_id,
-                        "description": product_name,  # ✅ Includes dosage info if it's a drug
-                        "ordered_qty": item["ordered_qty"],
-                        "supplier_price": supplier_price,
-                        "poi_total": poi_total,  # ✅ Renamed total → poi_total
-                        "purchase_order_item_status": item["purchase_order_item_status_id"],
-                        "po_item_status": item.get("Purchase_Order_Item_Status", {}).get("po_item_status", "Unknown"),
-                        "unit_id": item.get("unit_id", "N/A"),
-                        "unit": item.get("Unit", {}).get("unit", "N/A"),
-                        "expired_qty": item.get("expired_qty", 0),  # ✅ Added expired quantity
-                        "damaged_qty": item.get("damaged_qty", 0),  # ✅ Added damaged quantity
-                        # "expiry_date": expiry_date,  # ✅ Now fetched from Stock_Transaction
-                        "received_qty": item.get("received_qty", 0)
-                    })
-                    
-                formatted_order["po_total"] = po_total  # ✅ Renamed total → po_total
-                formatted_orders.append(formatted_order)
+            if page:
+                purchase_orders, next_cursor = page.split(purchase_orders, "purchase_order_id")
+
+            loaders = Loaders()
+            formatted_orders = await asyncio.gather(*(
+                self._format_order(loaders, order, today) for order in purchase_orders
+            ))
+
+            if page:
+                return Response({"results": formatted_orders, "next_cursor": next_cursor}, status=200)
 
             return Response(formatted_orders if purchase_order_id is None else formatted_orders[0], status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+    async def _format_order(self, loaders, order, today):
+        purchase_order_items = order.get("Purchase_Order_Item", [])
+        
+        # ✅ Ensure purchase_order_items exists before accessing index 0
+        supplier_item = {}
+        supplier_data = {}
+        person_data = {}
+
+        if purchase_order_items:
+            supplier_item = purchase_order_items[0].get("Supplier_Item", {})
+            supplier_data = supplier_item.get("Supplier", {})
+            person_data = supplier_data.get("Person", {})
+
+        # Brand and unit of every line item's product, batched across all orders
+        product_ids = [
+            (item.get("Supplier_Item") or {}).get("Products", {}).get("product_id")
+            for item in purchase_order_items
+        ]
+        brand_unit_rows = await loaders.get("Products", "product_id", "Brand(brand_name), Unit(unit)").load_many(product_ids)
+
+        expected_date = order["expected_delivery_date"]
+        current_status_id = order["purchase_order_status_id"]
+
+        # ✅ Check if order is delayed
+        if expected_date and datetime.strptime(expected_date, "%Y-%m-%d").date() < today:
+            if current_status_id != 3:  # Avoid unnecessary updates
+                await async_supabase.table("Purchase_Order").update({"purchase_order_status_id": 3}).eq("purchase_order_id", order["purchase_order_id"]).execute()
+                current_status_id = 3  # Update local variable
+
+        # ✅ Check if order is completed
+        if all(item["purchase_order_item_status_id"] != 1 for item in purchase_order_items):
+            if current_status_id != 4:  # Avoid unnecessary updates
+                await async_supabase.table("Purchase_Order").update({"purchase_order_status_id": 4}).eq("purchase_order_id", order["purchase_order_id"]).execute()
+                current_status_id = 4  # Update local variable
+
+        formatted_order = {
+            "purchase_order_id": order["purchase_order_id"],
+            "po_id": order["po_id"],
+            "supplier": {
+                "supplier_id": supplier_item.get("supplier_id", "N/A"),
+                "name": supplier_data.get("supplier_name", "Unknown Supplier"),
+                "contact": f"{person_data.get('first_name', '')} {person_data.get('last_name', '')}".strip(),
+                "email": person_data.get("email", "N/A"),
+                "phone": person_data.get("contact", "N/A"),
+                "address": person_data.get("address", "N/A"),
+            },
+            "order_date": order["order_date"],
+            "expected_date": expected_date,
+            "po_total": 0,  # Calculate below
+            "status_id": current_status_id,
+            "status": order.get("Purchase_Order_Status", {}).get("purchase_order_status", "Unknown"),
+            "notes": order["notes"],
+            "lineItems": [],
+        }
+
+        po_total = 0
+        for item, brand_units in zip(purchase_order_items, brand_unit_rows):
+            supplier_item = item.get("Supplier_Item", {})  # Avoid KeyError
+            product = supplier_item.get("Products", {})
+            drugs = product.get("Drugs", {}) if "Drugs" in product else {}  # ✅ Fix for non-drug products
+            product_id = product.get("product_id", "N/A")
+
+            # ✅ Concatenate dosage info only if available
+            brand_name = ((brand_units.get("Brand") or {}).get("brand_name") or "").strip() if brand_units else ""
+            unit_name = ((brand_units.get("Unit") or {}).get("unit") or "").strip() if brand_units else ""
+
+            net_content = product.get("net_content", "").strip()
+
+            # Format based on whether it's a drug or not
+            if isinstance(drugs, dict) and drugs:
+                dosage_strength = drugs.get("dosage_strength", "").strip()
+                dosage_form = drugs.get("dosage_form", "").strip()
+                product_name = f"{product.get('product_name', 'Unknown Product')} {dosage_strength} {dosage_form} ({brand_name})"
+            else:
+                product_name = f"{product.get('product_name', 'Unknown Product')} {net_content} per {unit_name} ({brand_name})"
+
+            supplier_price = supplier_item.get("supplier_price", 0)
+            poi_total = item["ordered_qty"] * supplier_price
+            po_total += poi_total
+
+            # ✅ Fetch expiry date from Stock_Transaction
+            # stock_transaction_query = (
+            #     supabase.table("Stock_Transaction")
+            #     .select("expiry_date")
+            #     .eq("reference_id", item["purchase_order_item_id"])
+            #     .order("expiry_date", desc=True)  # Get latest expiry date
+            #     .limit(1)
+            #     .maybe_single()
+            # )
+            # stock_transaction_result = stock_transaction_query.execute()
+
+            # expiry_date = stock_transaction_result.data["expiry_date"] if stock_transaction_result.data else None
+
+            formatted_order["lineItems"].append({
+                "purchase_order_item_id": item["purchase_order_item_id"],
+                "poi_id": item.get("poi_id", ""),
+                "product_id": product_id,
+                "description": product_name,  # ✅ Includes dosage info if it's a drug
+                "ordered_qty": item["ordered_qty"],
+                "supplier_price": supplier_price,
+                "poi_total": poi_total,  # ✅ Renamed total → poi_total
+                "purchase_order_item_status": item["purchase_order_item_status_id"],
+                "po_item_status": item.get("Purchase_Order_Item_Status", {}).get("po_item_status", "Unknown"),
+                "unit_id": item.get("unit_id", "N/A"),
+                "unit": item.get("Unit", {}).get("unit", "N/A"),
+                "expired_qty": item.get("expired_qty", 0),  # ✅ Added expired quantity
+                "damaged_qty": item.get("damaged_qty", 0),  # ✅ Added damaged quantity
+                # "expiry_date": expiry_date,  # ✅ Now fetched from Stock_Transaction
+                "received_qty": item.get("received_qty", 0)
+            })
+            
+        formatted_order["po_total"] = po_total  # ✅ Renamed total → po_total
+        return formatted_order
+
+
 
     def post(self, request):
         """Create a new Purchase Order with line items"""
@@ -165,26 +194,8 @@ class PurchaseOrder(APIView):
             data = request.data
             print(f"🟢 Received request data: {data}")  # Debugging input
 
-            # Get the current year
-            current_year = datetime.now().year
-
-            # Fetch the latest po_id for the current year
-            latest_order_query = supabase.table("Purchase_Order").select("po_id") \
-                .like("po_id", f"PO-{current_year}-%") \
-                .order("po_id", desc=True) \
-                .limit(1) \
-                .execute()
-
-            # Determine the next sequence number for purchase_order_id
-            if latest_order_query.data:
-                latest_order_id = latest_order_query.data[0]["po_id"]
-                last_number = int(latest_order_id.split("-")[-1])  # Extract last number
-                next_number = f"{last_number + 1:03d}"  # Increment and format as 3 digits
-            else:
-                next_number = "001"  # Start with 001 if no previous orders exist
-
-            # Generate the new po_id
-            po_id = f"PO-{current_year}-{next_number}"
+            # Generate the new po_id (PO-YYYY-NNN)
+            po_id = document_numbers.next_number("PO")
             purchase_order_suffix = po_id.split("-")[-1]
 
             order_date = datetime.fromisoformat(data["order_date"]).strftime("%Y-%m-%d")
@@ -209,20 +220,6 @@ class PurchaseOrder(APIView):
             supplier_id = data["supplier_id"]  # ✅ Just for querying Supplier_Item
             print(f"🟢 Supplier ID: {supplier_id}")  # Debugging
 
-            # ✅ Fetch latest POI suffix (so we don't query every time)
-            latest_item_query = supabase.table("Purchase_Order_Item").select("poi_id") \
-                .like("poi_id", f"POI-{purchase_order_suffix}-%") \
-                .order("poi_id", desc=True) \
-                .limit(1) \
-                .execute()
-
-            if latest_item_query.data:
-                latest_poi_id = latest_item_query.data[0]["poi_id"]
-                last_poi_match = re.search(r"-(\d+)$", latest_poi_id)
-                last_poi_number = int(last_poi_match.group(1)) if last_poi_match else 0
-            else:
-                last_poi_number = 0  # No previous items exist
-
             # ✅ Insert line items
             purchase_order_items = []
             for index, item in enumerate(data["lineItems"], start=1):
@@ -243,13 +240,7 @@ class PurchaseOrder(APIView):
                 supplier_item = supplier_item_query.data
                 print(f"🟢 Found Supplier_Item: {supplier_item}")  # Debugging
 
-                # ✅ Increment poi_id properly using counter
-                last_poi_number += 1
-                next_poi_number = f"{last_poi_number:02d}"
-                poi_id = f"POI-{purchase_order_suffix}-{next_poi_number}"
-
                 purchase_order_items.append({
-                    "poi_id": poi_id,
                     "purchase_order_id": purchase_order_id,
                     "supplier_item_id": supplier_item["supplier_item_id"],
                     "ordered_qty": item["ordered_qty"],
@@ -260,6 +251,11 @@ class PurchaseOrder(APIView):
                     # "expiry_date": None,
                 })
 
+            # ✅ Number the items in one call (POI-NNN-01, -02, ...)
+            poi_numbers = document_numbers.reserve(f"POI-{purchase_order_suffix}", len(purchase_order_items))
+            for item, number in zip(purchase_order_items, poi_numbers):
+                item["poi_id"] = f"POI-{purchase_order_suffix}-{number:02d}"
+
             print(f"🟢 Total Line Items to Insert: {len(purchase_order_items)}")  # Debugging
 
             if purchase_order_items:
@@ -374,17 +370,6 @@ class PurchaseOrder(APIView):
                     .execute()
                 print(f"🔍 Remaining Items After Deletion: {remaining_items_check.data}")
 
-                # 🔹 Get latest POI number after deletion
-                latest_poi_query = supabase.table("Purchase_Order_Item") \
-                    .select("poi_id") \
-                    .like("poi_id", f"POI-{purchase_order_suffix}-%") \
-                    .order("poi_id", desc=True) \
-                    .limit(1) \
-                    .execute()
-
-                last_poi_number = int(latest_poi_query.data[0]["poi_id"].split("-")[-1]) if latest_poi_query.data else 0
-                print(f"🔹 Last POI Number after deletion: {last_poi_number}")
-
                 # ✅ Process line items (update existing & insert new)
                 new_items = []
                 for item in data["lineItems"]:
@@ -411,12 +396,8 @@ class PurchaseOrder(APIView):
                             print(f"✅ Updated POI {poi_id}: {update_response}")
 
                     else:
-                        # ✅ Insert new PO Item
-                        last_poi_number += 1  # Increment for new item
-                        new_poi_id = f"POI-{purchase_order_suffix}-{last_poi_number:02d}"
-
+                        # ✅ Insert new PO Item (poi_id assigned below)
                         new_items.append({
-                            "poi_id": new_poi_id,
                             "purchase_order_id": purchase_order_id,
                             "supplier_item_id": supplier_item_id,
                             "ordered_qty": item["ordered_qty"],
@@ -426,10 +407,13 @@ class PurchaseOrder(APIView):
                             "damaged_qty": item.get("damaged_qty", 0),
                             # "expiry_date": item.get("expiry_date"),
                         })
-                        print(f"➕ New POI ID: {new_poi_id}")
 
-                # ✅ Bulk insert new items
+                # ✅ Bulk insert new items, numbered in one call
                 if new_items:
+                    poi_numbers = document_numbers.reserve(f"POI-{purchase_order_suffix}", len(new_items))
+                    for new_item, number in zip(new_items, poi_numbers):
+                        new_item["poi_id"] = f"POI-{purchase_order_suffix}-{number:02d}"
+                        print(f"➕ New POI ID: {new_item['poi_id']}")
                     insert_response = supabase.table("Purchase_Order_Item").insert(new_items).execute()
                     print(f"✅ Inserted New Items: {insert_response}")
 
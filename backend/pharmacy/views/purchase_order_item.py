@@ -5,6 +5,8 @@ from datetime import datetime, timezone
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data, stock
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -15,19 +17,28 @@ class POI(APIView):
     def get(self, request, purchase_order_item_id=None):
         """Retrieve a specific Purchase Order Item or all items"""
         try:
+            page = None
             if purchase_order_item_id:
                 response = supabase.table("Purchase_Order_Item").select("*").eq("purchase_order_item_id", purchase_order_item_id).execute()
             else:
-                response = supabase.table("Purchase_Order_Item").select("*").execute()
+                page = get_page(request)
+                query = supabase.table("Purchase_Order_Item").select("*")
+                if page:
+                    query = page.apply(query, "purchase_order_item_id")
+                response = query.execute()
 
             if hasattr(response, "error") and response.error:
                 print(f"❌ Error fetching Purchase Order Items: {response.error}")
                 return Response({"error": str(response.error)}, status=500)
 
             data = response.data
+            if page:
+                data = page.respond(data, "purchase_order_item_id")
 
             return Response(data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             print(f"❌ Exception: {str(e)}")  # Debugging
             return Response({"error": str(e)}, status=500)
@@ -64,24 +75,19 @@ class POI(APIView):
             ordered_qty = poi_result.data["ordered_qty"]
 
             # ✅ Step 2: Get Location IDs for src and destination
-            location_query = (
-                supabase.table("Location")
-                .select("location, location_id")
-                .in_("location", ["Supplier", "Asuncion - Stockroom"])
-            )
-            location_result = location_query.execute()
+            src_location = reference_data.find("Location", "location", "Supplier")
+            des_location = reference_data.find("Location", "location", "Asuncion - Stockroom")
 
-            if not location_result.data or len(location_result.data) < 2:
+            if not src_location or not des_location:
                 return Response({"error": "One or more locations not found"}, status=404)
 
-            location_map = {loc["location"]: loc["location_id"] for loc in location_result.data}
-            src_location_id = location_map.get("Supplier")
-            des_location_id = location_map.get("Asuncion - Stockroom")
+            src_location_id = src_location["location_id"]
+            des_location_id = des_location["location_id"]
 
             # ✅ Step 3: Get stock_item_id based on product_id and location
             stock_item_query = (
                 supabase.table("Stock_Item")
-                .select("stock_item_id, quantity")
+                .select("stock_item_id")
                 .eq("product_id", product_id)
                 .eq("location_id", des_location_id)  # Filter by destination location
                 .maybe_single()  # Avoids error if no result
@@ -90,20 +96,18 @@ class POI(APIView):
 
             if stock_item_result.data:
                 stock_item_id = stock_item_result.data["stock_item_id"]
-                current_quantity = stock_item_result.data["quantity"]
-                new_quantity = current_quantity + to_receive
             else:
                 # ✅ Create a new stock entry if it doesn't exist for the location
+                # (empty: the received quantity is added in Step 7 like for an existing one)
                 new_stock_item_data = {
                     "product_id": product_id,
                     "location_id": des_location_id,  # Assign destination location
-                    "quantity": to_receive,
+                    "quantity": 0,
                 }
                 stock_insert_response = supabase.table("Stock_Item").insert(new_stock_item_data).execute()
 
                 if stock_insert_response.data:
                     stock_item_id = stock_insert_response.data[0]["stock_item_id"]  # Get the newly inserted ID
-                    new_quantity = to_receive
                 else:
                     return Response({"error": "Failed to create stock item"}, status=500)
 
@@ -131,7 +135,7 @@ class POI(APIView):
                     "des_location": des_location_id,
                     "quantity_change": to_receive,
                     "transaction_date": datetime.now(timezone.utc).isoformat(),  # UTC timestamp
-                    # "expiry_date": expiry_date
+                    "expiry_date": expiry_date  # The batch received, as on the FIFO ledger rows
                 }
                 transaction_response = supabase.table("Stock_Transaction").insert(transaction_data).execute()
 
@@ -146,9 +150,8 @@ class POI(APIView):
                     if hasattr(expiration_response, "error") and expiration_response.error:
                         print(f"❌ Error inserting Expiration record: {expiration_response.error}")
 
-                # ✅ Step 7: Update Stock_Item quantity
-                supabase.table("Stock_Item").update({"quantity": new_quantity}) \
-                    .eq("stock_item_id", stock_item_id).execute()
+                # ✅ Step 7: Add the received quantity to Stock_Item atomically
+                stock.adjust({stock_item_id: to_receive})
 
                 print(f"🟢 Successfully updated POI {purchase_order_item_id}, added Stock Transaction, and updated Stock Item")
             else:
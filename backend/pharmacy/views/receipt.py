@@ -1,5 +1,6 @@
 # views.py
 
+import asyncio
 from calendar import month_name
 from collections import defaultdict
 from datetime import datetime
@@ -7,50 +8,96 @@ from datetime import datetime
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..supabase_client import get_supabase_client
+from .. import reference_data
+from ..concurrency import run_async
+from ..fetch import afetch_all, afetch_in
+from ..pagination import InvalidPage, encode_cursor, get_page
+from ..supabase_client import get_async_supabase_client, get_supabase_client
 
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
+
+def month_start(year, month):
+    """``YYYY-MM-01`` of ``month`` (which may run past 12) in ``year``."""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return f"{year:04d}-{month:02d}-01"
 
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class Receipt(APIView):
     def get(self, request):
+        return run_async(self.aget(request))
+
+    async def aget(self, request):
         try:
             # Optional month filtering
             month_param = request.query_params.get('month', '').strip().lower()
             month_lookup = {name.lower(): i for i, name in enumerate(month_name) if name}
             month_number = month_lookup.get(month_param) if month_param else None
 
+            # A page is ``limit`` calendar months starting at the cursor month
+            page = get_page(request, max_limit=12)
+            next_cursor = None
+
             # Load Stock_Transaction data
-            stock_transactions = supabase.table('Stock_Transaction').select('*').ilike('transaction_type', 'pos').execute()
-            transactions = stock_transactions.data or []
+            window = None
+            if page:
+                if page.after is None:
+                    first = await async_supabase.table('Stock_Transaction').select('transaction_date') \
+                        .ilike('transaction_type', 'pos').order('transaction_date').limit(1).execute()
+                    if not first.data:
+                        return Response({"error": "No POS transactions found"}, status=404)
+                    start = first.data[0]['transaction_date'][:7]
+                else:
+                    start = page.after
+                try:
+                    year, month = (int(part) for part in start.split('-'))
+                except (AttributeError, ValueError):
+                    raise InvalidPage("Invalid cursor") from None
+                window_end = month_start(year, month + page.limit)
+                window = (month_start(year, month), window_end)
+
+                later = await async_supabase.table('Stock_Transaction').select('stock_transaction_id') \
+                    .ilike('transaction_type', 'pos').gte('transaction_date', window_end).limit(1).execute()
+                if later.data:
+                    next_cursor = encode_cursor(window_end[:7])
+
+            def transactions_query():
+                query = async_supabase.table('Stock_Transaction').select('*').ilike('transaction_type', 'pos')
+                if window:
+                    query = query.gte('transaction_date', window[0]).lt('transaction_date', window[1])
+                return query
+
+            # Every POS transaction, not just the first SUPABASE_MAX_ROWS of them
+            transactions = await afetch_all(transactions_query, 'stock_transaction_id', parallel=4)
 
             if not transactions:
+                if page:
+                    return Response({"results": [], "next_cursor": next_cursor}, status=200)
                 return Response({"error": "No POS transactions found"}, status=404)
 
-            # POS and related data
+            # POS, their items and the (cached) customer type table are independent lookups
             pos_ids = list({txn['reference_id'] for txn in transactions if txn.get('reference_id')})
-            pos_list = supabase.table('POS').select('*').in_('pos_id', pos_ids).execute().data
+            pos_list, pos_items, customer_types = await asyncio.gather(
+                afetch_in(lambda: async_supabase.table('POS').select('*'), 'pos_id', pos_ids, key='pos_id'),
+                afetch_in(lambda: async_supabase.table('POS_Item').select('*'), 'pos_id', pos_ids, key='pos_item_id'),
+                reference_data.arows('Customer_Type'),
+            )
             pos_map = {pos['pos_id']: pos for pos in pos_list}
 
-            pos_items = supabase.table('POS_Item').select('*').in_('pos_id', pos_ids).execute().data
             pos_items_by_pos = defaultdict(list)
             for item in pos_items:
                 total_price = item["quantity_sold"] * item["price"]
                 item["total_price"] = total_price
                 pos_items_by_pos[item['pos_id']].append(item)
 
+            customer_type_map = {ct['customer_type_id']: ct for ct in customer_types}
+
+            # Prescriptions with their customer embedded
             prescription_ids = [pos['prescription_id'] for pos in pos_list if pos.get('prescription_id')]
-            prescriptions = supabase.table('Prescription').select('*').in_('prescription_id', prescription_ids).execute().data
+            prescriptions = await afetch_in(lambda: async_supabase.table('Prescription').select('*, Customers(*)'), 'prescription_id', prescription_ids, key='prescription_id')
             prescription_map = {p['prescription_id']: p for p in prescriptions}
-
-            customer_ids = [p['customer_id'] for p in prescriptions if p.get('customer_id')]
-            customers = supabase.table('Customers').select('*').in_('customer_id', customer_ids).execute().data
-            customer_map = {c['customer_id']: c for c in customers}
-
-            customer_type_ids = [c['customer_type_id'] for c in customers if c.get('customer_type_id')]
-            customer_types = supabase.table('Customer_Type').select('*').in_('customer_type_id', customer_type_ids).execute().data
-            customer_type_map = {ct['customer_type_id']: ct for ct in customer_types}
+            customer_map = {p['Customers']['customer_id']: p['Customers'] for p in prescriptions if p.get('Customers')}
 
             # Organize monthly -> daily sales
             monthly_sales = defaultdict(lambda: defaultdict(lambda: {
@@ -129,8 +176,13 @@ class Receipt(APIView):
                     }
                 })
 
+            if page:
+                return Response({"results": all_months_response, "next_cursor": next_cursor}, status=200)
+
             return Response(all_months_response, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
         
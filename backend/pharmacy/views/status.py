@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class Status(APIView):
     def get(self, request, status_id=None):
         try:
-            query = supabase.table('Status').select('*')
             if status_id is not None:
-                query = query.eq('status_id', status_id)
-            
-            response = query.execute()
+                row = reference_data.get('Status', status_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Status')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Status found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class Status(APIView):
         try:
            
             response = supabase.table("Status").insert(data).execute()
+            reference_data.invalidate("Status")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class Status(APIView):
         data = request.data
         try:
             response = supabase.table("Status").update(data).eq('status_id', status_id).execute()
+            reference_data.invalidate("Status")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class Status(APIView):
     def delete(self, request, status_id):
         try:
             response = supabase.table("Status").delete().eq('status_id', status_id).execute()
+            reference_data.invalidate("Status")
 
             if response.data:
                 return Response({"message": "Status deleted successfully"}, status=204)
@@ -1,23 +1,32 @@
 # views.py
 
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..supabase_client import get_supabase_client
+from .. import ledger, reference_data, stock
+from ..concurrency import run_async
+from ..fetch import afetch_in, fetch_all, fetch_in
+from ..filters import parse_date_bound
+from ..supabase_client import get_async_supabase_client, get_supabase_client
 
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
 
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
 class StockItem(APIView):
     def get(self, request):
+        return run_async(self.aget(request))
+
+    async def aget(self, request):
         try:
             threshold = request.query_params.get('threshold')
             branch = request.query_params.get('branch')  # Treated as location_id
 
-            query = supabase.table('Stock_Item').select('*')
+            query = async_supabase.table('Stock_Item').select('*')
 
             if threshold is not None:
                 query = query.lt('quantity', int(threshold))
@@ -25,7 +34,7 @@ class StockItem(APIView):
             if branch is not None:
                 query = query.eq('location_id', int(branch))
 
-            response = query.execute()
+            response = await query.execute()
             if not response.data:
                 return Response({"error": "No low stock items found"}, status=404)
 
@@ -33,30 +42,30 @@ class StockItem(APIView):
             product_ids = list(set(item['product_id'] for item in stock_items))
             location_ids = list(set(item['location_id'] for item in stock_items))
 
-            # Fetch Products
-            products_resp = supabase.table('Products').select('product_id, product_name, current_price, category_id, brand_id').in_('product_id', product_ids).execute()
-            product_map = {prod['product_id']: prod for prod in products_resp.data}
-
-            # Fetch Drugs
-            drugs_resp = supabase.table('Drugs').select('product_id, dosage_form, dosage_strength').in_('product_id', product_ids).execute()
-            drug_map = {drug['product_id']: drug for drug in drugs_resp.data}
-
-            # Fetch Categories
-            category_ids = list(set(prod['category_id'] for prod in products_resp.data if prod.get('category_id')))
-            categories_resp = supabase.table('Product_Category').select('category_id, category_name').in_('category_id', category_ids).execute()
+            # Fetch Products and Drugs concurrently; locations come from the reference cache
+            products, drugs, locations = await asyncio.gather(
+                afetch_in(lambda: async_supabase.table('Products').select('product_id, product_name, current_price, category_id, brand_id'),
+                          'product_id', product_ids, key='product_id'),
+                afetch_in(lambda: async_supabase.table('Drugs').select('product_id, dosage_form, dosage_strength'),
+                          'product_id', product_ids, key='product_id'),
+                reference_data.aget_many('Location', location_ids),
+            )
+            product_map = {prod['product_id']: prod for prod in products}
+            drug_map = {drug['product_id']: drug for drug in drugs}
+            location_map = {loc_id: loc['location'] for loc_id, loc in locations.items()}
+
+            # Categories and Brands of those products
+            category_ids = list(set(prod['category_id'] for prod in products if prod.get('category_id')))
+            brand_ids = list(set(prod['brand_id'] for prod in products if prod.get('brand_id')))
+            categories, brands = await asyncio.gather(
+                reference_data.aget_many('Product_Category', category_ids),
+                reference_data.aget_many('Brand', brand_ids),
+            )
             category_map = {
-                cat['category_id']: cat['category_name'].strip() if cat.get('category_name') else None
-                for cat in categories_resp.data
+                cat_id: cat['category_name'].strip() if cat.get('category_name') else None
+                for cat_id, cat in categories.items()
             }
-
-            # Fetch Brands
-            brand_ids = list(set(prod['brand_id'] for prod in products_resp.data if prod.get('brand_id')))
-            brands_resp = supabase.table('Brand').select('brand_id, brand_name').in_('brand_id', brand_ids).execute()
-            brand_map = {brand['brand_id']: brand['brand_name'] for brand in brands_resp.data}
-
-            # Fetch Locations
-            locations_resp = supabase.table('Location').select('location_id, location').in_('location_id', location_ids).execute()
-            location_map = {loc['location_id']: loc['location'] for loc in locations_resp.data}
+            brand_map = {brand_id: brand['brand_name'] for brand_id, brand in brands.items()}
 
             formatted_items = []
             for item in stock_items:
@@ -101,6 +110,17 @@ class StockItem(APIView):
         try:
            
             response = supabase.table("Stock_Item").insert(data).execute()
+
+            # A stock item created with stock gets its opening ledger entry
+            for stock_item in response.data:
+                if stock_item.get("quantity"):
+                    supabase.table("Stock_Transaction").insert({
+                        "stock_item_id": stock_item["stock_item_id"],
+                        "transaction_type": "Opening Balance",
+                        "quantity_change": stock_item["quantity"],
+                        "des_location": stock_item["location_id"],
+                        "transaction_date": datetime.now(timezone.utc).isoformat()
+                    }).execute()
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -145,22 +165,27 @@ class StockItem(APIView):
             if not stock_response.data:
                 return Response({"error": "Stock item not found"}, status=404)
 
+            stock_item_id = stock_response.data[0]["stock_item_id"]
             current_quantity = int(stock_response.data[0]["quantity"])
 
-            # 3. Insert stock transaction with src_location
+            # 2. Apply the correction as a delta, so sales made since the read are not overwritten
+            # 3. Insert stock transaction with src_location (the same delta, so the ledger adds up);
+            #    the correction is taken back if the row cannot be written
+            quantity_change = quantity - current_quantity
             transaction_data = {
-                "stock_item_id": stock_response.data[0]["stock_item_id"],
+                "stock_item_id": stock_item_id,
                 "transaction_type": transaction_type,
-                "quantity_change": current_quantity - quantity,
-                "src_location": location_id
+                "quantity_change": quantity_change,
+                "src_location": location_id,
+                "transaction_date": datetime.now(timezone.utc).isoformat()
             }
-            supabase.table("Stock_Transaction").insert(transaction_data).execute()
-
-            # 4. Update stock item quantity
-            supabase.table("Stock_Item").update({"quantity": quantity}).eq("product_id", product_id).eq("location_id", location_id).execute()
+            with stock.adjusted({stock_item_id: quantity_change}):
+                supabase.table("Stock_Transaction").insert(transaction_data).execute()
 
             return Response({"message": "Disposal recorded and quantities updated"}, status=200)
 
+        except stock.StockError as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -177,3 +202,64 @@ class StockItem(APIView):
                 return Response({"error": "Stock_Item not found or deletion failed"}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
+
+
+class StockAsOf(APIView):
+    def get(self, request):
+        """Per-product, per-location quantities at a past moment, folded from the ledger.
+
+        ``?as_of=`` is a date (the end of that day) or a datetime; ``branch``
+        (location_id) and ``product_id`` narrow it down.  Reads the nearest
+        daily snapshot and the entries after it (see ``pharmacy/ledger.py``).
+        Stock that was in hand before the ledger was complete counts from just
+        before each stock item's first entry (the snapshots migration's
+        ``Opening Balance`` rows).
+        """
+        try:
+            params = request.query_params
+            if not params.get("as_of"):
+                return Response({"error": "as_of is required"}, status=400)
+            as_of = parse_date_bound(params["as_of"])
+            branch = params.get("branch")  # Treated as location_id
+            product_id = params.get("product_id")
+
+            def stock_items():
+                query = supabase.table("Stock_Item").select("stock_item_id, product_id, location_id")
+                if branch is not None:
+                    query = query.eq("location_id", int(branch))
+                if product_id is not None:
+                    query = query.eq("product_id", int(product_id))
+                return query
+
+            rows = fetch_all(stock_items, "stock_item_id")
+            filtered = branch is not None or product_id is not None
+            quantities = ledger.quantities([row["stock_item_id"] for row in rows] if filtered else None, as_of)
+            held = [row for row in rows if quantities.get(row["stock_item_id"])]
+
+            product_ids = sorted({row["product_id"] for row in held})
+            products = {product["product_id"]: product for product in fetch_in(
+                lambda: supabase.table("Products").select("product_id, product_name, Drugs(dosage_form, dosage_strength)"),
+                "product_id", product_ids, key="product_id")}
+            locations = reference_data.get_many("Location", {row["location_id"] for row in held})
+
+            results = []
+            for row in held:
+                product = products.get(row["product_id"], {})
+                drugs = product.get("Drugs") or {}
+                dosage = f"{drugs.get('dosage_form') or ''} {drugs.get('dosage_strength') or ''}".strip()
+                results.append({
+                    "product_id": row["product_id"],
+                    "full_product_name": f"{product.get('product_name', 'Unknown Product')} {dosage}".strip(),
+                    "location_id": row["location_id"],
+                    "location_name": locations.get(row["location_id"], {}).get("location", "Unknown Location"),
+                    "quantity": quantities[row["stock_item_id"]],
+                })
+            results.sort(key=lambda item: (item["location_id"], item["full_product_name"]))
+
+            return Response({"as_of": as_of.isoformat(), "results": results}, status=200)
+
+        except ValueError as e:
+            return Response({"error": f"Invalid filter: {e}"}, status=400)
+        except Exception as e:
+            print(f"❌ Exception: {str(e)}")  # Debugging
+            return Response({"error": str(e)}, status=500)
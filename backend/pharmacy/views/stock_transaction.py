@@ -1,31 +1,65 @@
 # views.py
+import asyncio
 from datetime import datetime
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..supabase_client import get_supabase_client
+from .. import ledger, reference_data, stock
+from ..concurrency import run_async
+from ..fetch import afetch_all, afetch_in
+from ..pagination import InvalidPage, get_page
+from ..supabase_client import get_async_supabase_client, get_supabase_client
 
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
 
 #Handling Input: You can access the individual fields in the request data (e.g., request.data['name'], request.data['email']) and use them in your logic (e.g., saving them to a database).
 
+def ledger_changes(entry, sign):
+    """The ``stock.adjust`` change that adds (1) or takes back (-1) a ledger entry."""
+    if entry.get("stock_item_id") is None or not entry.get("quantity_change"):
+        return []
+    return [(entry["stock_item_id"], sign * int(entry["quantity_change"]))]
+
 class StockTransaction(APIView):
     
     def get(self, request):
+        return run_async(self.aget(request))
+
+    async def aget(self, request):
         try:
             transaction_type = request.query_params.get('transaction_type')
             order_type = request.query_params.get('order_type')
             branch = request.query_params.get('branch')
+            page = get_page(request)
 
-            query = supabase.table('Stock_Transaction').select('*')
-            if transaction_type:
-                query = query.ilike('transaction_type', transaction_type)
+            # Special case for branch 8: include transactions from branches 1 and 3
+            branch_filter = []
+            if branch == "8":
+                branch_filter = ["1", "3"]  # Include transactions from branches 1 and 3
+            elif branch:
+                branch_filter = [branch]    # Just filter for the requested branch
 
-            stock_transactions = query.execute()
-            if not stock_transactions.data:
+            def transactions_query():
+                query = async_supabase.table('Stock_Transaction').select('*')
+                if transaction_type:
+                    query = query.ilike('transaction_type', transaction_type)
+                # Filter branches in the query so a page is not thinned out afterwards
+                if branch_filter:
+                    query = query.in_('src_location', branch_filter)
+                return query
+
+            if page:
+                rows = (await page.apply(transactions_query(), 'stock_transaction_id').execute()).data
+            else:
+                # The whole history, not just the first SUPABASE_MAX_ROWS rows
+                rows = await afetch_all(transactions_query, 'stock_transaction_id', parallel=4)
+            if not rows:
                 return Response({"error": "No Stock_Transaction found"}, status=404)
 
+            transactions, next_cursor = page.split(rows, 'stock_transaction_id') if page else (rows, None)
+
             filtered_transactions = []
             pos_ids = set()
             src_location_ids = set()
@@ -33,19 +67,20 @@ class StockTransaction(APIView):
             # To track which POS IDs we've already processed
             processed_pos_ids = set()
 
-            # Special case for branch 8: include transactions from branches 1 and 3
-            branch_filter = []
-            if branch == "8":
-                branch_filter = ["1", "3"]  # Include transactions from branches 1 and 3
-            elif branch:
-                branch_filter = [branch]    # Just filter for the requested branch
+            # A POS listed on an earlier page must not be listed again on this one
+            if page and page.after is not None:
+                page_pos_ids = list({txn['reference_id'] for txn in transactions
+                                     if txn.get('transaction_type', '').lower() == 'pos'})
+                def earlier_query():
+                    query = async_supabase.table('Stock_Transaction').select('stock_transaction_id, reference_id') \
+                        .ilike('transaction_type', 'pos').lte('stock_transaction_id', page.after)
+                    if branch_filter:
+                        query = query.in_('src_location', branch_filter)
+                    return query
+                earlier = await afetch_in(earlier_query, 'reference_id', page_pos_ids, key='stock_transaction_id')
+                processed_pos_ids.update(row['reference_id'] for row in earlier)
             
-            
-            for txn in stock_transactions.data:
-                # Skip if src_location doesn't match our branch filter
-                if branch and str(txn.get('src_location')) not in branch_filter and branch_filter:
-                    continue
-                
+            for txn in transactions:
                 # For POS transactions, we'll only include the first one we encounter for each POS ID
                 if txn.get('transaction_type', '').lower() == 'pos':
                     ref_id = txn['reference_id']
@@ -64,10 +99,20 @@ class StockTransaction(APIView):
                 filtered_transactions.append(txn)
 
             if not filtered_transactions:
+                if page:
+                    return Response({"results": [], "next_cursor": next_cursor}, status=200)
                 return Response({"error": "No Stock_Transaction matched filters"}, status=404)
 
+            # Everything below depends only on the transactions, so fetch it concurrently.
+            # ID lists can run into the thousands; afetch_in splits them into URL-sized chunks.
+            pos_list, pos_item_data, dswd_orders, locations = await asyncio.gather(
+                afetch_in(lambda: async_supabase.table('POS').select('*'), 'pos_id', pos_ids, key='pos_id'),
+                afetch_in(lambda: async_supabase.table('POS_Item').select('*, Products(*, Drugs(*))'), 'pos_id', pos_ids, key='pos_item_id'),
+                afetch_in(lambda: async_supabase.table('Dswd_Order').select('*'), 'pos_id', pos_ids, key='dswd_order_id'),
+                reference_data.aget_many('Location', src_location_ids),
+            )
+
             # POS
-            pos_list = supabase.table('POS').select('*').in_('pos_id', list(pos_ids)).execute().data
             pos_map = {pos['pos_id']: pos for pos in pos_list}
 
             # Filter by order_type
@@ -82,7 +127,6 @@ class StockTransaction(APIView):
                 ]
 
             # POS Items
-            pos_item_data = supabase.table('POS_Item').select('*, Products(*, Drugs(*))').in_('pos_id', list(pos_ids)).execute().data
             pos_items_by_pos = {}
             for item in pos_item_data:
                 pos_id = item['pos_id']
@@ -101,42 +145,38 @@ class StockTransaction(APIView):
                 }
                 pos_items_by_pos.setdefault(pos_id, []).append(formatted_item)
 
-            dswd_orders = supabase.table('Dswd_Order').select('*').in_('pos_id', list(pos_ids)).execute().data
             dswd_map = {order['pos_id']: order for order in dswd_orders}
             
             
             # Prescriptions
             prescription_ids = [pos['prescription_id'] for pos in pos_list if pos.get('prescription_id')]
-            prescriptions = supabase.table('Prescription').select('*').in_('prescription_id', prescription_ids).execute().data
+            prescriptions = await afetch_in(lambda: async_supabase.table('Prescription').select('*'), 'prescription_id', prescription_ids, key='prescription_id')
             prescription_map = {p['prescription_id']: p for p in prescriptions}
 
-            # Customers
+            # Customers and physicians
             customer_ids = [p['customer_id'] for p in prescriptions if p.get('customer_id')]
-            customers = supabase.table('Customers').select('*').in_('customer_id', customer_ids).execute().data
+            physician_ids = [p['physician_id'] for p in prescriptions if p.get('physician_id')]
+            customers, physicians = await asyncio.gather(
+                afetch_in(lambda: async_supabase.table('Customers').select('*'), 'customer_id', customer_ids, key='customer_id'),
+                afetch_in(lambda: async_supabase.table('Physician').select('*'), 'physician_id', physician_ids, key='physician_id'),
+            )
             customer_map = {c['customer_id']: c for c in customers}
+            physician_map = {d['physician_id']: d for d in physicians}
 
-            # Customer Types
+            # Customer types, persons for customers and persons for physicians
             customer_type_ids = [c['customer_type_id'] for c in customers if c.get('customer_type_id')]
-            customer_types = supabase.table('Customer_Type').select('customer_type_id, discount').in_('customer_type_id', customer_type_ids).execute().data
-            customer_type_map = {ct['customer_type_id']: ct for ct in customer_types}
-
-            # Persons for customers
             person_ids = [c['person_id'] for c in customers if c.get('person_id')]
-            persons = supabase.table('Person').select('*').in_('person_id', person_ids).execute().data
-            person_map = {p['person_id']: p for p in persons}
-
-            # Physicians and their persons
-            physician_ids = [p['physician_id'] for p in prescriptions if p.get('physician_id')]
-            physicians = supabase.table('Physician').select('*').in_('physician_id', physician_ids).execute().data
-            physician_map = {d['physician_id']: d for d in physicians}
-
             physician_person_ids = [d['person_id'] for d in physicians if d.get('person_id')]
-            physician_persons = supabase.table('Person').select('*').in_('person_id', physician_person_ids).execute().data
+            customer_type_map, persons, physician_persons = await asyncio.gather(
+                reference_data.aget_many('Customer_Type', customer_type_ids),
+                afetch_in(lambda: async_supabase.table('Person').select('*'), 'person_id', person_ids, key='person_id'),
+                afetch_in(lambda: async_supabase.table('Person').select('*'), 'person_id', physician_person_ids, key='person_id'),
+            )
+            person_map = {p['person_id']: p for p in persons}
             physician_person_map = {p['person_id']: p for p in physician_persons}
 
             # Locations
-            locations = supabase.table('Location').select('*').in_('location_id', list(src_location_ids)).execute().data
-            location_map = {l['location_id']: l['location'] for l in locations}
+            location_map = {l_id: l['location'] for l_id, l in locations.items()}
 
             def format_dswd_details(dswd):
                 return {
@@ -220,8 +260,13 @@ class StockTransaction(APIView):
                                     customer.pop("person_id", None)
                                     txn["customer"] = customer
 
+            if page:
+                return Response({"results": filtered_transactions, "next_cursor": next_cursor}, status=200)
+
             return Response(filtered_transactions, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -240,15 +285,6 @@ class StockTransaction(APIView):
             # Ensure transaction_date is in ISO format (Supabase timestamptz requirement)
             transaction_date = data.get("transaction_date", datetime.utcnow().isoformat() + "Z")  # Default to now in UTC
 
-            # Validate stock item
-            stock_item_query = supabase.table("Stock_Item").select("*").eq("stock_item_id", stock_item_id).single()
-            stock_item = stock_item_query.execute()
-
-            if not stock_item.data:
-                return Response({"error": "Stock item not found"}, status=404)
-
-            current_quantity = stock_item.data["quantity"]
-
             # Validate reference_id based on transaction type
             valid_reference = False
             if transaction_type == "POI":
@@ -261,10 +297,6 @@ class StockTransaction(APIView):
             if not valid_reference:
                 return Response({"error": f"Invalid reference ID for transaction type {transaction_type}"}, status=400)
 
-            # Ensure stock doesn't go negative for outbound transactions
-            if quantity_change < 0 and current_quantity + quantity_change < 0:
-                return Response({"error": "Insufficient stock"}, status=400)
-
             # Insert stock transaction
             transaction_data = {
                 "stock_item_id": stock_item_id,
@@ -275,11 +307,10 @@ class StockTransaction(APIView):
                 "quantity_change": quantity_change,
                 "transaction_date": transaction_date  # Ensure this is in ISO format
             }
-            response = supabase.table("Stock_Transaction").insert(transaction_data).execute()
-
-            # Update Stock_Item quantity
-            updated_quantity = current_quantity + quantity_change
-            supabase.table("Stock_Item").update({"quantity": updated_quantity}).eq("stock_item_id", stock_item_id).execute()
+            # Apply the change atomically (refused if it would take the stock below zero),
+            # taken back if the ledger row cannot be written
+            with stock.adjusted({stock_item_id: quantity_change}):
+                response = supabase.table("Stock_Transaction").insert(transaction_data).execute()
 
             return Response(response.data, status=201)
 
@@ -289,22 +320,44 @@ class StockTransaction(APIView):
     def put(self, request, stock_transaction_id):
         data = request.data 
         try:
-            response = supabase.table("Stock_Transaction").update(data).eq('stock_transaction_id', stock_transaction_id).execute()
-
-            if response.data:
-                return Response(response.data, status=200)
-            else:
+            existing = supabase.table("Stock_Transaction").select("*").eq('stock_transaction_id', stock_transaction_id).execute()
+            if not existing.data:
                 return Response({"error": "Customer not found or update failed"}, status=400)
+            old = existing.data[0]
+            new = {**old, **data}
+
+            # The ledger is the record of the quantity: Stock_Item moves by the entry's change, and
+            # everything is taken back if the entry or the snapshots that counted it cannot follow
+            with stock.adjusted(ledger_changes(old, -1) + ledger_changes(new, 1)):
+                response = supabase.table("Stock_Transaction").update(data).eq('stock_transaction_id', stock_transaction_id).execute()
+                if not response.data:
+                    raise LookupError("Customer not found or update failed")
+                try:
+                    ledger.amend(old, response.data[0])
+                except Exception:
+                    supabase.table("Stock_Transaction").update({column: old[column] for column in data if column in old}) \
+                        .eq('stock_transaction_id', stock_transaction_id).execute()
+                    raise
+            return Response(response.data, status=200)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
    
     def delete(self, request, stock_transaction_id):
         try:
-            response = supabase.table("Stock_Transaction").delete().eq('stock_transaction_id', stock_transaction_id).execute()
-
-            if response.data:
-                return Response({"message": "Customer deleted successfully"}, status=204)
-            else:
+            existing = supabase.table("Stock_Transaction").select("*").eq('stock_transaction_id', stock_transaction_id).execute()
+            if not existing.data:
                 return Response({"error": "Customer not found or deletion failed"}, status=400)
+
+            with stock.adjusted(ledger_changes(existing.data[0], -1)):
+                response = supabase.table("Stock_Transaction").delete().eq('stock_transaction_id', stock_transaction_id).execute()
+                if not response.data:
+                    raise LookupError("Customer not found or deletion failed")
+                try:
+                    ledger.amend(existing.data[0])
+                except Exception:
+                    supabase.table("Stock_Transaction").insert(existing.data[0]).execute()
+                    raise
+            return Response({"message": "Customer deleted successfully"}, status=204)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
+
@@ -5,6 +5,9 @@ from datetime import datetime, timedelta, timezone
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import allocation, document_numbers, stock
+from ..fetch import fetch_in
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -28,14 +31,19 @@ class StockTransfer(APIView):
                 "Products (product_name, Drugs (dosage_strength, dosage_form)))"
             )
 
+            page = None
             if stock_transfer_id:
                 query = query.eq("stock_transfer_id", stock_transfer_id).single()
-            elif direction in ["src", "des"] and location_id:
-                location_column = "src_location" if direction == "src" else "des_location"
-                if location_id == 8:
-                    query = query.in_(location_column, [1, 3])
-                else:
-                    query = query.eq(location_column, location_id)
+            else:
+                if direction in ["src", "des"] and location_id:
+                    location_column = "src_location" if direction == "src" else "des_location"
+                    if location_id == 8:
+                        query = query.in_(location_column, [1, 3])
+                    else:
+                        query = query.eq(location_column, location_id)
+                page = get_page(request)
+                if page:
+                    query = page.apply(query, "stock_transfer_id")
 
             response = query.execute()
 
@@ -43,6 +51,8 @@ class StockTransfer(APIView):
                 return Response({"error": "No stock transfers found"}, status=404)
 
             stock_transfers = [response.data] if isinstance(response.data, dict) else response.data
+            if page:
+                stock_transfers, next_cursor = page.split(stock_transfers, "stock_transfer_id")
             formatted_transfers = []
 
             # Collect product_ids from Stock_Transfer_Item
@@ -54,15 +64,17 @@ class StockTransfer(APIView):
             }
 
             # Fetch stock quantities based on Expiration table
-            stock_response = supabase.table("Expiration").select(
-                "stock_item_id, quantity"
-            ).in_("stock_item_id", list(product_ids)).filter(
-                "expiry_date", "gte", (datetime.now() + timedelta(days=180)).strftime("%Y-%m-%d")
-            ).execute()
+            min_expiry = (datetime.now() + timedelta(days=180)).strftime("%Y-%m-%d")
+            stock_rows = fetch_in(
+                lambda: supabase.table("Expiration").select(
+                    "expiration_id, stock_item_id, quantity"
+                ).filter("expiry_date", "gte", min_expiry),
+                "stock_item_id", product_ids, key="expiration_id",
+            )
 
             # Manually sum quantities per stock_item_id
             stock_items = {}
-            for item in (stock_response.data or []):
+            for item in stock_rows:
                 stock_id = item["stock_item_id"]
                 quantity = item.get("quantity", 0)
                 stock_items[stock_id] = stock_items.get(stock_id, 0) + quantity
@@ -107,8 +119,13 @@ class StockTransfer(APIView):
 
                 formatted_transfers.append(formatted_transfer)
 
+            if page:
+                return Response({"results": formatted_transfers, "next_cursor": next_cursor}, status=200)
+
             return Response(formatted_transfers if stock_transfer_id is None else formatted_transfers[0], status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -125,22 +142,7 @@ class StockTransfer(APIView):
             items = data.get("transferItems", [])  # ✅ Correct key
 
             # ✅ Generate transfer_id (ST-YYYY-XXX)
-            year = datetime.now().year
-            last_transfer = (
-                supabase.table("Stock_Transfer")
-                .select("transfer_id")
-                .order("transfer_id", desc=True)
-                .limit(1)
-                .execute()
-            )
-
-            next_number = 1
-            if last_transfer.data:
-                last_id = last_transfer.data[0]["transfer_id"]
-                last_number = int(last_id.split("-")[-1])
-                next_number = last_number + 1
-
-            transfer_id = f"ST-{year}-{str(next_number).zfill(3)}"
+            transfer_id = document_numbers.next_number("ST")
 
             # ✅ Insert into Stock_Transfer
             stock_transfer = {
@@ -331,106 +333,96 @@ class StockTransfer(APIView):
 
             # ✅ If only `stock_transfer_status_id` is provided, update only the status
             if set(data.keys()) == {"stock_transfer_status_id"}:
-                update_response = (
-                    supabase.table("Stock_Transfer")
-                    .update({"stock_transfer_status_id": data["stock_transfer_status_id"]})
-                    .eq("stock_transfer_id", stock_transfer_id)
-                    .execute()
-                )
+                completing = data["stock_transfer_status_id"] == 4
 
-                if not update_response.data:
-                    return Response(
-                        {"error": "Stock transfer not found or not updated"}, status=404
-                    )
-
-                print(f"✅ Updated Stock Transfer Status: {update_response}")
-
-                # ✅ If status is "Completed", update all stock transfer items and handle stock movement
-                if data["stock_transfer_status_id"] == 4:
-                    # Update all stock transfer items to completed
-                    supabase.table("Stock_Transfer_Item").update(
-                        {"stock_transfer_item_status_id": 4}
-                    ).eq("stock_transfer_id", stock_transfer_id).execute()
-
-                    # Fetch stock transfer details
+                # ✅ Completing claims the transfer, then moves the stock; if that fails (the source cannot
+                #    cover it, or a later write), what it did is taken back and the transfer reopened
+                if completing:
                     transfer_query = (
                         supabase.table("Stock_Transfer")
-                        .select("src_location, des_location")
+                        .select("src_location, des_location, stock_transfer_status_id")
                         .eq("stock_transfer_id", stock_transfer_id)
-                        .single()
                         .execute()
                     )
-                    transfer_data = transfer_query.data
-
-                    if not transfer_data:
+                    if not transfer_query.data:
+                        return Response(
+                            {"error": "Stock transfer not found or not updated"}, status=404
+                        )
+                    transfer_data = transfer_query.data[0]
+                    if transfer_data["stock_transfer_status_id"] == 4:
                         return Response(
-                            {"error": "Stock transfer locations not found"}, status=404
+                            {"error": "Stock transfer is already completed"}, status=400
                         )
 
                     src_location = transfer_data["src_location"]
                     des_location = transfer_data["des_location"]
 
-                    # Fetch stock transfer items
+                    # Fetch stock transfer items and their stock at both locations
                     items_query = (
                         supabase.table("Stock_Transfer_Item")
-                        .select("product_id, ordered_quantity, stock_transfer_item_id")
+                        .select("product_id, ordered_quantity, stock_transfer_item_id, stock_transfer_item_status_id")
                         .eq("stock_transfer_id", stock_transfer_id)
                         .execute()
                     )
                     items = items_query.data or []
+                    stock_items = {
+                        (row["product_id"], row["location_id"]): row["stock_item_id"]
+                        for row in fetch_in(
+                            lambda: supabase.table("Stock_Item")
+                            .select("stock_item_id, product_id, location_id")
+                            .in_("location_id", [src_location, des_location]),
+                            "product_id", sorted({item["product_id"] for item in items}), key="stock_item_id",
+                        )
+                    }
 
+                    # (stock_item_id at source or None, stock_item_id at destination, item) per line
+                    moves = []
+                    changes = []
                     for item in items:
-                        product_id = item["product_id"]
-                        qty = item["ordered_quantity"]
-                        stock_transfer_item_id = item["stock_transfer_item_id"]
-
-                        # ✅ Fetch current stock from source location
-                        src_stock_query = (
-                            supabase.table("Stock_Item")
-                            .select("quantity")
-                            .eq("product_id", product_id)
-                            .eq("location_id", src_location)
-                            .single()
-                            .execute()
-                        )
-                        src_stock_data = src_stock_query.data
-                        print(f"🔍 Source Stock Data: {src_stock_data}")
-
-                        if src_stock_data:
-                            new_src_quantity = max(0, src_stock_data["quantity"] - qty)
-                            print(f"🔍 New Source Quantity: {new_src_quantity}")
-                            supabase.table("Stock_Item").update(
-                                {"quantity": new_src_quantity}
-                            ).eq("product_id", product_id).eq("location_id", src_location).execute()
-
-                        # ✅ Fetch current stock from destination location
-                        des_stock_query = (
-                            supabase.table("Stock_Item")
-                            .select("quantity")
-                            .eq("product_id", product_id)
-                            .eq("location_id", des_location)
-                            .single()
-                            .execute()
+                        src_stock_item_id = stock_items.get((item["product_id"], src_location))
+                        des_stock_item_id = stock_items.get((item["product_id"], des_location))
+                        if des_stock_item_id is None:
+                            return Response(
+                                {"error": f"Product {item['product_id']} has no stock item at the destination"},
+                                status=404,
+                            )
+                        if src_stock_item_id is not None:
+                            changes.append((src_stock_item_id, -item["ordered_quantity"]))
+                        changes.append((des_stock_item_id, item["ordered_quantity"]))
+                        moves.append((src_stock_item_id, des_stock_item_id, item))
+
+                    # ✅ Claim the transfer before moving anything, so a retry or a second click cannot move it twice
+                    claim_response = (
+                        supabase.table("Stock_Transfer")
+                        .update({"stock_transfer_status_id": 4})
+                        .eq("stock_transfer_id", stock_transfer_id)
+                        .neq("stock_transfer_status_id", 4)
+                        .execute()
+                    )
+                    if not claim_response.data:
+                        return Response(
+                            {"error": "Stock transfer is already completed"}, status=400
                         )
-                        des_stock_data = des_stock_query.data
-                        print(f"🔍 Destination Stock Data: {des_stock_data}")
-
-                        new_des_quantity = des_stock_data["quantity"] + qty
-                        print(f"🔍 New Destination Quantity: {new_des_quantity}")
-                        stock_item_res = supabase.table("Stock_Item").update({"quantity": new_des_quantity}).eq("product_id", product_id).eq("location_id", des_location).execute()
-
-                        # Insert into Stock_Transaction
-                        supabase.table("Stock_Transaction").insert(
-                            {
-                                "quantity_change": qty,
-                                "transaction_type": "Transfer",
-                                "src_location": src_location,
-                                "des_location": des_location,
-                                "transaction_date": datetime.now(timezone.utc).isoformat(),
-                                "stock_item_id": stock_item_res.data[0]["stock_item_id"],
-                                "reference_id": stock_transfer_item_id,
-                            }
-                        ).execute()
+
+                    # ✅ One atomic call for every quantity; refused if the source would go below zero
+                    try:
+                        quantities = stock.adjust(changes)
+                    except stock.StockError as e:
+                        # Nothing moved; reopen the transfer
+                        self._reopen(stock_transfer_id, transfer_data, items)
+                        return Response({"error": str(e)}, status=400)
+                    print(f"🔍 New Stock Quantities: {quantities}")
+                    print(f"✅ Updated Stock Transfer Status: {claim_response}")
+
+                    try:
+                        self._complete_items(stock_transfer_id, src_location, des_location, moves)
+                    except Exception as e:
+                        # Take back everything the completion did, then reopen, so it can be completed again
+                        stock.adjust([(stock_item_id, -delta) for stock_item_id, delta in changes])
+                        self._reopen(stock_transfer_id, transfer_data, items)
+                        if isinstance(e, stock.StockError):
+                            return Response({"error": str(e)}, status=400)
+                        raise
 
                     return Response(
                         {
@@ -438,6 +430,20 @@ class StockTransfer(APIView):
                         },
                         status=200,
                     )
+                else:
+                    update_response = (
+                        supabase.table("Stock_Transfer")
+                        .update({"stock_transfer_status_id": data["stock_transfer_status_id"]})
+                        .eq("stock_transfer_id", stock_transfer_id)
+                        .execute()
+                    )
+
+                    if not update_response.data:
+                        return Response(
+                            {"error": "Stock transfer not found or not updated"}, status=404
+                        )
+
+                    print(f"✅ Updated Stock Transfer Status: {update_response}")
 
                 return Response(
                     {"message": "Stock transfer status updated successfully"}, status=200
@@ -450,6 +456,52 @@ class StockTransfer(APIView):
             return Response({"error": str(e)}, status=500)
 
    
+    def _complete_items(self, stock_transfer_id, src_location, des_location, moves):
+        """Mark every item completed and move the expiry batches, with one ledger row per batch.
+
+        All or nothing: what was written is taken back before an error propagates.
+        """
+        allocator = allocation.Allocator.load(
+            stock_item_id for move in moves for stock_item_id in move[:2] if stock_item_id
+        )
+        transaction_date = datetime.now(timezone.utc).isoformat()
+        for src_stock_item_id, des_stock_item_id, item in moves:
+            entry = {
+                "transaction_type": "Transfer",
+                "src_location": src_location,
+                "des_location": des_location,
+                "transaction_date": transaction_date,
+                "reference_id": item["stock_transfer_item_id"],
+            }
+            qty = item["ordered_quantity"]
+            # A debit at the source and a credit at the destination per batch moved, soonest expiry first
+            parts = allocator.take(src_stock_item_id, qty, entry) if src_stock_item_id else [(None, qty)]
+            for expiry_date, moved in parts:
+                allocator.receive(des_stock_item_id, expiry_date, moved, entry)
+
+        try:
+            supabase.table("Stock_Transfer_Item").update(
+                {"stock_transfer_item_status_id": 4}
+            ).eq("stock_transfer_id", stock_transfer_id).execute()
+            allocator.save()
+        except Exception:
+            allocator.restore()
+            supabase.table("Stock_Transaction").delete().eq("transaction_type", "Transfer") \
+                .in_("reference_id", [item["stock_transfer_item_id"] for _, _, item in moves]).execute()
+            raise
+
+    def _reopen(self, stock_transfer_id, transfer_data, items):
+        """Put a claimed transfer and its items back to the statuses they were read with."""
+        statuses = {}
+        for item in items:
+            statuses.setdefault(item.get("stock_transfer_item_status_id"), []).append(item["stock_transfer_item_id"])
+        for status_id, item_ids in statuses.items():
+            supabase.table("Stock_Transfer_Item").update({"stock_transfer_item_status_id": status_id}) \
+                .in_("stock_transfer_item_id", item_ids).execute()
+        supabase.table("Stock_Transfer").update(
+            {"stock_transfer_status_id": transfer_data["stock_transfer_status_id"]}
+        ).eq("stock_transfer_id", stock_transfer_id).execute()
+
     def delete(self, request, stock_transfer_id):
         try:
             response = supabase.table("Stock_Transfer").delete().eq('stock_transfer_id', stock_transfer_id).execute()
@@ -5,6 +5,8 @@ from datetime import datetime, timezone
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data, stock
+from ..pagination import InvalidPage, get_page
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -15,19 +17,28 @@ class STI(APIView):
     def get(self, request, stock_transfer_item_id=None):
         """Retrieve a specific Purchase Order Item or all items"""
         try:
+            page = None
             if stock_transfer_item_id:
                 response = supabase.table("Stock_Transfer_Item").select("*").eq("stock_transfer_item_id", stock_transfer_item_id).execute()
             else:
-                response = supabase.table("Stock_Transfer_Item").select("*").execute()
+                page = get_page(request)
+                query = supabase.table("Stock_Transfer_Item").select("*")
+                if page:
+                    query = page.apply(query, "stock_transfer_item_id")
+                response = query.execute()
 
             if hasattr(response, "error") and response.error:
                 print(f"❌ Error fetching Purchase Order Items: {response.error}")
                 return Response({"error": str(response.error)}, status=500)
 
             data = response.data
+            if page:
+                data = page.respond(data, "stock_transfer_item_id")
 
             return Response(data, status=200)
 
+        except InvalidPage as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             print(f"❌ Exception: {str(e)}")  # Debugging
             return Response({"error": str(e)}, status=500)
@@ -66,7 +77,7 @@ class STI(APIView):
             # ✅ Step 2: Get stock_item_id
             stock_item_query = (
                 supabase.table("Stock_Item")
-                .select("stock_item_id, quantity")
+                .select("stock_item_id")
                 .eq("product_id", product_id)
                 .single()
             )
@@ -76,8 +87,6 @@ class STI(APIView):
                 return Response({"error": "Stock item not found"}, status=404)
 
             stock_item_id = stock_item_result.data["stock_item_id"]
-            current_quantity = stock_item_result.data["quantity"]
-            new_quantity = current_quantity + to_receive
 
             # ✅ Step 3: Update the Stock_Transfer_Item table
             update_response = supabase.table("Stock_Transfer_Item").update({
@@ -96,19 +105,14 @@ class STI(APIView):
             total_qty_handled = to_receive + expired_qty + damaged_qty
             if total_qty_handled == ordered_qty:
                 # ✅ Step 5: Get Location IDs for src and destination
-                location_query = (
-                    supabase.table("Location")
-                    .select("location, location_id")
-                    .in_("location", ["Supplier", "Asuncion - Stockroom"])
-                )
-                location_result = location_query.execute()
-
-                if not location_result.data or len(location_result.data) < 2:
+                src_location = reference_data.find("Location", "location", "Supplier")
+                des_location = reference_data.find("Location", "location", "Asuncion - Stockroom")
+
+                if not src_location or not des_location:
                     return Response({"error": "One or more locations not found"}, status=404)
 
-                location_map = {loc["location"]: loc["location_id"] for loc in location_result.data}
-                src_location_id = location_map.get("Supplier")
-                des_location_id = location_map.get("Asuncion - Stockroom")
+                src_location_id = src_location["location_id"]
+                des_location_id = des_location["location_id"]
 
                 # ✅ Step 6: Insert a Stock Transaction
                 transaction_data = {
@@ -122,8 +126,8 @@ class STI(APIView):
                 }
                 transaction_response = supabase.table("Stock_Transaction").insert(transaction_data).execute()
 
-                # ✅ Step 7: Update Stock_Item quantity
-                supabase.table("Stock_Item").update({"quantity": new_quantity}).eq("stock_item_id", stock_item_id).execute()
+                # ✅ Step 7: Add the received quantity to Stock_Item atomically
+                stock.adjust({stock_item_id: to_receive})
 
                 print(f"🟢 Successfully updated POI {stock_transfer_item_id}, added Stock Transaction, and updated Stock Item")
             else:
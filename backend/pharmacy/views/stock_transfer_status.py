@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,17 +13,16 @@ supabase = get_supabase_client()
 class Stock_Transfer_Status(APIView):
     def get(self, request, stock_transfer_status_id=None):
         try:
-            query = supabase.table('Stock_Transfer_Status').select('*')
-
             if stock_transfer_status_id is not None:
-                query = query.eq('stock_transfer_status_id', stock_transfer_status_id)
-
-            response = query.execute()
+                row = reference_data.get('Stock_Transfer_Status', stock_transfer_status_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Stock_Transfer_Status')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Stock_Transfer_Status found"}, status=404)
 
-            return Response(response.data[0] if stock_transfer_status_id else response.data, status=200)
+            return Response(data[0] if stock_transfer_status_id else data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -33,6 +33,7 @@ class Stock_Transfer_Status(APIView):
         try:
            
             response = supabase.table("Stock_Transfer_Status").insert(data).execute()
+            reference_data.invalidate("Stock_Transfer_Status")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -41,6 +42,7 @@ class Stock_Transfer_Status(APIView):
         data = request.data
         try:
             response = supabase.table("Stock_Transfer_Status").update(data).eq('stock_transfer_status_id', stock_transfer_status_id).execute()
+            reference_data.invalidate("Stock_Transfer_Status")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -52,6 +54,7 @@ class Stock_Transfer_Status(APIView):
     def delete(self, request, stock_transfer_status_id):
         try:
             response = supabase.table("Stock_Transfer_Status").delete().eq('stock_transfer_status_id', stock_transfer_status_id).execute()
+            reference_data.invalidate("Stock_Transfer_Status")
 
             if response.data:
                 return Response({"message": "Stock_Transfer_Status deleted successfully"}, status=204)
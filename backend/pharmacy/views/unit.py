@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class Unit(APIView):
     def get(self, request, unit_id=None):
         try:
-            query = supabase.table('Unit').select('*')
             if unit_id is not None:
-                query = query.eq('unit_id', unit_id)
-            
-            response = query.execute()
+                row = reference_data.get('Unit', unit_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('Unit')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No Unit found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -31,6 +32,7 @@ class Unit(APIView):
         try:
            
             response = supabase.table("Unit").insert(data).execute()
+            reference_data.invalidate("Unit")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -39,6 +41,7 @@ class Unit(APIView):
         data = request.data
         try:
             response = supabase.table("Unit").update(data).eq('unit_id', unit_id).execute()
+            reference_data.invalidate("Unit")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -50,6 +53,7 @@ class Unit(APIView):
     def delete(self, request, unit_id):
         try:
             response = supabase.table("Unit").delete().eq('unit_id', unit_id).execute()
+            reference_data.invalidate("Unit")
 
             if response.data:
                 return Response({"message": "Unit deleted successfully"}, status=204)
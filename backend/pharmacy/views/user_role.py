@@ -3,6 +3,7 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -12,16 +13,16 @@ supabase = get_supabase_client()
 class UserRole(APIView):
     def get(self, request, role_id=None):
         try:
-            query = supabase.table('User_Role').select('*')
             if role_id is not None:
-                query = query.eq('role_id', role_id)
-            
-            response = query.execute()
+                row = reference_data.get('User_Role', role_id)
+                data = [row] if row else []
+            else:
+                data = reference_data.rows('User_Role')
 
-            if not response.data:
+            if not data:
                 return Response({"error": "No User Roles found"}, status=404)
 
-            return Response(response.data, status=200)
+            return Response(data, status=200)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -30,6 +31,7 @@ class UserRole(APIView):
         user_data = request.data 
         try:
             response = supabase.table("User_Role").insert(user_data).execute()
+            reference_data.invalidate("User_Role")
             return Response(response.data, status=201)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
@@ -38,6 +40,7 @@ class UserRole(APIView):
         user_data = request.data 
         try:
             response = supabase.table("User_Role").update(user_data).eq('role_id', role_id).execute()
+            reference_data.invalidate("User_Role")
 
             if response.data:
                 return Response(response.data, status=200)
@@ -49,6 +52,7 @@ class UserRole(APIView):
     def delete(self, request, role_id):
         try:
             response = supabase.table("User_Role").delete().eq('role_id', role_id).execute()
+            reference_data.invalidate("User_Role")
 
             if response.data:
                 return Response({"message": "User_Role deleted successfully"}, status=204)
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken  # type: ignore
 
+from .. import reference_data
 from ..supabase_client import get_supabase_client
 
 supabase = get_supabase_client()
@@ -213,8 +214,8 @@ class UserLoginView(APIView):
             return Response({"error": "Invalid password"}, status=400)
 
         # Fetch role_name using role_id
-        role_response = supabase.table("User_Role").select("role_name").eq("role_id", user["role_id"]).execute()
-        role_name = role_response.data[0]["role_name"] if role_response.data else None
+        role = reference_data.get("User_Role", user["role_id"])
+        role_name = role["role_name"] if role else None
 
         location_id = user.get("location_id")
         location = user.get("Location", {}).get("location")  # Safe access
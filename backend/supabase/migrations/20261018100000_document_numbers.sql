@@ -0,0 +1,221 @@
+-- Document numbers (POS-2026-001, PO-2026-001, ST-2026-001, POI-001-01) from
+-- atomic counters instead of "read the latest number and add one", which
+-- costs a round trip and hands the same number to concurrent requests.
+--
+-- One row per counter; the year is part of the counter name ("PO-2026"), so
+-- numbering restarts at 1 every year.  The upsert in next_document_number
+-- locks the counter row, so concurrent callers queue up and each gets its own
+-- block of numbers; a rolled-back caller leaves a gap, as a sequence would.
+
+create table "Document_Counter" (
+    counter text primary key,
+    last_value bigint not null default 0
+);
+
+-- Continue from the numbers already issued
+insert into "Document_Counter" (counter, last_value)
+select 'POS-' || split_part(invoice, '-', 2), max(split_part(invoice, '-', 3)::bigint)
+from "POS"
+where invoice ~ '^POS-[0-9]{4}-[0-9]+$'
+group by 1
+on conflict (counter) do nothing;
+
+insert into "Document_Counter" (counter, last_value)
+select 'PO-' || split_part(po_id, '-', 2), max(split_part(po_id, '-', 3)::bigint)
+from "Purchase_Order"
+where po_id ~ '^PO-[0-9]{4}-[0-9]+$'
+group by 1
+on conflict (counter) do nothing;
+
+insert into "Document_Counter" (counter, last_value)
+select 'POI-' || split_part(poi_id, '-', 2), max(split_part(poi_id, '-', 3)::bigint)
+from "Purchase_Order_Item"
+where poi_id ~ '^POI-[0-9]+-[0-9]+$'
+group by 1
+on conflict (counter) do nothing;
+
+insert into "Document_Counter" (counter, last_value)
+select 'ST-' || split_part(transfer_id, '-', 2), max(split_part(transfer_id, '-', 3)::bigint)
+from "Stock_Transfer"
+where transfer_id ~ '^ST-[0-9]{4}-[0-9]+$'
+group by 1
+on conflict (counter) do nothing;
+
+-- Reserve how_many numbers from counter; returns the last one of the block.
+create or replace function next_document_number(counter text, how_many integer default 1)
+returns bigint
+language sql
+as $$
+    insert into "Document_Counter" as c (counter, last_value)
+    values (next_document_number.counter, how_many)
+    on conflict (counter) do update set last_value = c.last_value + excluded.last_value
+    returning c.last_value;
+$$;
+
+create or replace function format_document_number(prefix text, year integer, number bigint)
+returns text
+language sql
+immutable
+as $$
+    select format('%s-%s-%s', prefix, year, lpad(number::text, greatest(3, length(number::text)), '0'));
+$$;
+
+-- pos_checkout, now numbering invoices per year from the POS counter
+create or replace function pos_checkout(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_location bigint := (payload->>'location_id')::bigint;
+    v_sale_date timestamptz := (payload->>'sale_date')::timestamptz;
+    v_customer jsonb := payload->'customer';
+    v_prescription jsonb := payload->'prescription';
+    v_dswd jsonb := payload->'dswd';
+    v_person_id bigint;
+    v_customer_id bigint;
+    v_physician_id bigint;
+    v_prescription_id bigint;
+    v_pos_id bigint;
+    v_invoice text;
+    v_stock_item_id bigint;
+    v_available integer;
+    v_remaining integer;
+    v_take integer;
+    v_line record;
+    v_batch record;
+begin
+    -- Lock the cart's stock rows (in product order, so concurrent sales cannot
+    -- deadlock) and check every product before writing anything.
+    for v_line in
+        select (item->>'product_id')::bigint as product_id, sum((item->>'quantity')::integer) as quantity
+        from jsonb_array_elements(payload->'items') as item
+        group by 1
+        order by 1
+    loop
+        select quantity into v_available
+        from "Stock_Item"
+        where product_id = v_line.product_id and location_id = v_location
+        for update;
+
+        if not found then
+            raise exception 'Product % not found in stock for this location.', v_line.product_id;
+        end if;
+        if v_line.quantity > v_available then
+            raise exception 'Insufficient stock for product %. Available: %, Requested: %',
+                v_line.product_id, v_available, v_line.quantity;
+        end if;
+    end loop;
+
+    if jsonb_typeof(v_customer) = 'object' then
+        select person_id into v_person_id
+        from "Person"
+        where first_name = v_customer->>'first_name' and last_name = v_customer->>'last_name'
+        order by person_id
+        limit 1;
+        if v_person_id is null then
+            insert into "Person" (first_name, last_name)
+            values (v_customer->>'first_name', v_customer->>'last_name')
+            returning person_id into v_person_id;
+        end if;
+
+        select customer_id into v_customer_id
+        from "Customers"
+        where person_id = v_person_id
+        order by customer_id
+        limit 1;
+        if v_customer_id is null then
+            insert into "Customers" (person_id, id_card_number, customer_type_id)
+            values (v_person_id, v_customer->>'id_card_number', (v_customer->>'customer_type_id')::bigint)
+            returning customer_id into v_customer_id;
+        end if;
+    end if;
+
+    if jsonb_typeof(v_prescription) = 'object' then
+        select physician_id into v_physician_id
+        from "Physician"
+        where prc_num = v_prescription->>'prc_num' and ptr_num = v_prescription->>'ptr_num'
+        order by physician_id
+        limit 1;
+        if v_physician_id is null then
+            v_person_id := null;
+            select person_id into v_person_id
+            from "Person"
+            where first_name = v_prescription->>'first_name' and last_name = v_prescription->>'last_name'
+            order by person_id
+            limit 1;
+            if v_person_id is null then
+                insert into "Person" (first_name, last_name)
+                values (v_prescription->>'first_name', v_prescription->>'last_name')
+                returning person_id into v_person_id;
+            end if;
+
+            insert into "Physician" (person_id, prc_num, ptr_num)
+            values (v_person_id, v_prescription->>'prc_num', v_prescription->>'ptr_num')
+            returning physician_id into v_physician_id;
+        end if;
+
+        insert into "Prescription" (customer_id, physician_id, prescription_details, date_issued)
+        values (v_customer_id, v_physician_id, v_prescription->>'details', (v_prescription->>'date_issued')::date)
+        returning prescription_id into v_prescription_id;
+    end if;
+
+    v_invoice := format_document_number('POS', extract(year from now())::int,
+                                        next_document_number('POS-' || extract(year from now())::int));
+
+    insert into "POS" (sale_date, invoice, user_id, order_type, prescription_id)
+    values (v_sale_date, v_invoice, (payload->>'user_id')::bigint, payload->>'order_type', v_prescription_id)
+    returning pos_id into v_pos_id;
+
+    for v_line in
+        select (item->>'product_id')::bigint as product_id,
+               (item->>'price')::numeric as price,
+               (item->>'quantity')::integer as quantity
+        from jsonb_array_elements(payload->'items') with ordinality as t(item, position)
+        order by position
+    loop
+        update "Stock_Item"
+        set quantity = quantity - v_line.quantity
+        where product_id = v_line.product_id and location_id = v_location
+        returning stock_item_id into v_stock_item_id;
+
+        -- FIFO: use up the batches closest to expiry first, one ledger row per batch touched
+        v_remaining := v_line.quantity;
+        for v_batch in
+            select expiration_id, expiry_date, quantity
+            from "Expiration"
+            where stock_item_id = v_stock_item_id and quantity > 0
+            order by expiry_date, expiration_id
+            for update
+        loop
+            exit when v_remaining <= 0;
+            v_take := least(v_batch.quantity, v_remaining);
+
+            update "Expiration" set quantity = quantity - v_take where expiration_id = v_batch.expiration_id;
+
+            insert into "Stock_Transaction"
+                (transaction_date, transaction_type, src_location, stock_item_id, reference_id, quantity_change, expiry_date)
+            values (v_sale_date, 'POS', v_location, v_stock_item_id, v_pos_id, -v_take, v_batch.expiry_date);
+
+            v_remaining := v_remaining - v_take;
+        end loop;
+
+        -- Stock that is not recorded in any batch
+        if v_remaining > 0 then
+            insert into "Stock_Transaction"
+                (transaction_date, transaction_type, src_location, stock_item_id, reference_id, quantity_change)
+            values (v_sale_date, 'POS', v_location, v_stock_item_id, v_pos_id, -v_remaining);
+        end if;
+
+        insert into "POS_Item" (pos_id, product_id, price, quantity_sold)
+        values (v_pos_id, v_line.product_id, v_line.price, v_line.quantity);
+    end loop;
+
+    if jsonb_typeof(v_dswd) = 'object' then
+        insert into "Dswd_Order" (customer_id, pos_id, gl_num, gl_date, claim_date, client_name)
+        values (v_customer_id, v_pos_id, v_dswd->>'gl_num', (v_dswd->>'gl_date')::date,
+                (v_dswd->>'claim_date')::date, v_dswd->>'client_name');
+    end if;
+
+    return jsonb_build_object('pos_id', v_pos_id, 'invoice', v_invoice);
+end;
+$$;
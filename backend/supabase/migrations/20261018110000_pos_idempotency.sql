@@ -0,0 +1,63 @@
+-- Idempotent POS submissions.
+--
+-- Terminals send an Idempotency-Key header with every sale and reuse it when
+-- they retry.  pos_checkout claims the key in the same transaction as the
+-- sale: the first request records the sale and stores its result with the
+-- key, a retry gets that stored result back (with "replayed": true) instead
+-- of selling again.  A retry that arrives while the first request is still
+-- running waits on the key row and then replays.  Reusing a key for a
+-- different cart, or for a sale another path claimed and has not finished,
+-- is refused with HTTP 409.  Keys are forgotten after
+-- payload->'idempotency'->>'ttl' seconds.
+
+create table "Idempotency_Key" (
+    key text primary key,
+    request_hash text not null,
+    response jsonb,
+    created_at timestamptz not null default now(),
+    expires_at timestamptz not null
+);
+
+create index idempotency_key_expires_at_idx on "Idempotency_Key" (expires_at);
+
+-- The sale itself, unchanged; pos_checkout below wraps it.
+alter function pos_checkout(jsonb) rename to pos_record_sale;
+
+create or replace function pos_checkout(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_idempotency jsonb := payload->'idempotency';
+    v_key text := v_idempotency->>'key';
+    v_hash text := v_idempotency->>'request_hash';
+    v_stored "Idempotency_Key"%rowtype;
+    v_result jsonb;
+begin
+    if v_key is null then
+        return pos_record_sale(payload);
+    end if;
+
+    delete from "Idempotency_Key" where expires_at <= now();
+
+    insert into "Idempotency_Key" (key, request_hash, expires_at)
+    values (v_key, v_hash, now() + make_interval(secs => coalesce((v_idempotency->>'ttl')::int, 86400)))
+    on conflict (key) do nothing;
+
+    if not found then
+        select * into v_stored from "Idempotency_Key" where key = v_key;
+        if v_stored.request_hash is distinct from v_hash then
+            raise sqlstate 'PT409' using message = 'Idempotency key was already used for a different sale';
+        end if;
+        -- Claimed outside this function (POST /pos/bulk/, or idempotency.claim) and not finished
+        if v_stored.response is null then
+            raise sqlstate 'PT409' using message = 'A sale with this idempotency key is still being processed';
+        end if;
+        return v_stored.response || jsonb_build_object('replayed', true);
+    end if;
+
+    v_result := pos_record_sale(payload);
+    update "Idempotency_Key" set response = v_result where key = v_key;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,36 @@
+-- Many POS sales in one round trip (checkout.checkout_many: POST /pos/bulk/
+-- and the offline queue sync).
+--
+-- Each element of sales is a pos_checkout payload.  Sales are recorded in
+-- order, each in its own subtransaction: one that pos_checkout refuses
+-- (stock, reused idempotency key, a user or product that does not exist) is
+-- rolled back and reported, the rest still go through.  Returns one result
+-- per sale, in order:
+--   {"status": "created" | "replayed", "pos_id", "invoice"}
+--   {"status": "rejected", "error"}
+
+create or replace function pos_checkout_bulk(sales jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_sale jsonb;
+    v_result jsonb;
+    v_results jsonb := '[]'::jsonb;
+begin
+    for v_sale in select value from jsonb_array_elements(sales) with ordinality order by ordinality
+    loop
+        begin
+            v_result := pos_checkout(v_sale);
+            v_results := v_results || jsonb_build_array(jsonb_build_object(
+                'status', case when coalesce((v_result->>'replayed')::boolean, false) then 'replayed' else 'created' end,
+                'pos_id', v_result->'pos_id',
+                'invoice', v_result->'invoice'
+            ));
+        exception when sqlstate 'P0001' or sqlstate 'PT409' or foreign_key_violation then
+            v_results := v_results || jsonb_build_array(jsonb_build_object('status', 'rejected', 'error', sqlerrm));
+        end;
+    end loop;
+    return v_results;
+end;
+$$;
@@ -0,0 +1,222 @@
+-- Find-or-create for the people named on a sale.
+--
+-- resolve_customers and resolve_physicians take a JSON array and return the
+-- matching ids in the same order, creating the Person / Customers / Physician
+-- rows that do not exist yet, so a whole cart (or a bulk upload) resolves in
+-- one call per kind.  Names match case-insensitively.  The tables have no
+-- unique keys to upsert on (old data has duplicates), so each lookup takes a
+-- transaction-scoped advisory lock on the natural key instead: two sales
+-- naming the same new customer at once still create a single row.
+-- pos_record_sale (what pos_checkout runs) is recreated to use them too.
+
+create index person_lower_name_idx on "Person" (lower(first_name), lower(last_name));
+create index customers_person_id_idx on "Customers" (person_id);
+create index physician_prc_ptr_idx on "Physician" (prc_num, ptr_num);
+
+create or replace function resolve_person(p_first_name text, p_last_name text)
+returns bigint
+language plpgsql
+as $$
+declare
+    v_person_id bigint;
+begin
+    perform pg_advisory_xact_lock(hashtext('Person:' || lower(p_first_name) || '/' || lower(p_last_name)));
+
+    select person_id into v_person_id
+    from "Person"
+    where lower(first_name) = lower(p_first_name) and lower(last_name) = lower(p_last_name)
+    order by person_id
+    limit 1;
+
+    if v_person_id is null then
+        insert into "Person" (first_name, last_name)
+        values (p_first_name, p_last_name)
+        returning person_id into v_person_id;
+    end if;
+    return v_person_id;
+end;
+$$;
+
+-- customers: [{first_name, last_name, id_card_number, customer_type_id}, ...]
+create or replace function resolve_customers(customers jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_customer jsonb;
+    v_person_id bigint;
+    v_customer_id bigint;
+    v_ids jsonb := '[]'::jsonb;
+begin
+    for v_customer in select value from jsonb_array_elements(customers) with ordinality order by ordinality loop
+        v_person_id := resolve_person(v_customer->>'first_name', v_customer->>'last_name');
+
+        perform pg_advisory_xact_lock(hashtext('Customers:' || v_person_id));
+        select customer_id into v_customer_id
+        from "Customers"
+        where person_id = v_person_id
+        order by customer_id
+        limit 1;
+
+        if v_customer_id is null then
+            insert into "Customers" (person_id, id_card_number, customer_type_id)
+            values (v_person_id, v_customer->>'id_card_number', (v_customer->>'customer_type_id')::bigint)
+            returning customer_id into v_customer_id;
+        end if;
+        v_ids := v_ids || to_jsonb(v_customer_id);
+    end loop;
+    return v_ids;
+end;
+$$;
+
+-- physicians: [{first_name, last_name, prc_num, ptr_num}, ...]
+create or replace function resolve_physicians(physicians jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_physician jsonb;
+    v_physician_id bigint;
+    v_person_id bigint;
+    v_ids jsonb := '[]'::jsonb;
+begin
+    for v_physician in select value from jsonb_array_elements(physicians) with ordinality order by ordinality loop
+        perform pg_advisory_xact_lock(hashtext(
+            'Physician:' || coalesce(v_physician->>'prc_num', '') || '/' || coalesce(v_physician->>'ptr_num', '')
+        ));
+        select physician_id into v_physician_id
+        from "Physician"
+        where prc_num is not distinct from v_physician->>'prc_num'
+          and ptr_num is not distinct from v_physician->>'ptr_num'
+        order by physician_id
+        limit 1;
+
+        if v_physician_id is null then
+            v_person_id := resolve_person(v_physician->>'first_name', v_physician->>'last_name');
+            insert into "Physician" (person_id, prc_num, ptr_num)
+            values (v_person_id, v_physician->>'prc_num', v_physician->>'ptr_num')
+            returning physician_id into v_physician_id;
+        end if;
+        v_ids := v_ids || to_jsonb(v_physician_id);
+    end loop;
+    return v_ids;
+end;
+$$;
+
+-- Unchanged except that customers and physicians go through the functions above.
+create or replace function pos_record_sale(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_location bigint := (payload->>'location_id')::bigint;
+    v_sale_date timestamptz := (payload->>'sale_date')::timestamptz;
+    v_customer jsonb := payload->'customer';
+    v_prescription jsonb := payload->'prescription';
+    v_dswd jsonb := payload->'dswd';
+    v_customer_id bigint;
+    v_physician_id bigint;
+    v_prescription_id bigint;
+    v_pos_id bigint;
+    v_invoice text;
+    v_stock_item_id bigint;
+    v_available integer;
+    v_remaining integer;
+    v_take integer;
+    v_line record;
+    v_batch record;
+begin
+    -- Lock the cart's stock rows (in product order, so concurrent sales cannot
+    -- deadlock) and check every product before writing anything.
+    for v_line in
+        select (item->>'product_id')::bigint as product_id, sum((item->>'quantity')::integer) as quantity
+        from jsonb_array_elements(payload->'items') as item
+        group by 1
+        order by 1
+    loop
+        select quantity into v_available
+        from "Stock_Item"
+        where product_id = v_line.product_id and location_id = v_location
+        for update;
+
+        if not found then
+            raise exception 'Product % not found in stock for this location.', v_line.product_id;
+        end if;
+        if v_line.quantity > v_available then
+            raise exception 'Insufficient stock for product %. Available: %, Requested: %',
+                v_line.product_id, v_available, v_line.quantity;
+        end if;
+    end loop;
+
+    if jsonb_typeof(v_customer) = 'object' then
+        v_customer_id := (resolve_customers(jsonb_build_array(v_customer))->>0)::bigint;
+    end if;
+
+    if jsonb_typeof(v_prescription) = 'object' then
+        v_physician_id := (resolve_physicians(jsonb_build_array(v_prescription))->>0)::bigint;
+
+        insert into "Prescription" (customer_id, physician_id, prescription_details, date_issued)
+        values (v_customer_id, v_physician_id, v_prescription->>'details', (v_prescription->>'date_issued')::date)
+        returning prescription_id into v_prescription_id;
+    end if;
+
+    v_invoice := format_document_number('POS', extract(year from now())::int,
+                                        next_document_number('POS-' || extract(year from now())::int));
+
+    insert into "POS" (sale_date, invoice, user_id, order_type, prescription_id)
+    values (v_sale_date, v_invoice, (payload->>'user_id')::bigint, payload->>'order_type', v_prescription_id)
+    returning pos_id into v_pos_id;
+
+    for v_line in
+        select (item->>'product_id')::bigint as product_id,
+               (item->>'price')::numeric as price,
+               (item->>'quantity')::integer as quantity
+        from jsonb_array_elements(payload->'items') with ordinality as t(item, position)
+        order by position
+    loop
+        update "Stock_Item"
+        set quantity = quantity - v_line.quantity
+        where product_id = v_line.product_id and location_id = v_location
+        returning stock_item_id into v_stock_item_id;
+
+        -- FIFO: use up the batches closest to expiry first, one ledger row per batch touched
+        v_remaining := v_line.quantity;
+        for v_batch in
+            select expiration_id, expiry_date, quantity
+            from "Expiration"
+            where stock_item_id = v_stock_item_id and quantity > 0
+            order by expiry_date, expiration_id
+            for update
+        loop
+            exit when v_remaining <= 0;
+            v_take := least(v_batch.quantity, v_remaining);
+
+            update "Expiration" set quantity = quantity - v_take where expiration_id = v_batch.expiration_id;
+
+            insert into "Stock_Transaction"
+                (transaction_date, transaction_type, src_location, stock_item_id, reference_id, quantity_change, expiry_date)
+            values (v_sale_date, 'POS', v_location, v_stock_item_id, v_pos_id, -v_take, v_batch.expiry_date);
+
+            v_remaining := v_remaining - v_take;
+        end loop;
+
+        -- Stock that is not recorded in any batch
+        if v_remaining > 0 then
+            insert into "Stock_Transaction"
+                (transaction_date, transaction_type, src_location, stock_item_id, reference_id, quantity_change)
+            values (v_sale_date, 'POS', v_location, v_stock_item_id, v_pos_id, -v_remaining);
+        end if;
+
+        insert into "POS_Item" (pos_id, product_id, price, quantity_sold)
+        values (v_pos_id, v_line.product_id, v_line.price, v_line.quantity);
+    end loop;
+
+    if jsonb_typeof(v_dswd) = 'object' then
+        insert into "Dswd_Order" (customer_id, pos_id, gl_num, gl_date, claim_date, client_name)
+        values (v_customer_id, v_pos_id, v_dswd->>'gl_num', (v_dswd->>'gl_date')::date,
+                (v_dswd->>'claim_date')::date, v_dswd->>'client_name');
+    end if;
+
+    return jsonb_build_object('pos_id', v_pos_id, 'invoice', v_invoice);
+end;
+$$;
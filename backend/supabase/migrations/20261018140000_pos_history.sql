@@ -0,0 +1,26 @@
+-- POS history in one request.
+--
+-- GET /pos/ reads POS with its items embedded; the totals come from these
+-- computed columns (PostgREST exposes a function taking the row type as a
+-- column of that table: select=*,total_amount,POS_Item(*,total_price)), so
+-- the sums are done by Postgres instead of the API.  The indexes back the
+-- user_id filter and keyset pages within a sale_date range.
+
+create or replace function total_price(item "POS_Item")
+returns numeric
+language sql
+immutable
+as $$
+    select item.price * item.quantity_sold;
+$$;
+
+create or replace function total_amount(pos "POS")
+returns numeric
+language sql
+stable
+as $$
+    select coalesce(sum(price * quantity_sold), 0) from "POS_Item" where pos_id = pos.pos_id;
+$$;
+
+create index pos_user_id_idx on "POS" (user_id, pos_id);
+create index pos_sale_date_pos_id_idx on "POS" (sale_date, pos_id);
@@ -0,0 +1,44 @@
+-- Atomic changes to Stock_Item.quantity.
+--
+-- adjust_stock applies a batch of signed deltas in one statement per stock
+-- item (quantity = quantity + delta), so two writers changing the same item
+-- can no longer overwrite each other as they did when the views read the
+-- quantity, added to it in Python and wrote the result back.  Deltas for the
+-- same item are summed and items are updated in id order, so concurrent
+-- calls lock rows in the same order and cannot deadlock.  If any item would
+-- go below zero (or does not exist) the whole call fails and nothing changes.
+
+-- adjustments: [{stock_item_id, delta}, ...]; returns [{stock_item_id, quantity}, ...]
+create or replace function adjust_stock(adjustments jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_adjustment record;
+    v_quantity bigint;
+    v_result jsonb := '[]'::jsonb;
+begin
+    for v_adjustment in
+        select (value->>'stock_item_id')::bigint as stock_item_id, sum((value->>'delta')::bigint) as delta
+        from jsonb_array_elements(adjustments)
+        group by 1
+        order by 1
+    loop
+        update "Stock_Item"
+        set quantity = quantity + v_adjustment.delta
+        where stock_item_id = v_adjustment.stock_item_id
+        returning quantity into v_quantity;
+
+        if not found then
+            raise exception 'Stock item % not found.', v_adjustment.stock_item_id;
+        end if;
+        if v_quantity < 0 then
+            raise exception 'Insufficient stock for stock item %. Available: %, Requested: %',
+                v_adjustment.stock_item_id, v_quantity - v_adjustment.delta, -v_adjustment.delta;
+        end if;
+
+        v_result := v_result || jsonb_build_object('stock_item_id', v_adjustment.stock_item_id, 'quantity', v_quantity);
+    end loop;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,66 @@
+-- Daily snapshots of the stock ledger.
+--
+-- Stock_Transaction is the record of every change to a stock item's quantity;
+-- Stock_Item.quantity is the running total kept next to it for cheap reads.
+-- Stock_Snapshot holds each stock item's ledger total at the end of a day
+-- (pharmacy/ledger.py, `manage.py snapshot_stock`), so rebuilding or auditing
+-- a quantity folds only the entries after the last snapshot.  A snapshot
+-- covers the entries dated before the end of `day` with an id up to
+-- last_transaction_id; entries written later, even backdated ones (offline
+-- sales), are picked up by id.  last_transaction_id is the newest id read a
+-- settle delay before the snapshot is written (LEDGER_SETTLE_SECONDS), so no
+-- lower id can still belong to an uncommitted transaction.
+
+create table "Stock_Snapshot" (
+    stock_item_id bigint not null references "Stock_Item" (stock_item_id) on delete cascade,
+    day date not null,
+    quantity integer not null,
+    last_transaction_id bigint not null default 0,
+    primary key (stock_item_id, day)
+);
+
+create index stock_snapshot_day_idx on "Stock_Snapshot" (day);
+create index stock_transaction_date_idx on "Stock_Transaction" (transaction_date);
+
+-- Every ledger entry needs a date to fall on one side of a snapshot
+update "Stock_Transaction"
+set transaction_date = coalesce(disposed_date::timestamptz, now())
+where transaction_date is null;
+
+alter table "Stock_Transaction" alter column transaction_date set not null;
+
+-- Completed transfers only recorded the stock arriving; give each credit the
+-- matching debit at the source, dated with it, so past quantities fold right.
+insert into "Stock_Transaction" (stock_item_id, transaction_type, src_location, des_location, reference_id,
+                                 quantity_change, expiry_date, transaction_date)
+select src.stock_item_id, 'Transfer', t.src_location, t.des_location, t.reference_id,
+       -t.quantity_change, t.expiry_date, t.transaction_date
+from "Stock_Transaction" t
+join "Stock_Transfer_Item" i on i.stock_transfer_item_id = t.reference_id
+join "Stock_Item" src on src.product_id = i.product_id and src.location_id = t.src_location
+where t.transaction_type = 'Transfer'
+  and t.quantity_change > 0
+  and not exists (
+      select 1 from "Stock_Transaction" d
+      where d.transaction_type = 'Transfer'
+        and d.reference_id = t.reference_id
+        and d.stock_item_id = src.stock_item_id
+        and d.quantity_change < 0
+  );
+
+-- Quantities set before the ledger was complete (stock counts, imports) get an
+-- opening entry, so the ledger adds up to Stock_Item.quantity from here on.
+-- It is dated just before the stock item's first entry: that stock was never
+-- recorded coming in, so it counts as held from the start, and a fold as of
+-- an earlier day (GET /stock-items/as-of/) does not go negative over the
+-- sales and transfers that took from it.
+insert into "Stock_Transaction" (stock_item_id, transaction_type, quantity_change, transaction_date)
+select s.stock_item_id, 'Opening Balance', s.quantity - coalesce(l.total, 0),
+       coalesce(l.first_date - interval '1 second', now())
+from "Stock_Item" s
+left join (
+    select stock_item_id, sum(quantity_change) as total, min(transaction_date) as first_date
+    from "Stock_Transaction"
+    group by stock_item_id
+) l on l.stock_item_id = s.stock_item_id
+where s.quantity <> coalesce(l.total, 0);
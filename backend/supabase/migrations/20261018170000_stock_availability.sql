@@ -0,0 +1,88 @@
+-- Per-product, per-location availability for the catalog.
+--
+-- GET /products/ showed each product's stock per location with its batches
+-- in FIFO order, reading Expiration once per Stock_Item row (3N+1 queries
+-- for N products).  Stock_Availability keeps that summary ready: one row per
+-- stock item with its quantity and the batches with stock left, soonest
+-- expiry first.  Triggers on Stock_Item and Expiration refresh the rows of
+-- the stock items a statement touched, once per statement, so the catalog
+-- embeds it and reads in one query.
+
+create table "Stock_Availability" (
+    stock_item_id bigint primary key references "Stock_Item" (stock_item_id) on delete cascade,
+    product_id bigint not null references "Products" (product_id) on delete cascade,
+    location_id bigint not null references "Location" (location_id),
+    quantity integer not null default 0,
+    -- [{expiry_date, quantity}, ...], soonest expiry first
+    expiry_details jsonb not null default '[]',
+    updated_at timestamptz not null default now()
+);
+
+create index stock_availability_product_idx on "Stock_Availability" (product_id);
+
+create or replace function refresh_stock_availability(p_stock_item_ids bigint[])
+returns void
+language sql
+as $$
+    insert into "Stock_Availability" (stock_item_id, product_id, location_id, quantity, expiry_details, updated_at)
+    select s.stock_item_id, s.product_id, s.location_id, s.quantity,
+           coalesce((
+               select jsonb_agg(jsonb_build_object('expiry_date', e.expiry_date, 'quantity', e.quantity)
+                                order by e.expiry_date, e.expiration_id)
+               from "Expiration" e
+               where e.stock_item_id = s.stock_item_id and e.quantity > 0
+           ), '[]'::jsonb),
+           now()
+    from "Stock_Item" s
+    where s.stock_item_id = any(p_stock_item_ids)
+    on conflict (stock_item_id) do update
+    set product_id = excluded.product_id,
+        location_id = excluded.location_id,
+        quantity = excluded.quantity,
+        expiry_details = excluded.expiry_details,
+        updated_at = excluded.updated_at;
+$$;
+
+-- Statement-level, so a bulk write (a checkout's batch upsert, a transfer)
+-- refreshes each stock item it touched once.
+create or replace function stock_availability_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform refresh_stock_availability(array(select distinct stock_item_id from new_rows));
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform refresh_stock_availability(array(select distinct stock_item_id from old_rows));
+    end if;
+    return null;
+end;
+$$;
+
+create trigger stock_item_availability_insert
+after insert on "Stock_Item"
+referencing new table as new_rows
+for each statement execute function stock_availability_trigger();
+
+create trigger stock_item_availability_update
+after update on "Stock_Item"
+referencing old table as old_rows new table as new_rows
+for each statement execute function stock_availability_trigger();
+
+create trigger expiration_availability_insert
+after insert on "Expiration"
+referencing new table as new_rows
+for each statement execute function stock_availability_trigger();
+
+create trigger expiration_availability_update
+after update on "Expiration"
+referencing old table as old_rows new table as new_rows
+for each statement execute function stock_availability_trigger();
+
+create trigger expiration_availability_delete
+after delete on "Expiration"
+referencing old table as old_rows
+for each statement execute function stock_availability_trigger();
+
+select refresh_stock_availability(array(select stock_item_id from "Stock_Item"));
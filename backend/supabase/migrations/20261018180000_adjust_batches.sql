@@ -0,0 +1,43 @@
+-- Atomic changes to Expiration.quantity (the FIFO batches).
+--
+-- pharmacy/allocation.py used to work batch quantities out in Python and
+-- upsert the results, so a sale or transfer that touched the same batch
+-- between the read and the write was lost.  adjust_batches applies signed
+-- deltas instead (quantity = quantity + delta), one statement per batch in
+-- expiration_id order like adjust_stock, and if any batch would go below zero
+-- (or no longer exists) the whole call fails and nothing changes.
+
+-- adjustments: [{expiration_id, delta}, ...]; returns [{expiration_id, quantity}, ...]
+create or replace function adjust_batches(adjustments jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_adjustment record;
+    v_quantity bigint;
+    v_result jsonb := '[]'::jsonb;
+begin
+    for v_adjustment in
+        select (value->>'expiration_id')::bigint as expiration_id, sum((value->>'delta')::bigint) as delta
+        from jsonb_array_elements(adjustments)
+        group by 1
+        order by 1
+    loop
+        update "Expiration"
+        set quantity = quantity + v_adjustment.delta
+        where expiration_id = v_adjustment.expiration_id
+        returning quantity into v_quantity;
+
+        if not found then
+            raise exception 'Batch % not found.', v_adjustment.expiration_id;
+        end if;
+        if v_quantity < 0 then
+            raise exception 'Insufficient stock in batch %. Available: %, Requested: %',
+                v_adjustment.expiration_id, v_quantity - v_adjustment.delta, -v_adjustment.delta;
+        end if;
+
+        v_result := v_result || jsonb_build_object('expiration_id', v_adjustment.expiration_id, 'quantity', v_quantity);
+    end loop;
+    return v_result;
+end;
+$$;
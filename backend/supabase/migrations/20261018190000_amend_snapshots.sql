@@ -0,0 +1,34 @@
+-- Carry an edited or deleted ledger entry into the Stock_Snapshot rows that
+-- already counted it, as signed deltas (quantity = quantity + delta) rather
+-- than totals worked out by the caller, so two amendments of the same
+-- snapshot at once both land.  One call takes every change of an edit (the
+-- old entry out, the new one in) in one statement.
+
+-- changes: [{stock_item_id, day, stock_transaction_id, delta}, ...]: delta goes to
+-- the item's snapshots from `day` on whose last_transaction_id reaches the entry
+create or replace function amend_snapshots(changes jsonb)
+returns integer
+language sql
+as $$
+    with change as (
+        select (value->>'stock_item_id')::bigint as stock_item_id,
+               (value->>'day')::date as day,
+               (value->>'stock_transaction_id')::bigint as stock_transaction_id,
+               (value->>'delta')::integer as delta
+        from jsonb_array_elements(changes)
+    ), total as (
+        select s.stock_item_id, s.day, sum(c.delta) as delta
+        from "Stock_Snapshot" s
+        join change c on c.stock_item_id = s.stock_item_id
+                     and s.day >= c.day
+                     and s.last_transaction_id >= c.stock_transaction_id
+        group by s.stock_item_id, s.day
+    ), updated as (
+        update "Stock_Snapshot" s
+        set quantity = s.quantity + t.delta
+        from total t
+        where s.stock_item_id = t.stock_item_id and s.day = t.day
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
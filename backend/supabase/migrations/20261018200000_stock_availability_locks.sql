@@ -0,0 +1,90 @@
+-- Lock the stock items a Stock_Availability refresh rebuilds.
+--
+-- The statement-level triggers rebuilt each row from the refreshing
+-- statement's snapshot.  Two transactions writing different batches of the
+-- same stock item each saw only their own change, and the later upsert of
+-- the summary row overwrote the earlier one with a total that missed it.
+-- refresh_stock_availability now takes the Stock_Item rows first, in id
+-- order, and rebuilds them in a separate statement.  That statement gets a
+-- fresh snapshot once the lock is granted, so it sees every committed change
+-- to those items.
+--
+-- Locks are taken Stock_Item first, then Expiration, as pos_checkout already
+-- does.  adjust_batches now takes the stock items of its batches before it
+-- updates them, so it cannot deadlock with a checkout.
+
+create or replace function refresh_stock_availability(p_stock_item_ids bigint[])
+returns void
+language plpgsql
+as $$
+begin
+    perform 1
+    from "Stock_Item"
+    where stock_item_id = any(p_stock_item_ids)
+    order by stock_item_id
+    for update;
+
+    insert into "Stock_Availability" (stock_item_id, product_id, location_id, quantity, expiry_details, updated_at)
+    select s.stock_item_id, s.product_id, s.location_id, s.quantity,
+           coalesce((
+               select jsonb_agg(jsonb_build_object('expiry_date', e.expiry_date, 'quantity', e.quantity)
+                                order by e.expiry_date, e.expiration_id)
+               from "Expiration" e
+               where e.stock_item_id = s.stock_item_id and e.quantity > 0
+           ), '[]'::jsonb),
+           now()
+    from "Stock_Item" s
+    where s.stock_item_id = any(p_stock_item_ids)
+    on conflict (stock_item_id) do update
+    set product_id = excluded.product_id,
+        location_id = excluded.location_id,
+        quantity = excluded.quantity,
+        expiry_details = excluded.expiry_details,
+        updated_at = excluded.updated_at;
+end;
+$$;
+
+-- adjustments: [{expiration_id, delta}, ...]; returns [{expiration_id, quantity}, ...]
+create or replace function adjust_batches(adjustments jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_adjustment record;
+    v_quantity bigint;
+    v_result jsonb := '[]'::jsonb;
+begin
+    perform 1
+    from "Stock_Item"
+    where stock_item_id in (
+        select e.stock_item_id
+        from "Expiration" e
+        where e.expiration_id in (select (value->>'expiration_id')::bigint from jsonb_array_elements(adjustments))
+    )
+    order by stock_item_id
+    for update;
+
+    for v_adjustment in
+        select (value->>'expiration_id')::bigint as expiration_id, sum((value->>'delta')::bigint) as delta
+        from jsonb_array_elements(adjustments)
+        group by 1
+        order by 1
+    loop
+        update "Expiration"
+        set quantity = quantity + v_adjustment.delta
+        where expiration_id = v_adjustment.expiration_id
+        returning quantity into v_quantity;
+
+        if not found then
+            raise exception 'Batch % not found.', v_adjustment.expiration_id;
+        end if;
+        if v_quantity < 0 then
+            raise exception 'Insufficient stock in batch %. Available: %, Requested: %',
+                v_adjustment.expiration_id, v_quantity - v_adjustment.delta, -v_adjustment.delta;
+        end if;
+
+        v_result := v_result || jsonb_build_object('expiration_id', v_adjustment.expiration_id, 'quantity', v_quantity);
+    end loop;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,282 @@
+-- Public schema of the pharmacy Supabase project, as used by the Django views.
+--
+-- This is the reference copy the local stand-in (pharmacy/local_supabase) loads;
+-- keep it in step with the hosted database when tables or columns change.
+-- Changes that go beyond plain tables and indexes live in supabase/migrations/.
+
+create table "Location" (
+    location_id bigint generated by default as identity primary key,
+    location text not null
+);
+
+create table "Branch" (
+    branch_id bigint generated by default as identity primary key,
+    branch_name text,
+    address text,
+    location_id bigint references "Location" (location_id)
+);
+
+create table "Brand" (
+    brand_id bigint generated by default as identity primary key,
+    brand_name text not null
+);
+
+create table "Unit" (
+    unit_id bigint generated by default as identity primary key,
+    unit text not null
+);
+
+create table "Product_Category" (
+    category_id bigint generated by default as identity primary key,
+    category_name text not null
+);
+
+create table "Status" (
+    status_id bigint generated by default as identity primary key,
+    status text not null
+);
+
+create table "Products" (
+    product_id bigint generated by default as identity primary key,
+    product_name text not null,
+    category_id bigint references "Product_Category" (category_id),
+    brand_id bigint references "Brand" (brand_id),
+    unit_id bigint references "Unit" (unit_id),
+    current_price numeric not null default 0,
+    net_content text
+);
+
+create table "Drugs" (
+    drugs_id bigint generated by default as identity primary key,
+    product_id bigint not null unique references "Products" (product_id) on delete cascade,
+    dosage_strength text,
+    dosage_form text
+);
+
+create table "Inventory" (
+    inventory_id bigint generated by default as identity primary key,
+    product_id bigint references "Products" (product_id) on delete cascade
+);
+
+create table "Price_History" (
+    price_history_id bigint generated by default as identity primary key,
+    product_id bigint references "Products" (product_id) on delete cascade,
+    price numeric,
+    effective_date timestamptz default now()
+);
+
+create table "Person" (
+    person_id bigint generated by default as identity primary key,
+    first_name text,
+    last_name text,
+    address text,
+    contact text,
+    email text
+);
+
+create table "User_Role" (
+    role_id bigint generated by default as identity primary key,
+    role_name text not null
+);
+
+create table "Users" (
+    user_id bigint generated by default as identity primary key,
+    username text not null unique,
+    password text not null,
+    person_id bigint references "Person" (person_id),
+    role_id bigint references "User_Role" (role_id),
+    location_id bigint references "Location" (location_id),
+    status text default 'Active'
+);
+
+create table "Customer_Type" (
+    customer_type_id bigint generated by default as identity primary key,
+    description text not null,
+    discount numeric not null default 0
+);
+
+create table "Customers" (
+    customer_id bigint generated by default as identity primary key,
+    person_id bigint references "Person" (person_id),
+    id_card_number text,
+    customer_type_id bigint references "Customer_Type" (customer_type_id)
+);
+
+create table "Physician" (
+    physician_id bigint generated by default as identity primary key,
+    person_id bigint references "Person" (person_id),
+    prc_num text,
+    ptr_num text
+);
+
+create table "Prescription" (
+    prescription_id bigint generated by default as identity primary key,
+    customer_id bigint references "Customers" (customer_id),
+    physician_id bigint references "Physician" (physician_id),
+    prescription_details text,
+    date_issued date
+);
+
+create table "POS" (
+    pos_id bigint generated by default as identity primary key,
+    sale_date timestamptz not null default now(),
+    invoice text,
+    user_id bigint references "Users" (user_id),
+    order_type text,
+    prescription_id bigint references "Prescription" (prescription_id)
+);
+
+create table "POS_Item" (
+    pos_item_id bigint generated by default as identity primary key,
+    pos_id bigint not null references "POS" (pos_id) on delete cascade,
+    product_id bigint references "Products" (product_id),
+    price numeric not null,
+    quantity_sold integer not null
+);
+
+create table "Dswd_Order" (
+    dswd_order_id bigint generated by default as identity primary key,
+    customer_id bigint references "Customers" (customer_id),
+    pos_id bigint references "POS" (pos_id) on delete cascade,
+    gl_num text,
+    gl_date date,
+    claim_date date,
+    client_name text
+);
+
+create table "Order" (
+    order_id bigint generated by default as identity primary key,
+    customer_id bigint references "Customers" (customer_id),
+    order_date timestamptz default now()
+);
+
+create table "Receipt" (
+    receipt_id bigint generated by default as identity primary key,
+    pos_id bigint references "POS" (pos_id) on delete cascade,
+    receipt_date timestamptz default now()
+);
+
+create table "Supplier" (
+    supplier_id bigint generated by default as identity primary key,
+    supplier_name text not null,
+    vat_num text,
+    status_id bigint references "Status" (status_id),
+    person_id bigint references "Person" (person_id)
+);
+
+create table "Supplier_Item" (
+    supplier_item_id bigint generated by default as identity primary key,
+    supplier_id bigint references "Supplier" (supplier_id) on delete cascade,
+    product_id bigint references "Products" (product_id) on delete cascade,
+    supplier_price numeric
+);
+
+create table "Purchase_Order_Status" (
+    purchase_order_status_id bigint generated by default as identity primary key,
+    purchase_order_status text not null
+);
+
+create table "Purchase_Order_Item_Status" (
+    purchase_order_item_status_id bigint generated by default as identity primary key,
+    po_item_status text not null
+);
+
+create table "Purchase_Order" (
+    purchase_order_id bigint generated by default as identity primary key,
+    po_id text unique,
+    order_date date,
+    expected_delivery_date date,
+    purchase_order_status_id bigint references "Purchase_Order_Status" (purchase_order_status_id),
+    notes text
+);
+
+create table "Purchase_Order_Item" (
+    purchase_order_item_id bigint generated by default as identity primary key,
+    poi_id text unique,
+    purchase_order_id bigint references "Purchase_Order" (purchase_order_id) on delete cascade,
+    supplier_item_id bigint references "Supplier_Item" (supplier_item_id),
+    unit_id bigint references "Unit" (unit_id),
+    purchase_order_item_status_id bigint references "Purchase_Order_Item_Status" (purchase_order_item_status_id),
+    ordered_qty integer not null default 0,
+    received_qty integer default 0,
+    expired_qty integer default 0,
+    damaged_qty integer default 0,
+    expiry_date date
+);
+
+create table "Stock_Item" (
+    stock_item_id bigint generated by default as identity primary key,
+    product_id bigint not null references "Products" (product_id) on delete cascade,
+    location_id bigint not null references "Location" (location_id),
+    quantity integer not null default 0,
+    unique (product_id, location_id)
+);
+
+create table "Expiration" (
+    expiration_id bigint generated by default as identity primary key,
+    stock_item_id bigint not null references "Stock_Item" (stock_item_id) on delete cascade,
+    expiry_date date not null,
+    quantity integer not null default 0
+);
+
+create index expiration_stock_item_expiry_idx on "Expiration" (stock_item_id, expiry_date);
+create index expiration_expiry_date_idx on "Expiration" (expiry_date);
+
+create table "Disposed_Items" (
+    disposed_items_id bigint generated by default as identity primary key,
+    stock_item_id bigint references "Stock_Item" (stock_item_id),
+    quantity integer,
+    disposed_date date
+);
+
+-- reference_id points at a different table depending on transaction_type
+-- (POS, POS_Item, Purchase_Order_Item, Stock_Transfer_Item), so it has no FK.
+create table "Stock_Transaction" (
+    stock_transaction_id bigint generated by default as identity primary key,
+    stock_item_id bigint references "Stock_Item" (stock_item_id),
+    transaction_type text not null,
+    reference_id bigint,
+    src_location bigint,
+    des_location bigint,
+    quantity_change integer not null,
+    transaction_date timestamptz default now(),
+    disposed_date date,
+    expiry_date date
+);
+
+create index stock_transaction_type_idx on "Stock_Transaction" (transaction_type);
+create index stock_transaction_stock_item_idx on "Stock_Transaction" (stock_item_id, transaction_date);
+create index stock_transaction_reference_idx on "Stock_Transaction" (reference_id);
+
+create table "Stock_Transfer_Status" (
+    stock_transfer_status_id bigint generated by default as identity primary key,
+    stock_transfer_status text not null
+);
+
+create table "Stock_Transfer_Item_Status" (
+    stock_transfer_item_status_id bigint generated by default as identity primary key,
+    sti_status text not null
+);
+
+create table "Stock_Transfer" (
+    stock_transfer_id bigint generated by default as identity primary key,
+    transfer_id text unique,
+    transfer_date date,
+    stock_transfer_status_id bigint references "Stock_Transfer_Status" (stock_transfer_status_id),
+    src_location bigint references "Location" (location_id),
+    des_location bigint references "Location" (location_id)
+);
+
+create table "Stock_Transfer_Item" (
+    stock_transfer_item_id bigint generated by default as identity primary key,
+    sti_id text,
+    stock_transfer_id bigint references "Stock_Transfer" (stock_transfer_id) on delete cascade,
+    product_id bigint references "Products" (product_id),
+    unit_id bigint references "Unit" (unit_id),
+    stock_transfer_item_status_id bigint references "Stock_Transfer_Item_Status" (stock_transfer_item_status_id),
+    ordered_quantity integer not null default 0,
+    transferred_qty integer default 0
+);
+
+create index pos_sale_date_idx on "POS" (sale_date);
+create index pos_item_pos_idx on "POS_Item" (pos_id);